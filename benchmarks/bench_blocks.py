@@ -0,0 +1,46 @@
+"""Compares writing the text one fragment at a time (`iter_vrt_xml`) against
+writing it in blocks (`iter_vrt_blocks`).
+
+Usage: python benchmarks/bench_blocks.py [--size-mb 100] [--paragraphs]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import time
+
+from synthetic import make_vrt
+
+from vrt2txt import iter_vrt_blocks, iter_vrt_xml
+
+
+def write_fragments(contents: str, out, paragraphs: bool):
+    for text in iter_vrt_xml(contents, paragraphs=paragraphs):
+        out.write(text)
+
+
+def write_blocks(contents: str, out, paragraphs: bool):
+    for block in iter_vrt_blocks(contents, paragraphs=paragraphs):
+        out.write(block)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size-mb", type=float, default=100)
+    parser.add_argument("--paragraphs", action="store_true")
+    args = parser.parse_args()
+
+    contents = make_vrt(int(args.size_mb * 1e6))
+    size_mb = len(contents.encode("utf-8")) / 1e6
+    print(f"Synthetic corpus: {size_mb:.1f} MB")
+    for name, func in [("fragments", write_fragments), ("blocks", write_blocks)]:
+        with open(os.devnull, "w", encoding="utf-8") as out:
+            start = time.perf_counter()
+            func(contents, out, args.paragraphs)
+            elapsed = time.perf_counter() - start
+        print(f"{name:>10}: {elapsed:7.2f} s  {size_mb / elapsed:7.2f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""Compares the conversion with and without the token cache, and reports the
+hit rate of the cache.
+
+Usage: python benchmarks/bench_cache.py [--size-mb 100] [--cache-size 65536]
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+from synthetic import make_vrt
+
+from vrt2txt import TokenCache, iter_vrt_blocks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size-mb", type=float, default=100)
+    parser.add_argument("--cache-size", type=int, default=65536)
+    args = parser.parse_args()
+
+    contents = make_vrt(int(args.size_mb * 1e6))
+    size_mb = len(contents.encode("utf-8")) / 1e6
+    print(f"Synthetic corpus: {size_mb:.1f} MB")
+    for name, cache in [("no cache", None), ("cache", TokenCache(args.cache_size))]:
+        start = time.perf_counter()
+        for _ in iter_vrt_blocks(contents, paragraphs=True, cache=cache):
+            pass
+        elapsed = time.perf_counter() - start
+        print(f"{name:>10}: {elapsed:7.2f} s  {size_mb / elapsed:7.2f} MB/s")
+        if cache is not None:
+            lookups = max(cache.hits + cache.misses, 1)
+            print(f"{'':>10}  {cache!r}, hit rate {cache.hits / lookups:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""Compares the table-driven `_form_sentence` against the previous generator
+based implementation and the batched `form_sentences` (with each available
+backend), and checks that all give the same output on random sentences.
+
+The random sentences stress the special cases (quotes, parentheses, empty
+parts), the synthetic corpus has a more realistic share of punctuation.
+
+Usage: python benchmarks/bench_detokenizer.py [--sentences 200000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+
+from synthetic import make_vrt
+
+from vrt2txt.batch import BACKENDS, form_sentences
+from vrt2txt.vrt2txt import (
+    NUM,
+    PART_TYPES,
+    PUNCT,
+    WORD,
+    _form_sentence,
+    get_contents_from_line,
+)
+
+PARTS = [
+    ("Foo", WORD), ("bar", WORD), ('"le', WORD), ("l'eau", WORD), ("”x", WORD),
+    ("6", NUM), ("3", NUM), (".", PUNCT), (",", PUNCT), ("!", PUNCT),
+    ("(", PUNCT), (")", PUNCT), ("/", PUNCT), ('"', PUNCT), ("”", PUNCT),
+    ("'", PUNCT), ("", WORD), ("", PUNCT),
+]  # fmt: skip
+
+
+def legacy_form_sentence(sentence_parts, sentence_part_types) -> str:
+    """_form_sentence of vrt2txt 0.1.0."""
+    return "".join(legacy_iter_sentence_parts(sentence_parts, sentence_part_types))
+
+
+def legacy_iter_sentence_parts(sentence_parts, sentence_part_types):
+    # Notes:
+    # This would be probably easier to understand if rewritten as a class.
+    # This does not handle all special cases. There are numerous different
+    # quotation marks in the world which are not handled correctly. Urls are
+    # not handled correctly either.
+    previous_part = None
+    previous_part_type = None
+    before_previous_part_type = None
+
+    space_before_part = False
+
+    inside_double_quotes = False
+    inside_single_quotes = False
+    inside_curly_double_quotes = False
+
+    for part, part_type in zip(
+        sentence_parts,
+        sentence_part_types,
+    ):
+        if part_type not in PART_TYPES:
+            raise ValueError(f"Invalid part type: {part_type}")
+
+        if previous_part:
+            # By detault, assume that each part is separated with a space.
+            space_before_part = True
+
+        if previous_part in {"(", "/"}:
+            # After opening parenthesis there is no space
+            # After slash there is no space
+            # Example: "km/h"
+            space_before_part = False
+        elif previous_part == '"' and inside_double_quotes:
+            # Inside double quotes, no space
+            # Example: 'Foo "bar" baz' (at 'b')
+            space_before_part = False
+        elif previous_part == "”" and inside_curly_double_quotes:
+            # Inside double curly quotes, no space
+            # Example: "Foo ”bar” baz" (at 'b')
+            space_before_part = False
+        elif previous_part == "'" and inside_single_quotes:
+            # Inside single quotes, no space
+            # Example: "Foo 'bar' baz" (at 'b')
+            space_before_part = False
+
+        # Note: sometimes quotation marks may be part of a WORD (and not as a
+        # separate PUNCT). Therefore using syntax <<if '"' in part>>.
+        if '"' in part:
+            if inside_double_quotes:
+                # When closing double quotes, there is no space
+                # Example: 'foo "bar" baz' (at 'r')
+                space_before_part = False
+            inside_double_quotes = not inside_double_quotes
+        elif "”" in part:
+            if inside_curly_double_quotes:
+                # When closing curly double quotes, there is no space
+                # Example: 'foo ”bar” baz' (at 'r')
+                space_before_part = False
+            inside_curly_double_quotes = not inside_curly_double_quotes
+        elif "'" in part:
+            if inside_single_quotes:
+                # When closing single quotes, there is no space
+                # Example: "foo 'bar' baz" (at 'r')
+                space_before_part = False
+            inside_single_quotes = not inside_single_quotes
+        elif part_type == PUNCT:
+            if part in "(":
+                # Before opening parenthesis there is a space
+                # Example: "Foo (bar) baz"
+                space_before_part = True
+            else:
+                # Otherwise before punctionation, no space
+                # Example: "Foo!" (at '!')
+                space_before_part = False
+
+        if part_type == NUM:
+            if previous_part_type == PUNCT and before_previous_part_type == NUM:
+                # Example: "6,3"
+                space_before_part = False
+
+        if space_before_part:
+            yield " "
+
+        yield part
+
+        before_previous_part_type = previous_part_type
+
+        previous_part = part
+        previous_part_type = part_type
+
+
+def make_sentences(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    sentences = []
+    for _ in range(count):
+        parts = [rng.choice(PARTS) for _ in range(rng.randint(1, 20))]
+        sentences.append(([part for part, _ in parts], [t for _, t in parts]))
+    return sentences
+
+
+def corpus_sentences(size: int):
+    """The sentences of a synthetic corpus, as (parts, part types)."""
+    sentences = []
+    parts, part_types = [], []
+    for line in make_vrt(size).splitlines():
+        if line == "</sentence>":
+            sentences.append((parts, part_types))
+            parts, part_types = [], []
+        elif not line.startswith("<"):
+            part, part_type = get_contents_from_line(line)
+            parts.append(part)
+            part_types.append(part_type)
+    return sentences
+
+
+def measure(name: str, func, sentences) -> list[str]:
+    start = time.perf_counter()
+    result = [func(parts, part_types) for parts, part_types in sentences]
+    elapsed = time.perf_counter() - start
+    print(f"{name:>7}: {elapsed:6.2f} s  {len(sentences) / elapsed:9.0f} sentences/s")
+    return result
+
+
+def measure_batch(backend: str, sentences) -> list[str] | None:
+    parts = [part for sentence_parts, _ in sentences for part in sentence_parts]
+    part_types = [part_type for _, types in sentences for part_type in types]
+    offsets = [0]
+    for sentence_parts, _ in sentences:
+        offsets.append(offsets[-1] + len(sentence_parts))
+    start = time.perf_counter()
+    try:
+        result = form_sentences(parts, part_types, offsets, backend=backend)
+    except ValueError as err:
+        # NumPy is not installed
+        print(f"{backend:>7}: {err}")
+        return None
+    elapsed = time.perf_counter() - start
+    print(
+        f"{backend:>7}: {elapsed:6.2f} s  {len(sentences) / elapsed:9.0f} sentences/s"
+    )
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sentences", type=int, default=200_000)
+    args = parser.parse_args()
+
+    for name, sentences in [
+        ("random parts", make_sentences(args.sentences)),
+        ("synthetic corpus", corpus_sentences(args.sentences * 150)),
+    ]:
+        print(f"{name} ({len(sentences)} sentences)")
+        before = measure("before", legacy_form_sentence, sentences)
+        after = measure("after", _form_sentence, sentences)
+        if before != after:
+            raise SystemExit("The outputs differ!")
+        for backend in BACKENDS:
+            batch = measure_batch(backend, sentences)
+            if batch is not None and batch != after:
+                raise SystemExit(f"The outputs of the {backend} backend differ!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Compares reading a VRT file as text (`iter_vrt_file_blocks`) against
+parsing the memory-mapped bytes (`iter_vrt_mmap_blocks`). Each variant runs in
+its own process, so that the peak memory usage can be compared.
+
+Usage: python benchmarks/bench_mmap.py [--size-mb 100] [--paragraphs]
+"""
+
+from __future__ import annotations
+
+import argparse
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+
+from synthetic import make_vrt
+
+from vrt2txt import iter_vrt_file_blocks, iter_vrt_mmap_blocks
+
+VARIANTS = {"text": iter_vrt_file_blocks, "mmap": iter_vrt_mmap_blocks}
+
+
+def run(name: str, file: str, paragraphs: bool) -> tuple[float, float]:
+    start = time.perf_counter()
+    for _ in VARIANTS[name](file, paragraphs=paragraphs):
+        pass
+    elapsed = time.perf_counter() - start
+    return elapsed, peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss survives exec, so it may include the memory of the parent
+    # process. VmHWM (Linux only) is the peak of this process alone.
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size-mb", type=float, default=100)
+    parser.add_argument("--paragraphs", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        file = os.path.join(folder, "synthetic.VRT")
+        with open(file, "w", encoding="utf-8") as f:
+            f.write(make_vrt(int(args.size_mb * 1e6)))
+        size_mb = os.path.getsize(file) / 1e6
+        print(f"Synthetic corpus: {size_mb:.1f} MB")
+        context = multiprocessing.get_context("spawn")
+        for name in VARIANTS:
+            with context.Pool(1) as pool:
+                elapsed, peak_mb = pool.apply(run, (name, file, args.paragraphs))
+            print(
+                f"{name:>10}: {elapsed:7.2f} s  {size_mb / elapsed:7.2f} MB/s  "
+                f"peak RSS {peak_mb:6.1f} MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
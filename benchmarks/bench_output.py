@@ -0,0 +1,102 @@
+"""Compares the ways of writing the text fragments (sentences and separators)
+yielded by `iter_vrt_xml`: encoding and writing each fragment, joining them
+into blocks first (like `convert`), and a `BlockWriter` writing into a file
+descriptor. The fragments are parsed before the timing, so that only the
+writing is measured. The text is written to /dev/null, or to a pipe read by
+another process with --pipe.
+
+Usage: python benchmarks/bench_output.py [--size-mb 50] [--pipe] [--repeat 5]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+import typing
+
+from synthetic import make_vrt
+
+from vrt2txt import iter_vrt_xml
+from vrt2txt.output import BlockWriter
+
+if typing.TYPE_CHECKING:
+    from typing import Callable
+
+BLOCK_SIZE = 64 * 1024
+
+
+def write_fragments(fragments: list[str], fd: int):
+    with open(fd, "wb", closefd=False) as out:
+        for fragment in fragments:
+            out.write(fragment.encode("utf-8"))
+
+
+def write_blocks(fragments: list[str], fd: int):
+    with open(fd, "wb", closefd=False) as out:
+        block: list[str] = []
+        length = 0
+        for fragment in fragments:
+            block.append(fragment)
+            length += len(fragment)
+            if length >= BLOCK_SIZE:
+                out.write("".join(block).encode("utf-8"))
+                block = []
+                length = 0
+        out.write("".join(block).encode("utf-8"))
+
+
+def write_block_writer(fragments: list[str], fd: int):
+    with BlockWriter(fd) as writer:
+        writer.writelines(fragments)
+
+
+VARIANTS = {
+    "fragments": write_fragments,
+    "blocks": write_blocks,
+    "BlockWriter": write_block_writer,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size-mb", type=float, default=50)
+    parser.add_argument("--pipe", action="store_true")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    fragments = list(iter_vrt_xml(make_vrt(int(args.size_mb * 1e6)), paragraphs=True))
+    size_mb = sum(len(fragment) for fragment in fragments) / 1e6
+    print(f"Text: {size_mb:.1f} MB in {len(fragments)} fragments")
+    for name, write in VARIANTS.items():
+        elapsed = min(run(write, fragments, args.pipe) for _ in range(args.repeat))
+        print(f"{name:>12}: {elapsed:7.3f} s  {size_mb / elapsed:8.1f} MB/s")
+
+
+def run(write: Callable[[list[str], int], None], fragments: list[str], pipe: bool):
+    """Writes the fragments, and returns the time taken in seconds."""
+    if pipe:
+        consumer = subprocess.Popen(
+            [sys.executable, "-c", "import sys, shutil; "
+             "shutil.copyfileobj(sys.stdin.buffer, open('/dev/null', 'wb'))"],
+            stdin=subprocess.PIPE,
+        )  # fmt: skip
+        assert consumer.stdin is not None
+        fd = consumer.stdin.fileno()
+    else:
+        fd = os.open(os.devnull, os.O_WRONLY)
+    start = time.perf_counter()
+    write(fragments, fd)
+    elapsed = time.perf_counter() - start
+    if pipe:
+        consumer.stdin.close()
+        consumer.wait()
+    else:
+        os.close(fd)
+    return elapsed
+
+
+if __name__ == "__main__":
+    main()
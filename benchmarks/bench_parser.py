@@ -0,0 +1,71 @@
+"""Compares the throughput of the line-oriented parser engine of
+`iter_vrt_xml` against the previous nested regex implementation.
+
+Usage: python benchmarks/bench_parser.py [--size-mb 300] [--paragraphs]
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import time
+
+from synthetic import make_vrt
+
+from vrt2txt import iter_vrt_xml
+from vrt2txt.vrt2txt import parse_vrt_sentence
+
+
+def legacy_iter_vrt_xml(
+    contents: str, sentence_tag="sentence", paragraph_tag="paragraph", paragraphs=False
+):
+    """The regex based implementation of iter_vrt_xml (vrt2txt 0.1.0)."""
+    if paragraphs:
+        re_iterator = re.finditer(
+            rf"<{paragraph_tag}>(.*?)</{paragraph_tag}>",
+            contents,
+            flags=re.DOTALL,
+        )
+        paragraph_iterator = (match.groups()[0] for match in re_iterator)
+    else:
+        paragraph_iterator = iter((contents,))
+
+    for paragraph_contents in paragraph_iterator:
+        sentence_iterator = re.finditer(
+            rf"<{sentence_tag}>(.*?)</{sentence_tag}>",
+            paragraph_contents,
+            flags=re.DOTALL,
+        )
+        sentence = next(sentence_iterator)
+        yield parse_vrt_sentence(sentence.groups()[0])
+        for sentence in sentence_iterator:
+            yield " "
+            yield parse_vrt_sentence(sentence.groups()[0])
+        yield "\n"
+
+
+def measure(name: str, func, contents: str, paragraphs: bool) -> str:
+    size_mb = len(contents.encode("utf-8")) / 1e6
+    start = time.perf_counter()
+    text = "".join(func(contents, paragraphs=paragraphs))
+    elapsed = time.perf_counter() - start
+    print(f"{name:>8}: {elapsed:7.2f} s  {size_mb / elapsed:7.2f} MB/s")
+    return text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size-mb", type=float, default=300)
+    parser.add_argument("--paragraphs", action="store_true")
+    args = parser.parse_args()
+
+    contents = make_vrt(int(args.size_mb * 1e6))
+    print(f"Synthetic corpus: {len(contents.encode('utf-8')) / 1e6:.1f} MB")
+    legacy = measure("regex", legacy_iter_vrt_xml, contents, args.paragraphs)
+    current = measure("lines", iter_vrt_xml, contents, args.paragraphs)
+    if legacy != current:
+        raise SystemExit("The outputs differ!")
+
+
+if __name__ == "__main__":
+    main()
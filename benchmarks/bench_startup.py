@@ -0,0 +1,86 @@
+"""Measures the start-up cost of the command line interface: the time of
+`import vrt2txt.cli` in a new interpreter, and the latency of converting many
+small shards with a new process for each shard against sending them to one
+long-lived worker (`vrt2txt --serve`).
+
+Usage: python benchmarks/bench_startup.py [--shards 50] [--shard-kb 20]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from synthetic import write_vrt
+
+COMMAND = [sys.executable, "-m", "vrt2txt"]
+
+
+def import_time(runs: int) -> float:
+    """The fastest of `runs` imports of the command line interface, in
+    seconds, without the start-up of the interpreter itself."""
+    code = (
+        "import time; start = time.perf_counter(); import vrt2txt.cli; "
+        "print(time.perf_counter() - start)"
+    )
+    times = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True
+        ).stdout
+        times.append(float(output))
+    return min(times)
+
+
+def run_processes(shards: list[str]) -> float:
+    start = time.perf_counter()
+    for shard in shards:
+        subprocess.run([*COMMAND, shard, "-o", shard + ".txt", "-q"], check=True)
+    return time.perf_counter() - start
+
+
+def run_server(shards: list[str]) -> float:
+    start = time.perf_counter()
+    with subprocess.Popen(
+        [*COMMAND, "--serve", "-q"],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True,
+    ) as worker:
+        for shard in shards:
+            worker.stdin.write(f"{shard}\t{shard}.txt\n")
+            worker.stdin.flush()
+            # Wait for the response, like a scheduler waiting for each shard.
+            worker.stdout.readline()
+        worker.stdin.close()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--shards", type=int, default=50)
+    parser.add_argument("--shard-kb", type=float, default=20)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"import vrt2txt.cli: {import_time(args.runs) * 1000:7.1f} ms")
+    with tempfile.TemporaryDirectory() as folder:
+        shards = []
+        for i in range(args.shards):
+            shard = os.path.join(folder, f"shard-{i:04d}.VRT")
+            write_vrt(shard, int(args.shard_kb * 1000), seed=i)
+            shards.append(shard)
+        for name, run in [("processes", run_processes), ("server", run_server)]:
+            elapsed = run(shards)
+            print(
+                f"{name:>10}: {elapsed:7.2f} s  "
+                f"{elapsed / len(shards) * 1000:7.1f} ms/shard"
+            )
+
+
+if __name__ == "__main__":
+    main()
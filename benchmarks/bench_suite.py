@@ -0,0 +1,215 @@
+"""The benchmark suite: converts synthetic corpora in the opensub and wikipedia
+layouts (see synthetic.py), and measures the throughput (MB/s and tokens/s)
+and the peak memory usage of each stage of the conversion:
+
+    read          reading and decoding the file in chunks
+    lines         + splitting the chunks into lines
+    tokens        + reading the word and its type from the token lines
+    detokenize    joining the words of the sentences (on pre-parsed sentences)
+    convert       the whole conversion into a text file (`convert`)
+    convert-mmap  the same with the memory-mapped bytes (`use_mmap=True`)
+
+Each stage runs in its own process, and the best time of `--repeat` runs is
+reported. The results can be saved as JSON and compared against a saved
+baseline; the exit status is 1 if any stage is slower than the baseline by
+more than `--tolerance`.
+
+Usage:
+    python benchmarks/bench_suite.py --size-mb 50 --save baseline.json
+    python benchmarks/bench_suite.py --size-mb 50 --compare baseline.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+import typing
+
+from bench_mmap import peak_rss_mb
+from synthetic import LAYOUTS, write_vrt
+
+from vrt2txt import convert
+from vrt2txt.columns import DEFAULT_COLUMNS
+from vrt2txt.stream import DEFAULT_CHUNK_SIZE, _iter_text_chunks
+from vrt2txt.vrt2txt import _form_sentence, _iter_lines, _make_token_reader
+
+if typing.TYPE_CHECKING:
+    from typing import Callable
+
+STAGES = ("read", "lines", "tokens", "detokenize", "convert", "convert-mmap")
+
+
+def prepare_stage(stage: str, file: str, paragraphs: bool) -> Callable[[], None]:
+    """Returns the function which runs a stage on the file. The work that is
+    not part of the stage is done here."""
+    if stage == "read":
+        return lambda: _consume(_iter_text_chunks(file, DEFAULT_CHUNK_SIZE, "utf-8"))
+    if stage == "lines":
+        return lambda: _consume(
+            _iter_lines(_iter_text_chunks(file, DEFAULT_CHUNK_SIZE, "utf-8"))
+        )
+    if stage == "tokens":
+        get_contents = _make_token_reader(DEFAULT_COLUMNS)
+
+        def read_tokens():
+            for line in _iter_lines(
+                _iter_text_chunks(file, DEFAULT_CHUNK_SIZE, "utf-8")
+            ):
+                if line and line[0] != "<":
+                    get_contents(line)
+
+        return read_tokens
+    if stage == "detokenize":
+        sentences = _read_sentences(file)
+
+        def detokenize():
+            for parts, types in sentences:
+                _form_sentence(parts, types)
+
+        return detokenize
+    if stage in ("convert", "convert-mmap"):
+        use_mmap = stage == "convert-mmap"
+        return lambda: convert(
+            file, os.devnull, paragraphs=paragraphs, use_mmap=use_mmap
+        )
+    raise ValueError(f"Unknown stage: {stage}")
+
+
+def run_stage(stage: str, file: str, paragraphs: bool, repeat: int) -> dict:
+    """Runs a stage `repeat` times. Called in a new process."""
+    func = prepare_stage(stage, file, paragraphs)
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return {"seconds": best, "peak_rss_mb": peak_rss_mb()}
+
+
+def _consume(iterable):
+    for _ in iterable:
+        pass
+
+
+def _read_sentences(file: str) -> list[tuple[list[str], list[str]]]:
+    get_contents = _make_token_reader(DEFAULT_COLUMNS)
+    sentences = []
+    parts: list[str] = []
+    types: list[str] = []
+    for line in _iter_lines(_iter_text_chunks(file, DEFAULT_CHUNK_SIZE, "utf-8")):
+        if not line.startswith("<"):
+            part, part_type = get_contents(line)
+            parts.append(part)
+            types.append(part_type)
+        elif line.startswith("</sentence"):
+            sentences.append((parts, types))
+            parts, types = [], []
+    return sentences
+
+
+def run_suite(size: int, seed: int, repeat: int, stages: list[str]) -> dict:
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as folder:
+        for layout in LAYOUTS:
+            file = os.path.join(folder, f"{layout}.VRT")
+            tokens = write_vrt(file, size, seed, layout)
+            size_mb = os.path.getsize(file) / 1e6
+            print(f"{layout}: {size_mb:.1f} MB, {tokens} tokens")
+            for stage in stages:
+                with context.Pool(1) as pool:
+                    result = pool.apply(
+                        run_stage, (stage, file, layout == "wikipedia", repeat)
+                    )
+                result["mb_per_s"] = size_mb / result["seconds"]
+                result["tokens_per_s"] = tokens / result["seconds"]
+                results[f"{layout}/{stage}"] = result
+                print(_format_result(stage, result))
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Prints the change of the throughput of each stage from the baseline,
+    and returns the names of the stages which are slower than the tolerance.
+    The throughput does not depend on the size of the corpus, unlike the time.
+    """
+    regressions = []
+    print(f"\nCompared to the baseline of {baseline['meta']['date']}:")
+    for name, result in results.items():
+        previous = baseline["results"].get(name)
+        if previous is None:
+            print(f"{name:>24}: not in the baseline")
+            continue
+        change = result["mb_per_s"] / previous["mb_per_s"] - 1
+        rss_change = result["peak_rss_mb"] - previous["peak_rss_mb"]
+        flag = ""
+        if change < -tolerance:
+            flag = "  SLOWER"
+            regressions.append(name)
+        elif change > tolerance:
+            flag = "  faster"
+        print(f"{name:>24}: {change:+7.1%} MB/s  {rss_change:+7.1f} MB peak RSS{flag}")
+    return regressions
+
+
+def _format_result(stage: str, result: dict) -> str:
+    return (
+        f"{stage:>14}: {result['seconds']:7.2f} s  {result['mb_per_s']:7.2f} MB/s  "
+        f"{result['tokens_per_s'] / 1e6:6.2f} M tokens/s  "
+        f"peak RSS {result['peak_rss_mb']:6.1f} MB"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--size-mb", type=float, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--stages", nargs="+", choices=STAGES, default=list(STAGES), metavar="STAGE"
+    )
+    parser.add_argument("--save", metavar="FILE", help="Save the results as JSON.")
+    parser.add_argument(
+        "--compare", metavar="FILE", help="Compare against saved results."
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.1,
+        help="Allowed slowdown from the baseline, by default 0.1 (10%%).",
+    )
+    args = parser.parse_args()
+
+    results = run_suite(int(args.size_mb * 1e6), args.seed, args.repeat, args.stages)
+    report = {
+        "meta": {
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "size_mb": args.size_mb,
+            "seed": args.seed,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
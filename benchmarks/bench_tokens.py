@@ -0,0 +1,46 @@
+"""Microbenchmark for decoding token lines with `get_contents_from_line`,
+compared against the previous implementation which always called
+`html.unescape`.
+
+Usage: python benchmarks/bench_tokens.py
+"""
+
+from __future__ import annotations
+
+import html
+import timeit
+
+from vrt2txt.vrt2txt import NON_WORD_CONTENT_TYPES, WORD, get_contents_from_line
+
+LINES = {
+    "word": "4\tkokonaisuudessaan\tkokonaisuus\tNOUN\t_\tCase=Ine|Number=Sing\t7\tnmod\t_\t_",
+    "punct": "9\t.\t.\tPUNCT\t_\t_\t8\tpunct\t_\t_",
+    "entity": "2\t&amp;\t&amp;\tNOUN\t_\tCase=Nom|Number=Sing\t3\tcompound:nn\t_\t_",
+}  # fmt: skip
+
+
+def legacy_get_contents_from_line(line: str) -> tuple[str, str]:
+    """get_contents_from_line of vrt2txt 0.1.0."""
+    try:
+        _, content, _, content_type, _ = line.split("\t", maxsplit=4)
+        if content_type not in NON_WORD_CONTENT_TYPES:
+            content_type = WORD
+        content = html.unescape(content)
+    except ValueError as err:
+        raise ValueError(f'Could not parse line "{line}"') from err
+    return content, content_type
+
+
+def main():
+    number = 1_000_000
+    for name, line in LINES.items():
+        for label, func in [
+            ("before", legacy_get_contents_from_line),
+            ("after", get_contents_from_line),
+        ]:
+            elapsed = timeit.timeit(lambda: func(line), number=number)
+            print(f"{name:>7} {label:>7}: {elapsed / number * 1e9:6.0f} ns/line")
+
+
+if __name__ == "__main__":
+    main()
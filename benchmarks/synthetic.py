@@ -0,0 +1,115 @@
+"""Deterministic generator for synthetic VRT corpora used by the benchmarks.
+
+Two layouts are generated: "wikipedia" (<doc> containing <paragraph>s of
+<sentence>s) and "opensub" (<file> containing only <sentence>s, like the
+OpenSubtitles corpora). Both contain punctuation, quotes, numbers and HTML
+entities. The same `size`, `seed` and `layout` always give the same corpus.
+"""
+
+from __future__ import annotations
+
+import random
+import typing
+
+if typing.TYPE_CHECKING:
+    from typing import Iterable
+
+WORDS = [
+    "joki", "on", "pisin", "kokonaisuudessaan", "Portugalin", "alueella",
+    "sijaitseva", "Sen", "pituus", "kilometriä", "Minä", "keksin", "tarvitsen",
+    "apua", "Kiitos", "Mitä", "haluat", "tietää", "hänet", "että", "ja", "se",
+    "Yukon", "Territory", "Mondego", "vuonna", "kaupunki", "Helsingin",
+]  # fmt: skip
+PUNCTUATION = [".", ",", ",", "!", "?", ":", "(", ")", '"', "/", "&amp;", "-"]
+QUOTES = ['"', '"', "”", "'", "&quot;"]
+ENTITIES = ["&amp;", "&lt;", "&gt;", "&quot;", "&apos;"]
+GENRES = ["Comedy", "Drama", "Action", "Documentary", "Comedy,Drama"]
+COUNTRIES = ["USA", "Finland", "UK", "France"]
+
+LAYOUTS = ("wikipedia", "opensub")
+
+TOKEN_LINE = "{index}\t{word}\t{word}\t{upos}\t_\t_\t0\troot\t_\t_\n"
+
+
+def iter_vrt_lines(size: int, seed: int = 0, layout="wikipedia") -> Iterable[str]:
+    """Yields the lines of a synthetic VRT corpus in the given layout until
+    about `size` characters are reached."""
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown layout: {layout}")
+    rng = random.Random(seed)
+    written = 0
+    doc_id = 0
+    while written < size:
+        doc_id += 1
+        if layout == "wikipedia":
+            line = f'<doc id="{doc_id}" title="Artikkeli {doc_id}">\n'
+            paragraphs = rng.randint(1, 8)
+        else:
+            line = (
+                f'<file id="{doc_id}" year="{rng.randint(1950, 2020)}" '
+                f'genre="{rng.choice(GENRES)}" country="{rng.choice(COUNTRIES)}">\n'
+            )
+            paragraphs = 1
+        written += len(line)
+        yield line
+        for _ in range(paragraphs):
+            if layout == "wikipedia":
+                yield "<paragraph>\n"
+                sentences = rng.randint(1, 6)
+            else:
+                # Subtitles have many short sentences per file.
+                sentences = rng.randint(20, 200)
+            for _ in range(sentences):
+                yield "<sentence>\n"
+                tokens = _iter_tokens(rng, layout)
+                for index, (word, upos) in enumerate(tokens, start=1):
+                    line = TOKEN_LINE.format(index=index, word=word, upos=upos)
+                    written += len(line)
+                    yield line
+                yield "</sentence>\n"
+            if layout == "wikipedia":
+                yield "</paragraph>\n"
+        yield "</doc>\n" if layout == "wikipedia" else "</file>\n"
+
+
+def _iter_tokens(rng: random.Random, layout: str) -> Iterable[tuple[str, str]]:
+    """Yields the (word, upos) pairs of a sentence."""
+    if layout == "opensub":
+        length = rng.randint(2, 12)
+        if rng.random() < 0.1:
+            # A line of a dialogue
+            yield "-", "PUNCT"
+    else:
+        length = rng.randint(2, 24)
+    for _ in range(length):
+        roll = rng.random()
+        if roll < 0.12:
+            yield rng.choice(PUNCTUATION), "PUNCT"
+        elif roll < 0.15:
+            yield rng.choice(QUOTES), "PUNCT"
+        elif roll < 0.16:
+            yield rng.choice(ENTITIES), "SYM"
+        elif roll < 0.21:
+            number = rng.choice(["{}", "{}", "{},5", "{}.", "{}%"])
+            yield number.format(rng.randint(0, 2000)), "NUM"
+        else:
+            yield rng.choice(WORDS), "NOUN"
+    if layout == "opensub" or rng.random() < 0.8:
+        yield rng.choice([".", ".", "!", "?", "..."]), "PUNCT"
+
+
+def make_vrt(size: int, seed: int = 0, layout="wikipedia") -> str:
+    """Returns a synthetic VRT corpus of about `size` characters."""
+    return "".join(iter_vrt_lines(size, seed, layout))
+
+
+def write_vrt(file: str, size: int, seed: int = 0, layout="wikipedia") -> int:
+    """Writes a synthetic VRT corpus of about `size` characters into a file,
+    and returns the number of tokens in it."""
+    tokens = 0
+    with open(file, "w", encoding="utf-8") as f:
+        for line in iter_vrt_lines(size, seed, layout):
+            if line[0] != "<":
+                tokens += 1
+            f.write(line)
+    return tokens
@@ -1 +1,67 @@
-from .vrt2txt import iter_vrt_xml as iter_vrt_xml
+import typing
+
+if typing.TYPE_CHECKING:
+    from .cache import TokenCache as TokenCache
+    from .columnar import TokenBatch as TokenBatch
+    from .columnar import iter_vrt_token_batches as iter_vrt_token_batches
+    from .columns import Columns as Columns
+    from .dedup import Deduplicator as Deduplicator
+    from .documents import AttributeFilter as AttributeFilter
+    from .documents import Document as Document
+    from .errors import RejectLog as RejectLog
+    from .grammar import StructureGrammar as StructureGrammar
+    from .ngrams import NgramCounter as NgramCounter
+    from .output import BlockWriter as BlockWriter
+    from .stats import ConversionStats as ConversionStats
+    from .stream import convert as convert
+    from .stream import iter_vrt_documents as iter_vrt_documents
+    from .stream import iter_vrt_file as iter_vrt_file
+    from .stream import iter_vrt_file_blocks as iter_vrt_file_blocks
+    from .stream import iter_vrt_mmap as iter_vrt_mmap
+    from .stream import iter_vrt_mmap_blocks as iter_vrt_mmap_blocks
+    from .vrt2txt import iter_vrt_blocks as iter_vrt_blocks
+    from .vrt2txt import iter_vrt_xml as iter_vrt_xml
+
+# The modules of the names exported by the package. They are imported on first
+# access, so that importing the package (or only the command line interface)
+# does not import all the modules.
+_EXPORTS = {
+    "TokenCache": "cache",
+    "TokenBatch": "columnar",
+    "iter_vrt_token_batches": "columnar",
+    "Columns": "columns",
+    "Deduplicator": "dedup",
+    "AttributeFilter": "documents",
+    "Document": "documents",
+    "RejectLog": "errors",
+    "StructureGrammar": "grammar",
+    "NgramCounter": "ngrams",
+    "BlockWriter": "output",
+    "ConversionStats": "stats",
+    "convert": "stream",
+    "iter_vrt_documents": "stream",
+    "iter_vrt_file": "stream",
+    "iter_vrt_file_blocks": "stream",
+    "iter_vrt_mmap": "stream",
+    "iter_vrt_mmap_blocks": "stream",
+    "iter_vrt_blocks": "vrt2txt",
+    "iter_vrt_xml": "vrt2txt",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import importlib
+
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    # Later lookups find the name directly.
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted([*globals(), *_EXPORTS])
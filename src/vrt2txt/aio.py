@@ -0,0 +1,366 @@
+"""Asynchronous conversion for asyncio applications. The input is read from an
+asynchronous stream and split into batches at safe boundaries, and the
+batches are parsed in an executor, so the event loop is never blocked by the
+parser."""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import inspect
+import os
+import time
+import typing
+
+from .columns import DEFAULT_COLUMNS, _find_columns
+from .compression import open_binary
+from .errors import _check_error_policy
+from .grammar import get_grammar
+from .parallel import _convert_contents, _get_worker_state
+from .vrt2txt import _split_lines
+
+if typing.TYPE_CHECKING:
+    from concurrent.futures import Executor
+    from typing import Any, AsyncIterable, AsyncIterator, Union
+
+    from .cache import TokenCache
+    from .columns import Columns
+    from .documents import DocumentFilter
+    from .errors import RejectLog
+    from .stats import ConversionStats
+
+    AsyncVRTSource = Union[str, os.PathLike, AsyncIterable[Union[bytes, str]], Any]
+    AsyncTextDestination = Union[str, os.PathLike, Any]
+
+# Approximate size of the batches parsed in the executor (in bytes).
+DEFAULT_BATCH_SIZE = 1024 * 1024
+
+# Amount of bytes read from the source at a time.
+DEFAULT_READ_SIZE = 64 * 1024
+
+# The number of batches being parsed (or waiting to be consumed) at a time.
+DEFAULT_MAX_PENDING = 2
+
+
+async def iter_vrt_async(
+    source: AsyncVRTSource,
+    sentence_tag="sentence",
+    paragraph_tag="paragraph",
+    paragraphs=False,
+    html_entities=False,
+    columns: Columns | None = None,
+    cache: TokenCache | None = None,
+    document_filter: DocumentFilter | None = None,
+    stats: ConversionStats | None = None,
+    errors="strict",
+    reject_log: RejectLog | None = None,
+    executor: Executor | None = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    max_pending: int = DEFAULT_MAX_PENDING,
+    read_size: int = DEFAULT_READ_SIZE,
+    encoding="utf-8",
+) -> AsyncIterator[str]:
+    """Iterates asynchronously over the text of a VRT stream. The input is
+    collected into batches of about `batch_size` bytes which end right after
+    a </paragraph> line (or </sentence> line if `paragraphs` is False), and
+    the batches are parsed in `executor` while the event loop keeps running.
+
+    The source is read only as fast as the text is consumed: at most
+    `max_pending` batches are parsed or held at a time, after which the
+    source is not read until the next text is consumed. The concatenated
+    output is identical to the concatenated output of `iter_vrt_xml`.
+
+    Parameters
+    ----------
+    source : str | os.PathLike | AsyncIterable[bytes | str] | async reader
+        An object with an asynchronous `read(n)` method (e.g. an
+        `asyncio.StreamReader`), an asynchronous iterable of chunks of bytes
+        or text, or a path, which is read in the default executor. Paths
+        ending with .gz, .bz2 or .xz are decompressed.
+    sentence_tag, paragraph_tag, paragraphs, html_entities, cache, stats
+        See `iter_vrt_xml`. The stats of the batches are added to `stats`
+        as the text is yielded.
+    columns : Columns | None, optional
+        The positions of the word and part-of-speech columns. By default, read
+        from the positional attributes comment in the first batch.
+    document_filter : Callable[[Document], bool] | None, optional
+        Converts only the documents accepted by the filter. See
+        `iter_vrt_xml`. The batches then end only at the ends of the
+        documents.
+    errors, reject_log
+        The policy for malformed input and the log of the rejected input. See
+        `iter_vrt_xml`. The offsets are bytes from the start of the stream;
+        the line numbers are None. With "skip-document", the batches end only
+        at the ends of the documents.
+    executor : Executor | None, optional
+        Parses the batches. By default, the default executor of the event
+        loop (a thread pool). A `ProcessPoolExecutor` parses the batches in
+        parallel; `cache` and `document_filter` must then be picklable.
+    batch_size : int, optional
+        The approximate size of a batch, in bytes.
+    max_pending : int, optional
+        The maximum number of batches parsed or held at a time, by default 2.
+    read_size : int, optional
+        The number of bytes to read from the source at a time.
+    encoding : str, optional
+        The encoding of the input, by default "utf-8". Text chunks are encoded
+        with it. Must be ASCII compatible (for example UTF-8 or Latin-1).
+
+    Yields
+    ------
+    str
+        The text of one batch at a time. Batches contain whole paragraphs (or
+        sentences).
+    """
+    _check_error_policy(errors)
+    if max_pending < 1:
+        raise ValueError("max_pending must be at least 1")
+    grammar = get_grammar(sentence_tag, paragraph_tag)
+    closing_tags = grammar.get_boundaries(paragraphs)
+    if errors == "skip-document" or document_filter is not None:
+        # Documents are left out as a whole only if they are in one batch.
+        closing_tags = grammar.document_tags
+    closing_lines = [f"</{tag}>".encode(encoding) for tag in closing_tags]
+    options = dict(
+        sentence_tag=sentence_tag,
+        paragraph_tag=paragraph_tag,
+        paragraphs=paragraphs,
+        html_entities=html_entities,
+        columns=columns,
+        cache=cache,
+        document_filter=document_filter,
+        errors=errors,
+    )
+
+    batches = _iter_batches(
+        _iter_chunks(source, read_size, encoding), batch_size, closing_lines
+    )
+    texts = _convert_batches(
+        batches, options, encoding, executor, max_pending, stats, reject_log
+    )
+    found_sentences = False
+    try:
+        async for text in texts:
+            if paragraphs:
+                yield text
+                continue
+            if text is None:
+                continue
+            # The sentences of all batches belong to the same (implicit)
+            # paragraph.
+            if found_sentences:
+                yield " "
+            found_sentences = True
+            yield text
+    finally:
+        await texts.aclose()
+
+    if paragraphs:
+        return
+    if not found_sentences:
+        if errors == "strict":
+            raise ValueError("Found no sentences")
+        return
+    yield "\n"
+
+
+async def convert_async(
+    src: AsyncVRTSource,
+    dst: AsyncTextDestination,
+    sentence_tag="sentence",
+    paragraph_tag="paragraph",
+    paragraphs=False,
+    html_entities=False,
+    columns: Columns | None = None,
+    cache: TokenCache | None = None,
+    document_filter: DocumentFilter | None = None,
+    stats: ConversionStats | None = None,
+    errors="strict",
+    reject_log: RejectLog | None = None,
+    executor: Executor | None = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    max_pending: int = DEFAULT_MAX_PENDING,
+    encoding="utf-8",
+):
+    """Converts a VRT stream into text asynchronously. See `iter_vrt_async`
+    for the parameters.
+
+    Parameters
+    ----------
+    dst : str | os.PathLike | async writer
+        Path to the text file, which is written in the default executor (and
+        compressed if the path ends with .gz, .bz2 or .xz), or a binary stream
+        whose `write` returns an awaitable, or which has an asynchronous
+        `drain` method (e.g. an `asyncio.StreamWriter`). The text is encoded
+        with `encoding`. Streams are not closed by this function.
+    """
+    texts = iter_vrt_async(
+        src,
+        sentence_tag=sentence_tag,
+        paragraph_tag=paragraph_tag,
+        paragraphs=paragraphs,
+        html_entities=html_entities,
+        columns=columns,
+        cache=cache,
+        document_filter=document_filter,
+        stats=stats,
+        errors=errors,
+        reject_log=reject_log,
+        executor=executor,
+        batch_size=batch_size,
+        max_pending=max_pending,
+        encoding=encoding,
+    )
+    if not isinstance(dst, (str, os.PathLike)):
+        await _write_texts(texts, dst, encoding, stats)
+        return
+    loop = asyncio.get_running_loop()
+    f = await loop.run_in_executor(None, open_binary, dst, "wb")
+    try:
+
+        async def write(data: bytes):
+            await loop.run_in_executor(None, f.write, data)
+
+        await _write_texts(texts, write, encoding, stats)
+    finally:
+        await loop.run_in_executor(None, f.close)
+
+
+async def _write_texts(
+    texts: AsyncIterator[str],
+    out: Any,
+    encoding: str,
+    stats: ConversionStats | None,
+):
+    """Writes the texts into an asynchronous stream (or with an asynchronous
+    write function), waiting for the stream to accept each text."""
+    write = out if inspect.iscoroutinefunction(out) else out.write
+    drain = getattr(out, "drain", None)
+    perf_counter = time.perf_counter
+    async for text in texts:
+        start = perf_counter()
+        result = write(text.encode(encoding))
+        if inspect.isawaitable(result):
+            await result
+        if drain is not None:
+            await drain()
+        if stats is not None:
+            stats.add_time("write", perf_counter() - start)
+
+
+async def _iter_chunks(
+    source: AsyncVRTSource, read_size: int, encoding: str
+) -> AsyncIterator[bytes]:
+    if isinstance(source, (str, os.PathLike)):
+        loop = asyncio.get_running_loop()
+        f = await loop.run_in_executor(None, open_binary, source)
+        try:
+            while chunk := await loop.run_in_executor(None, f.read, read_size):
+                yield chunk
+        finally:
+            await loop.run_in_executor(None, f.close)
+        return
+    if hasattr(source, "read"):
+        while chunk := await source.read(read_size):
+            yield chunk.encode(encoding) if isinstance(chunk, str) else chunk
+        return
+    async for chunk in source:
+        yield chunk.encode(encoding) if isinstance(chunk, str) else chunk
+
+
+async def _iter_batches(
+    chunks: AsyncIterator[bytes], batch_size: int, closing_lines: list[bytes]
+) -> AsyncIterator[tuple[int, bytes]]:
+    """Collects the chunks into batches of about `batch_size` bytes, each
+    (except the last one) ending right after one of the `closing_lines`.
+    Yields the offset of each batch in the stream, and the batch."""
+    buffer = bytearray()
+    offset = 0
+    # The part of the buffer already searched for the closing lines.
+    searched = 0
+    try:
+        async for chunk in chunks:
+            buffer += chunk
+            if len(buffer) < batch_size:
+                continue
+            end = _find_batch_end(buffer, closing_lines, searched)
+            if end == -1:
+                # The closing line may be split between the chunks.
+                searched = max(len(buffer) - max(map(len, closing_lines)) - 1, 0)
+                searched = buffer.rfind(b"\n", 0, searched) + 1
+                continue
+            yield offset, bytes(buffer[:end])
+            del buffer[:end]
+            offset += end
+            searched = 0
+    finally:
+        await chunks.aclose()
+    if buffer:
+        yield offset, bytes(buffer)
+
+
+def _find_batch_end(buffer: bytearray, closing_lines: list[bytes], start: int) -> int:
+    """Returns the offset right after the last complete line of the buffer
+    which is one of the `closing_lines`, searching from the offset `start`.
+    Returns -1 if there is no such line."""
+    batch_end = -1
+    for closing_line in closing_lines:
+        end = len(buffer)
+        while (position := buffer.rfind(closing_line, start, end)) != -1:
+            line_start = buffer.rfind(b"\n", 0, position) + 1
+            line_end = buffer.find(b"\n", position)
+            if line_end != -1 and buffer[line_start:line_end].strip() == closing_line:
+                batch_end = max(batch_end, line_end + 1)
+                break
+            end = position
+    return batch_end
+
+
+async def _convert_batches(
+    batches: AsyncIterator[tuple[int, bytes]],
+    options: dict[str, Any],
+    encoding: str,
+    executor: Executor | None,
+    max_pending: int,
+    stats: ConversionStats | None,
+    reject_log: RejectLog | None,
+) -> AsyncIterator[str | None]:
+    """Parses the batches in the executor, at most `max_pending` at a time,
+    and yields their text (None if a batch has no sentences) in order."""
+    loop = asyncio.get_running_loop()
+    pending: collections.deque[asyncio.Future] = collections.deque()
+    try:
+        async for start, batch in batches:
+            if options["columns"] is None:
+                # Only the first batch contains the positional attributes
+                # comment.
+                lines = (line.decode(encoding) for line in _split_lines(batch))
+                options["columns"] = _find_columns(lines) or DEFAULT_COLUMNS
+            # Each batch gets its own stats and log (see _get_worker_state).
+            batch_options = {**options, **_get_worker_state(stats, reject_log)}
+            pending.append(
+                loop.run_in_executor(
+                    executor, _convert_contents, batch, start, encoding, batch_options
+                )
+            )
+            if len(pending) >= max_pending:
+                yield _merge_batch(await pending.popleft(), stats, reject_log)
+        while pending:
+            yield _merge_batch(await pending.popleft(), stats, reject_log)
+    finally:
+        for future in pending:
+            future.cancel()
+        await batches.aclose()
+
+
+def _merge_batch(
+    result: tuple[str | None, ConversionStats | None, RejectLog | None, Any],
+    stats: ConversionStats | None,
+    reject_log: RejectLog | None,
+) -> str | None:
+    text, batch_stats, batch_log, _ = result
+    if stats is not None and batch_stats is not None:
+        stats.merge(batch_stats)
+    if reject_log is not None and batch_log is not None:
+        reject_log.merge(batch_log)
+    return text
@@ -0,0 +1,330 @@
+"""Detokenization of many sentences at once.
+
+The sentences are given as flat sequences of the parts (words) and the part
+types of all their tokens, with the offsets of the sentences in them (like
+`TokenBatch.token_offsets`). The space before each part is decided for all
+the parts together, with the same rules as `_form_sentence`:
+
+- A part after a non-empty part gets a space, and a part after an empty
+  part gets the same space as the empty part (a sentence starts without one).
+- No space after "(" or "/", or after a quotation mark which opened quotes.
+- No space before a quotation mark which closes quotes; the quote state of a
+  sentence is the XOR of the quote bits of its parts so far.
+- No space before punctuation, except before "(".
+- No space before a number after a number and punctuation, e.g. "6,3".
+
+With NumPy installed, these are array operations over all the parts: the
+quote states are a cumulative XOR restarted at each sentence, and the spaces
+after empty parts are forward-filled. Without NumPy, the same rules are
+applied in one loop over the parts. The result is the same as joining the
+sentences one by one with `_form_sentence`.
+"""
+
+from __future__ import annotations
+
+import itertools
+import re
+import typing
+
+from .vrt2txt import (
+    _NUM_CODE,
+    _PART_CLASSES,
+    _PART_TYPE_CODES,
+    _PUNCT_CODE,
+    BARE_QUOTE,
+    CURLY_DOUBLE_QUOTE,
+    DOUBLE_QUOTE,
+    NO_SPACE_AFTER,
+    OPENING_PUNCT,
+    QUOTES,
+    SINGLE_QUOTE,
+    _form_sentence,
+    _get_part_class,
+)
+
+if typing.TYPE_CHECKING:
+    from typing import Any, Callable, Sequence
+
+# The implementations of `get_spaces`. None picks "numpy" if it is installed.
+BACKENDS = ("python", "numpy")
+
+# The quotation marks of the quote bits, in the reverse order of precedence.
+_QUOTE_CHARS = (("'", SINGLE_QUOTE), ("”", CURLY_DOUBLE_QUOTE), ('"', DOUBLE_QUOTE))
+
+
+def form_sentences(
+    parts: Sequence[str],
+    part_types: Sequence[str],
+    sentence_offsets: Sequence[int],
+    get_part_class: Callable[[str], int | None] = _PART_CLASSES.get,
+    backend: str | None = None,
+) -> list[str]:
+    """Joins the parts of many sentences with spaces where needed.
+
+    Parameters
+    ----------
+    parts : Sequence[str]
+        The parts (words) of all the sentences, one after another.
+    part_types : Sequence[str]
+        The type of each part: "PUNCT", "NUM" or "WORD".
+    sentence_offsets : Sequence[int]
+        The index of the first part of each sentence in `parts`, and the
+        number of parts at the end (one more than there are sentences).
+    get_part_class : Callable[[str], int | None], optional
+        Returns the spacing class of a part, or None for the parts whose
+        class is resolved here (e.g. `TokenCache.get_part_class`). See
+        `_form_sentence`. With the default, the "numpy" backend finds the
+        classes of all the parts at once.
+    backend : str | None, optional
+        "numpy" or "python". By default "numpy" if NumPy is installed. The
+        "python" backend joins the sentences one by one with `_form_sentence`.
+
+    Returns
+    -------
+    list[str]
+        The sentences, the same as ``_form_sentence(parts[start:end],
+        part_types[start:end])`` for each sentence.
+
+    Examples
+    --------
+    >>> parts = ["Hei", "!", "6", ",", "3"]
+    >>> part_types = ["WORD", "PUNCT", "NUM", "PUNCT", "NUM"]
+    >>> form_sentences(parts, part_types, [0, 2, 5])
+    ['Hei!', '6,3']
+    """
+    np = _get_numpy(backend)
+    parts, part_types = _check_batch(parts, part_types, sentence_offsets)
+    if np is None:
+        # The scalar engine is the fastest way to do this in pure Python.
+        return [
+            _form_sentence(parts[start:end], part_types[start:end], get_part_class)
+            for start, end in zip(sentence_offsets, sentence_offsets[1:])
+        ]
+    lengths = np.fromiter(map(len, parts), dtype=np.intp, count=len(parts))
+    spaces = _get_spaces_numpy(
+        np, parts, part_types, sentence_offsets, lengths, get_part_class
+    )
+    # The whole text is joined at once, and cut into the sentences.
+    separators = np.array(["", " "], dtype=object)[spaces.view(np.int8)].tolist()
+    text = "".join(itertools.chain.from_iterable(zip(separators, parts)))
+    ends = np.zeros(len(parts) + 1, dtype=np.intp)
+    np.cumsum(lengths + spaces, out=ends[1:])
+    starts = ends[np.asarray(sentence_offsets, dtype=np.intp)].tolist()
+    return [text[start:end] for start, end in zip(starts, starts[1:])]
+
+
+def get_spaces(
+    parts: Sequence[str],
+    part_types: Sequence[str],
+    sentence_offsets: Sequence[int],
+    get_part_class: Callable[[str], int | None] = _PART_CLASSES.get,
+    backend: str | None = None,
+) -> Any:
+    """Decides whether there is a space before each part. See
+    `form_sentences` for the parameters.
+
+    Returns
+    -------
+    list[bool] | numpy.ndarray
+        True for the parts with a space before them: a list with the "python"
+        backend, and a boolean array with the "numpy" backend.
+    """
+    np = _get_numpy(backend)
+    parts, part_types = _check_batch(parts, part_types, sentence_offsets)
+    if np is not None:
+        lengths = np.fromiter(map(len, parts), dtype=np.intp, count=len(parts))
+        return _get_spaces_numpy(
+            np, parts, part_types, sentence_offsets, lengths, get_part_class
+        )
+    codes = [_PART_TYPE_CODES.get(part_type, 0) for part_type in part_types]
+    if 0 in codes:
+        raise ValueError(f"Invalid part type: {part_types[codes.index(0)]}")
+    classes = _get_classes(parts, get_part_class)
+    return _get_spaces(parts, codes, classes, sentence_offsets)
+
+
+def _get_numpy(backend: str | None) -> Any:
+    """Returns the numpy module, or None for the "python" backend."""
+    if backend not in (None, *BACKENDS):
+        raise ValueError(
+            f"Unknown backend {backend!r}, expected one of {', '.join(BACKENDS)}"
+        )
+    if backend == "python":
+        return None
+    try:
+        import numpy
+    except ImportError:
+        if backend == "numpy":
+            raise ValueError("The numpy backend requires NumPy") from None
+        return None
+    return numpy
+
+
+def _check_batch(
+    parts: Sequence[str], part_types: Sequence[str], sentence_offsets: Sequence[int]
+) -> tuple[list[str], list[str]]:
+    parts = parts if isinstance(parts, list) else list(parts)
+    part_types = part_types if isinstance(part_types, list) else list(part_types)
+    if len(parts) != len(part_types):
+        raise ValueError("There must be a part type for each part")
+    if (
+        len(sentence_offsets) == 0
+        or sentence_offsets[0] != 0
+        or sentence_offsets[-1] != len(parts)
+    ):
+        raise ValueError("The sentence offsets must start at 0 and end at the parts")
+    if any(start > end for start, end in zip(sentence_offsets, sentence_offsets[1:])):
+        raise ValueError("The sentence offsets must not decrease")
+    return parts, part_types
+
+
+def _get_quote_class(part: str) -> int:
+    # The parts which are not in the table of `_form_sentence` only have the
+    # quote bits.
+    return _get_part_class(part) & QUOTES
+
+
+def _get_classes(
+    parts: list[str], get_part_class: Callable[[str], int | None]
+) -> list[int]:
+    return [
+        _get_quote_class(part) if part_class is None else part_class
+        for part, part_class in zip(parts, map(get_part_class, parts))
+    ]
+
+
+def _get_spaces(
+    parts: list[str],
+    codes: list[int],
+    classes: list[int],
+    sentence_offsets: Sequence[int],
+) -> list[bool]:
+    spaces = [False] * len(parts)
+    punct, num = _PUNCT_CODE, _NUM_CODE
+    quotes, bare_quote = QUOTES, BARE_QUOTE
+    no_space_after, opening_punct = NO_SPACE_AFTER, OPENING_PUNCT
+    for start, end in zip(sentence_offsets, sentence_offsets[1:]):
+        space = False
+        inside_quotes = 0
+        previous_class = previous_code = before_previous_code = 0
+        for i in range(start, end):
+            part_class = classes[i]
+            code = codes[i]
+            if i > start and parts[i - 1]:
+                space = True
+            if previous_class & no_space_after or (
+                previous_class & bare_quote and previous_class & inside_quotes
+            ):
+                space = False
+            quote = part_class & quotes
+            if quote:
+                if inside_quotes & quote:
+                    space = False
+                inside_quotes ^= quote
+            elif code == punct:
+                space = part_class & opening_punct != 0
+            if code == num and previous_code == punct and before_previous_code == num:
+                space = False
+            spaces[i] = space
+            before_previous_code = previous_code
+            previous_class = part_class
+            previous_code = code
+    return spaces
+
+
+def _get_spaces_numpy(
+    np: Any,
+    parts: list[str],
+    part_types: list[str],
+    sentence_offsets: Sequence[int],
+    lengths: Any,
+    get_part_class: Callable[[str], int | None],
+) -> Any:
+    size = len(parts)
+    codes = np.fromiter(
+        map(_PART_TYPE_CODES.get, part_types, itertools.repeat(0)),
+        dtype=np.int8,
+        count=size,
+    )
+    invalid = np.flatnonzero(codes == 0)
+    if len(invalid):
+        raise ValueError(f"Invalid part type: {part_types[invalid[0]]}")
+    if get_part_class == _PART_CLASSES.get:
+        classes = _get_classes_numpy(np, parts, lengths)
+    else:
+        classes = np.array(_get_classes(parts, get_part_class), dtype=np.int8)
+    offsets = np.asarray(sentence_offsets, dtype=np.intp)
+    # The first part of each sentence, and the first two parts.
+    first = np.zeros(size + 1, dtype=bool)
+    first[offsets[:-1]] = True
+    first = first[:size]
+    first_two = first.copy()
+    first_two[1:] |= first[:-1]
+
+    previous_class = _shift(np, classes, 1, first)
+    previous_code = _shift(np, codes, 1, first)
+    before_previous_code = _shift(np, codes, 2, first_two)
+
+    # The quotes open before each part: the XOR of the quote bits of the
+    # previous parts, restarted at each sentence.
+    quote = classes & QUOTES
+    before = np.bitwise_xor.accumulate(quote) ^ quote
+    at_start = np.append(before, 0)[offsets[:-1]]
+    inside_quotes = before ^ np.repeat(at_start, np.diff(offsets))
+
+    # A space after a non-empty part, and the space of the previous part after
+    # an empty part (inherited, unless one of the rules below decides).
+    spaces = _shift(np, lengths != 0, 1, first)
+    inherited = ~first & ~spaces
+    decided = ((previous_class & NO_SPACE_AFTER) != 0) | (
+        ((previous_class & BARE_QUOTE) != 0) & ((previous_class & inside_quotes) != 0)
+    )
+    decided |= (quote & inside_quotes) != 0
+    punct = (quote == 0) & (codes == _PUNCT_CODE)
+    number = (
+        (codes == _NUM_CODE)
+        & (previous_code == _PUNCT_CODE)
+        & (before_previous_code == _NUM_CODE)
+    )
+    spaces &= ~decided
+    spaces = np.where(punct, (classes & OPENING_PUNCT) != 0, spaces)
+    spaces &= ~number
+    inherited &= ~(decided | punct | number)
+    if inherited.any():
+        # Forward-fill: the index of the last part which decided its space.
+        # The first parts of the sentences always decide.
+        source = np.where(inherited, 0, np.arange(size))
+        np.maximum.accumulate(source, out=source)
+        spaces = spaces[source]
+    return spaces
+
+
+def _get_classes_numpy(np: Any, parts: list[str], lengths: Any) -> Any:
+    """The spacing classes of the parts (int8), the same as `_get_part_class`.
+    Only the parts of at most one character can be in the table of
+    `_form_sentence`; the quote bits of the others are found in the joined
+    text of all the parts."""
+    text = "".join(parts)
+    ends = np.cumsum(lengths)
+    classes = np.zeros(len(parts), dtype=np.int8)
+    # The later ones take precedence, like in `_get_part_class`.
+    for char, part_class in _QUOTE_CHARS:
+        positions = np.fromiter(
+            (match.start() for match in re.finditer(char, text)), dtype=np.intp
+        )
+        classes[np.searchsorted(ends, positions, side="right")] = part_class
+    short = np.flatnonzero(lengths <= 1)
+    get = _PART_CLASSES.get
+    table_classes = np.array([get(parts[i], -1) for i in short.tolist()], dtype=np.int8)
+    in_table = table_classes >= 0
+    classes[short[in_table]] = table_classes[in_table]
+    return classes
+
+
+def _shift(np: Any, values: Any, count: int, first: Any) -> Any:
+    """The value `count` parts before each part, or 0 where that is not in the
+    same sentence (where `first` is True)."""
+    shifted = np.zeros_like(values)
+    shifted[count:] = values[:-count]
+    shifted[first] = 0
+    return shifted
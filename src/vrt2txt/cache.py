@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import functools
+import typing
+
+from .vrt2txt import _get_part_class, _get_unescape
+
+if typing.TYPE_CHECKING:
+    from typing import Any, Callable
+
+DEFAULT_CACHE_SIZE = 64 * 1024
+
+
+class TokenCache:
+    """Memoizes the decoding of the words and their spacing classification.
+
+    Corpora are very repetitive at the token level (punctuation, function
+    words), so most words are decoded and classified only once. The cache also
+    interns the words: every occurrence of a word is the same str object,
+    which saves memory when the words are kept around.
+
+    The cache is bounded: at most `maxsize` words are kept per table, and the
+    least recently used ones are evicted first. A cache may be shared by
+    several conversions (for example all files of a folder). When it is passed
+    to worker processes, each process gets its own cache, which is reused for
+    all the pieces the process converts. The counters of the worker caches are
+    not added to the original.
+
+    Parameters
+    ----------
+    maxsize : int, optional
+        The maximum number of cached words per table, by default 65536.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_CACHE_SIZE):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self.get_part_class: Callable[[str], int] = functools.lru_cache(maxsize)(
+            _get_part_class
+        )
+        self._decoders: dict[tuple[bool, str | None], Callable[[Any], str]] = {}
+
+    def get_decoder(
+        self, html_entities=False, encoding: str | None = None
+    ) -> Callable[[Any], str]:
+        """Returns a memoized function which decodes the entities of a word. See
+        `iter_vrt_xml` for `html_entities`. If `encoding` is given, the function
+        takes the word as bytes and decodes it first."""
+        key = (html_entities, encoding)
+        decoder = self._decoders.get(key)
+        if decoder is None:
+            unescape = _get_unescape(html_entities)
+            decoder = functools.lru_cache(self.maxsize)(
+                functools.partial(_decode_word, unescape=unescape, encoding=encoding)
+            )
+            self._decoders[key] = decoder
+        return decoder
+
+    @property
+    def hits(self) -> int:
+        """The number of lookups which were found in the cache."""
+        return sum(info.hits for info in self._iter_cache_infos())
+
+    @property
+    def misses(self) -> int:
+        """The number of lookups which were not found in the cache."""
+        return sum(info.misses for info in self._iter_cache_infos())
+
+    @property
+    def size(self) -> int:
+        """The number of cached entries, in all tables."""
+        return sum(info.currsize for info in self._iter_cache_infos())
+
+    def clear(self):
+        """Empties the cache and resets the counters."""
+        self.get_part_class.cache_clear()  # type: ignore[attr-defined]
+        self._decoders.clear()
+
+    def _iter_cache_infos(self):
+        yield self.get_part_class.cache_info()  # type: ignore[attr-defined]
+        for decoder in self._decoders.values():
+            yield decoder.cache_info()  # type: ignore[attr-defined]
+
+    def __reduce__(self):
+        # The memoized functions cannot be pickled. Unpickling gives the cache
+        # of the receiving process instead.
+        return (_get_process_cache, (self.maxsize,))
+
+    def __repr__(self) -> str:
+        return (
+            f"TokenCache(maxsize={self.maxsize}, size={self.size}, "
+            f"hits={self.hits}, misses={self.misses})"
+        )
+
+
+_process_caches: dict[int, TokenCache] = {}
+
+
+def _get_process_cache(maxsize: int) -> TokenCache:
+    cache = _process_caches.get(maxsize)
+    if cache is None:
+        cache = _process_caches[maxsize] = TokenCache(maxsize)
+    return cache
+
+
+def _decode_word(
+    word: str | bytes, unescape: Callable[[str], str], encoding: str | None
+) -> str:
+    if encoding is not None:
+        word = word.decode(encoding)  # type: ignore[union-attr]
+    if "&" in word:
+        return unescape(word)
+    return word
@@ -0,0 +1,829 @@
+"""The `vrt2txt` command-line interface."""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import glob
+import json
+import os
+import sys
+import time
+import typing
+from pathlib import Path
+
+from .cache import TokenCache
+from .columns import Columns
+from .compression import (
+    COMPRESSIONS,
+    ZipMember,
+    get_compression,
+    get_format_errors,
+    get_text_name,
+    iter_zip_members,
+    open_binary,
+    open_vrt,
+)
+from .dedup import DEDUP_UNITS
+from .documents import AttributeFilter
+from .errors import ERROR_POLICIES, RejectLog
+from .ngrams import NgramCounter
+from .stats import ConversionStats
+from .stream import iter_vrt_documents, iter_vrt_file, iter_vrt_mmap
+
+if typing.TYPE_CHECKING:
+    from typing import IO, Iterable, Iterator, Sequence
+
+    from .dedup import BloomFilter, DiskHashSet
+    from .documents import Document
+
+# Output is written in blocks of about this many characters.
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+SEPARATORS = {" ", "\n"}
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = _get_parser()
+    args = parser.parse_args(argv)
+
+    inputs = _resolve_inputs(args.inputs, args.pattern)
+    if not inputs:
+        parser.error("no input files found")
+    if args.split and args.output is None:
+        parser.error("--split requires --output")
+    if args.workers > 1 and (args.split or args.filter):
+        parser.error("--filter and --split cannot be used with --workers")
+    if args.workers > 1 and (args.threaded or any(map(_is_stream, inputs))):
+        # The workers need plain files, which they can seek in.
+        parser.error(
+            "--workers cannot be used with --threaded, stdin, compressed or .zip "
+            "inputs"
+        )
+    if args.resume and (args.output is None or args.split or "-" in inputs):
+        parser.error(
+            "--resume requires --output, and cannot be used with --split or stdin"
+        )
+    if args.mmap and (
+        args.workers > 1
+        or args.threaded
+        or args.resume
+        or (not args.serve and any(map(_is_stream, inputs)))
+    ):
+        # Only plain files can be memory-mapped, and the workers and --resume
+        # read the files in their own pieces. (With --serve, stdin has the
+        # requests.)
+        parser.error(
+            "--mmap cannot be used with --workers, --threaded, --resume, stdin, "
+            "compressed or .zip inputs"
+        )
+    if args.resume and args.workers > 1:
+        parser.error("--resume cannot be used with --workers")
+    if args.stats and (args.resume or args.split):
+        parser.error("--stats cannot be used with --resume or --split")
+    if args.errors != "strict" and (args.resume or args.split):
+        parser.error("--errors cannot be used with --resume or --split")
+    if args.ngrams is not None and (args.resume or args.split):
+        parser.error("--ngrams cannot be used with --resume or --split")
+    if args.dedup is not None and (args.resume or args.split or args.workers > 1):
+        parser.error("--dedup cannot be used with --resume, --split or --workers")
+    if args.dedup is None and (args.dedup_index or args.dedup_bloom):
+        parser.error("--dedup-index and --dedup-bloom require --dedup")
+    if args.dedup == "paragraph" and not args.paragraphs:
+        parser.error("--dedup paragraph requires --paragraphs")
+    if args.reject_log is not None and args.errors == "strict":
+        parser.error("--reject-log requires --errors other than strict")
+    if args.socket is not None and not args.serve:
+        parser.error("--socket requires --serve")
+    if args.serve and args.inputs != ["-"]:
+        parser.error("--serve reads the input files from its requests")
+    if args.serve and (
+        args.split
+        or args.resume
+        or args.build_index
+        or args.workers > 1
+        or args.stats
+        or args.reject_log
+        or args.ngrams
+        or args.dedup
+        or args.threaded
+        or args.chunk_size
+    ):
+        parser.error(
+            "--serve cannot be used with --split, --resume, --build-index, "
+            "--workers, --stats, --reject-log, --ngrams, --dedup, --threaded or "
+            "--chunk-size"
+        )
+    try:
+        args.document_filter = AttributeFilter(*args.filter) if args.filter else None
+    except ValueError as err:
+        parser.error(f"argument --filter: {err}")
+    if args.build_index:
+        _build_indexes(inputs, args, parser)
+        return 0
+    if args.output is not None:
+        _check_output_names(inputs, parser)
+        args.output.mkdir(exist_ok=True, parents=True)
+    args.manifest = None
+    if args.resume:
+        # The modules of the optional features are imported only when used,
+        # which keeps the startup of short conversions fast.
+        from .incremental import Manifest
+
+        args.manifest = Manifest.load(args.output)
+
+    # One cache is shared by all the inputs (the words repeat across files).
+    cache = TokenCache(args.cache_size) if args.cache_size > 0 else None
+    if args.serve:
+        _serve(args, cache)
+        return 0
+    reject_file = None
+    args.rejects = None
+    if args.errors != "strict":
+        if args.reject_log is not None:
+            reject_file = open(args.reject_log, "w", encoding="utf-8")
+        args.rejects = RejectLog(reject_file)
+    # One deduplicator is shared by all the inputs.
+    args.deduplicator = None
+    if args.dedup is not None:
+        from .dedup import Deduplicator
+
+        args.deduplicator = Deduplicator(args.dedup, _get_dedup_index(args))
+    try:
+        _convert_inputs(inputs, args, parser, cache)
+    finally:
+        if reject_file is not None:
+            reject_file.close()
+        if args.deduplicator is not None:
+            args.deduplicator.close()
+    return 0
+
+
+def _build_indexes(
+    inputs: list[Path | ZipMember | str],
+    args: argparse.Namespace,
+    parser: argparse.ArgumentParser,
+):
+    from .index import build_index, get_index_path
+
+    for file in inputs:
+        if not isinstance(file, Path):
+            parser.exit(1, f"vrt2txt: error: {file}: only files can be indexed\n")
+        try:
+            index = build_index(
+                file, args.sentence_tag, args.paragraph_tag, encoding=args.encoding
+            )
+            index.save()
+        except (OSError, ValueError) as err:
+            parser.exit(1, f"vrt2txt: error: {file}: {err}\n")
+        if not args.quiet:
+            print(
+                f"{get_index_path(file)}: {index.num_documents} documents, "
+                f"{index.num_paragraphs} paragraphs, {index.num_sentences} "
+                "sentences",
+                file=sys.stderr,
+            )
+
+
+def _serve(args: argparse.Namespace, cache: TokenCache | None):
+    from .server import ConversionServer
+
+    server = ConversionServer(
+        args.output,
+        args.compress,
+        sentence_tag=args.sentence_tag,
+        paragraph_tag=args.paragraph_tag,
+        paragraphs=args.paragraphs,
+        html_entities=args.html_entities,
+        columns=args.columns,
+        cache=cache,
+        document_filter=args.document_filter,
+        errors=args.errors,
+        encoding=args.encoding,
+        use_mmap=args.mmap,
+    )
+    if args.socket is None:
+        server.serve(sys.stdin, sys.stdout)
+    else:
+        try:
+            server.serve_socket(args.socket)
+        except KeyboardInterrupt:
+            pass
+    if not args.quiet:
+        print(
+            f"served {server.requests} requests, {server.failed} failed",
+            file=sys.stderr,
+        )
+
+
+def _get_dedup_index(args: argparse.Namespace) -> BloomFilter | DiskHashSet | None:
+    from .dedup import BloomFilter, DiskHashSet
+
+    if args.dedup_bloom:
+        return BloomFilter(args.dedup_bloom, path=args.dedup_index)
+    if args.dedup_index is not None:
+        return DiskHashSet(args.dedup_index)
+    return None
+
+
+def _convert_inputs(
+    inputs: list[Path | ZipMember | str],
+    args: argparse.Namespace,
+    parser: argparse.ArgumentParser,
+    cache: TokenCache | None,
+):
+    total = _Report("total")
+    total_stats = ConversionStats()
+    total_ngrams = NgramCounter()
+    for file in inputs:
+        report = _Report("<stdin>" if file == "-" else str(file))
+        stats = ConversionStats() if args.stats else None
+        # Each input is counted as a separate text.
+        ngrams = NgramCounter() if args.ngrams is not None else None
+        rejected = 0
+        dropped = 0 if args.deduplicator is None else args.deduplicator.dropped
+        if args.rejects is not None:
+            args.rejects.source = report.name
+            rejected = args.rejects.errors
+        try:
+            _convert_input(file, args, report, cache, stats, ngrams)
+        except (OSError, ValueError, EOFError, *get_format_errors()) as err:
+            parser.exit(1, f"vrt2txt: error: {report.name}: {err}\n")
+        total.add(report)
+        if not args.quiet:
+            print(report, file=sys.stderr)
+        if stats is not None:
+            print(f"{report.name}: {stats}", file=sys.stderr)
+            total_stats.merge(stats)
+        if ngrams is not None:
+            total_ngrams.merge(ngrams)
+        if not args.quiet and args.rejects is not None:
+            if args.rejects.errors > rejected:
+                print(
+                    f"{report.name}: {args.rejects.errors - rejected} errors skipped",
+                    file=sys.stderr,
+                )
+        if not args.quiet and args.deduplicator is not None:
+            if args.deduplicator.dropped > dropped:
+                print(
+                    f"{report.name}: {args.deduplicator.dropped - dropped} "
+                    f"duplicate {args.dedup}s dropped",
+                    file=sys.stderr,
+                )
+
+    if not args.quiet and len(inputs) > 1:
+        print(total, file=sys.stderr)
+    if args.stats and len(inputs) > 1:
+        print(f"total: {total_stats}", file=sys.stderr)
+    if not args.quiet and cache is not None and cache.hits + cache.misses:
+        # With several workers, the caches of the worker processes are not
+        # counted here.
+        print(
+            f"cache: {cache.hits} hits, {cache.misses} misses, "
+            f"{cache.size} entries",
+            file=sys.stderr,
+        )
+    if not args.quiet and args.rejects is not None and args.rejects.errors:
+        print(f"skipped: {_format_rejects(args.rejects)}", file=sys.stderr)
+    if not args.quiet and args.deduplicator is not None:
+        dedup = args.deduplicator
+        print(
+            f"duplicates: {dedup.dropped} of {dedup.items} {dedup.unit}s dropped",
+            file=sys.stderr,
+        )
+    if args.ngrams is not None:
+        total_ngrams.save(args.ngrams)
+
+
+def _get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="vrt2txt",
+        description="Convert VRT (verticalized XML) corpora to plain text.",
+    )
+    parser.add_argument(
+        "inputs",
+        nargs="*",
+        default=["-"],
+        help="VRT files, folders, .zip archives or glob patterns. Files ending "
+        "with .gz, .bz2 or .xz are decompressed. Use '-' (default) to read "
+        "from stdin.",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=Path,
+        help="Folder for the .txt files. By default, the text is written to stdout.",
+    )
+    parser.add_argument(
+        "--pattern",
+        default="*.VRT",
+        help="Glob pattern for the VRT files in input folders and .zip archives "
+        "(default: %(default)s).",
+    )
+    parser.add_argument(
+        "--paragraphs",
+        action="store_true",
+        help="Separate <paragraph>s with newlines. By default, all sentences "
+        "of a file are written on one line.",
+    )
+    parser.add_argument("--sentence-tag", default="sentence")
+    parser.add_argument("--paragraph-tag", default="paragraph")
+    parser.add_argument(
+        "--html-entities",
+        action="store_true",
+        help="Decode all HTML entities in the words, not only the ones used in "
+        "VRT (&amp; &lt; &gt; &quot; &apos;).",
+    )
+    parser.add_argument(
+        "--columns",
+        type=_parse_columns,
+        help="Positions of the word and part-of-speech columns (1-based, like "
+        "cut), e.g. '1,4' for word-first layouts. By default, read from the "
+        "positional attributes comment of the file, or '2,4'.",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=0,
+        help="Memoize the decoding of up to this many distinct words (0 = no "
+        "cache, default). Helps on corpora with a small vocabulary.",
+    )
+    parser.add_argument(
+        "--filter",
+        action="append",
+        metavar="CONDITION",
+        help="Convert only the documents (<file>, <doc> or <text>) whose "
+        "attributes match the condition, e.g. 'year>=2010' or 'genre~Comedy'. "
+        "Operators: = != ~ (contains) !~ > >= < <=. Can be repeated.",
+    )
+    parser.add_argument(
+        "--split",
+        action="store_true",
+        help="Write each document into its own file, in a folder named after "
+        "the input file, with the attributes of the documents in "
+        "documents.jsonl. Requires --output.",
+    )
+    parser.add_argument(
+        "--compress",
+        choices=sorted(COMPRESSIONS.values()),
+        help="Compress the output (e.g. .txt.gz files with 'gz').",
+    )
+    parser.add_argument(
+        "--threaded",
+        action="store_true",
+        help="Read and decompress the inputs in a background thread, so that "
+        "the decompression overlaps with the parsing.",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Convert only the inputs which have changed since the previous run "
+        "into the --output folder (tracked in a manifest file there), and "
+        "resume interrupted conversions.",
+    )
+    parser.add_argument(
+        "--build-index",
+        action="store_true",
+        help="Instead of converting the inputs, write the byte offsets of their "
+        "documents, paragraphs and sentences into a sidecar index file (e.g. "
+        "corpus.VRT.idx) for random access with vrt2txt.index.",
+    )
+    parser.add_argument("--encoding", default="utf-8")
+    parser.add_argument(
+        "--mmap",
+        action="store_true",
+        help="Memory-map the input files and parse them as bytes, decoding only "
+        "the words. Only for plain files, without --workers.",
+    )
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes used per file (default: %(default)s). "
+        "Only for uncompressed files.",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=None,
+        help="Size (in bytes) of the pieces handed to the workers.",
+    )
+    parser.add_argument(
+        "--errors",
+        choices=ERROR_POLICIES,
+        default="strict",
+        help="What to do on malformed input, e.g. a token line without the "
+        "part-of-speech column: stop with an error (strict, default), or leave "
+        "out the line, its sentence or its document (<file>, <doc> or <text>). "
+        "The lenient policies also leave out paragraphs without sentences.",
+    )
+    parser.add_argument(
+        "--reject-log",
+        type=Path,
+        metavar="FILE",
+        help="Write the input left out by --errors into FILE as JSON lines, "
+        "with the input file, line number, offset and error of each.",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Print the counts of lines, sentences, tokens, entities and "
+        "malformed lines, and the time spent in each stage of the conversion. "
+        "Makes the conversion up to about twice as slow.",
+    )
+    parser.add_argument(
+        "--ngrams",
+        type=Path,
+        metavar="FILE",
+        help="Count the characters, and the bigrams and trigrams of characters, "
+        "of the text of all inputs, and save the counts into FILE as JSON "
+        "(compressed if FILE ends with .gz, .bz2 or .xz).",
+    )
+    parser.add_argument(
+        "--dedup",
+        choices=DEDUP_UNITS,
+        help="Leave out the sentences (or paragraphs) which were already "
+        "written, from this or an earlier input. Only a 64-bit hash of each "
+        "is kept in memory.",
+    )
+    parser.add_argument(
+        "--dedup-index",
+        type=Path,
+        metavar="FILE",
+        help="Keep the hashes of --dedup in FILE (an SQLite database, or the "
+        "Bloom filter of --dedup-bloom) instead of in memory. The hashes of "
+        "earlier runs in FILE are used, too.",
+    )
+    parser.add_argument(
+        "--dedup-bloom",
+        type=int,
+        metavar="N",
+        help="Keep the hashes of --dedup in a Bloom filter sized for N items "
+        "(about 1.8 bytes per item). Up to about 0.1%% of the unique items "
+        "are dropped by mistake.",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Run as a long-lived worker: read the paths of VRT files from "
+        "stdin, one per line (optionally followed by a tab and the path of the "
+        "text file), convert them one at a time, and write a JSON line for "
+        "each to stdout. See vrt2txt.server.",
+    )
+    parser.add_argument(
+        "--socket",
+        type=Path,
+        metavar="PATH",
+        help="With --serve, read the requests from the connections to a Unix "
+        "domain socket at PATH instead of stdin.",
+    )
+    parser.add_argument(
+        "-q", "--quiet", action="store_true", help="Do not print throughput reports."
+    )
+    return parser
+
+
+def _parse_columns(value: str) -> Columns:
+    try:
+        word, upos = (int(position) - 1 for position in value.split(","))
+        return Columns(word=word, upos=upos)
+    except ValueError as err:
+        raise argparse.ArgumentTypeError(
+            f"expected two positive column numbers, like '2,4', got '{value}'"
+        ) from err
+
+
+def _resolve_inputs(
+    inputs: Sequence[str], pattern: str
+) -> list[Path | ZipMember | str]:
+    files: list[Path | ZipMember | str] = []
+    for item in inputs:
+        path = Path(item)
+        if item == "-":
+            files.append(item)
+        elif path.is_dir():
+            files.extend(sorted(path.glob(pattern)))
+        elif path.suffix.lower() == ".zip" and path.is_file():
+            files.extend(iter_zip_members(path, pattern))
+        elif path.exists():
+            files.append(path)
+        else:
+            files.extend(Path(match) for match in sorted(glob.glob(item)))
+    return files
+
+
+def _convert_input(
+    file: Path | ZipMember | str,
+    args: argparse.Namespace,
+    report: _Report,
+    cache: TokenCache | None = None,
+    stats: ConversionStats | None = None,
+    ngrams: NgramCounter | None = None,
+):
+    options = dict(
+        sentence_tag=args.sentence_tag,
+        paragraph_tag=args.paragraph_tag,
+        paragraphs=args.paragraphs,
+        html_entities=args.html_entities,
+        columns=args.columns,
+        cache=cache,
+        document_filter=args.document_filter,
+        encoding=args.encoding,
+    )
+    if args.rejects is not None:
+        options["errors"] = args.errors
+        options["reject_log"] = args.rejects
+    if args.deduplicator is not None:
+        options["dedup"] = args.deduplicator
+    start = time.perf_counter()
+
+    if args.manifest is not None:
+        assert not isinstance(file, str)
+        name = f"{_get_stem(file)}.txt" + (f".{args.compress}" if args.compress else "")
+        del options["encoding"]
+        from .incremental import convert_incremental
+
+        converted = convert_incremental(
+            file, args.output / name, args.manifest, encoding=args.encoding, **options
+        )
+        # The sentences are not counted.
+        report.sentences = None
+        if converted:
+            report.bytes_in = _get_input_size(file)
+        else:
+            report.up_to_date = True
+        report.elapsed = time.perf_counter() - start
+        return
+
+    # Streams are read through a counting reader. Plain files are read by path,
+    # so that they can be memory-mapped or split between the workers.
+    reader = None
+    if file == "-":
+        reader = _CountingReader(sys.stdin.buffer)
+    elif _is_stream(file) or args.threaded:
+        reader = _CountingReader(open_vrt(file, threaded=args.threaded))
+    try:
+        if args.split:
+            if reader is None and args.mmap:
+                options["use_mmap"] = True
+            documents = iter_vrt_documents(reader or file, **options)
+            folder = args.output / _get_stem(file)
+            _write_documents(documents, folder, report, args.encoding, args.compress)
+        else:
+            options["stats"] = stats
+            if reader is not None:
+                fragments = iter_vrt_file(reader, **options)
+            elif args.workers > 1:
+                from .parallel import iter_vrt_file_parallel
+
+                del options["document_filter"]
+                if args.chunk_size:
+                    options["chunk_size"] = args.chunk_size
+                # The workers count the n-grams of their pieces.
+                options["ngrams"] = ngrams
+                ngrams = None
+                fragments = iter_vrt_file_parallel(
+                    file, workers=args.workers, **options
+                )
+                # The parallel conversion yields whole blocks of sentences,
+                # which are counted only by the stats.
+                report.sentences = None
+            elif args.mmap:
+                fragments = iter_vrt_mmap(file, **options)
+            else:
+                fragments = iter_vrt_file(file, **options)
+
+            if args.output is None:
+                out = open_binary(sys.stdout.buffer, "wb", args.compress)
+                _write_buffered(fragments, out, report, args.encoding, stats, ngrams)
+                if out is not sys.stdout.buffer:
+                    # Closing the compressor leaves stdout open.
+                    out.close()
+            else:
+                name = f"{_get_stem(file)}.txt"
+                if args.compress:
+                    name += f".{args.compress}"
+                with _open_output(args.output / name, args.compress) as out:
+                    _write_buffered(
+                        fragments, out, report, args.encoding, stats, ngrams
+                    )
+            if report.sentences is None and stats is not None:
+                report.sentences = stats.sentences
+    finally:
+        if reader is not None and file != "-":
+            reader.raw.close()
+
+    if reader is not None:
+        report.bytes_in = reader.bytes_read
+    else:
+        assert isinstance(file, Path)
+        report.bytes_in = file.stat().st_size
+    report.elapsed = time.perf_counter() - start
+
+
+def _format_rejects(rejects: RejectLog) -> str:
+    counts = [
+        (rejects.lines, "lines"),
+        (rejects.sentences, "sentences"),
+        (rejects.paragraphs, "paragraphs"),
+        (rejects.documents, "documents"),
+    ]
+    return ", ".join(f"{count} {name}" for count, name in counts if count)
+
+
+def _get_input_size(file: Path | ZipMember) -> int:
+    if isinstance(file, ZipMember):
+        import zipfile
+
+        with zipfile.ZipFile(file.archive) as archive:
+            return archive.getinfo(file.name).file_size
+    return file.stat().st_size
+
+
+def _is_stream(file: Path | ZipMember | str) -> bool:
+    """Whether the input can only be read from the start to the end: stdin,
+    compressed files and the members of .zip archives."""
+    return file == "-" or isinstance(file, ZipMember) or bool(get_compression(file))
+
+
+def _check_output_names(
+    inputs: list[Path | ZipMember | str], parser: argparse.ArgumentParser
+):
+    """Exits if two inputs would be written to the same file (or folder with
+    --split) in the output folder, e.g. "a/x.VRT" and "b/x.VRT.gz"."""
+    names: dict[str, Path | ZipMember | str] = {}
+    for file in inputs:
+        name = _get_stem(file)
+        if name in names:
+            parser.error(
+                f"inputs {names[name]} and {file} would both be written to "
+                f"{name!r} in the output folder"
+            )
+        names[name] = file
+
+
+def _get_stem(file: Path | ZipMember | str) -> str:
+    """The name of the input without the folders and suffixes, e.g. "a" for
+    "raw/a.VRT.gz"."""
+    if file == "-":
+        return "stdin"
+    name = file.name if isinstance(file, (Path, ZipMember)) else file
+    return get_text_name(name).removesuffix(".txt")
+
+
+@contextlib.contextmanager
+def _open_output(path: Path, compression: str | None) -> Iterator[IO[bytes]]:
+    """Opens a temporary file next to `path` for writing, and renames it to
+    `path` when done. On errors, the temporary file is removed instead, so a
+    failed conversion leaves no partial output (nor truncates an old one)."""
+    # A prefix keeps the suffix of the name.
+    temporary = path.with_name(".tmp-" + path.name)
+    try:
+        with open_binary(temporary, "wb", compression) as f:
+            yield f
+    except BaseException:
+        with contextlib.suppress(OSError):
+            temporary.unlink()
+        raise
+    os.replace(temporary, path)
+
+
+def _write_buffered(
+    fragments: Iterable[str],
+    out: IO[bytes],
+    report: _Report,
+    encoding="utf-8",
+    stats: ConversionStats | None = None,
+    ngrams: NgramCounter | None = None,
+):
+    """Writes the text fragments in large blocks instead of one write call per
+    sentence or separator. The time of the writes is added to `stats`, and the
+    n-grams of the blocks to `ngrams`."""
+    buffer: list[str] = []
+    buffered = 0
+    sentences = 0
+    for fragment in fragments:
+        buffer.append(fragment)
+        buffered += len(fragment)
+        if fragment not in SEPARATORS:
+            sentences += 1
+        if buffered >= WRITE_BUFFER_SIZE:
+            _write_block(out, "".join(buffer), encoding, stats, ngrams)
+            buffer = []
+            buffered = 0
+    _write_block(out, "".join(buffer), encoding, stats, ngrams)
+    start = time.perf_counter()
+    out.flush()
+    if stats is not None:
+        stats.add_time("write", time.perf_counter() - start)
+    if report.sentences is not None:
+        report.sentences += sentences
+
+
+def _write_block(
+    out: IO[bytes],
+    block: str,
+    encoding: str,
+    stats: ConversionStats | None,
+    ngrams: NgramCounter | None,
+):
+    if ngrams is not None:
+        ngrams.update(block)
+    _write(out, block.encode(encoding), stats)
+
+
+def _write(out: IO[bytes], data: bytes, stats: ConversionStats | None):
+    if stats is None:
+        out.write(data)
+        return
+    start = time.perf_counter()
+    out.write(data)
+    stats.add_time("write", time.perf_counter() - start)
+
+
+def _write_documents(
+    documents: Iterable[Document],
+    folder: Path,
+    report: _Report,
+    encoding="utf-8",
+    compression: str | None = None,
+):
+    """Writes the text of each document into a numbered file in `folder`, and
+    the attributes of the documents into documents.jsonl."""
+    folder.mkdir(exist_ok=True, parents=True)
+    suffix = f".txt.{compression}" if compression else ".txt"
+    written = [folder / "documents.jsonl"]
+    try:
+        with open(written[0], "w", encoding="utf-8") as index:
+            for number, document in enumerate(documents, start=1):
+                name = f"{number:06d}{suffix}"
+                written.append(folder / name)
+                with open_binary(folder / name, "wb", compression) as f:
+                    f.write(document.text.encode(encoding))
+                record = {"file": name, "tag": document.tag, **document.attributes}
+                index.write(json.dumps(record, ensure_ascii=False) + "\n")
+    except BaseException:
+        # The documents of a failed input are not left half written.
+        for path in written:
+            with contextlib.suppress(OSError):
+                path.unlink()
+        with contextlib.suppress(OSError):
+            folder.rmdir()
+        raise
+    # The documents are counted instead of the sentences.
+    report.sentences = None
+    report.documents = len(written) - 1
+
+
+class _CountingReader:
+    """Binary reader wrapper which counts the bytes read."""
+
+    def __init__(self, raw: IO[bytes]):
+        self.raw = raw
+        self.bytes_read = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.raw.read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+class _Report:
+    """Throughput of the conversion of one input (or all inputs)."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.bytes_in = 0
+        self.sentences: int | None = 0
+        self.documents: int | None = None
+        self.up_to_date = False
+        self.elapsed = 0.0
+
+    def add(self, other: _Report):
+        self.bytes_in += other.bytes_in
+        self.elapsed += other.elapsed
+        if self.sentences is None or other.sentences is None:
+            self.sentences = None
+        else:
+            self.sentences += other.sentences
+        if other.documents is not None:
+            self.documents = (self.documents or 0) + other.documents
+
+    def __str__(self) -> str:
+        if self.up_to_date:
+            return f"{self.name}: up to date"
+        megabytes = self.bytes_in / 1e6
+        elapsed = max(self.elapsed, 1e-9)
+        text = (
+            f"{self.name}: {megabytes:.1f} MB in {self.elapsed:.2f} s "
+            f"({megabytes / elapsed:.1f} MB/s"
+        )
+        if self.sentences is not None:
+            text += (
+                f", {self.sentences} sentences, "
+                f"{self.sentences / elapsed:.0f} sentences/s"
+            )
+        if self.documents is not None:
+            text += f", {self.documents} documents"
+        return text + ")"
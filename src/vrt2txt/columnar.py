@@ -0,0 +1,443 @@
+"""Columnar output: the tokens of the sentences in compact, array-backed
+batches, together with the text of the sentences.
+
+The strings of a column are stored like in Apache Arrow's string arrays: the
+UTF-8 encoded strings concatenated into one buffer, and an array of int32
+offsets into it. The offsets and other integer arrays are `array.array`
+objects, which support the buffer protocol, so they can be used without
+copying, e.g. with `numpy.frombuffer(batch.token_starts, dtype=numpy.int32)`
+or `pyarrow.StringArray.from_buffers(len(column), pyarrow.py_buffer(
+column.offsets), pyarrow.py_buffer(column.data))`.
+"""
+
+from __future__ import annotations
+
+import codecs
+import itertools
+import operator
+import os
+import typing
+from array import array
+
+from .stream import DEFAULT_CHUNK_SIZE, _iter_mapped_lines, _iter_text_chunks
+from .vrt2txt import _get_unescape, _iter_lines, _iter_vrt_lines
+
+if typing.TYPE_CHECKING:
+    from typing import Any, Callable, Iterable, Iterator, Sequence
+
+    from .cache import TokenCache
+    from .columns import Columns
+    from .documents import DocumentFilter
+    from .errors import RejectLog
+    from .grammar import StructureGrammar
+    from .stats import ConversionStats
+    from .stream import VRTSource
+
+# The columns collected by default.
+DEFAULT_FIELDS = ("word", "upos", "lemma")
+
+# Minimum number of tokens in a batch (except the last one).
+DEFAULT_BATCH_TOKENS = 64 * 1024
+
+
+class StringColumn:
+    """A sequence of strings stored in one UTF-8 buffer (`data`), with the
+    offsets of the strings in it (`offsets`, int32, one more than there are
+    strings): the string i is ``data[offsets[i]:offsets[i + 1]]``."""
+
+    def __init__(self, data: bytes, offsets: array):
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, strings: Iterable[str]) -> StringColumn:
+        return cls.from_encoded([string.encode("utf-8") for string in strings])
+
+    @classmethod
+    def from_encoded(cls, strings: Sequence[bytes]) -> StringColumn:
+        """Creates the column from UTF-8 encoded strings."""
+        offsets = array("i", itertools.accumulate(map(len, strings), initial=0))
+        return cls(b"".join(strings), offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("StringColumn index out of range")
+        offsets = self.offsets
+        return self.data[offsets[index] : offsets[index + 1]].decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        data = self.data
+        offsets = self.offsets
+        for start, end in zip(offsets, itertools.islice(offsets, 1, None)):
+            yield data[start:end].decode("utf-8")
+
+    def to_list(self) -> list[str]:
+        return list(self)
+
+    def __repr__(self) -> str:
+        return f"StringColumn(size={len(self)}, nbytes={len(self.data)})"
+
+
+class TokenBatch:
+    """The tokens of a batch of whole sentences, and the text of the sentences.
+
+    Attributes
+    ----------
+    text : str
+        The text of the sentences, concatenated without separators.
+    sentence_offsets : array
+        The offsets of the sentences in `text` (int32, one more than there are
+        sentences): the sentence i is ``text[sentence_offsets[i]:
+        sentence_offsets[i + 1]]``.
+    token_offsets : array
+        The index of the first token of each sentence (int32, one more than
+        there are sentences).
+    token_starts, token_ends : array
+        The offsets of each token (its word) in `text` (int32, characters).
+    columns : dict[str, StringColumn]
+        The collected columns, one string per token, by the name of the column.
+        The words are decoded like in the text (the entities are decoded in
+        all the columns).
+    """
+
+    def __init__(
+        self,
+        text: str,
+        sentence_offsets: array,
+        token_offsets: array,
+        token_starts: array,
+        token_ends: array,
+        columns: dict[str, StringColumn],
+    ):
+        self.text = text
+        self.sentence_offsets = sentence_offsets
+        self.token_offsets = token_offsets
+        self.token_starts = token_starts
+        self.token_ends = token_ends
+        self.columns = columns
+
+    @property
+    def num_sentences(self) -> int:
+        return len(self.sentence_offsets) - 1
+
+    @property
+    def num_tokens(self) -> int:
+        return len(self.token_starts)
+
+    def sentence(self, index: int) -> str:
+        """Returns the text of a sentence."""
+        offsets = self.sentence_offsets
+        return self.text[offsets[index] : offsets[index + 1]]
+
+    def tokens(self, index: int, column="word") -> list[str]:
+        """Returns the values of a column for the tokens of a sentence."""
+        values = self.columns[column]
+        return [
+            values[i]
+            for i in range(self.token_offsets[index], self.token_offsets[index + 1])
+        ]
+
+    def __len__(self) -> int:
+        return self.num_sentences
+
+    def __repr__(self) -> str:
+        return (
+            f"TokenBatch(sentences={self.num_sentences}, tokens={self.num_tokens}, "
+            f"columns={list(self.columns)})"
+        )
+
+
+def iter_vrt_token_batches(
+    file: VRTSource,
+    fields: Sequence[str] = DEFAULT_FIELDS,
+    sentence_tag="sentence",
+    paragraph_tag="paragraph",
+    paragraphs=False,
+    html_entities=False,
+    columns: Columns | None = None,
+    cache: TokenCache | None = None,
+    document_filter: DocumentFilter | None = None,
+    stats: ConversionStats | None = None,
+    errors="strict",
+    reject_log: RejectLog | None = None,
+    batch_tokens: int = DEFAULT_BATCH_TOKENS,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    encoding="utf-8",
+    use_mmap=False,
+    grammar: StructureGrammar | None = None,
+) -> Iterable[TokenBatch]:
+    """Converts a VRT XML file into batches of sentences with their tokens in
+    columnar form, in a single pass. The sentences are the same as the
+    sentences yielded by `iter_vrt_file`.
+
+    Parameters
+    ----------
+    file : str | os.PathLike | IO[str] | IO[bytes]
+        Path to the VRT file, or a file handle opened in text or binary mode.
+    fields : Sequence[str], optional
+        The names of the columns to collect, by default "word", "upos" and
+        "lemma". "word" and "upos" are the columns of `columns`; the other
+        names are looked up from the positional attributes comment, or from
+        the default CoNLL-U layout (see `Columns.position`). A token line
+        without one of the columns is malformed (see `errors`).
+    sentence_tag, paragraph_tag, paragraphs, html_entities, columns, cache,
+    document_filter, stats, errors, reject_log
+        See `iter_vrt_xml`.
+    batch_tokens : int, optional
+        A batch is yielded as soon as it has at least this many tokens.
+    chunk_size, encoding
+        See `iter_vrt_file`.
+    use_mmap : bool, optional
+        If True, `file` must be a path. It is memory-mapped and parsed as bytes
+        (see `iter_vrt_mmap`).
+    grammar : StructureGrammar | None, optional
+        The structural tags, used instead of `sentence_tag` and
+        `paragraph_tag`. See `iter_vrt_xml`.
+
+    Yields
+    ------
+    TokenBatch
+        A batch of whole sentences.
+    """
+    line_encoding = None
+    keep_cr = reject_log is not None or stats is not None
+    if use_mmap:
+        if not isinstance(file, (str, os.PathLike)):
+            raise ValueError("use_mmap requires a path")
+        lines: Iterable = _iter_mapped_lines(file, keep_cr=keep_cr)
+        line_encoding = encoding
+    else:
+        lines = _iter_lines(
+            _iter_text_chunks(file, chunk_size, encoding), keep_cr=keep_cr
+        )
+
+    collector = TokenCollector(fields, html_entities)
+    fragments = _iter_vrt_lines(
+        lines,
+        sentence_tag,
+        paragraph_tag,
+        paragraphs,
+        html_entities=html_entities,
+        columns=columns,
+        cache=cache,
+        document_filter=document_filter,
+        encoding=line_encoding,
+        stats=stats,
+        errors=errors,
+        reject_log=reject_log,
+        collector=collector,
+        grammar=grammar,
+        text_encoding=encoding,
+    )
+    # The text is collected with the tokens. The fragments are yielded after
+    # each sentence, and outside of the documents held by the skip-document
+    # policy.
+    for _ in fragments:
+        if collector.num_tokens >= batch_tokens:
+            yield collector.flush()
+    if collector.num_sentences:
+        yield collector.flush()
+
+
+class TokenCollector:
+    """Collects the tokens of the sentences formed by the parser into columns
+    (see `_iter_vrt_lines`), and flushes them as `TokenBatch` objects.
+
+    Parameters
+    ----------
+    fields : Sequence[str]
+        The names of the columns to collect. See `iter_vrt_token_batches`.
+    html_entities : bool, optional
+        If True, all HTML entities are decoded in the columns other than the
+        word. See `iter_vrt_xml`.
+    """
+
+    def __init__(self, fields: Sequence[str], html_entities=False):
+        if not fields:
+            raise ValueError("At least one field must be collected")
+        self.fields = tuple(fields)
+        # The words are the parts of the sentences; the other fields are read
+        # from the token lines.
+        self._line_fields = [field for field in self.fields if field != "word"]
+        self._unescape = _get_unescape(html_entities)
+        # The fields of the tokens read after the last formed sentence.
+        self._pending: list[tuple[Any, ...]] = []
+        # If True, the fields read from the lines are UTF-8 bytes.
+        self._encoded = False
+        self._reset()
+        self._document_start = (0, 0, 0)
+
+    @property
+    def num_sentences(self) -> int:
+        return len(self._texts)
+
+    @property
+    def num_tokens(self) -> int:
+        return len(self._token_starts)
+
+    def flush(self) -> TokenBatch:
+        """Returns the collected sentences as a batch, and starts a new one."""
+        make_column = (
+            StringColumn.from_encoded if self._encoded else StringColumn.from_strings
+        )
+        columns = {
+            field: make_column(values)
+            for field, values in zip(self._line_fields, self._values)
+        }
+        if "word" in self.fields:
+            columns["word"] = StringColumn.from_strings(self._words)
+        batch = TokenBatch(
+            "".join(self._texts),
+            self._sentence_offsets,
+            self._token_offsets,
+            self._token_starts,
+            self._token_ends,
+            {field: columns[field] for field in self.fields},
+        )
+        self._reset()
+        return batch
+
+    def _reset(self):
+        self._texts: list[str] = []
+        self._length = 0
+        self._sentence_offsets = array("i", [0])
+        self._token_offsets = array("i", [0])
+        self._token_starts = array("i")
+        self._token_ends = array("i")
+        self._words: list[str] = []
+        self._values: list[list[Any]] = [[] for _ in self._line_fields]
+
+    def _make_token_reader(
+        self,
+        make_token_reader: Callable[..., Callable[[Any], tuple[str, str]]],
+        columns: Columns,
+        html_entities=False,
+        cache: TokenCache | None = None,
+        encoding: str | None = None,
+    ) -> Callable[[Any], tuple[str, str]]:
+        """Wraps a token reader (see `_make_token_reader`) to read the fields
+        of each token. The lines may be str or bytes (in `encoding`)."""
+        get_contents = make_token_reader(columns, html_entities, cache)
+        if not self._line_fields:
+            return get_contents
+        positions = [columns.position(field) for field in self._line_fields]
+        maxsplit = max(positions) + 1
+        if len(positions) == 1:
+            (position,) = positions
+
+            def get_fields(columns: list) -> tuple:
+                return (columns[position],)
+
+        else:
+            get_fields = operator.itemgetter(*positions)
+        unescape = self._unescape
+        append = self._pending.append
+
+        if encoding is None:
+
+            def get_recorded_contents(line: str) -> tuple[str, str]:
+                contents = get_contents(line)
+                columns = line.split("\t", maxsplit)
+                if len(columns) < maxsplit:
+                    raise ValueError(f'Could not parse line "{line}"')
+                values = get_fields(columns)
+                if "&" in line:
+                    values = tuple(
+                        unescape(value) if "&" in value else value for value in values
+                    )
+                append(values)
+                return contents
+
+            return get_recorded_contents
+
+        # UTF-8 fields are kept as bytes, which is how they are stored in the
+        # columns. Other encodings are decoded.
+        self._encoded = codecs.lookup(encoding).name == "utf-8"
+        encoded = self._encoded
+
+        def get_recorded_bytes_contents(line: bytes) -> tuple[str, str]:
+            contents = get_contents(line)
+            columns = line.split(b"\t", maxsplit)
+            if len(columns) < maxsplit:
+                raise ValueError(f'Could not parse line "{line.decode(encoding)}"')
+            values = get_fields(columns)
+            if not encoded:
+                values = tuple(
+                    unescape(value) if "&" in value else value
+                    for value in (value.decode(encoding) for value in values)
+                )
+            elif b"&" in line:
+                values = tuple(
+                    (
+                        unescape(value.decode(encoding)).encode()
+                        if b"&" in value
+                        else value
+                    )
+                    for value in values
+                )
+            append(values)
+            return contents
+
+        return get_recorded_bytes_contents
+
+    def _wrap_detokenizer(
+        self, form_sentence: Callable[..., str]
+    ) -> Callable[..., str]:
+        """Wraps `_form_sentence` to collect the formed sentences with their
+        tokens."""
+        pending = self._pending
+        collect_words = "word" in self.fields
+
+        def form_collected_sentence(
+            sentence_parts, sentence_part_types, get_part_class
+        ) -> str:
+            starts: list[int] = []
+            sentence = form_sentence(
+                sentence_parts, sentence_part_types, get_part_class, starts
+            )
+            base = self._length
+            self._token_starts.extend([base + start for start in starts])
+            self._token_ends.extend(
+                [
+                    base + start + len(part)
+                    for start, part in zip(starts, sentence_parts)
+                ]
+            )
+            if collect_words:
+                self._words.extend(sentence_parts)
+            if pending:
+                # The tokens of the sentence are the last ones read; the ones
+                # before them are of a sentence left out as malformed.
+                tokens = pending[len(pending) - len(sentence_parts) :]
+                for values, column in zip(self._values, zip(*tokens)):
+                    values.extend(column)
+                pending.clear()
+            self._texts.append(sentence)
+            self._length += len(sentence)
+            self._sentence_offsets.append(self._length)
+            self._token_offsets.append(len(self._token_starts))
+            return sentence
+
+        return form_collected_sentence
+
+    def _start_document(self):
+        self._document_start = (self.num_sentences, self.num_tokens, self._length)
+
+    def _reject_document(self):
+        """Drops the sentences collected since the start of the document."""
+        sentences, tokens, length = self._document_start
+        self._pending.clear()
+        del self._texts[sentences:]
+        del self._sentence_offsets[sentences + 1 :]
+        del self._token_offsets[sentences + 1 :]
+        del self._token_starts[tokens:]
+        del self._token_ends[tokens:]
+        del self._words[tokens:]
+        for values in self._values:
+            del values[tokens:]
+        self._length = length
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import os
+import typing
+
+if typing.TYPE_CHECKING:
+    from typing import Iterable, Sequence
+
+# Start of the comment line which lists the names of the positional attributes
+# (columns) of a VRT file. See: https://www.kielipankki.fi/support/vrt-format/
+POSITIONAL_ATTRIBUTES_COMMENT = "<!-- #vrt positional-attributes:"
+
+# The names of the columns of a VRT file without a positional attributes
+# comment (the CoNLL-U layout of the Kielipankki corpora).
+DEFAULT_ATTRIBUTES = (
+    "ref",
+    "word",
+    "lemma",
+    "upos",
+    "xpos",
+    "feats",
+    "dephead",
+    "deprel",
+    "deps",
+    "misc",
+)
+
+WORD_ATTRIBUTES = ("word",)
+UPOS_ATTRIBUTES = ("upos", "pos")
+
+
+class Columns:
+    """The positions of the columns (positional attributes) which are used from
+    the token lines: the word and its part-of-speech tag. Positions start from
+    0, so the default is the layout where the word is in the 2nd and the UPOS
+    tag in the 4th column:
+
+        1	Helppoa	helppo	ADJ	_	Case=Par|Degree=Pos|Number=Sing	0	root	_	_
+
+    Parameters
+    ----------
+    word : int, optional
+        The position of the word column, by default 1.
+    upos : int, optional
+        The position of the part-of-speech column, by default 3. The values
+        PUNCT and NUM affect the spacing of the words; other values are treated
+        as words.
+    names : Sequence[str] | None, optional
+        The names of all the columns, if known (see `from_names`). Used to find
+        the other columns by name (see `position`).
+    """
+
+    def __init__(
+        self, word: int = 1, upos: int = 3, names: Sequence[str] | None = None
+    ):
+        if word < 0 or upos < 0:
+            raise ValueError("Column positions must be non-negative")
+        self.word = word
+        self.upos = upos
+        self.names = None if names is None else tuple(names)
+
+    @classmethod
+    def from_names(
+        cls,
+        names: Sequence[str],
+        word_attributes: Sequence[str] = WORD_ATTRIBUTES,
+        upos_attributes: Sequence[str] = UPOS_ATTRIBUTES,
+    ) -> Columns:
+        """Creates the columns from the names of the positional attributes, for
+        example ["word", "ref", "lemma", "upos", "msd"].
+
+        Parameters
+        ----------
+        names : Sequence[str]
+            The names of the positional attributes, in the order of the columns.
+        word_attributes : Sequence[str], optional
+            The accepted names for the word column, in order of preference.
+        upos_attributes : Sequence[str], optional
+            The accepted names for the part-of-speech column, in order of
+            preference.
+        """
+        # Feature set attributes are marked with a trailing slash, e.g. "lex/"
+        names = [name.rstrip("/") for name in names]
+        return cls(
+            word=_find_attribute(names, word_attributes),
+            upos=_find_attribute(names, upos_attributes),
+            names=names,
+        )
+
+    @classmethod
+    def from_header(cls, line: str) -> Columns:
+        """Creates the columns from a positional attributes comment, like
+
+        <!-- #vrt positional-attributes: word ref lemma upos msd -->
+        """
+        line = line.strip()
+        if not line.startswith(POSITIONAL_ATTRIBUTES_COMMENT):
+            raise ValueError(f'Not a positional attributes comment: "{line}"')
+        names = line[len(POSITIONAL_ATTRIBUTES_COMMENT) :].removesuffix("-->")
+        return cls.from_names(names.split())
+
+    def position(self, name: str) -> int:
+        """Returns the position of a column by its name. "word" and "upos" are
+        the positions of this object; the other names are looked up from
+        `names`, or from `DEFAULT_ATTRIBUTES` if the names are not known."""
+        if name == "word":
+            return self.word
+        if name == "upos":
+            return self.upos
+        return _find_attribute(list(self.names or DEFAULT_ATTRIBUTES), (name,))
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Columns):
+            return NotImplemented
+        return (self.word, self.upos) == (other.word, other.upos)
+
+    def __repr__(self) -> str:
+        return f"Columns(word={self.word}, upos={self.upos})"
+
+
+DEFAULT_COLUMNS = Columns()
+
+
+def read_columns(file: str | os.PathLike, encoding="utf-8") -> Columns | None:
+    """Reads the columns from the positional attributes comment of a VRT file.
+    Only the structural lines before the first token line are searched.
+
+    Returns
+    -------
+    Columns | None
+        The columns, or None if the file has no positional attributes comment.
+    """
+    # The lines end only at "\n", like in the parser.
+    with open(file, encoding=encoding, newline="\n") as f:
+        return _find_columns(f)
+
+
+def _find_columns(lines: Iterable[str]) -> Columns | None:
+    """Finds the positional attributes comment among the structural lines
+    before the first token line."""
+    for line in lines:
+        head = line.strip()
+        if head.startswith(POSITIONAL_ATTRIBUTES_COMMENT):
+            return Columns.from_header(head)
+        if head and not head.startswith("<"):
+            break
+    return None
+
+
+def _find_attribute(names: Sequence[str], candidates: Sequence[str]) -> int:
+    for candidate in candidates:
+        if candidate in names:
+            return names.index(candidate)
+    raise ValueError(
+        f"None of the positional attributes {list(candidates)} found in {list(names)}"
+    )
@@ -0,0 +1,232 @@
+"""Reading and writing compressed files: .gz, .bz2 and .xz streams, and the
+members of .zip archives.
+
+The compression modules (and the threading modules) are imported when first
+used, as importing them is slow and they are not needed for plain files."""
+
+from __future__ import annotations
+
+import fnmatch
+import os
+import typing
+from pathlib import PurePosixPath
+
+if typing.TYPE_CHECKING:
+    from typing import IO, Union
+
+    BinarySource = Union[str, os.PathLike, "ZipMember"]
+
+# The compressed formats by file suffix.
+COMPRESSIONS = {".gz": "gz", ".bz2": "bz2", ".xz": "xz"}
+
+# Amount of bytes read at a time by the background thread of `ThreadedReader`.
+THREAD_CHUNK_SIZE = 1024 * 1024
+
+
+def get_compression(path: str | os.PathLike) -> str | None:
+    """Returns the compression of a file by its suffix ("gz", "bz2" or "xz"),
+    or None if the file is not compressed."""
+    return COMPRESSIONS.get(os.path.splitext(path)[1].lower())
+
+
+def strip_compression_suffix(name: str) -> str:
+    """Removes the compression suffix from a file name, e.g.
+    "wikipedia.VRT.gz" -> "wikipedia.VRT"."""
+    base, suffix = os.path.splitext(name)
+    return base if suffix.lower() in COMPRESSIONS else name
+
+
+def get_text_name(name: str, compression: str | None = None) -> str:
+    """Returns the name of the text file for a VRT file, e.g.
+    "vrt/wikipedia.VRT.gz" -> "wikipedia.txt", or "wikipedia.txt.xz" with the
+    compression "xz"."""
+    stem = os.path.splitext(strip_compression_suffix(PurePosixPath(name).name))[0]
+    return f"{stem}.txt" + (f".{compression}" if compression else "")
+
+
+def open_binary(
+    file: str | os.PathLike | IO[bytes],
+    mode="rb",
+    compression: str | None = None,
+) -> IO[bytes]:
+    """Opens a file in binary mode ("rb" or "wb"), (de)compressing it on the
+    fly. The compression is detected from the suffix of a path if not given.
+    Handles are wrapped without closing them when the returned file is closed.
+    """
+    if compression is None and isinstance(file, (str, os.PathLike)):
+        compression = get_compression(file)
+    if compression is None:
+        if isinstance(file, (str, os.PathLike)):
+            return open(file, mode)
+        return file
+    if compression == "gz":
+        import gzip
+
+        # The default level 9 is several times slower than 6 for a few percent.
+        return gzip.open(file, mode, compresslevel=6)  # type: ignore[return-value]
+    if compression == "bz2":
+        import bz2
+
+        return bz2.open(file, mode)  # type: ignore[return-value]
+    if compression == "xz":
+        import lzma
+
+        return lzma.open(file, mode)  # type: ignore[return-value]
+    raise ValueError(f"Unknown compression: {compression}")
+
+
+class ZipMember:
+    """A member of a .zip archive.
+
+    Parameters
+    ----------
+    archive : str | os.PathLike
+        Path to the .zip archive.
+    name : str
+        The name of the member in the archive, e.g. "vrt/wikipedia-fi.VRT".
+    """
+
+    def __init__(self, archive: str | os.PathLike, name: str):
+        self.archive = archive
+        self.name = name
+
+    def open(self) -> IO[bytes]:
+        """Opens the member for reading. The returned handle decompresses the
+        member as it is read."""
+        import zipfile
+
+        with zipfile.ZipFile(self.archive) as archive:
+            # The handle keeps the archive file open until it is closed.
+            return archive.open(self.name)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, ZipMember):
+            return NotImplemented
+        return (self.archive, self.name) == (other.archive, other.name)
+
+    def __str__(self) -> str:
+        return f"{os.fspath(self.archive)}:{self.name}"
+
+    def __repr__(self) -> str:
+        return f"ZipMember({os.fspath(self.archive)!r}, {self.name!r})"
+
+
+def iter_zip_members(archive: str | os.PathLike, pattern="*.VRT") -> list[ZipMember]:
+    """Lists the members of a .zip archive whose file name (without the folders)
+    matches the glob `pattern`, sorted by name."""
+    import zipfile
+
+    with zipfile.ZipFile(archive) as f:
+        names = [info.filename for info in f.infolist() if not info.is_dir()]
+    return [
+        ZipMember(archive, name)
+        for name in sorted(names)
+        if fnmatch.fnmatchcase(PurePosixPath(name).name, pattern)
+    ]
+
+
+def get_format_errors() -> tuple[type[Exception], ...]:
+    """Returns the exceptions (other than OSError, EOFError and ValueError)
+    raised for corrupt compressed files and archives."""
+    import lzma
+    import zipfile
+
+    return (zipfile.BadZipFile, lzma.LZMAError)
+
+
+def open_vrt(file: BinarySource, threaded=False) -> IO[bytes]:
+    """Opens a VRT file, a compressed VRT file or a member of a .zip archive
+    for reading, as a binary handle which can be passed to `iter_vrt_file` or
+    `convert`.
+
+    Parameters
+    ----------
+    file : str | os.PathLike | ZipMember
+        The file to open. Files ending with .gz, .bz2 or .xz are decompressed.
+    threaded : bool, optional
+        If True, the file is read (and decompressed) in a background thread,
+        so that the decompression overlaps with the parsing. The compression
+        libraries release the GIL while decompressing.
+    """
+    if isinstance(file, ZipMember):
+        handle = file.open()
+    else:
+        handle = open_binary(file)
+    if threaded:
+        return ThreadedReader(handle)  # type: ignore[return-value]
+    return handle
+
+
+class ThreadedReader:
+    """A binary reader which reads the wrapped file in a background thread.
+    At most `queue_size` chunks of `chunk_size` bytes are read ahead. The
+    wrapped file is closed when the reader is closed."""
+
+    def __init__(
+        self, raw: IO[bytes], chunk_size: int = THREAD_CHUNK_SIZE, queue_size: int = 4
+    ):
+        import queue
+        import threading
+
+        self.raw = raw
+        self._chunk_size = chunk_size
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._buffer = b""
+        self._eof = False
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._read_ahead, daemon=True)
+        self._thread.start()
+
+    def _read_ahead(self):
+        try:
+            while not self._closed.is_set():
+                chunk = self.raw.read(self._chunk_size)
+                self._put(chunk)
+                if not chunk:
+                    return
+        except BaseException as err:
+            self._put(err)
+
+    def _put(self, item):
+        import queue
+
+        # Waits for room in the queue, unless the reader is closed meanwhile.
+        while not self._closed.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _next_chunk(self) -> bytes:
+        if self._eof:
+            return b""
+        item = self._queue.get()
+        if isinstance(item, BaseException):
+            self._eof = True
+            raise item
+        if not item:
+            self._eof = True
+        return item
+
+    def read(self, size: int | None = -1) -> bytes:
+        if size is None or size < 0:
+            data = self._buffer + b"".join(iter(self._next_chunk, b""))
+            self._buffer = b""
+            return data
+        if not self._buffer:
+            self._buffer = self._next_chunk()
+        # Returns at most one chunk at a time, like a raw read.
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def close(self):
+        self._closed.set()
+        self._thread.join()
+        self.raw.close()
+
+    def __enter__(self) -> ThreadedReader:
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
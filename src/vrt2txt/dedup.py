@@ -0,0 +1,392 @@
+"""Deduplication of the sentences or paragraphs of the converted text.
+
+Each emitted sentence (or paragraph) is hashed into a 64-bit fingerprint, and
+the fingerprints are kept in an index instead of the texts. The index is one
+of
+
+- `HashSet`: an open addressing table of the fingerprints in memory, 8 bytes
+  per slot. The table is kept between 1/3 and 2/3 full (it is doubled when it
+  gets fuller), which is 12 to 24 bytes per item. Can be saved and loaded.
+- `DiskHashSet`: the fingerprints in an SQLite database, for corpora whose
+  fingerprints do not fit into memory, or for deduplicating across runs.
+- `BloomFilter`: a fixed amount of bits (about 1.8 bytes per item for a 0.1 %
+  false positive rate), in memory or in a memory-mapped file. Unlike the
+  others, it can drop an item which was not seen before (a false positive).
+
+Two different texts get the same fingerprint with a probability of about
+n² / 2⁶⁵ for n items (about 3 in 10⁶ for 10⁷ items).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import math
+import mmap
+import os
+import typing
+from array import array
+from pathlib import Path
+
+from .compression import open_binary
+
+if typing.TYPE_CHECKING:
+    from typing import Protocol
+
+    class DedupIndex(Protocol):
+        def add(self, key: int) -> bool: ...
+
+        def __contains__(self, key: int) -> bool: ...
+
+        def close(self): ...
+
+
+# What is deduplicated: each sentence, or each paragraph as a whole.
+DEDUP_UNITS = ("sentence", "paragraph")
+
+# The header of the files written by `HashSet.save`.
+_HASH_SET_MAGIC = b"vrt2txt-hashes\n"
+# The header of the files of `BloomFilter`, followed by the number of bits
+# and the number of hashes.
+_BLOOM_MAGIC = b"vrt2txt-bloom\n\0\0"
+_BLOOM_HEADER_SIZE = len(_BLOOM_MAGIC) + 16
+
+# Slots of `HashSet` (an empty slot is 0).
+_EMPTY = 0
+
+
+class Deduplicator:
+    """Drops the sentences (or paragraphs) which were already emitted. Pass it
+    to the conversion functions as `dedup`, and keep it for all the files of a
+    corpus to deduplicate across the files.
+
+    The sentences and paragraphs are compared exactly as they are emitted
+    (after the detokenization). With `unit="sentence"`, the sentences of a
+    paragraph are deduplicated one by one, and a paragraph left without
+    sentences is left out. With the skip-document error policy, the items of
+    the rejected documents do not count as seen.
+
+    Parameters
+    ----------
+    unit : str, optional
+        "sentence" (default) or "paragraph". Paragraphs can be deduplicated
+        only when converting with `paragraphs=True`.
+    index : HashSet | DiskHashSet | BloomFilter | None, optional
+        The index of the seen items. By default, a new `HashSet`.
+
+    Attributes
+    ----------
+    items : int
+        The number of sentences (or paragraphs) checked.
+    dropped : int
+        The number of dropped duplicates.
+
+    Examples
+    --------
+    >>> with Deduplicator(index=DiskHashSet("seen.sqlite")) as dedup:
+    ...     for file in files:
+    ...         convert(file, get_output(file), dedup=dedup)
+    >>> dedup.dropped
+    1234
+    """
+
+    def __init__(self, unit="sentence", index: DedupIndex | None = None):
+        if unit not in DEDUP_UNITS:
+            raise ValueError(
+                f"Unknown unit {unit!r}, expected one of {', '.join(DEDUP_UNITS)}"
+            )
+        self.unit = unit
+        self.index: DedupIndex = HashSet() if index is None else index
+        self.items = 0
+        self.dropped = 0
+        # The fingerprints of the document being converted with the
+        # skip-document error policy. Added to the index at the end of the
+        # document.
+        self._pending: set[int] | None = None
+
+    def close(self):
+        """Closes the index (see `DiskHashSet` and `BloomFilter`)."""
+        self.index.close()
+
+    def __enter__(self) -> Deduplicator:
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __repr__(self) -> str:
+        return (
+            f"Deduplicator(unit={self.unit!r}, items={self.items}, "
+            f"dropped={self.dropped})"
+        )
+
+    def _is_duplicate(self, text: str) -> bool:
+        """Checks whether the text was seen, and marks it as seen."""
+        self.items += 1
+        key = get_fingerprint(text)
+        pending = self._pending
+        if pending is None:
+            if self.index.add(key):
+                return False
+        elif key not in pending and key not in self.index:
+            pending.add(key)
+            return False
+        self.dropped += 1
+        return True
+
+    def _start_document(self):
+        self._pending = set()
+
+    def _end_document(self):
+        if self._pending is not None:
+            for key in self._pending:
+                self.index.add(key)
+        self._pending = None
+
+    def _reject_document(self):
+        self._pending = None
+
+
+def get_fingerprint(text: str) -> int:
+    """Returns the 64-bit fingerprint of a text. It is the same in all
+    processes and runs (unlike `hash`)."""
+    digest = hashlib.blake2b(
+        text.encode("utf-8", "surrogatepass"), digest_size=8
+    ).digest()
+    return int.from_bytes(digest, "little")
+
+
+class HashSet:
+    """A set of 64-bit fingerprints in an open addressing table (linear
+    probing), which is kept at most 2/3 full and doubled when needed.
+
+    Parameters
+    ----------
+    capacity : int, optional
+        The number of items to reserve space for, by default 65536.
+    """
+
+    def __init__(self, capacity: int = 64 * 1024):
+        size = 1 << max(3, math.ceil(math.log2(capacity * 3 / 2 + 1)))
+        self._slots = array("Q", bytes(8 * size))
+        self._mask = size - 1
+        self._count = 0
+
+    def add(self, key: int) -> bool:
+        """Adds a fingerprint. Returns True if it was not in the set."""
+        key = key or 1
+        slots = self._slots
+        mask = self._mask
+        i = key & mask
+        while True:
+            slot = slots[i]
+            if slot == _EMPTY:
+                break
+            if slot == key:
+                return False
+            i = (i + 1) & mask
+        slots[i] = key
+        self._count += 1
+        if 3 * self._count > 2 * len(slots):
+            self._resize(2 * len(slots))
+        return True
+
+    def __contains__(self, key: int) -> bool:
+        key = key or 1
+        slots = self._slots
+        mask = self._mask
+        i = key & mask
+        while True:
+            slot = slots[i]
+            if slot == _EMPTY:
+                return False
+            if slot == key:
+                return True
+            i = (i + 1) & mask
+
+    def __len__(self) -> int:
+        return self._count
+
+    def close(self):
+        pass
+
+    def save(self, file: str | os.PathLike):
+        """Saves the fingerprints (8 bytes each), compressed if the path ends
+        with .gz, .bz2 or .xz."""
+        keys = array("Q", (slot for slot in self._slots if slot != _EMPTY))
+        if keys.itemsize != 8:  # pragma: no cover
+            raise ValueError("64-bit integers are not supported on this platform")
+        with open_binary(file, "wb") as f:
+            f.write(_HASH_SET_MAGIC)
+            f.write(keys.tobytes())
+
+    @classmethod
+    def load(cls, file: str | os.PathLike) -> HashSet:
+        """Loads the fingerprints saved with `save`."""
+        with open_binary(file) as f:
+            if f.read(len(_HASH_SET_MAGIC)) != _HASH_SET_MAGIC:
+                raise ValueError(f"Not a fingerprint file: {file}")
+            keys = array("Q", f.read())
+        hash_set = cls(len(keys))
+        for key in keys:
+            hash_set.add(key)
+        return hash_set
+
+    def _resize(self, size: int):
+        keys = [slot for slot in self._slots if slot != _EMPTY]
+        self._slots = array("Q", bytes(8 * size))
+        self._mask = size - 1
+        self._count = 0
+        for key in keys:
+            self.add(key)
+
+
+class DiskHashSet:
+    """A set of 64-bit fingerprints in an SQLite database. The database is
+    created if it does not exist, and the fingerprints of the earlier runs are
+    kept. Close the set (or the `Deduplicator`) to commit the last additions.
+
+    Parameters
+    ----------
+    path : str | os.PathLike
+        The database file.
+    commit_every : int, optional
+        Commits the additions after this many new fingerprints, by default
+        100000.
+    """
+
+    def __init__(self, path: str | os.PathLike, commit_every: int = 100_000):
+        # Imported here, as the module is slow to import and rarely needed.
+        import sqlite3
+
+        self.path = Path(path)
+        self.commit_every = commit_every
+        self._db = sqlite3.connect(self.path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS fingerprints "
+            "(fingerprint INTEGER PRIMARY KEY) WITHOUT ROWID"
+        )
+        self._uncommitted = 0
+
+    def add(self, key: int) -> bool:
+        """Adds a fingerprint. Returns True if it was not in the set."""
+        cursor = self._db.execute(
+            "INSERT OR IGNORE INTO fingerprints VALUES (?)", (_to_signed(key),)
+        )
+        if cursor.rowcount != 1:
+            return False
+        self._uncommitted += 1
+        if self._uncommitted >= self.commit_every:
+            self._db.commit()
+            self._uncommitted = 0
+        return True
+
+    def __contains__(self, key: int) -> bool:
+        cursor = self._db.execute(
+            "SELECT 1 FROM fingerprints WHERE fingerprint = ?", (_to_signed(key),)
+        )
+        return cursor.fetchone() is not None
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM fingerprints").fetchone()[0]
+
+    def close(self):
+        """Commits the additions and closes the database."""
+        self._db.commit()
+        self._db.close()
+
+
+class BloomFilter:
+    """A Bloom filter of the fingerprints: a fixed amount of memory, but a
+    small fraction of the new items are reported as seen.
+
+    Parameters
+    ----------
+    capacity : int
+        The number of items the filter is sized for.
+    error_rate : float, optional
+        The probability of a false positive when the filter has `capacity`
+        items, by default 0.001.
+    path : str | os.PathLike | None, optional
+        If given, the bits are kept in this file (memory-mapped), and the file
+        is reused if it exists. The size of an existing filter is read from
+        the file, and `capacity` and `error_rate` are ignored.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        error_rate=0.001,
+        path: str | os.PathLike | None = None,
+    ):
+        if capacity <= 0 or not 0 < error_rate < 1:
+            raise ValueError("capacity must be positive and error_rate in (0, 1)")
+        num_bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.num_bits = (num_bits + 7) // 8 * 8
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.path = None if path is None else Path(path)
+        self._mapped: mmap.mmap | None = None
+        self._bits: bytearray | memoryview
+        if self.path is None:
+            self._bits = bytearray(self.num_bits // 8)
+        else:
+            self._bits = self._map_file(self.path)
+
+    def add(self, key: int) -> bool:
+        """Adds a fingerprint. Returns True if it was not (as far as the filter
+        knows) in the set."""
+        bits = self._bits
+        new = False
+        for position in self._get_positions(key):
+            byte = bits[position >> 3]
+            mask = 1 << (position & 7)
+            if not byte & mask:
+                bits[position >> 3] = byte | mask
+                new = True
+        return new
+
+    def __contains__(self, key: int) -> bool:
+        bits = self._bits
+        return all(
+            bits[position >> 3] & (1 << (position & 7))
+            for position in self._get_positions(key)
+        )
+
+    def close(self):
+        """Writes the bits of a file-backed filter to the file."""
+        if self._mapped is not None:
+            self._bits.release()  # type: ignore[union-attr]
+            self._mapped.flush()
+            self._mapped.close()
+            self._mapped = None
+
+    def _get_positions(self, key: int) -> list[int]:
+        # Double hashing: the positions are h1 + i * h2 for the two halves of
+        # the fingerprint.
+        first = key & 0xFFFFFFFF
+        step = (key >> 32) | 1
+        num_bits = self.num_bits
+        return [(first + i * step) % num_bits for i in range(self.num_hashes)]
+
+    def _map_file(self, path: Path) -> memoryview:
+        with open(path, "r+b" if path.exists() else "w+b") as f:
+            header = f.read(_BLOOM_HEADER_SIZE)
+            if not header:
+                f.write(_BLOOM_MAGIC)
+                f.write(self.num_bits.to_bytes(8, "little"))
+                f.write(self.num_hashes.to_bytes(8, "little"))
+                f.truncate(_BLOOM_HEADER_SIZE + self.num_bits // 8)
+            elif header.startswith(_BLOOM_MAGIC):
+                self.num_bits = int.from_bytes(header[-16:-8], "little")
+                self.num_hashes = int.from_bytes(header[-8:], "little")
+            else:
+                raise ValueError(f"Not a Bloom filter file: {path}")
+            # The map stays valid after the file is closed.
+            self._mapped = mmap.mmap(f.fileno(), 0)
+        # The bits follow the header (the offset of a map must be a multiple
+        # of the page size).
+        return memoryview(self._mapped)[_BLOOM_HEADER_SIZE:]
+
+
+def _to_signed(key: int) -> int:
+    """SQLite integers are signed."""
+    return key - (1 << 64) if key >= 1 << 63 else key
@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import re
+import typing
+
+from .entities import VRT_ENTITIES
+
+if typing.TYPE_CHECKING:
+    from typing import Any, Callable, Iterable
+
+    DocumentFilter = Callable[["Document"], bool]
+
+# The top-level structures of VRT files: <file> in OpenSubtitles, <doc> in
+# Wikipedia and <text> in many other Kielipankki corpora.
+DOCUMENT_TAGS = ("file", "doc", "text")
+
+_TAG_NAME = re.compile(r"<([\w.:-]+)")
+_ATTRIBUTE = re.compile(r'([\w.:-]+)\s*=\s*"([^"]*)"')
+_CONDITION = re.compile(r"^\s*([\w.:-]+)\s*(!=|>=|<=|!~|=|~|>|<)(.*)$")
+
+# The entities used in the attribute values of VRT. Values with other entities
+# are decoded with html.unescape, whose module (with a table of over 2000
+# entities) is imported only then.
+_VRT_ENTITY = re.compile("|".join(VRT_ENTITIES))
+
+
+class Document:
+    """A document of a VRT file, i.e. a top-level structure such as <file> or
+    <doc>, with its attributes.
+
+    Parameters
+    ----------
+    tag : str
+        The name of the structure, e.g. "doc". Empty for text outside of the
+        documents.
+    attributes : dict[str, str] | None, optional
+        The attributes of the structure, e.g. {"id": "123", "title": "Foo"}.
+    text : str, optional
+        The text of the document. Only set by `iter_vrt_documents`.
+    """
+
+    def __init__(self, tag: str, attributes: dict[str, str] | None = None, text=""):
+        self.tag = tag
+        self.attributes = attributes or {}
+        self.text = text
+
+    @classmethod
+    def from_tag(cls, tag: str) -> Document:
+        """Creates the document from its opening tag, like
+        <doc id="123" url="https://fi.wikipedia.org/wiki?curid=123" title="Foo">
+        """
+        match = _TAG_NAME.match(tag.strip())
+        if match is None:
+            raise ValueError(f'Not an opening tag: "{tag}"')
+        return cls(match.group(1), parse_attributes(tag))
+
+    def get(self, name: str, default: str | None = None) -> str | None:
+        """Returns the value of an attribute, or `default` if it is missing."""
+        return self.attributes.get(name, default)
+
+    def __repr__(self) -> str:
+        return f"Document(tag={self.tag!r}, attributes={self.attributes!r})"
+
+
+def parse_attributes(tag: str) -> dict[str, str]:
+    """Parses the attributes of a structural tag. The values are unescaped.
+
+    Examples
+    --------
+    >>> parse_attributes('<file id="20018" year="2001" genre="Comedy">')
+    {'id': '20018', 'year': '2001', 'genre': 'Comedy'}
+    """
+    return {
+        name: _unescape_attribute(value) if "&" in value else value
+        for name, value in _ATTRIBUTE.findall(tag)
+    }
+
+
+def _unescape_attribute(value: str) -> str:
+    """Decodes the entities of an attribute value like `html.unescape`."""
+    entities = _VRT_ENTITY.findall(value)
+    if len(entities) == value.count("&"):
+        # Only the entities of VRT, each decoded once (no "&amp;lt;" -> "<").
+        return _VRT_ENTITY.sub(lambda match: VRT_ENTITIES[match.group()], value)
+    import html
+
+    return html.unescape(value)
+
+
+class AttributeFilter:
+    """A document filter which accepts the documents whose attributes match
+    all the given conditions. A condition is an expression "<name><op><value>",
+    where op is one of
+
+        =   equal                   != not equal
+        ~   contains                !~ does not contain
+        >   greater than (numbers)  >= greater than or equal (numbers)
+        <   less than (numbers)     <= less than or equal (numbers)
+
+    Documents without the attribute never match, and numeric conditions do not
+    match values which are not numbers. Keyword arguments are equality
+    conditions.
+
+    Examples
+    --------
+    >>> comedies = AttributeFilter("year>2010", "genre~Comedy", country="USA")
+    """
+
+    def __init__(self, *expressions: str, **values: str):
+        self.conditions: list[tuple[str, str, str]] = [
+            _parse_condition(expression) for expression in expressions
+        ]
+        self.conditions.extend((name, "=", value) for name, value in values.items())
+
+    def __call__(self, document: Document) -> bool:
+        attributes = document.attributes
+        for name, op, value in self.conditions:
+            actual = attributes.get(name)
+            if actual is None or not _compare(actual, op, value):
+                return False
+        return True
+
+    def __repr__(self) -> str:
+        expressions = ", ".join(repr(f"{n}{op}{v}") for n, op, v in self.conditions)
+        return f"AttributeFilter({expressions})"
+
+
+def _parse_condition(expression: str) -> tuple[str, str, str]:
+    match = _CONDITION.match(expression)
+    if match is None:
+        raise ValueError(f'Invalid condition: "{expression}"')
+    name, op, value = match.groups()
+    if op in {">", ">=", "<", "<="}:
+        # Checked here, so that a typo is not silently a filter matching nothing.
+        try:
+            float(value)
+        except ValueError:
+            raise ValueError(f'Expected a number in "{expression}"') from None
+    return name, op, value.strip()
+
+
+def _compare(actual: str, op: str, value: str) -> bool:
+    if op == "=":
+        return actual == value
+    if op == "!=":
+        return actual != value
+    if op == "~":
+        return value in actual
+    if op == "!~":
+        return value not in actual
+    try:
+        number = float(actual)
+    except ValueError:
+        return False
+    if op == ">":
+        return number > float(value)
+    if op == ">=":
+        return number >= float(value)
+    if op == "<":
+        return number < float(value)
+    return number <= float(value)
+
+
+def _get_openings(document_tags: Iterable[str], encoding: str | None) -> tuple:
+    openings = tuple(f"<{tag}{end}" for tag in document_tags for end in " \t>")
+    if encoding is None:
+        return openings
+    return tuple(opening.encode(encoding) for opening in openings)
+
+
+def _filter_document_lines(
+    lines: Iterable[Any],
+    document_filter: DocumentFilter,
+    document_tags: Iterable[str] = DOCUMENT_TAGS,
+    encoding: str | None = None,
+) -> Iterable[Any]:
+    """Leaves out the lines of the documents rejected by `document_filter`.
+    The lines of a rejected document are only searched for its closing tag.
+    The lines are bytes if `encoding` is given (see `_iter_vrt_lines`)."""
+    openings = _get_openings(document_tags, encoding)
+    lines = iter(lines)
+    for line in lines:
+        head = line.lstrip()
+        if head.startswith(openings):
+            tag = head if encoding is None else head.decode(encoding)
+            document = Document.from_tag(tag)
+            if not document_filter(document):
+                closing: Any = f"</{document.tag}>"
+                if encoding is not None:
+                    closing = closing.encode(encoding)
+                for line in lines:
+                    if closing in line and line.strip() == closing:
+                        break
+                continue
+        yield line
+
+
+def _iter_document_groups(
+    lines: Iterable[Any],
+    document_filter: DocumentFilter | None = None,
+    document_tags: Iterable[str] = DOCUMENT_TAGS,
+    encoding: str | None = None,
+) -> Iterable[tuple[Document | None, list[Any]]]:
+    """Groups the lines by document. Yields (document, lines) for each
+    document accepted by `document_filter`, and (None, lines) for the lines
+    between the documents. The lines of a document include its opening and
+    closing tags."""
+    openings = _get_openings(document_tags, encoding)
+    document: Document | None = None
+    closing: Any = None
+    group: list[Any] = []
+    lines = iter(lines)
+    for line in lines:
+        if document is None:
+            head = line.lstrip()
+            if head.startswith(openings):
+                if group:
+                    yield None, group
+                    group = []
+                tag = head if encoding is None else head.decode(encoding)
+                document = Document.from_tag(tag)
+                closing = f"</{document.tag}>"
+                if encoding is not None:
+                    closing = closing.encode(encoding)
+                if document_filter is not None and not document_filter(document):
+                    for line in lines:
+                        if closing in line and line.strip() == closing:
+                            break
+                    document = None
+                    continue
+                group = [line]
+                continue
+            group.append(line)
+        else:
+            group.append(line)
+            if closing in line and line.strip() == closing:
+                yield document, group
+                document = None
+                group = []
+    if group:
+        yield document, group
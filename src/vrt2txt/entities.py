@@ -0,0 +1,17 @@
+"""The character entities of VRT, shared by the words and the attribute values
+of the structures."""
+
+from __future__ import annotations
+
+# The characters escaped in VRT (https://www.kielipankki.fi/support/vrt-format/)
+# by their entities. &amp; is the last, as it must be decoded last: e.g.
+# "&amp;lt;" is "&lt;".
+VRT_ENTITIES = {"&lt;": "<", "&gt;": ">", "&quot;": '"', "&apos;": "'", "&amp;": "&"}
+
+
+def unescape_vrt(text: str) -> str:
+    """Decodes the entities used in VRT (&amp;, &lt;, &gt;, &quot; and &apos;).
+    Other HTML entities are left as they are."""
+    for entity, character in VRT_ENTITIES.items():
+        text = text.replace(entity, character)
+    return text
@@ -0,0 +1,135 @@
+"""Error policies for malformed input, and the log of the rejected input."""
+
+from __future__ import annotations
+
+import json
+import typing
+
+if typing.TYPE_CHECKING:
+    from typing import IO, Any, Iterable, Iterator
+
+# What to do on malformed input:
+#   strict          raise ValueError (the default)
+#   skip-line       leave out the malformed line
+#   skip-sentence   leave out the sentence with the malformed line
+#   skip-document   leave out the document (<file>, <doc> or <text>) with the
+#                   malformed line. Outside of documents, like skip-sentence.
+# A paragraph without sentences is left out by all but the strict policy.
+ERROR_POLICIES = ("strict", "skip-line", "skip-sentence", "skip-document")
+
+# How many of the rejected lines are kept in `RejectLog.records`.
+DEFAULT_MAX_RECORDS = 1000
+
+
+class RejectLog:
+    """Counts and records the malformed input skipped by a lenient error
+    policy (see `ERROR_POLICIES`).
+
+    Each rejection is recorded as a dictionary with the number of the line
+    ("line", 1-based), the offset of the start of the line in bytes ("offset":
+    in the encoding of the input, and in UTF-8 for a string), the error
+    ("error") and what was left out ("skipped": "line", "sentence",
+    "paragraph" or "document"). In the
+    pieces of a file parsed by the worker processes of
+    `iter_vrt_file_parallel`, the line number is None.
+
+    Parameters
+    ----------
+    file : IO[str] | None, optional
+        If given, each record is written into this file as a JSON line. The
+        file is not closed by the log.
+    source : str | None, optional
+        The name of the input, added to the records as "source". Can be changed
+        between the inputs.
+    max_records : int, optional
+        The maximum number of records kept in `records`, by default 1000. The
+        counters and the file include all the rejections.
+
+    Attributes
+    ----------
+    lines, sentences, paragraphs, documents : int
+        The number of skipped lines, sentences, paragraphs and documents.
+    records : list[dict]
+        The first `max_records` records.
+    """
+
+    def __init__(
+        self,
+        file: IO[str] | None = None,
+        source: str | None = None,
+        max_records=DEFAULT_MAX_RECORDS,
+    ):
+        self.file = file
+        self.source = source
+        self.max_records = max_records
+        self.lines = 0
+        self.sentences = 0
+        self.paragraphs = 0
+        self.documents = 0
+        self.records: list[dict[str, Any]] = []
+        # The position of the line being parsed.
+        self._line_number = 0
+        self._offset = 0
+        self._next_offset = 0
+
+    @property
+    def errors(self) -> int:
+        """The total number of rejections."""
+        return self.lines + self.sentences + self.paragraphs + self.documents
+
+    def record(self, error: str, skipped: str, line: int | None, offset: int | None):
+        """Records a rejection."""
+        setattr(self, f"{skipped}s", getattr(self, f"{skipped}s") + 1)
+        self._add(
+            {
+                "source": self.source,
+                "line": line,
+                "offset": offset,
+                "error": error,
+                "skipped": skipped,
+            }
+        )
+
+    def merge(self, other: RejectLog):
+        """Adds the rejections of another log, e.g. of a worker process. The
+        records without a source get the source of this log."""
+        for name in ("lines", "sentences", "paragraphs", "documents"):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        for entry in other.records:
+            self._add({**entry, "source": entry["source"] or self.source})
+
+    def __repr__(self) -> str:
+        return (
+            f"RejectLog(lines={self.lines}, sentences={self.sentences}, "
+            f"paragraphs={self.paragraphs}, documents={self.documents})"
+        )
+
+    def _add(self, entry: dict[str, Any]):
+        if len(self.records) < self.max_records:
+            self.records.append(entry)
+        if self.file is not None:
+            self.file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def _reject(self, error: str, skipped: str):
+        """Records a rejection at the line being parsed."""
+        self.record(error, skipped, self._line_number, self._offset)
+
+    def _track(self, lines: Iterable[tuple[Any, int]]) -> Iterator[Any]:
+        """Tracks the position of the line being parsed, from the start of
+        `lines`. Takes the lines with their sizes in bytes (see
+        `_measure_lines`), and yields the lines."""
+        self._line_number = 0
+        self._next_offset = 0
+        for line, size in lines:
+            self._offset = self._next_offset
+            self._next_offset += size
+            self._line_number += 1
+            yield line
+
+
+def _check_error_policy(errors: str):
+    if errors not in ERROR_POLICIES:
+        raise ValueError(
+            f'Unknown error policy "{errors}". Expected one of: '
+            + ", ".join(ERROR_POLICIES)
+        )
@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import functools
+import typing
+
+from .columns import POSITIONAL_ATTRIBUTES_COMMENT
+from .documents import DOCUMENT_TAGS, _get_openings
+
+if typing.TYPE_CHECKING:
+    from typing import Any, Iterable, Sequence, Union
+
+    TagNames = Union[str, Sequence[str]]
+
+
+class StructureTags(typing.NamedTuple):
+    """The tags of a `StructureGrammar`, as str or as bytes of an encoding.
+    The openings are prefixes for `startswith` (the opening tags may have
+    attributes), and the closings are sets of whole tags."""
+
+    sentence_openings: tuple
+    sentence_closings: frozenset
+    paragraph_openings: tuple
+    paragraph_closings: frozenset
+    document_openings: tuple
+    document_closings: frozenset
+    header_start: Any
+    # The tags added around the sentences outside of paragraphs.
+    implicit_paragraph: tuple
+
+
+class StructureGrammar:
+    """The structural tags of VRT files: the documents, which contain the
+    paragraphs, which contain the sentences. The opening tags may have
+    attributes, like <sentence id="3"> or <paragraph type="heading">, and each
+    level may have several names.
+
+    The tags are built once per encoding and kept with the grammar, so the
+    same grammar can be used for any number of files. Grammars can be pickled,
+    e.g. for worker processes.
+
+    Parameters
+    ----------
+    sentence_tags : str | Sequence[str], optional
+        The name (or the names) of the sentence structure, by default
+        "sentence".
+    paragraph_tags : str | Sequence[str], optional
+        The name (or the names) of the paragraph structure, by default
+        "paragraph".
+    document_tags : Sequence[str], optional
+        The names of the structures which are documents, by default "file",
+        "doc" and "text".
+    optional_paragraphs : bool, optional
+        If True, the paragraph level is optional: when converting paragraphs,
+        a run of sentences outside of paragraphs forms a paragraph, which ends
+        at the next paragraph or document tag. By default, such sentences are
+        left out.
+
+    Examples
+    --------
+    >>> grammar = StructureGrammar(("s", "sentence"), "p", optional_paragraphs=True)
+    >>> list(iter_vrt_xml(contents, paragraphs=True, grammar=grammar))
+    """
+
+    def __init__(
+        self,
+        sentence_tags: TagNames = "sentence",
+        paragraph_tags: TagNames = "paragraph",
+        document_tags: Sequence[str] = DOCUMENT_TAGS,
+        optional_paragraphs=False,
+    ):
+        self.sentence_tags = _get_names(sentence_tags)
+        self.paragraph_tags = _get_names(paragraph_tags)
+        self.document_tags = _get_names(document_tags)
+        if not self.sentence_tags or not self.paragraph_tags:
+            raise ValueError("The sentence and paragraph tags must be given")
+        self.optional_paragraphs = optional_paragraphs
+        self._tags: dict[str | None, StructureTags] = {}
+
+    def get_tags(self, encoding: str | None = None) -> StructureTags:
+        """Returns the tags as str, or as bytes if `encoding` is given."""
+        tags = self._tags.get(encoding)
+        if tags is None:
+            tags = self._tags[encoding] = self._build_tags(encoding)
+        return tags
+
+    def get_boundaries(self, paragraphs: bool) -> tuple[str, ...]:
+        """Returns the names of the structures after whose closing tags the
+        input can be split into pieces which are converted separately: the
+        paragraphs (and the documents, which end the implicit paragraphs), or
+        the sentences if `paragraphs` is False."""
+        if not paragraphs:
+            return self.sentence_tags
+        if self.optional_paragraphs:
+            return self.paragraph_tags + self.document_tags
+        return self.paragraph_tags
+
+    def _build_tags(self, encoding: str | None) -> StructureTags:
+        def get_closings(names: Sequence[str]) -> frozenset:
+            return frozenset(encode(f"</{name}>") for name in names)
+
+        def encode(tag: str) -> Any:
+            return tag if encoding is None else tag.encode(encoding)
+
+        paragraph_tag = self.paragraph_tags[0]
+        return StructureTags(
+            sentence_openings=_get_openings(self.sentence_tags, encoding),
+            sentence_closings=get_closings(self.sentence_tags),
+            paragraph_openings=_get_openings(self.paragraph_tags, encoding),
+            paragraph_closings=get_closings(self.paragraph_tags),
+            document_openings=_get_openings(self.document_tags, encoding),
+            document_closings=get_closings(self.document_tags),
+            header_start=encode(POSITIONAL_ATTRIBUTES_COMMENT),
+            implicit_paragraph=(
+                encode(f"<{paragraph_tag}>"),
+                encode(f"</{paragraph_tag}>"),
+            ),
+        )
+
+    def __getstate__(self) -> dict[str, Any]:
+        # The tags are built again after unpickling.
+        return {**self.__dict__, "_tags": {}}
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, StructureGrammar):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __hash__(self) -> int:
+        return hash(self._key())
+
+    def _key(self) -> tuple:
+        return (
+            self.sentence_tags,
+            self.paragraph_tags,
+            self.document_tags,
+            self.optional_paragraphs,
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"StructureGrammar(sentence_tags={self.sentence_tags!r}, "
+            f"paragraph_tags={self.paragraph_tags!r}, "
+            f"document_tags={self.document_tags!r}, "
+            f"optional_paragraphs={self.optional_paragraphs!r})"
+        )
+
+
+@functools.lru_cache(maxsize=32)
+def get_grammar(
+    sentence_tag: TagNames = "sentence", paragraph_tag: TagNames = "paragraph"
+) -> StructureGrammar:
+    """Returns the grammar of the given sentence and paragraph tags. The
+    grammars are cached, so converting many small files does not build the
+    tags again for each file."""
+    return StructureGrammar(sentence_tag, paragraph_tag)
+
+
+def _get_names(names: TagNames) -> tuple[str, ...]:
+    return (names,) if isinstance(names, str) else tuple(names)
+
+
+def _add_implicit_paragraphs(
+    lines: Iterable[Any], tags: StructureTags
+) -> Iterable[Any]:
+    """Adds the paragraph tags around the runs of sentences outside of
+    paragraphs (see `StructureGrammar.optional_paragraphs`). The lines are str
+    or bytes, like the tags."""
+    paragraph_start, paragraph_end = tags.implicit_paragraph
+    tag_start = paragraph_start[:1]
+    sentence_openings = tags.sentence_openings
+    paragraph_openings = tags.paragraph_openings
+    paragraph_closings = tags.paragraph_closings
+    document_openings = tags.document_openings
+    document_closings = tags.document_closings
+    in_paragraph = False
+    implicit = False
+    for line in lines:
+        head = line.lstrip()
+        if head.startswith(tag_start):
+            tag = head.rstrip()
+            if tag.startswith(sentence_openings):
+                if not in_paragraph:
+                    yield paragraph_start
+                    in_paragraph = implicit = True
+            elif tag.startswith(paragraph_openings):
+                if implicit:
+                    yield paragraph_end
+                    implicit = False
+                in_paragraph = True
+            elif tag in paragraph_closings:
+                in_paragraph = False
+            elif implicit and (
+                tag.startswith(document_openings) or tag in document_closings
+            ):
+                yield paragraph_end
+                in_paragraph = implicit = False
+        yield line
+    if implicit:
+        yield paragraph_end
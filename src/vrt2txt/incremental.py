@@ -0,0 +1,379 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import typing
+import zipfile
+from pathlib import Path
+
+from .columns import DEFAULT_COLUMNS, read_columns
+from .compression import ZipMember, get_compression, get_text_name
+from .grammar import get_grammar
+from .parallel import (
+    _convert_file,
+    _convert_piece,
+    _iter_piece_offsets,
+    _list_folder,
+    _map_ordered,
+)
+
+if typing.TYPE_CHECKING:
+    from typing import Any
+
+    from .cache import TokenCache
+    from .columns import Columns
+    from .documents import DocumentFilter
+
+# The manifest file in the output folder.
+MANIFEST_NAME = "vrt2txt-manifest.json"
+# Suffix of the checkpoint file of a text file which is being written.
+CHECKPOINT_SUFFIX = ".checkpoint"
+# Approximate amount of input (in bytes) converted between two checkpoints.
+DEFAULT_CHECKPOINT_SIZE = 64 * 1024 * 1024
+
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+
+class Manifest:
+    """The record of the text files converted into an output folder. For each
+    text file, the manifest has the state of the input file (size,
+    modification time and hash), the conversion options, and the size and
+    checksum of the text file. It is saved as JSON in the output folder.
+
+    Parameters
+    ----------
+    path : str | os.PathLike
+        Path to the manifest file.
+    entries : dict[str, dict] | None, optional
+        The entries by the name of the text file.
+    """
+
+    def __init__(self, path: str | os.PathLike, entries: dict | None = None):
+        self.path = Path(path)
+        self.entries: dict[str, dict[str, Any]] = entries or {}
+
+    @classmethod
+    def load(cls, folder_out: str | os.PathLike) -> Manifest:
+        """Loads the manifest of an output folder. A missing manifest is
+        empty."""
+        path = Path(folder_out) / MANIFEST_NAME
+        try:
+            with open(path, encoding="utf-8") as f:
+                entries = json.load(f)["files"]
+        except FileNotFoundError:
+            entries = {}
+        return cls(path, entries)
+
+    def save(self):
+        """Saves the manifest. The file is replaced atomically, so a crash
+        never leaves a partially written manifest."""
+        temporary = self.path.with_name(self.path.name + ".tmp")
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump({"files": self.entries}, f, indent=1, sort_keys=True)
+        os.replace(temporary, self.path)
+
+    def is_up_to_date(
+        self,
+        file: Path | ZipMember,
+        file_out: Path,
+        fingerprint: str,
+        verify=False,
+    ) -> bool:
+        """Tells whether `file_out` was converted from the current contents of
+        `file` with the same options. The input is hashed only if its
+        modification time has changed. If `verify` is True, the checksum of
+        the text file is checked too."""
+        entry = self.entries.get(file_out.name)
+        if entry is None or entry["options"] != fingerprint:
+            return False
+        try:
+            if os.path.getsize(file_out) != entry["output_size"]:
+                return False
+        except OSError:
+            return False
+        if verify and _hash_file(file_out) != entry["output_checksum"]:
+            return False
+
+        state = _get_input_state(file)
+        if state == entry["input"]:
+            return True
+        # The modification time changes also when a file is copied or touched.
+        if (
+            isinstance(file, Path)
+            and state["size"] == entry["input"]["size"]
+            and _hash_file(file) == entry["hash"]
+        ):
+            entry["input"] = state
+            return True
+        return False
+
+    def record(self, file_out: Path, entry: dict[str, Any]):
+        """Records the entry of a converted text file."""
+        self.entries[file_out.name] = entry
+
+
+def convert_incremental(
+    file: Path | ZipMember,
+    file_out: Path,
+    manifest: Manifest,
+    sentence_tag="sentence",
+    paragraph_tag="paragraph",
+    paragraphs=False,
+    html_entities=False,
+    columns: Columns | None = None,
+    cache: TokenCache | None = None,
+    document_filter: DocumentFilter | None = None,
+    encoding="utf-8",
+    checkpoint_size: int = DEFAULT_CHECKPOINT_SIZE,
+    verify=False,
+) -> bool:
+    """Converts a VRT file into a text file, unless the manifest tells that the
+    text file is up to date. A conversion which was interrupted is resumed
+    from its last checkpoint. The manifest is saved after the conversion.
+
+    Parameters
+    ----------
+    file : Path | ZipMember
+        The VRT file.
+    file_out : Path
+        The text file. Compressed if the name ends with .gz, .bz2 or .xz.
+    manifest : Manifest
+        The manifest of the output folder.
+    sentence_tag, paragraph_tag, paragraphs, html_entities, columns, cache,
+    document_filter
+        See `iter_vrt_xml`.
+    encoding : str, optional
+        The encoding of the input and output files, by default "utf-8".
+    checkpoint_size : int, optional
+        A checkpoint is saved after about every `checkpoint_size` bytes of
+        input, by default 64 MiB. Only plain (uncompressed) files without a
+        `document_filter` can be resumed in the middle; other files are
+        converted from the beginning.
+    verify : bool, optional
+        If True, the checksum of an existing text file is verified before it
+        is considered up to date.
+
+    Returns
+    -------
+    bool
+        True if the file was converted, False if it was up to date.
+    """
+    options = dict(
+        sentence_tag=sentence_tag,
+        paragraph_tag=paragraph_tag,
+        paragraphs=paragraphs,
+        html_entities=html_entities,
+        columns=columns,
+        cache=cache,
+        document_filter=document_filter,
+    )
+    fingerprint = _get_fingerprint(options, encoding)
+    if manifest.is_up_to_date(file, file_out, fingerprint, verify):
+        manifest.save()
+        return False
+    entry = _convert_checkpointed(
+        (file, file_out, encoding, options, fingerprint, checkpoint_size)
+    )
+    manifest.record(file_out, entry)
+    manifest.save()
+    return True
+
+
+def convert_folder_incremental(
+    folder: str | os.PathLike,
+    folder_out: str | os.PathLike,
+    pattern="*.VRT",
+    sentence_tag="sentence",
+    paragraph_tag="paragraph",
+    paragraphs=False,
+    html_entities=False,
+    columns: Columns | None = None,
+    cache: TokenCache | None = None,
+    document_filter: DocumentFilter | None = None,
+    workers: int | None = None,
+    encoding="utf-8",
+    compression: str | None = None,
+    checkpoint_size: int = DEFAULT_CHECKPOINT_SIZE,
+    verify=False,
+) -> list[Path]:
+    """Like `convert_folder`, but converts only the files which have changed
+    since the previous run, and resumes the files whose conversion was
+    interrupted. The state is kept in a manifest file in `folder_out`, which
+    is saved after each converted file. See `convert_incremental` for
+    `checkpoint_size` and `verify`, and `convert_folder` for the other
+    parameters.
+
+    Returns
+    -------
+    list[Path]
+        The text files which were converted, in the order of the sorted input
+        files. The other text files were up to date.
+    """
+    folder_out = Path(folder_out)
+    folder_out.mkdir(exist_ok=True, parents=True)
+    options = dict(
+        sentence_tag=sentence_tag,
+        paragraph_tag=paragraph_tag,
+        paragraphs=paragraphs,
+        html_entities=html_entities,
+        columns=columns,
+        cache=cache,
+        document_filter=document_filter,
+    )
+    fingerprint = _get_fingerprint(options, encoding)
+    manifest = Manifest.load(folder_out)
+    jobs = []
+    for file in _list_folder(folder, pattern):
+        file_out = folder_out / get_text_name(str(file), compression)
+        if not manifest.is_up_to_date(file, file_out, fingerprint, verify):
+            jobs.append(
+                (file, file_out, encoding, options, fingerprint, checkpoint_size)
+            )
+
+    converted = []
+    for (_, file_out, *_), entry in zip(
+        jobs, _map_ordered(_convert_checkpointed, jobs, workers)
+    ):
+        manifest.record(file_out, entry)
+        manifest.save()
+        converted.append(file_out)
+    # Saves the updated modification times of the files which were touched.
+    manifest.save()
+    return converted
+
+
+def _convert_checkpointed(
+    args: tuple[Path | ZipMember, Path, str, dict[str, Any], str, int],
+) -> dict[str, Any]:
+    """Converts a file and returns its manifest entry."""
+    file, file_out, encoding, options, fingerprint, checkpoint_size = args
+    # The state before the conversion: if the file changes meanwhile, it is
+    # converted again on the next run.
+    state = _get_input_state(file)
+    if (
+        isinstance(file, ZipMember)
+        or get_compression(file)
+        or get_compression(file_out)
+        or options["document_filter"] is not None
+    ):
+        # Streams cannot be resumed in the middle, and a document filter
+        # needs to see the start of each document.
+        _convert_file((file, file_out, encoding, options))
+    else:
+        _convert_in_pieces(
+            file, file_out, encoding, options, state, fingerprint, checkpoint_size
+        )
+    return {
+        "input": state,
+        "hash": _hash_file(file) if isinstance(file, Path) else None,
+        "options": fingerprint,
+        "output_size": os.path.getsize(file_out),
+        "output_checksum": _hash_file(file_out),
+    }
+
+
+def _convert_in_pieces(
+    file: Path,
+    file_out: Path,
+    encoding: str,
+    options: dict[str, Any],
+    state: dict[str, Any],
+    fingerprint: str,
+    checkpoint_size: int,
+):
+    """Converts the file one piece at a time (see `iter_vrt_file_parallel`),
+    saving a checkpoint after each piece. Resumes from a valid checkpoint."""
+    checkpoint_path = file_out.with_name(file_out.name + CHECKPOINT_SUFFIX)
+    checkpoint = {
+        "input": state,
+        "options": fingerprint,
+        "offset": 0,
+        "output_size": 0,
+        "found_sentences": False,
+    }
+    previous = _load_checkpoint(checkpoint_path)
+    if (
+        previous is not None
+        and previous["input"] == state
+        and previous["options"] == fingerprint
+        and file_out.exists()
+        and os.path.getsize(file_out) >= previous["output_size"]
+    ):
+        checkpoint = previous
+
+    paragraphs = options["paragraphs"]
+    grammar = get_grammar(options["sentence_tag"], options["paragraph_tag"])
+    closing_tag = grammar.get_boundaries(paragraphs)
+    if options["columns"] is None:
+        # Only the first piece contains the positional attributes comment.
+        columns = read_columns(file, encoding) or DEFAULT_COLUMNS
+        options = {**options, "columns": columns}
+
+    start = checkpoint["offset"]
+    with open(file_out, "r+b" if start else "wb") as out:
+        # Removes the text written after the checkpoint.
+        out.truncate(checkpoint["output_size"])
+        out.seek(checkpoint["output_size"])
+        for piece_start, end in _iter_piece_offsets(
+            file, checkpoint_size, closing_tag, start, encoding
+        ):
+            text, *_ = _convert_piece((file, piece_start, end, encoding, options))
+            if text is not None:
+                if not paragraphs and checkpoint["found_sentences"]:
+                    # The sentences of all pieces are on the same line.
+                    text = " " + text
+                checkpoint["found_sentences"] = True
+                out.write(text.encode(encoding))
+            out.flush()
+            checkpoint["offset"] = end
+            checkpoint["output_size"] = out.tell()
+            _save_checkpoint(checkpoint_path, checkpoint)
+        if not paragraphs:
+            if not checkpoint["found_sentences"]:
+                raise ValueError("Found no sentences")
+            out.write("\n".encode(encoding))
+    checkpoint_path.unlink(missing_ok=True)
+
+
+def _load_checkpoint(path: Path) -> dict[str, Any] | None:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        # A missing or broken checkpoint: the file is converted from the start.
+        return None
+
+
+def _save_checkpoint(path: Path, checkpoint: dict[str, Any]):
+    temporary = path.with_name(path.name + ".tmp")
+    with open(temporary, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(temporary, path)
+
+
+def _get_fingerprint(options: dict[str, Any], encoding: str) -> str:
+    """A string which changes when the options affecting the output change.
+    (Filters without a stable repr are never equal, which only causes extra
+    conversions.)"""
+    items = {name: repr(value) for name, value in options.items() if name != "cache"}
+    items["encoding"] = encoding
+    return json.dumps(items, sort_keys=True)
+
+
+def _get_input_state(file: Path | ZipMember) -> dict[str, Any]:
+    if isinstance(file, ZipMember):
+        with zipfile.ZipFile(file.archive) as archive:
+            info = archive.getinfo(file.name)
+        # The CRC-32 of the member is a hash of its contents.
+        return {"size": info.file_size, "crc": info.CRC}
+    stat = os.stat(file)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _hash_file(path: str | os.PathLike) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while block := f.read(_HASH_BLOCK_SIZE):
+            digest.update(block)
+    return digest.hexdigest()
@@ -0,0 +1,439 @@
+"""A sidecar index of the byte offsets of the documents, paragraphs and
+sentences of a VRT file, for random access without scanning the file.
+
+The index is built in one pass over the memory-mapped file and saved next to
+it (e.g. corpus.VRT.idx). With the index, the Nth sentence, paragraph or
+document is read by seeking straight to it, a uniform sample of sentences
+reads only the sampled sentences, and the file can be cut into shards of
+about the same size at the ends of the paragraphs (or sentences or
+documents).
+"""
+
+from __future__ import annotations
+
+import bisect
+import json
+import mmap
+import os
+import random
+import re
+import sys
+import typing
+from array import array
+from pathlib import Path
+
+from .columns import Columns, read_columns
+from .compression import get_compression
+from .documents import DOCUMENT_TAGS, Document
+from .grammar import StructureGrammar
+from .vrt2txt import _get_closing_tag, _iter_vrt_lines, _split_lines
+
+if typing.TYPE_CHECKING:
+    from typing import Any, Iterable, Sequence
+
+    from .cache import TokenCache
+
+# The suffix of the index files, added to the name of the VRT file.
+INDEX_SUFFIX = ".idx"
+
+# The levels of structures in the index.
+INDEX_LEVELS = ("document", "paragraph", "sentence")
+
+_INDEX_MAGIC = b"vrt2txt-index\n"
+_NEWLINE = ord("\n")
+_INDEX_VERSION = 1
+
+
+class VrtIndex:
+    """The byte offsets of the documents (<file>, <doc> or <text>),
+    paragraphs and sentences of a VRT file. Create it with `build_index` or
+    `open_index`.
+
+    The start of an item is the offset of its opening tag line, and the end is
+    the offset right after its closing tag line. Nested documents are part of
+    the outer one.
+
+    The file is memory-mapped when the first item is read. Close the index
+    (or use it as a context manager) to release the map.
+
+    Attributes
+    ----------
+    file : Path
+        The VRT file.
+    starts, ends : dict[str, array]
+        The start and end offsets of the items of each level ("document",
+        "paragraph" and "sentence"), in the order of the file.
+    columns : Columns | None
+        The columns from the positional attributes comment of the file.
+    """
+
+    def __init__(
+        self,
+        file: str | os.PathLike,
+        starts: dict[str, array],
+        ends: dict[str, array],
+        columns: Columns | None = None,
+        sentence_tag="sentence",
+        paragraph_tag="paragraph",
+        encoding="utf-8",
+        size=0,
+        mtime_ns=0,
+    ):
+        self.file = Path(file)
+        self.starts = starts
+        self.ends = ends
+        self.columns = columns
+        self.sentence_tag = sentence_tag
+        self.paragraph_tag = paragraph_tag
+        self.encoding = encoding
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self._file: Any = None
+        self._mapped: mmap.mmap | None = None
+
+    @property
+    def num_documents(self) -> int:
+        return len(self.starts["document"])
+
+    @property
+    def num_paragraphs(self) -> int:
+        return len(self.starts["paragraph"])
+
+    @property
+    def num_sentences(self) -> int:
+        return len(self.starts["sentence"])
+
+    def is_current(self) -> bool:
+        """Returns True if the file has not changed since it was indexed."""
+        stat = self.file.stat()
+        return (stat.st_size, stat.st_mtime_ns) == (self.size, self.mtime_ns)
+
+    def read(self, start: int, end: int) -> bytes:
+        """Reads the bytes between the offsets from the file."""
+        if self.size == 0:
+            return b""
+        if self._mapped is None:
+            self._file = open(self.file, "rb")
+            self._mapped = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mapped[start:end]
+
+    def convert_range(
+        self,
+        start: int,
+        end: int,
+        paragraphs=False,
+        html_entities=False,
+        cache: TokenCache | None = None,
+        errors="strict",
+    ) -> str:
+        """Converts the VRT between the offsets (e.g. a shard) to text, like
+        `iter_vrt_xml` would convert it. Without `paragraphs`, the sentences
+        form one paragraph, which ends with a newline."""
+        lines = _split_lines(self.read(start, end))
+        return "".join(
+            _iter_vrt_lines(
+                lines,
+                self.sentence_tag,
+                self.paragraph_tag,
+                paragraphs,
+                # The whole range is assembled as a single block.
+                block_size=sys.maxsize,
+                html_entities=html_entities,
+                columns=self.columns,
+                cache=cache,
+                encoding=self.encoding,
+                errors=errors,
+            )
+        )
+
+    def sentence(self, i: int, **options) -> str:
+        """Returns the text of the `i`th sentence (0-based). The `options` are
+        passed to `convert_range`."""
+        return self._get_text("sentence", i, options)
+
+    def paragraph(self, i: int, **options) -> str:
+        """Returns the text of the `i`th paragraph, without the newline."""
+        return self._get_text("paragraph", i, options)
+
+    def document(self, i: int, paragraphs=False, **options) -> Document:
+        """Returns the `i`th document with its attributes and text. The text is
+        formed like in `iter_vrt_documents`."""
+        start = self.starts["document"][i]
+        end = self.ends["document"][i]
+        opening = self.read(start, end).split(b"\n", 1)[0].decode(self.encoding)
+        document = Document.from_tag(opening)
+        document.text = self.convert_range(start, end, paragraphs=paragraphs, **options)
+        return document
+
+    def sample(
+        self, k: int, level="sentence", seed: Any = None, **options
+    ) -> list[str]:
+        """Returns the texts of `k` different sentences (or paragraphs) chosen
+        uniformly at random, in the order of the file. Only the chosen items
+        are read. `seed` makes the sample reproducible."""
+        _check_level(level, ("paragraph", "sentence"))
+        count = len(self.starts[level])
+        chosen = sorted(random.Random(seed).sample(range(count), k))
+        return [self._get_text(level, i, options) for i in chosen]
+
+    def shards(self, n: int, level="paragraph") -> list[tuple[int, int]]:
+        """Cuts the file into at most `n` shards of about the same size in
+        bytes. Each shard ends at the end of an item of the `level` (except
+        the last one, which ends at the end of the file), so no item is split
+        between two shards.
+
+        Returns
+        -------
+        list[tuple[int, int]]
+            The (start, end) offsets of the shards, which cover the whole file.
+            Convert a shard with `convert_range`.
+        """
+        if n <= 0:
+            raise ValueError("The number of shards must be positive")
+        _check_level(level, INDEX_LEVELS)
+        ends = self.ends[level]
+        shards = []
+        start = 0
+        for i in range(1, n):
+            target = self.size * i // n
+            position = bisect.bisect_left(ends, target)
+            if position == len(ends):
+                break
+            end = ends[position]
+            if end > start:
+                shards.append((start, end))
+                start = end
+        if start < self.size or not shards:
+            shards.append((start, self.size))
+        return shards
+
+    def save(self, path: str | os.PathLike | None = None):
+        """Saves the index, by default next to the file (see
+        `get_index_path`)."""
+        header = {
+            "version": _INDEX_VERSION,
+            "size": self.size,
+            "mtime_ns": self.mtime_ns,
+            "sentence_tag": self.sentence_tag,
+            "paragraph_tag": self.paragraph_tag,
+            "encoding": self.encoding,
+            "columns": None if self.columns is None else self.columns.names,
+            "byteorder": sys.byteorder,
+            "counts": {level: len(self.starts[level]) for level in INDEX_LEVELS},
+        }
+        with open(path or get_index_path(self.file), "wb") as f:
+            f.write(_INDEX_MAGIC)
+            f.write(json.dumps(header).encode("utf-8") + b"\n")
+            for level in INDEX_LEVELS:
+                self.starts[level].tofile(f)
+                self.ends[level].tofile(f)
+
+    @classmethod
+    def load(
+        cls, file: str | os.PathLike, path: str | os.PathLike | None = None
+    ) -> VrtIndex:
+        """Loads the index of the VRT `file` from `path`, by default next to
+        the file (see `get_index_path`)."""
+        with open(path or get_index_path(file), "rb") as f:
+            if f.readline() != _INDEX_MAGIC:
+                raise ValueError(f"Not an index file: {path or get_index_path(file)}")
+            header = json.loads(f.readline())
+            if header["version"] != _INDEX_VERSION:
+                raise ValueError(f"Unsupported index version: {header['version']}")
+            starts = {}
+            ends = {}
+            for level in INDEX_LEVELS:
+                for offsets in (starts, ends):
+                    offsets[level] = _new_offsets()
+                    offsets[level].fromfile(f, header["counts"][level])
+                    if header["byteorder"] != sys.byteorder:
+                        offsets[level].byteswap()
+        names = header["columns"]
+        return cls(
+            file,
+            starts,
+            ends,
+            columns=None if names is None else Columns.from_names(names),
+            sentence_tag=header["sentence_tag"],
+            paragraph_tag=header["paragraph_tag"],
+            encoding=header["encoding"],
+            size=header["size"],
+            mtime_ns=header["mtime_ns"],
+        )
+
+    def close(self):
+        """Releases the memory map of the file."""
+        if self._mapped is not None:
+            self._mapped.close()
+            self._mapped = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> VrtIndex:
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __repr__(self) -> str:
+        return (
+            f"VrtIndex({str(self.file)!r}, documents={self.num_documents}, "
+            f"paragraphs={self.num_paragraphs}, sentences={self.num_sentences})"
+        )
+
+    def _get_text(self, level: str, i: int, options: dict[str, Any]) -> str:
+        start = self.starts[level][i]
+        end = self.ends[level][i]
+        text = self.convert_range(
+            start, end, paragraphs=level == "paragraph", **options
+        )
+        return text.removesuffix("\n")
+
+
+def build_index(
+    file: str | os.PathLike,
+    sentence_tag="sentence",
+    paragraph_tag="paragraph",
+    document_tags: Sequence[str] = DOCUMENT_TAGS,
+    encoding="utf-8",
+) -> VrtIndex:
+    """Builds the index of a VRT file in one pass over the memory-mapped file.
+    Only the structural tag lines are looked at.
+
+    Parameters
+    ----------
+    file : str | os.PathLike
+        Path to the VRT file. Compressed files cannot be indexed.
+    sentence_tag, paragraph_tag
+        The tags of the sentences and the paragraphs. See `iter_vrt_xml`.
+    document_tags : Sequence[str], optional
+        The names of the structures which are documents, by default "file",
+        "doc" and "text".
+    encoding : str, optional
+        The encoding of the file, by default "utf-8". Must be ASCII compatible.
+    """
+    if get_compression(file):
+        raise ValueError("Compressed files cannot be indexed")
+    stat = os.stat(file)
+    starts = {level: _new_offsets() for level in INDEX_LEVELS}
+    ends = {level: _new_offsets() for level in INDEX_LEVELS}
+    if stat.st_size:
+        with open(file, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                _scan_tags(
+                    mm,
+                    starts,
+                    ends,
+                    sentence_tag,
+                    paragraph_tag,
+                    document_tags,
+                    encoding,
+                )
+    return VrtIndex(
+        file,
+        starts,
+        ends,
+        columns=read_columns(file, encoding),
+        sentence_tag=sentence_tag,
+        paragraph_tag=paragraph_tag,
+        encoding=encoding,
+        size=stat.st_size,
+        mtime_ns=stat.st_mtime_ns,
+    )
+
+
+def open_index(
+    file: str | os.PathLike,
+    sentence_tag="sentence",
+    paragraph_tag="paragraph",
+    encoding="utf-8",
+) -> VrtIndex:
+    """Loads the sidecar index of a VRT file, or builds and saves it if it is
+    missing, out of date (the file has changed), or for other tags or another
+    encoding."""
+    path = get_index_path(file)
+    if path.exists():
+        index = VrtIndex.load(file, path)
+        options = (index.sentence_tag, index.paragraph_tag, index.encoding)
+        if index.is_current() and options == (sentence_tag, paragraph_tag, encoding):
+            return index
+    index = build_index(file, sentence_tag, paragraph_tag, encoding=encoding)
+    index.save(path)
+    return index
+
+
+def get_index_path(file: str | os.PathLike) -> Path:
+    """Returns the path of the sidecar index of a file, e.g. corpus.VRT.idx for
+    corpus.VRT."""
+    return Path(f"{os.fspath(file)}{INDEX_SUFFIX}")
+
+
+def _scan_tags(
+    contents: Any,
+    starts: dict[str, array],
+    ends: dict[str, array],
+    sentence_tag: str,
+    paragraph_tag: str,
+    document_tags: Iterable[str],
+    encoding="utf-8",
+):
+    """Finds the tag lines of the sentences, paragraphs and documents with a
+    regular expression, which skips the token lines without Python code per
+    line. The expression is not anchored to the starts of the lines (which
+    makes it several times slower), so the starts are checked here. The
+    opening tags may have attributes (see `StructureGrammar`)."""
+    grammar = StructureGrammar(sentence_tag, paragraph_tag, document_tags)
+    tags = grammar.get_tags(encoding)
+    names = grammar.sentence_tags + grammar.paragraph_tags + grammar.document_tags
+    alternatives = b"|".join(re.escape(name.encode(encoding)) for name in names)
+    pattern = re.compile(rb"</?(?:" + alternatives + rb")[ \t>][^\n]*")
+    size = len(contents)
+    levels = [
+        ("sentence", tags.sentence_openings, tags.sentence_closings),
+        ("paragraph", tags.paragraph_openings, tags.paragraph_closings),
+    ]
+    # The start of the open item of each level, or None.
+    open_starts: dict[str, int | None] = dict.fromkeys(INDEX_LEVELS)
+    document_closing = None
+    for match in pattern.finditer(contents):
+        start = match.start()
+        if start and contents[start - 1] != _NEWLINE:
+            line_start = contents.rfind(b"\n", 0, start) + 1
+            if contents[line_start:start].strip():
+                continue
+            start = line_start
+        tag = match.group().strip()
+        end = min(match.end() + 1, size)
+        for level, openings, closings in levels:
+            if tag in closings:
+                if open_starts[level] is not None:
+                    starts[level].append(open_starts[level])
+                    ends[level].append(end)
+                    open_starts[level] = None
+                break
+            if tag.startswith(openings):
+                open_starts[level] = start
+                break
+        else:
+            if document_closing is None:
+                if tag.startswith(tags.document_openings):
+                    open_starts["document"] = start
+                    document_closing = _get_closing_tag(tag)
+            elif tag == document_closing:
+                starts["document"].append(open_starts["document"])
+                ends["document"].append(end)
+                document_closing = None
+    if document_closing is not None:
+        # A document which is not closed at the end of the file
+        starts["document"].append(open_starts["document"])
+        ends["document"].append(size)
+
+
+def _new_offsets() -> array:
+    return array("Q")
+
+
+def _check_level(level: str, levels: Sequence[str]):
+    if level not in levels:
+        raise ValueError(f"Unknown level {level!r}, expected one of {levels}")
@@ -0,0 +1,181 @@
+"""Character n-gram statistics of the converted text, e.g. for keyboard layout
+optimization. Pass an `NgramCounter` to `convert` (or to the parallel
+conversion functions) as `ngrams` to count the text as it is written,
+without another pass over the text."""
+
+from __future__ import annotations
+
+import collections
+import json
+import operator
+import os
+import re
+import typing
+
+from .compression import open_binary
+
+if typing.TYPE_CHECKING:
+    from typing import Any, Iterable, Iterator
+
+# Identifies the files written by `NgramCounter.save`.
+NGRAMS_FORMAT = "vrt2txt-ngrams"
+NGRAMS_VERSION = 1
+
+# Texts shorter than this are counted directly, character by character.
+_MIN_WORD_COUNTING_LENGTH = 64
+
+# The trigrams with a space in the middle. The lookahead finds the
+# overlapping ones.
+_SPACED_TRIGRAM = re.compile("(?=(. .))", re.DOTALL)
+
+
+class NgramCounter:
+    """Counts the characters (unigrams), and the bigrams and trigrams of
+    characters, of a text given in pieces. The spaces and the newlines are
+    counted as characters.
+
+    The pieces given to `update` are counted as one continuous text (the
+    n-grams spanning two pieces are counted). Counters of separate texts, such
+    as the files converted by the workers of `convert_folder`, are combined
+    with `merge`.
+
+    Attributes
+    ----------
+    unigrams, bigrams, trigrams : collections.Counter[str]
+        The counts of the n-grams.
+
+    Examples
+    --------
+    >>> ngrams = NgramCounter()
+    >>> convert("wikipedia.VRT", "wikipedia.txt", ngrams=ngrams)
+    >>> ngrams.bigrams.most_common(3)
+    [('n ', 1234), ('en', 1200), ('an', 1100)]
+    >>> ngrams.save("wikipedia-ngrams.json.gz")
+    """
+
+    def __init__(self):
+        self.unigrams: collections.Counter[str] = collections.Counter()
+        self.bigrams: collections.Counter[str] = collections.Counter()
+        self.trigrams: collections.Counter[str] = collections.Counter()
+        # The last two characters of the text so far.
+        self._tail = ""
+
+    def update(self, text: str):
+        """Counts a piece of the text."""
+        self._count(text)
+        self._count_boundary(text)
+
+    def counted(self, texts: Iterable[str]) -> Iterator[str]:
+        """Counts the texts as they are yielded, e.g.
+        ``f.writelines(ngrams.counted(iter_vrt_file_blocks(file)))``."""
+        for text in texts:
+            self.update(text)
+            yield text
+
+    def merge(self, other: NgramCounter):
+        """Adds the counts of a separate text."""
+        self.unigrams.update(other.unigrams)
+        self.bigrams.update(other.bigrams)
+        self.trigrams.update(other.trigrams)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Returns the counts, each order sorted from the most common."""
+        return {
+            "format": NGRAMS_FORMAT,
+            "version": NGRAMS_VERSION,
+            "unigrams": dict(self.unigrams.most_common()),
+            "bigrams": dict(self.bigrams.most_common()),
+            "trigrams": dict(self.trigrams.most_common()),
+        }
+
+    def save(self, file: str | os.PathLike):
+        """Saves the counts as JSON, compressed if the path ends with .gz, .bz2
+        or .xz. The file has the keys "unigrams", "bigrams" and "trigrams",
+        which map the n-grams to their counts."""
+        data = json.dumps(self.as_dict(), ensure_ascii=False, separators=(",", ":"))
+        with open_binary(file, "wb") as f:
+            f.write(data.encode("utf-8"))
+
+    @classmethod
+    def load(cls, file: str | os.PathLike) -> NgramCounter:
+        """Loads the counts saved with `save`."""
+        with open_binary(file) as f:
+            data = json.loads(f.read().decode("utf-8"))
+        if data.get("format") != NGRAMS_FORMAT:
+            raise ValueError(f"Not an n-gram file: {file}")
+        if data.get("version") != NGRAMS_VERSION:
+            raise ValueError(f"Unsupported n-gram file version: {data.get('version')}")
+        counter = cls()
+        counter.unigrams.update(data["unigrams"])
+        counter.bigrams.update(data["bigrams"])
+        counter.trigrams.update(data["trigrams"])
+        return counter
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, NgramCounter):
+            return NotImplemented
+        return (self.unigrams, self.bigrams, self.trigrams) == (
+            other.unigrams,
+            other.bigrams,
+            other.trigrams,
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"NgramCounter(characters={sum(self.unigrams.values())}, "
+            f"unigrams={len(self.unigrams)}, bigrams={len(self.bigrams)}, "
+            f"trigrams={len(self.trigrams)})"
+        )
+
+    def _count(self, text: str):
+        """Counts the n-grams within the text."""
+        if len(text) < _MIN_WORD_COUNTING_LENGTH:
+            add = operator.add
+            self.unigrams.update(text)
+            self.bigrams.update(map(add, text, text[1:]))
+            self.trigrams.update(map(add, map(add, text, text[1:]), text[2:]))
+            return
+
+        # The text repeats the same words, so the trigrams are counted once per
+        # distinct word (with the spaces around it), and the trigrams with a
+        # space in the middle are found with a regular expression. Each
+        # trigram of the text has its middle character either in a word or in
+        # a space.
+        trigrams: collections.Counter[str] = collections.Counter(
+            _SPACED_TRIGRAM.findall(text)
+        )
+        for word, count in collections.Counter(text.split(" ")).items():
+            padded = f" {word} "
+            for i in range(len(word)):
+                trigrams[padded[i : i + 3]] += count
+        # The first and the last word have no spaces around them.
+        if text[0] != " ":
+            trigrams[" " + text[:2]] -= 1
+        if text[-1] != " ":
+            trigrams[text[-2:] + " "] -= 1
+        trigrams = +trigrams
+
+        # Each bigram (and character) starts a trigram (and a bigram), except
+        # the last one of the text.
+        bigrams: collections.Counter[str] = collections.Counter()
+        for trigram, count in trigrams.items():
+            bigrams[trigram[:2]] += count
+        bigrams[text[-2:]] += 1
+        unigrams: collections.Counter[str] = collections.Counter()
+        for bigram, count in bigrams.items():
+            unigrams[bigram[0]] += count
+        unigrams[text[-1]] += 1
+
+        self.unigrams.update(unigrams)
+        self.bigrams.update(bigrams)
+        self.trigrams.update(trigrams)
+
+    def _count_boundary(self, text: str):
+        """Counts the n-grams which start before the text and end in it."""
+        tail = self._tail
+        joined = tail + text[:2]
+        for n, counts in ((2, self.bigrams), (3, self.trigrams)):
+            for start in range(max(len(tail) - n + 1, 0), len(tail)):
+                if start + n <= len(joined):
+                    counts[joined[start : start + n]] += 1
+        self._tail = (tail + text[-2:])[-2:]
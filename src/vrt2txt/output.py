@@ -0,0 +1,305 @@
+"""Writing the text in large encoded blocks, to file descriptors, pipes, binary
+handles and shared memory.
+
+The conversion yields the text as many small strings (sentences and
+separators). Encoding and writing each of them costs an encode call, a bytes
+object and a write call per fragment. A `BlockWriter` collects the fragments,
+encodes them once per block and copies the bytes into a buffer which is
+allocated once and reused for the whole text. Full buffers are written with
+one call (`os.write` for file descriptors and pipes).
+
+Python has no way to encode a string into an existing buffer, so each block
+is encoded into a new bytes object and then copied into the buffer. With
+`SharedMemoryWriter`, the buffer is a `multiprocessing.shared_memory` segment,
+and a consumer in another process reads the blocks from the segment without
+any further copies (see `iter_shared_memory_blocks`).
+"""
+
+from __future__ import annotations
+
+import os
+import typing
+
+if typing.TYPE_CHECKING:
+    from multiprocessing.connection import Connection
+    from typing import IO, Iterable, Iterator
+
+# The default size of the buffer of the writers, in bytes.
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+
+# The maximum number of characters encoded at a time. Smaller strings stay in
+# the CPU caches while they are encoded and copied.
+_ENCODE_LENGTH = 64 * 1024
+
+
+class BlockWriter:
+    """A text writer which encodes the text into a reusable buffer, and writes
+    the buffer to `dst` when it is full (and when flushed or closed). It can be
+    passed to `vrt2txt.stream.convert` as `dst`, or be written to directly:
+
+    >>> with BlockWriter(sys.stdout.fileno()) as writer:
+    ...     writer.writelines(iter_vrt_xml(contents))
+
+    Parameters
+    ----------
+    dst : int | IO[bytes]
+        A file descriptor (e.g. of a pipe), or a file handle opened in binary
+        mode. Neither is closed by the writer.
+    buffer_size : int, optional
+        The size of the buffer, in bytes. By default 1 MiB.
+    encoding : str, optional
+        The encoding of the text, by default "utf-8".
+
+    Attributes
+    ----------
+    bytes_written : int
+        The number of bytes written to `dst`.
+    writes : int
+        The number of write calls to `dst`.
+    """
+
+    # Whether the blocks larger than the buffer can be written without
+    # copying them into the buffer.
+    _write_large_blocks = True
+
+    def __init__(
+        self,
+        dst: int | IO[bytes],
+        buffer_size: int = DEFAULT_BUFFER_SIZE,
+        encoding="utf-8",
+    ):
+        if buffer_size < 1:
+            raise ValueError("The buffer size must be positive")
+        self.dst = dst
+        self.encoding = encoding
+        self.bytes_written = 0
+        self.writes = 0
+        self.closed = False
+        self._buffer = self._get_buffer(buffer_size)
+        self._size = len(self._buffer)
+        self._used = 0
+        # The fragments not encoded yet, and their length in characters. They
+        # are encoded when they would fill a quarter of the buffer (leaving
+        # room for 4 bytes per character), or 64 Ki characters at most.
+        self._fragments: list[str] = []
+        self._pending = 0
+        self._block_length = max(1, min(self._size // 4, _ENCODE_LENGTH))
+
+    def write(self, text: str) -> int:
+        """Writes a string. Returns the number of characters written."""
+        self._fragments.append(text)
+        self._pending += len(text)
+        if self._pending >= self._block_length:
+            self._encode_fragments()
+        return len(text)
+
+    def writelines(self, fragments: Iterable[str]):
+        """Writes each of the strings, like calling `write` for each one."""
+        append = self._fragments.append
+        block_length = self._block_length
+        pending = self._pending
+        for fragment in fragments:
+            append(fragment)
+            pending += len(fragment)
+            if pending >= block_length:
+                self._pending = pending
+                self._encode_fragments()
+                append = self._fragments.append
+                pending = 0
+        self._pending = pending
+
+    def flush(self):
+        """Writes the buffered text to `dst`."""
+        if self._fragments:
+            self._encode_fragments()
+        if self._used:
+            self._write(self._buffer[: self._used])
+            self._used = 0
+        # File descriptors (and the connections of the shared memory) have
+        # nothing to flush.
+        flush = getattr(self.dst, "flush", None)
+        if flush is not None:
+            flush()
+
+    def close(self):
+        """Flushes the buffered text. `dst` is left open."""
+        if self.closed:
+            return
+        self.flush()
+        self.closed = True
+
+    def __enter__(self) -> BlockWriter:
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __repr__(self) -> str:
+        return (
+            f"{type(self).__name__}(bytes_written={self.bytes_written}, "
+            f"writes={self.writes})"
+        )
+
+    def _get_buffer(self, size: int) -> memoryview:
+        return memoryview(bytearray(size))
+
+    def _encode_fragments(self):
+        data = "".join(self._fragments).encode(self.encoding)
+        self._fragments = []
+        self._pending = 0
+        self._copy(memoryview(data))
+
+    def _copy(self, data: memoryview):
+        """Copies the bytes into the buffer, writing the buffer whenever it is
+        full."""
+        buffer = self._buffer
+        while data:
+            used = self._used
+            if not used and len(data) >= self._size and self._write_large_blocks:
+                self._write(data)
+                return
+            end = min(self._size, used + len(data))
+            buffer[used:end] = data[: end - used]
+            data = data[end - used :]
+            self._used = end
+            if end == self._size:
+                self._write(buffer)
+                self._used = 0
+
+    def _write(self, data: memoryview):
+        dst = self.dst
+        self.writes += 1
+        self.bytes_written += len(data)
+        if isinstance(dst, int):
+            # A pipe may take only a part of the data at a time.
+            while data:
+                data = data[os.write(dst, data) :]
+            return
+        while data:
+            # Raw (unbuffered) handles can also write only a part of the data.
+            written = dst.write(data)
+            if written is None or written >= len(data):
+                return
+            data = data[written:]
+
+
+class SharedMemoryWriter(BlockWriter):
+    """A `BlockWriter` whose buffer is a new shared memory segment. When the
+    segment is full (or the writer is flushed), the number of bytes in it is
+    sent to the consumer through `connection`, and the writer waits until the
+    consumer has read them before reusing the segment. The consumer reads the
+    blocks with `iter_shared_memory_blocks`:
+
+    >>> reader, writer = multiprocessing.Pipe()
+    >>> consumer = multiprocessing.Process(target=count_bytes, args=(reader,))
+    >>> consumer.start()
+    >>> with SharedMemoryWriter(writer) as out:
+    ...     convert("wikipedia.VRT", out, paragraphs=True)
+
+    The segment is removed when the writer is closed.
+
+    Parameters
+    ----------
+    connection : multiprocessing.connection.Connection
+        The end of a pipe whose other end is passed to
+        `iter_shared_memory_blocks` in the consumer process. The name of the
+        segment is sent through it first.
+    buffer_size : int, optional
+        The size of the segment, in bytes. By default 1 MiB.
+    encoding : str, optional
+        The encoding of the text, by default "utf-8".
+    """
+
+    _write_large_blocks = False
+
+    def __init__(
+        self,
+        connection: Connection,
+        buffer_size: int = DEFAULT_BUFFER_SIZE,
+        encoding="utf-8",
+    ):
+        from multiprocessing import shared_memory
+
+        self.connection = connection
+        self.shared_memory = shared_memory.SharedMemory(create=True, size=buffer_size)
+        self._attached = False
+        connection.send(self.shared_memory.name)
+        super().__init__(connection, buffer_size, encoding)  # type: ignore[arg-type]
+
+    def close(self):
+        """Flushes the buffered text, tells the consumer that the text has
+        ended, and removes the segment."""
+        if self.closed:
+            return
+        try:
+            self.flush()
+            self._wait_for_consumer()
+            self.connection.send(0)
+        finally:
+            self.closed = True
+            # The views of the segment must be released before closing it.
+            self._buffer.release()
+            self.shared_memory.close()
+            self.shared_memory.unlink()
+
+    def _get_buffer(self, size: int) -> memoryview:
+        # The segment may be larger than requested (rounded up to pages).
+        return self.shared_memory.buf[:size]  # type: ignore[index]
+
+    def _write(self, data: memoryview):
+        self._wait_for_consumer()
+        self.writes += 1
+        self.bytes_written += len(data)
+        self.connection.send(len(data))
+        # The consumer answers when it has read the block.
+        self.connection.recv()
+
+    def _wait_for_consumer(self):
+        # The segment must not be removed before the consumer has opened it.
+        if not self._attached:
+            self.connection.recv()
+            self._attached = True
+
+
+def iter_shared_memory_blocks(connection: Connection) -> Iterator[memoryview]:
+    """Yields the blocks of encoded text written by a `SharedMemoryWriter`
+    into its shared memory segment, as views of the segment. A view is valid
+    only until the next block is requested; copy it (e.g. with `bytes`) to
+    keep the data.
+
+    Parameters
+    ----------
+    connection : multiprocessing.connection.Connection
+        The other end of the pipe given to the `SharedMemoryWriter`.
+    """
+    from multiprocessing import shared_memory
+
+    name = connection.recv()
+    try:
+        # Only the writer removes the segment.
+        segment = shared_memory.SharedMemory(name, track=False)  # type: ignore
+    except TypeError:
+        # Python < 3.13 registers the segment with the resource tracker, which
+        # removes it (and warns about a leak) when this process exits. A child
+        # process of the writer shares its tracker, but a process started
+        # otherwise gets a new one, where the registration must be undone.
+        from multiprocessing import resource_tracker
+
+        own_tracker = resource_tracker._resource_tracker._fd is None  # type: ignore
+        segment = shared_memory.SharedMemory(name)
+        if own_tracker:
+            resource_tracker.unregister(segment._name, "shared_memory")  # type: ignore
+    try:
+        connection.send(True)
+        while True:
+            size = connection.recv()
+            if not size:
+                return
+            block = segment.buf[:size]  # type: ignore[index]
+            try:
+                yield block
+            finally:
+                block.release()
+            connection.send(True)
+    finally:
+        segment.close()
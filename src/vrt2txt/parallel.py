@@ -0,0 +1,439 @@
+from __future__ import annotations
+
+import collections
+import os
+import sys
+import typing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from .columns import DEFAULT_COLUMNS, Columns, read_columns
+from .compression import ZipMember, get_compression, get_text_name, iter_zip_members
+from .documents import _filter_document_lines
+from .errors import RejectLog
+from .grammar import get_grammar
+from .ngrams import NgramCounter
+from .stats import ConversionStats
+from .stream import convert
+from .vrt2txt import _iter_vrt_lines, _split_lines
+
+if typing.TYPE_CHECKING:
+    from typing import Any, Iterable
+
+    from .cache import TokenCache
+    from .dedup import Deduplicator
+    from .documents import DocumentFilter
+    from .grammar import StructureGrammar
+
+
+# Approximate size of the pieces a VRT file is split into (in bytes).
+DEFAULT_PARALLEL_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def iter_vrt_file_parallel(
+    file: str | os.PathLike,
+    sentence_tag="sentence",
+    paragraph_tag="paragraph",
+    paragraphs=False,
+    html_entities=False,
+    columns: Columns | None = None,
+    cache: TokenCache | None = None,
+    workers: int | None = None,
+    chunk_size: int = DEFAULT_PARALLEL_CHUNK_SIZE,
+    encoding="utf-8",
+    stats: ConversionStats | None = None,
+    errors="strict",
+    reject_log: RejectLog | None = None,
+    ngrams: NgramCounter | None = None,
+    grammar: StructureGrammar | None = None,
+) -> Iterable[str]:
+    """Converts a VRT file to text using multiple processes. The file is split
+    into pieces of about `chunk_size` bytes at safe boundaries (right after a
+    </paragraph> line, or </sentence> line if `paragraphs` is False), the
+    pieces are parsed in a process pool and the text is yielded in the
+    original order.
+
+    The concatenated output is identical to the concatenated output of
+    `iter_vrt_xml` for the contents of the file.
+
+    Parameters
+    ----------
+    file : str | os.PathLike
+        Path to the VRT file.
+    sentence_tag : str, optional
+        The tag for the sentence, by default "sentence". See `iter_vrt_xml`.
+    paragraph_tag : str, optional
+        The tag for the paragraph, by default "paragraph". See `iter_vrt_xml`.
+    paragraphs : bool, optional
+        If True, the contents are assumed to contain multiple paragraphs. See
+        `iter_vrt_xml`.
+    html_entities : bool, optional
+        If True, all HTML entities are decoded. See `iter_vrt_xml`.
+    columns : Columns | None, optional
+        The positions of the word and part-of-speech columns. By default, read
+        from the positional attributes comment in the beginning of the file.
+        See `iter_vrt_xml`.
+    cache : TokenCache | None, optional
+        Memoizes the decoded words and their spacing classes. Each worker
+        process uses its own cache of the same size. See `iter_vrt_xml`.
+    workers : int | None, optional
+        The number of worker processes. By default, the number of CPUs.
+    chunk_size : int, optional
+        The approximate size of a piece handed to a worker, in bytes.
+    encoding : str, optional
+        The encoding of the file, by default "utf-8".
+    stats : ConversionStats | None, optional
+        If given, the counters and times of the workers are added to it as the
+        pieces are yielded. The times are the sum over the workers. See
+        `iter_vrt_xml`.
+    errors : str, optional
+        The policy for malformed input, by default "strict". See
+        `iter_vrt_xml`. With "skip-document", the file is split only at the
+        ends of the documents.
+    reject_log : RejectLog | None, optional
+        Records the input left out by a lenient `errors` policy. The offsets
+        are bytes from the start of the file; the line numbers are None.
+    ngrams : NgramCounter | None, optional
+        If given, the character n-grams of the text are added to it. The
+        workers count their pieces, and the n-grams spanning the pieces are
+        counted as the pieces are yielded.
+    grammar : StructureGrammar | None, optional
+        The structural tags, used instead of `sentence_tag` and
+        `paragraph_tag`. See `iter_vrt_xml`.
+
+    Yields
+    ------
+    str
+        The text of one piece of the file at a time. Pieces contain whole
+        paragraphs (or sentences), and at most two pieces per worker are held
+        in memory at a time.
+    """
+    if get_compression(file):
+        raise ValueError("Compressed files cannot be split into pieces")
+    if grammar is None:
+        grammar = get_grammar(sentence_tag, paragraph_tag)
+    closing_tag = grammar.get_boundaries(paragraphs)
+    if errors == "skip-document":
+        # A document can be left out as a whole only if it is in one piece.
+        closing_tag = grammar.document_tags
+    if columns is None:
+        # Only the first piece contains the positional attributes comment.
+        columns = read_columns(file, encoding) or DEFAULT_COLUMNS
+    options = dict(
+        sentence_tag=sentence_tag,
+        paragraph_tag=paragraph_tag,
+        paragraphs=paragraphs,
+        html_entities=html_entities,
+        columns=columns,
+        cache=cache,
+        errors=errors,
+        grammar=grammar,
+        **_get_worker_state(stats, reject_log, ngrams),
+    )
+    pieces = (
+        (file, start, end, encoding, options)
+        for start, end in _iter_piece_offsets(
+            file, chunk_size, closing_tag, encoding=encoding
+        )
+    )
+    texts = _merge_worker_state(
+        _map_ordered(_convert_piece, pieces, workers), stats, reject_log, ngrams
+    )
+
+    if paragraphs:
+        for text in texts:
+            if ngrams is not None:
+                ngrams._count_boundary(text)
+            yield text
+        return
+
+    # The sentences of all pieces belong to the same (implicit) paragraph.
+    found_sentences = False
+    for text in texts:
+        if text is None:
+            continue
+        if found_sentences:
+            if ngrams is not None:
+                ngrams.update(" ")
+            yield " "
+        found_sentences = True
+        if ngrams is not None:
+            ngrams._count_boundary(text)
+        yield text
+    if not found_sentences:
+        if errors == "strict":
+            raise ValueError("Found no sentences")
+        return
+    if ngrams is not None:
+        ngrams.update("\n")
+    yield "\n"
+
+
+def convert_folder(
+    folder: str | os.PathLike,
+    folder_out: str | os.PathLike,
+    pattern="*.VRT",
+    sentence_tag="sentence",
+    paragraph_tag="paragraph",
+    paragraphs=False,
+    html_entities=False,
+    columns: Columns | None = None,
+    cache: TokenCache | None = None,
+    document_filter: DocumentFilter | None = None,
+    workers: int | None = None,
+    encoding="utf-8",
+    compression: str | None = None,
+    stats: ConversionStats | None = None,
+    errors="strict",
+    reject_log: RejectLog | None = None,
+    ngrams: NgramCounter | None = None,
+    dedup: Deduplicator | None = None,
+    grammar: StructureGrammar | None = None,
+) -> list[Path]:
+    """Converts every VRT file matching `pattern` in `folder` into a .txt file
+    in `folder_out`, using one worker process per file at a time.
+
+    Parameters
+    ----------
+    folder : str | os.PathLike
+        The folder with the VRT files, or a .zip archive. The files may be
+        compressed (.gz, .bz2 or .xz), if `pattern` matches them.
+    folder_out : str | os.PathLike
+        The folder for the text files. Created if it does not exist.
+    pattern : str, optional
+        Glob pattern for the VRT files, by default "*.VRT".
+    sentence_tag, paragraph_tag, paragraphs, html_entities, columns, cache,
+    document_filter
+        See `iter_vrt_xml`. Each worker process uses its own cache. The
+        filter must be picklable, e.g. an `AttributeFilter`.
+    workers : int | None, optional
+        The number of worker processes. By default, the number of CPUs.
+    encoding : str, optional
+        The encoding of the input and output files, by default "utf-8".
+    compression : str | None, optional
+        Compresses the text files with "gz", "bz2" or "xz" (and adds the
+        suffix to their names). By default, the text files are not compressed.
+    stats : ConversionStats | None, optional
+        If given, the counters and times of the workers are added to it. See
+        `convert`.
+    errors, reject_log
+        The policy for malformed input and the log of the rejected input. See
+        `iter_vrt_xml`. The records have the input file as their "source".
+    ngrams : NgramCounter | None, optional
+        If given, the character n-grams of the text files are added to it.
+        Each file is counted as a separate text.
+    dedup : Deduplicator | None, optional
+        If given, the sentences (or paragraphs) already seen in the earlier
+        files (or by the deduplicator before) are left out. The files are then
+        converted one at a time in this process, in order, and `workers` is
+        not used.
+    grammar : StructureGrammar | None, optional
+        The structural tags, used instead of `sentence_tag` and
+        `paragraph_tag`. See `iter_vrt_xml`.
+
+    Returns
+    -------
+    list[Path]
+        The written text files, in the order of the sorted input files.
+    """
+    folder_out = Path(folder_out)
+    folder_out.mkdir(exist_ok=True, parents=True)
+    options = dict(
+        sentence_tag=sentence_tag,
+        paragraph_tag=paragraph_tag,
+        paragraphs=paragraphs,
+        html_entities=html_entities,
+        columns=columns,
+        cache=cache,
+        document_filter=document_filter,
+        errors=errors,
+        grammar=grammar,
+    )
+    jobs = [
+        (file, folder_out / get_text_name(str(file), compression), encoding, options)
+        for file in _list_folder(folder, pattern)
+    ]
+    if dedup is not None:
+        # Each file is deduplicated against all the files before it.
+        options.update(stats=stats, reject_log=reject_log, ngrams=ngrams, dedup=dedup)
+        return [_convert_file(job)[0] for job in jobs]
+
+    options.update(_get_worker_state(stats, reject_log, ngrams))
+    return list(
+        _merge_worker_state(
+            _map_ordered(_convert_file, jobs, workers), stats, reject_log, ngrams
+        )
+    )
+
+
+def _list_folder(
+    folder: str | os.PathLike, pattern: str
+) -> list[Path] | list[ZipMember]:
+    """Lists the files of a folder (or the members of a .zip archive) matching
+    `pattern`, sorted by name."""
+    if Path(folder).suffix.lower() == ".zip":
+        return iter_zip_members(folder, pattern)
+    return sorted(Path(folder).glob(pattern))
+
+
+def _iter_piece_offsets(
+    file: str | os.PathLike,
+    chunk_size: int,
+    closing_tag: str | tuple[str, ...],
+    start: int = 0,
+    encoding="utf-8",
+) -> Iterable[tuple[int, int]]:
+    """Yields (start, end) byte offsets of the pieces of the file, beginning
+    from the offset `start`. Each piece (except the last one) ends right after
+    a line with the `closing_tag` (or one of the closing tags), encoded with
+    `encoding`."""
+    tags = (closing_tag,) if isinstance(closing_tag, str) else closing_tag
+    closing_lines = {f"</{tag}>".encode(encoding) for tag in tags}
+    with open(file, "rb") as f:
+        file_size = f.seek(0, os.SEEK_END)
+        while start < file_size:
+            f.seek(start + chunk_size)
+            # The seek may land in the middle of a line. Skip to the next line
+            # and then to the first closing tag.
+            line = f.readline()
+            while line and line.strip() not in closing_lines:
+                line = f.readline()
+            end = f.tell() if line else file_size
+            yield start, end
+            start = end
+
+
+def _convert_piece(
+    args: tuple[str | os.PathLike, int, int, str, dict[str, Any]],
+) -> tuple[str | None, ConversionStats | None, RejectLog | None, NgramCounter | None]:
+    """Converts a piece of a file. Returns the text (None if the piece has no
+    sentences), and the stats, the reject log and the n-grams of the piece if
+    `options` has them (see `_get_worker_state`)."""
+    file, start, end, encoding, options = args
+    with open(file, "rb") as f:
+        f.seek(start)
+        contents = f.read(end - start)
+    return _convert_contents(contents, start, encoding, options)
+
+
+def _convert_contents(
+    contents: bytes, start: int, encoding: str, options: dict[str, Any]
+) -> tuple[str | None, ConversionStats | None, RejectLog | None, NgramCounter | None]:
+    """Converts a piece of VRT input which starts at the offset `start` (in
+    bytes) of the whole input. See `_convert_piece`."""
+    stats = options.get("stats")
+    reject_log = options.get("reject_log")
+    ngrams = options.get("ngrams")
+    options = {key: value for key, value in options.items() if key != "ngrams"}
+    paragraphs = options["paragraphs"]
+    grammar = options.get("grammar")
+    if grammar is None:
+        grammar = get_grammar(options["sentence_tag"], options["paragraph_tag"])
+    sentence_closings = grammar.get_tags(encoding).sentence_closings
+
+    def has_sentences(lines: Iterable[bytes]) -> bool:
+        return any(closing in line for line in lines for closing in sentence_closings)
+
+    if not paragraphs and not has_sentences([contents]):
+        # For example the last piece with only the closing </file> tag.
+        return None, stats, reject_log, ngrams
+    # The piece is parsed as bytes (only the words are decoded) and the whole
+    # piece is assembled as a single block.
+    lines = _split_lines(contents, keep_cr=reject_log is not None or stats is not None)
+    document_filter = options.get("document_filter")
+    if document_filter is not None:
+        # The pieces end at the ends of the documents. The rejected documents
+        # are left out first, as the piece may have no other sentences.
+        lines = list(
+            _filter_document_lines(
+                lines, document_filter, grammar.document_tags, encoding
+            )
+        )
+        options = {**options, "document_filter": None}
+        if not paragraphs and not has_sentences(lines):
+            return None, stats, reject_log, ngrams
+    text: str | None = "".join(
+        _iter_vrt_lines(lines, block_size=sys.maxsize, encoding=encoding, **options)
+    )
+    if not paragraphs:
+        # Remove the newline which ends the implicit paragraph of the piece.
+        # Without the newline, all the sentences were skipped as malformed.
+        text = text[:-1] if text else None
+    if ngrams is not None and text:
+        ngrams.update(text)
+    if reject_log is not None:
+        for entry in reject_log.records:
+            # The offsets are from the start of the file, and the line numbers
+            # are unknown.
+            entry["line"] = None
+            if entry["offset"] is not None:
+                entry["offset"] += start
+    return text, stats, reject_log, ngrams
+
+
+def _convert_file(
+    args: tuple[Path | ZipMember, Path, str, dict[str, Any]],
+) -> tuple[Path, ConversionStats | None, RejectLog | None, NgramCounter | None]:
+    file, file_out, encoding, options = args
+    reject_log = options.get("reject_log")
+    if reject_log is not None:
+        reject_log.source = str(file)
+    if isinstance(file, ZipMember):
+        with file.open() as f:
+            convert(f, file_out, encoding=encoding, **options)
+    else:
+        convert(file, file_out, encoding=encoding, **options)
+    return file_out, options.get("stats"), reject_log, options.get("ngrams")
+
+
+def _get_worker_state(
+    stats: ConversionStats | None,
+    reject_log: RejectLog | None,
+    ngrams: NgramCounter | None = None,
+) -> dict[str, Any]:
+    """The options for collecting the stats, the rejections and the n-grams
+    in the worker processes. Each task gets its own copy of the empty stats,
+    log and counter, which it returns with its result (see
+    `_merge_worker_state`)."""
+    return {
+        "stats": None if stats is None else ConversionStats(),
+        # The log of a task keeps all its records, but has no file.
+        "reject_log": (
+            None if reject_log is None else RejectLog(max_records=sys.maxsize)
+        ),
+        "ngrams": None if ngrams is None else NgramCounter(),
+    }
+
+
+def _merge_worker_state(
+    results: Iterable[
+        tuple[Any, ConversionStats | None, RejectLog | None, NgramCounter | None]
+    ],
+    stats: ConversionStats | None,
+    reject_log: RejectLog | None,
+    ngrams: NgramCounter | None = None,
+) -> Iterable[Any]:
+    """Yields the results of the workers, adding their stats, rejections and
+    n-grams to `stats`, `reject_log` and `ngrams`."""
+    for result, worker_stats, worker_log, worker_ngrams in results:
+        if stats is not None and worker_stats is not None:
+            stats.merge(worker_stats)
+        if reject_log is not None and worker_log is not None:
+            reject_log.merge(worker_log)
+        if ngrams is not None and worker_ngrams is not None:
+            ngrams.merge(worker_ngrams)
+        yield result
+
+
+def _map_ordered(func, iterable, workers: int | None) -> Iterable:
+    """Like `ProcessPoolExecutor.map`, but submits new tasks only as results
+    are consumed, so that at most two tasks per worker are pending at a time."""
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending: collections.deque = collections.deque()
+        for item in iterable:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -0,0 +1,171 @@
+"""A long-lived conversion worker, for job schedulers which would otherwise
+start a new Python process for each small VRT file (e.g. a shard or a single
+Wikipedia article). The files are converted one after another in the same
+interpreter, so the imports, the compiled tags and the token cache are shared
+by all of them.
+
+The requests are lines of text, read from a stream (e.g. stdin) or from the
+connections to a local (Unix domain) socket. Each request is the path of a VRT
+file, optionally followed by a tab and the path of the text file:
+
+    corpus/shard-0001.VRT
+    corpus/shard-0002.VRT<TAB>out/shard-0002.txt
+
+The worker answers each request with a line of JSON, after the file is
+written:
+
+    {"input": "corpus/shard-0001.VRT", "output": "corpus/shard-0001.txt",
+     "seconds": 0.0123, "error": null}
+"""
+
+from __future__ import annotations
+
+import contextlib
+import io
+import json
+import os
+import socketserver
+import stat
+import time
+import typing
+from pathlib import Path
+
+from .compression import get_format_errors, get_text_name
+from .stream import convert
+
+if typing.TYPE_CHECKING:
+    from typing import IO, Any, Iterable
+
+
+class ConversionServer:
+    """Converts the VRT files named by the requests with the same options.
+
+    Parameters
+    ----------
+    output : str | os.PathLike | None, optional
+        The folder of the text files of the requests without an output path.
+        By default, the text file is written next to the VRT file.
+    compression : str | None, optional
+        Compresses the text files of the requests without an output path with
+        "gz", "bz2" or "xz" (see `vrt2txt.compression.get_text_name`).
+    **options
+        The options of `vrt2txt.stream.convert`, e.g. `paragraphs=True`,
+        `cache=TokenCache()` (shared by all the files) or `use_mmap=True`.
+
+    Attributes
+    ----------
+    requests : int
+        The number of requests handled.
+    failed : int
+        The number of requests whose file could not be converted.
+    """
+
+    def __init__(
+        self,
+        output: str | os.PathLike | None = None,
+        compression: str | None = None,
+        **options: Any,
+    ):
+        self.output = None if output is None else Path(output)
+        self.compression = compression
+        self.options = options
+        self.requests = 0
+        self.failed = 0
+
+    def handle(self, request: str) -> dict[str, Any]:
+        """Converts the file of a request line, and returns the response. The
+        errors of the conversion are reported in the "error" of the response,
+        and a failed request leaves no output behind.
+        """
+        src, _, dst = request.rstrip("\r\n").partition("\t")
+        if not dst:
+            dst = str(self._get_output(src))
+        self.requests += 1
+        start = time.perf_counter()
+        error = None
+        try:
+            if not src:
+                raise ValueError("No input file")
+            _convert_atomically(src, dst, self.options)
+        except (OSError, ValueError, EOFError, *get_format_errors()) as err:
+            self.failed += 1
+            error = str(err)
+        return {
+            "input": src,
+            "output": dst,
+            "seconds": round(time.perf_counter() - start, 6),
+            "error": error,
+        }
+
+    def serve(self, requests: Iterable[str], responses: IO[str]) -> int:
+        """Handles the request lines until the end of `requests`, writing the
+        responses to `responses` (flushed after each one). Empty lines are
+        skipped. Returns the number of handled requests."""
+        handled = 0
+        for request in requests:
+            if not request.strip():
+                continue
+            response = self.handle(request)
+            responses.write(json.dumps(response, ensure_ascii=False) + "\n")
+            responses.flush()
+            handled += 1
+        return handled
+
+    def serve_socket(self, path: str | os.PathLike):
+        """Handles the connections to a Unix domain socket at `path` (see
+        `make_socket_server`) until interrupted, and removes the socket file
+        at the end."""
+        server = self.make_socket_server(path)
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+            os.unlink(path)
+
+    def make_socket_server(self, path: str | os.PathLike) -> socketserver.BaseServer:
+        """Creates a server which listens on a Unix domain socket at `path`.
+        The connections are handled one at a time, each like `serve`."""
+        if not hasattr(socketserver, "UnixStreamServer"):
+            raise ValueError("Unix domain sockets are not supported here")
+        if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+            # A socket left by an earlier server.
+            os.unlink(path)
+        server = socketserver.UnixStreamServer(os.fspath(path), _RequestHandler)
+        server.conversion_server = self  # type: ignore[attr-defined]
+        return server
+
+    def _get_output(self, src: str) -> Path:
+        name = get_text_name(src, self.compression)
+        if self.output is None:
+            return Path(src).with_name(name)
+        return self.output / name
+
+    def __repr__(self) -> str:
+        return f"ConversionServer(requests={self.requests}, failed={self.failed})"
+
+
+def _convert_atomically(src: str, dst: str, options: dict[str, Any]):
+    """Converts `src` to a temporary file next to `dst`, which replaces `dst`
+    only when the conversion succeeds."""
+    path = Path(dst)
+    # A prefix keeps the suffix, which selects the compression.
+    temporary = path.with_name(".tmp-" + path.name)
+    try:
+        convert(src, temporary, **options)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(temporary)
+        raise
+    os.replace(temporary, path)
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        requests = io.TextIOWrapper(self.rfile, encoding="utf-8")
+        responses = io.TextIOWrapper(self.wfile, encoding="utf-8")
+        self.server.conversion_server.serve(  # type: ignore[attr-defined]
+            requests, responses
+        )
+        # The socket files are closed by the handler.
+        requests.detach()
+        responses.detach()
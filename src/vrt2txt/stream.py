@@ -0,0 +1,567 @@
+from __future__ import annotations
+
+import codecs
+import contextlib
+import io
+import mmap
+import os
+import sys
+import time
+import typing
+
+from .columns import Columns
+from .compression import get_compression, open_binary
+from .documents import DOCUMENT_TAGS, Document, _iter_document_groups
+from .grammar import StructureGrammar
+from .ngrams import NgramCounter
+from .output import BlockWriter
+from .vrt2txt import DEFAULT_BLOCK_SIZE, _iter_lines, _iter_vrt_lines, _split_lines
+
+if typing.TYPE_CHECKING:
+    from typing import IO, Callable, Iterable, Sequence, Union
+
+    from .cache import TokenCache
+    from .documents import DocumentFilter
+    from .dedup import Deduplicator
+    from .errors import RejectLog
+    from .stats import ConversionStats
+
+    VRTSource = Union[str, os.PathLike, IO[str], IO[bytes]]
+    TextDestination = Union[str, os.PathLike, IO[str], IO[bytes], int, BlockWriter]
+
+# Amount of characters (or bytes, for binary handles) read at a time.
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+# Amount of bytes of a memory-mapped file split into lines at a time.
+MMAP_WINDOW_SIZE = 1024 * 1024
+
+
+def iter_vrt_file(
+    file: VRTSource,
+    sentence_tag="sentence",
+    paragraph_tag="paragraph",
+    paragraphs=False,
+    html_entities=False,
+    columns: Columns | None = None,
+    cache: TokenCache | None = None,
+    document_filter: DocumentFilter | None = None,
+    stats: ConversionStats | None = None,
+    errors="strict",
+    reject_log: RejectLog | None = None,
+    dedup: Deduplicator | None = None,
+    grammar: StructureGrammar | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    encoding="utf-8",
+) -> Iterable[str]:
+    """Iterates over sentences in a VRT XML file without reading the whole
+    file into memory. Yields the same sentences and separators as
+    `iter_vrt_xml` would yield for the full contents of the file.
+
+    The file is read in chunks of `chunk_size` and parsed line by line, so the
+    memory usage is bounded by the chunk size and the largest single sentence.
+
+    Parameters
+    ----------
+    file : str | os.PathLike | IO[str] | IO[bytes]
+        Path to the VRT file, or a file handle opened in text or binary mode.
+        Handles are not closed by this function. Paths ending with .gz, .bz2
+        or .xz are decompressed; see `vrt2txt.compression.open_vrt` for .zip
+        archives and decompression in a background thread.
+    sentence_tag : str, optional
+        The tag for the sentence, by default "sentence". See `iter_vrt_xml`.
+    paragraph_tag : str, optional
+        The tag for the paragraph, by default "paragraph". See `iter_vrt_xml`.
+    paragraphs : bool, optional
+        If True, the contents are assumed to contain multiple paragraphs. See
+        `iter_vrt_xml`.
+    html_entities : bool, optional
+        If True, all HTML entities are decoded. See `iter_vrt_xml`.
+    columns : Columns | None, optional
+        The positions of the word and part-of-speech columns. See
+        `iter_vrt_xml`.
+    cache : TokenCache | None, optional
+        Memoizes the decoded words and their spacing classes. See
+        `iter_vrt_xml`.
+    document_filter : Callable[[Document], bool] | None, optional
+        Converts only the documents accepted by the filter. See `iter_vrt_xml`.
+    stats : ConversionStats | None, optional
+        Collects the counters and times of the stages. See `iter_vrt_xml`.
+    errors : str, optional
+        The policy for malformed input, by default "strict". See
+        `iter_vrt_xml`.
+    reject_log : RejectLog | None, optional
+        Records the input left out by a lenient `errors` policy. See
+        `iter_vrt_xml`.
+    dedup : Deduplicator | None, optional
+        Leaves out the sentences (or paragraphs) already seen. Pass the same
+        deduplicator for all the files of a corpus. See `vrt2txt.dedup`.
+    grammar : StructureGrammar | None, optional
+        The structural tags, used instead of `sentence_tag` and
+        `paragraph_tag`. See `iter_vrt_xml`.
+    chunk_size : int, optional
+        The number of characters (or bytes) to read at a time.
+    encoding : str, optional
+        The encoding used for paths and binary handles, by default "utf-8".
+
+    Yields
+    ------
+    str
+        The parsed sentence or paragraph. One sentence or separator (space or
+        newline) at a time.
+    """
+    lines = _iter_lines(
+        _iter_text_chunks(file, chunk_size, encoding),
+        keep_cr=reject_log is not None or stats is not None,
+    )
+    return _iter_vrt_lines(
+        lines,
+        sentence_tag,
+        paragraph_tag,
+        paragraphs,
+        html_entities=html_entities,
+        columns=columns,
+        cache=cache,
+        document_filter=document_filter,
+        stats=stats,
+        errors=errors,
+        reject_log=reject_log,
+        dedup=dedup,
+        grammar=grammar,
+        text_encoding=encoding,
+    )
+
+
+def iter_vrt_file_blocks(
+    file: VRTSource,
+    sentence_tag="sentence",
+    paragraph_tag="paragraph",
+    paragraphs=False,
+    html_entities=False,
+    columns: Columns | None = None,
+    cache: TokenCache | None = None,
+    document_filter: DocumentFilter | None = None,
+    stats: ConversionStats | None = None,
+    errors="strict",
+    reject_log: RejectLog | None = None,
+    dedup: Deduplicator | None = None,
+    grammar: StructureGrammar | None = None,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    encoding="utf-8",
+) -> Iterable[str]:
+    """Iterates over the text of a VRT XML file in blocks of whole sentences.
+    This is the file counterpart of `iter_vrt_blocks`; see `iter_vrt_file` for
+    the description of the parameters.
+
+    Yields
+    ------
+    str
+        A block of at least `block_size` characters (except the last one), or
+        a whole paragraph if `block_size` is 0.
+    """
+    lines = _iter_lines(
+        _iter_text_chunks(file, chunk_size, encoding),
+        keep_cr=reject_log is not None or stats is not None,
+    )
+    return _iter_vrt_lines(
+        lines,
+        sentence_tag,
+        paragraph_tag,
+        paragraphs,
+        block_size=block_size,
+        html_entities=html_entities,
+        columns=columns,
+        cache=cache,
+        document_filter=document_filter,
+        stats=stats,
+        errors=errors,
+        reject_log=reject_log,
+        dedup=dedup,
+        grammar=grammar,
+        text_encoding=encoding,
+    )
+
+
+def iter_vrt_mmap(
+    file: str | os.PathLike,
+    sentence_tag="sentence",
+    paragraph_tag="paragraph",
+    paragraphs=False,
+    html_entities=False,
+    columns: Columns | None = None,
+    cache: TokenCache | None = None,
+    document_filter: DocumentFilter | None = None,
+    stats: ConversionStats | None = None,
+    errors="strict",
+    reject_log: RejectLog | None = None,
+    dedup: Deduplicator | None = None,
+    grammar: StructureGrammar | None = None,
+    encoding="utf-8",
+) -> Iterable[str]:
+    """Iterates over sentences in a VRT XML file like `iter_vrt_file`, but
+    memory-maps the file and parses the raw bytes. The tags and the columns are
+    found from the bytes directly, and only the words are decoded, so the file
+    is never decoded as a whole. The pages of the file are read sequentially
+    and can be dropped from memory by the OS at any time.
+
+    Parameters
+    ----------
+    file : str | os.PathLike
+        Path to the VRT file.
+    sentence_tag, paragraph_tag, paragraphs, html_entities, columns, cache,
+    document_filter, stats, errors, reject_log, dedup, grammar
+        See `iter_vrt_xml`. The amount of input in `stats` and the offsets in
+        `reject_log` are in bytes.
+    encoding : str, optional
+        The encoding of the file, by default "utf-8". Must be ASCII compatible
+        (for example UTF-8 or Latin-1).
+
+    Yields
+    ------
+    str
+        The parsed sentence or paragraph. One sentence or separator (space or
+        newline) at a time.
+    """
+    return _iter_vrt_lines(
+        _iter_mapped_lines(file, keep_cr=reject_log is not None or stats is not None),
+        sentence_tag,
+        paragraph_tag,
+        paragraphs,
+        html_entities=html_entities,
+        columns=columns,
+        cache=cache,
+        document_filter=document_filter,
+        encoding=encoding,
+        stats=stats,
+        errors=errors,
+        reject_log=reject_log,
+        dedup=dedup,
+        grammar=grammar,
+    )
+
+
+def iter_vrt_mmap_blocks(
+    file: str | os.PathLike,
+    sentence_tag="sentence",
+    paragraph_tag="paragraph",
+    paragraphs=False,
+    html_entities=False,
+    columns: Columns | None = None,
+    cache: TokenCache | None = None,
+    document_filter: DocumentFilter | None = None,
+    stats: ConversionStats | None = None,
+    errors="strict",
+    reject_log: RejectLog | None = None,
+    dedup: Deduplicator | None = None,
+    grammar: StructureGrammar | None = None,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    encoding="utf-8",
+) -> Iterable[str]:
+    """Iterates over the text of a memory-mapped VRT XML file in blocks of
+    whole sentences. See `iter_vrt_mmap` and `iter_vrt_blocks`."""
+    return _iter_vrt_lines(
+        _iter_mapped_lines(file, keep_cr=reject_log is not None or stats is not None),
+        sentence_tag,
+        paragraph_tag,
+        paragraphs,
+        block_size=block_size,
+        html_entities=html_entities,
+        columns=columns,
+        cache=cache,
+        document_filter=document_filter,
+        encoding=encoding,
+        stats=stats,
+        errors=errors,
+        reject_log=reject_log,
+        dedup=dedup,
+        grammar=grammar,
+    )
+
+
+def iter_vrt_documents(
+    file: VRTSource,
+    sentence_tag="sentence",
+    paragraph_tag="paragraph",
+    paragraphs=False,
+    html_entities=False,
+    columns: Columns | None = None,
+    cache: TokenCache | None = None,
+    document_filter: DocumentFilter | None = None,
+    document_tags: Sequence[str] = DOCUMENT_TAGS,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    encoding="utf-8",
+    use_mmap=False,
+    grammar: StructureGrammar | None = None,
+) -> Iterable[Document]:
+    """Converts a VRT XML file one document (<file>, <doc> or <text>
+    structure) at a time, and yields the documents with their attributes and
+    text.
+
+    Parameters
+    ----------
+    file : str | os.PathLike | IO[str] | IO[bytes]
+        Path to the VRT file, or a file handle opened in text or binary mode.
+    sentence_tag, paragraph_tag, paragraphs, html_entities, columns, cache,
+    document_filter
+        See `iter_vrt_xml`.
+    document_tags : Sequence[str], optional
+        The names of the structures which are documents, by default "file",
+        "doc" and "text". Nested documents are part of the outer one.
+    chunk_size, encoding
+        See `iter_vrt_file`.
+    use_mmap : bool, optional
+        If True, `file` must be a path. It is memory-mapped and parsed as bytes
+        (see `iter_vrt_mmap`).
+    grammar : StructureGrammar | None, optional
+        The structural tags, used instead of `sentence_tag`, `paragraph_tag`
+        and `document_tags`. See `iter_vrt_xml`.
+
+    Yields
+    ------
+    Document
+        A document with its `text`. The text is formed like the text of a
+        whole file: the paragraphs (or all the sentences, if `paragraphs` is
+        False) end with a newline. The text outside of the documents, if it
+        has any sentences, is yielded as a document with an empty tag.
+    """
+    line_encoding = None
+    if use_mmap:
+        if not isinstance(file, (str, os.PathLike)):
+            raise ValueError("use_mmap requires a path")
+        lines: Iterable = _iter_mapped_lines(file)
+        line_encoding = encoding
+    else:
+        lines = _iter_lines(_iter_text_chunks(file, chunk_size, encoding))
+
+    if grammar is None:
+        grammar = StructureGrammar(sentence_tag, paragraph_tag, document_tags)
+    tags = grammar.get_tags(line_encoding)
+    sentence_closings = tags.sentence_closings
+    header_start = tags.header_start
+    document_tags = grammar.document_tags
+
+    groups = _iter_document_groups(lines, document_filter, document_tags, line_encoding)
+    for document, group in groups:
+        if document is None:
+            if columns is None:
+                # The positional attributes comment is before the documents.
+                for line in group:
+                    head = line.strip()
+                    if head.startswith(header_start):
+                        if line_encoding is not None:
+                            head = head.decode(line_encoding)
+                        columns = Columns.from_header(head)
+            document = Document("")
+        if not any(closing in line for closing in sentence_closings for line in group):
+            if document.tag:
+                yield document
+            continue
+        text = "".join(
+            _iter_vrt_lines(
+                group,
+                sentence_tag,
+                paragraph_tag,
+                paragraphs,
+                # The whole document is assembled as a single block.
+                block_size=sys.maxsize,
+                html_entities=html_entities,
+                columns=columns,
+                cache=cache,
+                encoding=line_encoding,
+                grammar=grammar,
+            )
+        )
+        if text or document.tag:
+            document.text = text
+            yield document
+
+
+def convert(
+    src: VRTSource,
+    dst: TextDestination,
+    sentence_tag="sentence",
+    paragraph_tag="paragraph",
+    paragraphs=False,
+    html_entities=False,
+    columns: Columns | None = None,
+    cache: TokenCache | None = None,
+    document_filter: DocumentFilter | None = None,
+    stats: ConversionStats | None = None,
+    errors="strict",
+    reject_log: RejectLog | None = None,
+    dedup: Deduplicator | None = None,
+    grammar: StructureGrammar | None = None,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    encoding="utf-8",
+    use_mmap=False,
+    ngrams: NgramCounter | None = None,
+):
+    """Converts a VRT XML file into a text file, writing the text in large
+    blocks (one write call per `block_size` characters).
+
+    Parameters
+    ----------
+    src : str | os.PathLike | IO[str] | IO[bytes]
+        Path to the VRT file, or a file handle opened in text or binary mode.
+        See `iter_vrt_file`.
+    dst : str | os.PathLike | IO[str] | IO[bytes] | int | BlockWriter
+        Path to the text file, a file handle opened in text or binary mode, a
+        file descriptor (e.g. of a pipe) or a `vrt2txt.output.BlockWriter`
+        (e.g. a `SharedMemoryWriter`). Handles, file descriptors and writers
+        are not closed by this function, but file descriptors and writers are
+        flushed. Paths ending with .gz, .bz2 or .xz are compressed.
+    sentence_tag, paragraph_tag, paragraphs, html_entities, columns, cache,
+    document_filter
+        See `iter_vrt_xml`.
+    stats : ConversionStats | None, optional
+        If given, the counters and the times of the stages, including writing
+        the text, are added to it. See `vrt2txt.stats.ConversionStats`.
+    errors, reject_log
+        The policy for malformed input and the log of the rejected input. See
+        `iter_vrt_xml`.
+    dedup : Deduplicator | None, optional
+        Leaves out the sentences (or paragraphs) already seen. See
+        `iter_vrt_file`.
+    grammar : StructureGrammar | None, optional
+        The structural tags. See `iter_vrt_xml`.
+    block_size : int, optional
+        The minimum size of a written block, in characters.
+    encoding : str, optional
+        The encoding used for paths and binary handles, by default "utf-8".
+    use_mmap : bool, optional
+        If True and `src` is a path, the file is memory-mapped and parsed as
+        bytes. See `iter_vrt_mmap`.
+    ngrams : NgramCounter | None, optional
+        If given, the character n-grams of the text are added to it as the
+        blocks are written. The file is counted as a separate text (the
+        n-grams spanning the end of the previously counted text and the start
+        of this one are not counted).
+    """
+    iter_blocks: Callable[..., Iterable[str]] = iter_vrt_file_blocks
+    if use_mmap and isinstance(src, (str, os.PathLike)):
+        iter_blocks = iter_vrt_mmap_blocks
+    blocks = iter_blocks(
+        src,
+        sentence_tag=sentence_tag,
+        paragraph_tag=paragraph_tag,
+        paragraphs=paragraphs,
+        html_entities=html_entities,
+        columns=columns,
+        cache=cache,
+        document_filter=document_filter,
+        block_size=block_size,
+        encoding=encoding,
+        stats=stats,
+        errors=errors,
+        reject_log=reject_log,
+        dedup=dedup,
+        grammar=grammar,
+    )
+    file_ngrams = None
+    if ngrams is not None:
+        file_ngrams = NgramCounter()
+        blocks = file_ngrams.counted(blocks)
+    if isinstance(dst, (str, os.PathLike)):
+        # Compressed if the path ends with .gz, .bz2 or .xz
+        with open_binary(dst, "wb") as f:
+            _write_blocks(blocks, f, encoding, stats)
+    elif isinstance(dst, int):
+        # Written without the buffering of a file object.
+        with BlockWriter(dst, encoding=encoding) as writer:
+            _write_blocks(blocks, writer, encoding, stats)
+    else:
+        _write_blocks(blocks, dst, encoding, stats)
+        if isinstance(dst, BlockWriter):
+            dst.flush()
+    if ngrams is not None and file_ngrams is not None:
+        ngrams.merge(file_ngrams)
+
+
+def _write_blocks(
+    blocks: Iterable[str],
+    out: IO,
+    encoding: str,
+    stats: ConversionStats | None = None,
+):
+    is_text = isinstance(out, (io.TextIOBase, BlockWriter))
+    if stats is not None:
+        perf_counter = time.perf_counter
+        for block in blocks:
+            start = perf_counter()
+            out.write(block if is_text else block.encode(encoding))
+            stats.add_time("write", perf_counter() - start)
+    elif is_text:
+        out.writelines(blocks)
+    else:
+        for block in blocks:
+            out.write(block.encode(encoding))
+
+
+def _iter_text_chunks(file: VRTSource, chunk_size: int, encoding: str) -> Iterable[str]:
+    if isinstance(file, (str, os.PathLike)):
+        if get_compression(file):
+            with open_binary(file) as f:
+                yield from _iter_text_chunks(f, chunk_size, encoding)
+            return
+        # Without translating the newlines, like the other inputs (see
+        # `_split_lines`).
+        with open(file, encoding=encoding, newline="") as f:
+            yield from _iter_text_chunks(f, chunk_size, encoding)
+        return
+
+    decoder = None
+    while chunk := file.read(chunk_size):
+        if isinstance(chunk, bytes):
+            if decoder is None:
+                decoder = codecs.getincrementaldecoder(encoding)()
+            chunk = decoder.decode(chunk)
+        yield chunk
+    if decoder is not None:
+        yield decoder.decode(b"", final=True)
+
+
+def _iter_mapped_lines(
+    file: str | os.PathLike, window_size: int = MMAP_WINDOW_SIZE, keep_cr=False
+) -> Iterable[bytes]:
+    """Iterates over the lines of a file as bytes, using a memory map. The map
+    is split into lines one window of about `window_size` bytes at a time, and
+    the pages of the windows already parsed are released. See `_split_lines`
+    for `keep_cr`."""
+    if get_compression(file):
+        raise ValueError("Compressed files cannot be memory-mapped")
+    with open(file, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            # Empty files cannot be mapped.
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            release = _get_page_releaser(mm)
+            size = len(mm)
+            start = 0
+            while start < size:
+                end = mm.find(b"\n", start + window_size)
+                end = size if end == -1 else end + 1
+                lines = _split_lines(mm[start:end], keep_cr)
+                release(start, end)
+                yield from lines
+                start = end
+
+
+def _get_page_releaser(mm: mmap.mmap) -> Callable[[int, int], None]:
+    """Returns a function which tells the OS that the pages between two
+    offsets are not needed anymore. Does nothing where madvise is missing."""
+    if not hasattr(mmap, "MADV_DONTNEED"):
+        return lambda start, end: None
+    with contextlib.suppress(OSError):
+        mm.madvise(mmap.MADV_SEQUENTIAL)
+    released = 0
+
+    def release(start: int, end: int):
+        nonlocal released
+        # madvise works on whole pages.
+        end -= end % mmap.PAGESIZE
+        if end > released:
+            with contextlib.suppress(OSError):
+                mm.madvise(mmap.MADV_DONTNEED, released, end - released)
+            released = end
+
+    return release
@@ -1,11 +1,26 @@
 from __future__ import annotations
 
-import html
-import re
+import functools
 import typing
 
+from .columns import DEFAULT_COLUMNS, Columns
+from .documents import _filter_document_lines
+from .entities import unescape_vrt
+from .errors import _check_error_policy
+from .grammar import _add_implicit_paragraphs, get_grammar
+
 if typing.TYPE_CHECKING:
-    from typing import Iterable, Sequence
+    from typing import Any, Callable, Iterable, Iterator, Sequence
+
+    from .cache import TokenCache
+    from .columnar import TokenCollector
+    from .dedup import Deduplicator
+    from .documents import DocumentFilter
+    from .errors import RejectLog
+    from .grammar import StructureGrammar
+    from .stats import ConversionStats
+
+    TokenReader = Callable[[str], tuple[str, str]]
 
 
 PUNCT = "PUNCT"
@@ -15,9 +30,37 @@ PART_TYPES = {PUNCT, NUM, WORD}
 
 NON_WORD_CONTENT_TYPES = {PUNCT, NUM}
 
+# Default minimum size (in characters) of the blocks of `iter_vrt_blocks`.
+DEFAULT_BLOCK_SIZE = 64 * 1024
+
+# What is left out on malformed input by each lenient error policy.
+_SKIPPED = {
+    "skip-line": "line",
+    "skip-sentence": "sentence",
+    "skip-document": "document",
+}
+
+# The markers of the documents yielded by the parser with the skip-document
+# error policy.
+_DOCUMENT_START = object()
+_DOCUMENT_END = object()
+_DOCUMENT_REJECTED = object()
+
 
 def iter_vrt_xml(
-    contents: str, sentence_tag="sentence", paragraph_tag="paragraph", paragraphs=False
+    contents: str,
+    sentence_tag="sentence",
+    paragraph_tag="paragraph",
+    paragraphs=False,
+    html_entities=False,
+    columns: Columns | None = None,
+    cache: TokenCache | None = None,
+    document_filter: DocumentFilter | None = None,
+    stats: ConversionStats | None = None,
+    errors="strict",
+    reject_log: RejectLog | None = None,
+    dedup: Deduplicator | None = None,
+    grammar: StructureGrammar | None = None,
 ) -> Iterable[str]:
     """Iterates over sentences in VRT XML. Sentences separated by spaces and
     paragraphs by newlines.
@@ -36,6 +79,42 @@ def iter_vrt_xml(
     paragraphs : bool, optional
         If True, the contents are assumed to contain multiple paragraphs. If
         False, the contents are assumed to contain only sentences.
+    html_entities : bool, optional
+        If True, all HTML entities in the words are decoded. By default, only
+        the entities used in VRT (&amp;, &lt;, &gt;, &quot; and &apos;) are
+        decoded.
+    columns : Columns | None, optional
+        The positions of the word and part-of-speech columns. By default, the
+        positions are read from the "<!-- #vrt positional-attributes: ... -->"
+        comment if the contents have one, and otherwise the word is in the 2nd
+        and the part of speech in the 4th column.
+    cache : TokenCache | None, optional
+        If given, the decoded words and their spacing classes are memoized in
+        the cache. See `vrt2txt.cache.TokenCache`.
+    document_filter : Callable[[Document], bool] | None, optional
+        If given, only the documents (<file>, <doc> or <text> structures) for
+        which this returns True are converted. The lines of the other documents
+        are skipped without parsing them. See `vrt2txt.documents`.
+    stats : ConversionStats | None, optional
+        If given, the counters and the times of the stages of the parser are
+        added to it. See `vrt2txt.stats.ConversionStats`.
+    errors : str, optional
+        What to do on malformed input, such as a token line without the
+        part-of-speech column: "strict" (default) raises ValueError,
+        "skip-line", "skip-sentence" and "skip-document" leave out the line,
+        its sentence or its document (<file>, <doc> or <text>). The lenient
+        policies also leave out paragraphs without sentences. See
+        `vrt2txt.errors`.
+    reject_log : RejectLog | None, optional
+        If given, the input left out by a lenient `errors` policy is counted
+        and recorded in it, with the line numbers and offsets.
+    dedup : Deduplicator | None, optional
+        If given, the sentences (or paragraphs) already seen by it are left
+        out, and the rest are marked as seen. See `vrt2txt.dedup`.
+    grammar : StructureGrammar | None, optional
+        The structural tags, for several names per level or an optional
+        paragraph level. If given, `sentence_tag` and `paragraph_tag` are not
+        used. See `vrt2txt.grammar.StructureGrammar`.
 
     Yields
     ------
@@ -43,54 +122,668 @@ def iter_vrt_xml(
         The parsed sentence or paragraph. One sentence or separator (space or
         newline) at a time.
     """
-    if paragraphs:
-        re_iterator = re.finditer(
-            rf"<{paragraph_tag}>(.*?)</{paragraph_tag}>",
-            contents,
-            flags=re.DOTALL,
+    return _iter_vrt_lines(
+        _iter_lines((contents,), keep_cr=reject_log is not None or stats is not None),
+        sentence_tag,
+        paragraph_tag,
+        paragraphs,
+        html_entities=html_entities,
+        columns=columns,
+        cache=cache,
+        document_filter=document_filter,
+        stats=stats,
+        errors=errors,
+        reject_log=reject_log,
+        dedup=dedup,
+        grammar=grammar,
+    )
+
+
+def iter_vrt_blocks(
+    contents: str,
+    sentence_tag="sentence",
+    paragraph_tag="paragraph",
+    paragraphs=False,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    html_entities=False,
+    columns: Columns | None = None,
+    cache: TokenCache | None = None,
+    document_filter: DocumentFilter | None = None,
+    stats: ConversionStats | None = None,
+    errors="strict",
+    reject_log: RejectLog | None = None,
+    dedup: Deduplicator | None = None,
+    grammar: StructureGrammar | None = None,
+) -> Iterable[str]:
+    """Iterates over the text of VRT XML in blocks of whole sentences, instead
+    of one sentence or separator at a time like `iter_vrt_xml`. The
+    concatenated blocks are identical to the concatenated output of
+    `iter_vrt_xml`.
+
+    Parameters
+    ----------
+    contents : str
+        The VRT XML contents.
+    sentence_tag, paragraph_tag, paragraphs, html_entities, columns, cache,
+    document_filter, stats, errors, reject_log, dedup, grammar
+        See `iter_vrt_xml`.
+    block_size : int, optional
+        A block is yielded as soon as it has at least `block_size` characters,
+        by default 64 KiB. If 0, each paragraph is yielded as its own block
+        (including the newline which ends it). Note that without `paragraphs`
+        the whole contents is a single paragraph.
+
+    Yields
+    ------
+    str
+        A block of text.
+    """
+    return _iter_vrt_lines(
+        _iter_lines((contents,), keep_cr=reject_log is not None or stats is not None),
+        sentence_tag,
+        paragraph_tag,
+        paragraphs,
+        block_size=block_size,
+        html_entities=html_entities,
+        columns=columns,
+        cache=cache,
+        document_filter=document_filter,
+        stats=stats,
+        errors=errors,
+        reject_log=reject_log,
+        dedup=dedup,
+        grammar=grammar,
+    )
+
+
+def _iter_vrt_lines(
+    lines: Iterable[str],
+    sentence_tag="sentence",
+    paragraph_tag="paragraph",
+    paragraphs=False,
+    block_size: int | None = None,
+    html_entities=False,
+    columns: Columns | None = None,
+    cache: TokenCache | None = None,
+    document_filter: DocumentFilter | None = None,
+    encoding: str | None = None,
+    stats: ConversionStats | None = None,
+    errors="strict",
+    reject_log: RejectLog | None = None,
+    collector: TokenCollector | None = None,
+    text_encoding="utf-8",
+    dedup: Deduplicator | None = None,
+    grammar: StructureGrammar | None = None,
+) -> Iterable[str]:
+    """The parser engine behind `iter_vrt_xml`. Walks through the VRT lines
+    exactly once, tracking the enclosing structures with a small state machine.
+    Structural tags are expected to be on their own lines (as in VRT), and
+    unknown structures (e.g. <file> or <doc>) are skipped.
+
+    If `block_size` is None, yields sentences and separators one at a time.
+    Otherwise yields blocks of text as described in `iter_vrt_blocks`.
+
+    If `encoding` is given, the lines are bytes in that (ASCII compatible)
+    encoding. The tags are then matched as bytes and only the words are
+    decoded. Otherwise the lines are str, decoded from `text_encoding`.
+
+    If `stats` is given, the stages of the parser are counted and timed into
+    it. Otherwise the parser runs without any instrumentation.
+
+    `errors` is the policy for malformed input (see `ERROR_POLICIES`), and the
+    rejected input is recorded into `reject_log`. With `stats` or `reject_log`,
+    the lines must keep the "\\r" of a "\\r\\n" line end (see `_split_lines`),
+    so that their sizes and offsets in the input are known.
+
+    If `collector` is given, the tokens of the sentences are collected into it
+    (see `vrt2txt.columnar`).
+
+    If `dedup` is given, the sentences (or paragraphs) seen by it are left
+    out.
+
+    The tags are taken from `grammar`, or from the cached grammar of
+    `sentence_tag` and `paragraph_tag`."""
+    _check_error_policy(errors)
+    if dedup is not None and dedup.unit == "paragraph" and not paragraphs:
+        raise ValueError("Paragraphs can be deduplicated only with paragraphs=True")
+    if grammar is None:
+        grammar = get_grammar(sentence_tag, paragraph_tag)
+    parser = _parse_vrt_lines(
+        lines,
+        grammar,
+        paragraphs,
+        block_size,
+        html_entities,
+        columns,
+        cache,
+        document_filter,
+        encoding,
+        stats,
+        errors,
+        reject_log,
+        collector,
+        dedup,
+        text_encoding,
+    )
+    if errors == "skip-document":
+        parser = _drop_rejected_documents(parser, collector, dedup)
+    if stats is None:
+        return parser
+    return stats._time_stage("parse", parser)
+
+
+def _parse_vrt_lines(
+    lines: Iterable[str],
+    grammar: StructureGrammar,
+    paragraphs: bool,
+    block_size: int | None,
+    html_entities: bool,
+    columns: Columns | None,
+    cache: TokenCache | None,
+    document_filter: DocumentFilter | None,
+    encoding: str | None,
+    stats: ConversionStats | None,
+    errors: str,
+    reject_log: RejectLog | None,
+    collector: TokenCollector | None,
+    dedup: Deduplicator | None,
+    text_encoding: str,
+) -> Iterable[str]:
+    """The state machine of `_iter_vrt_lines`. With the skip-document error
+    policy, also yields the markers of the documents (see
+    `_drop_rejected_documents`)."""
+    tag_start: str | int = "<"
+    make_token_reader = _make_token_reader
+    if encoding is not None:
+        _check_ascii_compatible(encoding)
+        tag_start = ord("<")  # The first item of bytes is an int
+        make_token_reader = functools.partial(
+            _make_bytes_token_reader, encoding=encoding
         )
-        paragraph_iterator = (match.groups()[0] for match in re_iterator)
-    else:
-        paragraph_iterator = iter((contents,))
 
-    for paragraph_contents in paragraph_iterator:
-        sentence_iterator = re.finditer(
-            rf"<{sentence_tag}>(.*?)</{sentence_tag}>",
-            paragraph_contents,
-            flags=re.DOTALL,
+    tags = grammar.get_tags(encoding)
+    sentence_openings = tags.sentence_openings
+    sentence_closings = tags.sentence_closings
+    paragraph_openings = tags.paragraph_openings
+    paragraph_closings = tags.paragraph_closings
+    document_openings = tags.document_openings
+    header_start = tags.header_start
+    if reject_log is not None or stats is not None:
+        sized_lines = _measure_lines(lines, encoding or text_encoding)
+        if stats is not None:
+            sized_lines = stats._count_lines(sized_lines)
+        if reject_log is not None:
+            lines = reject_log._track(sized_lines)
+        else:
+            lines = (line for line, _ in sized_lines)
+    if paragraphs and grammar.optional_paragraphs:
+        # The added tags are not counted as input lines.
+        lines = _add_implicit_paragraphs(lines, tags)
+    form_sentence = _form_sentence
+    if stats is not None:
+        form_sentence = stats._wrap_detokenizer(_form_sentence)
+        make_token_reader = functools.partial(
+            _make_counted_token_reader, make_token_reader, stats
+        )
+    if collector is not None:
+        form_sentence = collector._wrap_detokenizer(form_sentence)
+        make_token_reader = functools.partial(
+            collector._make_token_reader, make_token_reader, encoding=encoding
         )
-        sentence = next(sentence_iterator)
-        sentence_data = sentence.groups()[0]
-        yield parse_vrt_sentence(sentence_data)
-
-        for sentence in sentence_iterator:
-            # If more than one sentence, they are separated by a space
-            yield " "
-            sentence_data = sentence.groups()[0]
-            yield parse_vrt_sentence(sentence_data)
-        yield "\n"
-
-
-def get_contents_from_line(line: str) -> tuple[str, str]:
-    try:
-        _, content, _, content_type, _ = line.split("\t", maxsplit=4)
-        if content_type not in NON_WORD_CONTENT_TYPES:
+
+    if document_filter is not None:
+        lines = _filter_document_lines(
+            lines, document_filter, grammar.document_tags, encoding
+        )
+
+    # The token reader is created once per layout of the columns.
+    get_contents = make_token_reader(columns or DEFAULT_COLUMNS, html_entities, cache)
+    detect_columns = columns is None
+    get_part_class = _PART_CLASSES.get if cache is None else cache.get_part_class
+
+    # Without paragraphs, the whole contents is treated as one paragraph.
+    in_paragraph = not paragraphs
+    in_sentence = False
+    first_sentence = True
+    sentence_parts: list[str] = []
+    sentence_part_types: list[str] = []
+
+    blocks = block_size is not None
+    block: list[str] = []
+    buffered = 0
+
+    # Duplicate sentences are left out as they are formed. The sentences of
+    # a paragraph are held (as a block) until the end of the paragraph, where
+    # the whole paragraph is checked.
+    is_duplicate_sentence = None
+    is_duplicate_paragraph = None
+    if dedup is not None and dedup.unit == "sentence":
+        is_duplicate_sentence = dedup._is_duplicate
+    elif dedup is not None:
+        is_duplicate_paragraph = dedup._is_duplicate
+    yield_fragments = False
+    sentence_block_size = block_size
+    if is_duplicate_paragraph is not None:
+        yield_fragments = not blocks
+        blocks = True
+        sentence_block_size = 0
+    paragraph_index = 0
+    dropped_sentences = False
+
+    strict = errors == "strict"
+    skip_documents = errors == "skip-document"
+    in_document = False
+    document_closing: Any = None
+    document_state = (first_sentence, in_paragraph)
+    # A rejected document is skipped by reading the lines directly.
+    lines = iter(lines)
+
+    for line in lines:
+        head = line.lstrip()
+        if not head:
+            continue
+        if head[0] != tag_start:
+            if in_sentence:
+                try:
+                    content, content_type = get_contents(line)
+                except ValueError as err:
+                    if strict:
+                        raise
+                    skipped = _SKIPPED[errors]
+                    if skipped == "document" and not in_document:
+                        skipped = "sentence"
+                    if reject_log is not None:
+                        reject_log._reject(str(err), skipped)
+                    if skipped == "line":
+                        continue
+                    in_sentence = False
+                    if skipped == "document":
+                        for line in lines:
+                            if (
+                                document_closing in line
+                                and line.strip() == document_closing
+                            ):
+                                break
+                        in_document = False
+                        first_sentence, in_paragraph = document_state
+                        block = []
+                        buffered = 0
+                        yield _DOCUMENT_REJECTED
+                    continue
+                sentence_parts.append(content)
+                sentence_part_types.append(content_type)
+            continue
+
+        tag = head.rstrip()
+        if tag in sentence_closings:
+            if in_sentence:
+                in_sentence = False
+                sentence = form_sentence(
+                    sentence_parts, sentence_part_types, get_part_class
+                )
+                if is_duplicate_sentence is not None and is_duplicate_sentence(
+                    sentence
+                ):
+                    dropped_sentences = True
+                    continue
+                if not blocks:
+                    if not first_sentence:
+                        # If more than one sentence, they are separated by a space
+                        yield " "
+                    yield sentence
+                else:
+                    if not first_sentence:
+                        block.append(" ")
+                    block.append(sentence)
+                    buffered += len(sentence)
+                    if sentence_block_size and buffered >= sentence_block_size:
+                        yield "".join(block)
+                        block = []
+                        buffered = 0
+                first_sentence = False
+        elif tag.startswith(sentence_openings):
+            if in_paragraph:
+                in_sentence = True
+                sentence_parts = []
+                sentence_part_types = []
+        elif detect_columns and tag.startswith(header_start):
+            if encoding is not None:
+                tag = tag.decode(encoding)
+            get_contents = make_token_reader(
+                Columns.from_header(tag), html_entities, cache
+            )
+        elif skip_documents and not in_document and tag.startswith(document_openings):
+            # The output of the document is held until its closing tag.
+            if block:
+                yield "".join(block)
+                block = []
+                buffered = 0
+            in_document = True
+            document_closing = _get_closing_tag(tag)
+            document_state = (first_sentence, in_paragraph)
+            yield _DOCUMENT_START
+        elif in_document and tag == document_closing:
+            if block:
+                yield "".join(block)
+                block = []
+                buffered = 0
+            in_document = False
+            yield _DOCUMENT_END
+        elif not paragraphs:
+            continue
+        elif tag.startswith(paragraph_openings):
+            if not in_paragraph:
+                in_paragraph = True
+                first_sentence = True
+                dropped_sentences = False
+                paragraph_index = len(block)
+        elif tag in paragraph_closings:
+            if in_paragraph:
+                in_paragraph = False
+                in_sentence = False
+                if first_sentence:
+                    if dropped_sentences:
+                        # All the sentences were duplicates.
+                        continue
+                    if strict:
+                        raise ValueError("Found a paragraph without sentences")
+                    if reject_log is not None:
+                        reject_log._reject(
+                            "Found a paragraph without sentences", "paragraph"
+                        )
+                    continue
+                if is_duplicate_paragraph is not None:
+                    paragraph = block[paragraph_index:]
+                    if is_duplicate_paragraph("".join(paragraph)):
+                        del block[paragraph_index:]
+                        buffered -= sum(map(len, paragraph))
+                        continue
+                if stats is not None:
+                    stats.paragraphs += 1
+                if not blocks:
+                    yield "\n"
+                else:
+                    block.append("\n")
+                    if yield_fragments:
+                        yield from block
+                        block = []
+                    elif not block_size or buffered >= block_size:
+                        yield "".join(block)
+                        block = []
+                        buffered = 0
+
+    if not paragraphs:
+        if first_sentence:
+            if strict and not dropped_sentences:
+                raise ValueError("Found no sentences")
+            # All the sentences were skipped.
+            return
+        if blocks:
+            block.append("\n")
+        else:
+            yield "\n"
+    if block:
+        yield "".join(block)
+
+
+def _drop_rejected_documents(
+    parser: Iterable[Any],
+    collector: TokenCollector | None = None,
+    dedup: Deduplicator | None = None,
+) -> Iterable[str]:
+    """Holds the output of each document until the end of the document, and
+    drops the output (and the collected tokens and the seen items) of the
+    rejected documents."""
+    held: list[str] | None = None
+    for item in parser:
+        if item is _DOCUMENT_START:
+            held = []
+            if collector is not None:
+                collector._start_document()
+            if dedup is not None:
+                dedup._start_document()
+        elif item is _DOCUMENT_END:
+            yield from held  # type: ignore[misc]
+            held = None
+            if dedup is not None:
+                dedup._end_document()
+        elif item is _DOCUMENT_REJECTED:
+            held = None
+            if collector is not None:
+                collector._reject_document()
+            if dedup is not None:
+                dedup._reject_document()
+        elif held is not None:
+            held.append(item)
+        else:
+            yield item
+    if dedup is not None:
+        dedup._end_document()
+    if held:
+        # A document which is not closed at the end of the input
+        yield from held
+
+
+def _get_closing_tag(tag: Any) -> Any:
+    """Returns the closing tag for an opening tag, e.g. "</doc>" for
+    '<doc id="1">'. Works for str and bytes."""
+    name = tag[1:].split(None, 1)[0]
+    if isinstance(tag, bytes):
+        return b"</" + name.rstrip(b">") + b">"
+    return "</" + name.rstrip(">") + ">"
+
+
+def _iter_lines(
+    chunks: Iterable[str], block_size: int = 1024 * 1024, keep_cr=False
+) -> Iterable[str]:
+    """Iterates over the lines in text chunks of any size. Long chunks are
+    split into blocks of about `block_size` characters, so that the list of
+    lines never holds more than one block at a time. See `_split_lines` for
+    `keep_cr`."""
+    rest = ""
+    for chunk in chunks:
+        start = 0
+        while start < len(chunk):
+            end = chunk.find("\n", start + block_size)
+            if end == -1:
+                break
+            # The newline is included, so that a blank line before it is kept.
+            yield from _split_lines(rest + chunk[start : end + 1], keep_cr)
+            rest = ""
+            start = end + 1
+        # The part after the last newline may continue in the next chunk.
+        rest += chunk[start:]
+        cut = rest.rfind("\n") + 1
+        if cut:
+            yield from _split_lines(rest[:cut], keep_cr)
+            rest = rest[cut:]
+    if rest:
+        yield from _split_lines(rest, keep_cr)
+
+
+def _split_lines(text: Any, keep_cr=False) -> list[Any]:
+    """Splits str or bytes into lines at "\\n" (removing a "\\r" before it,
+    unless `keep_cr` is True). Unlike `str.splitlines`, the other line
+    boundaries of Unicode (e.g. "\\x85" and "\\u2028") do not end a line, so
+    the text and the bytes of a file (see `vrt2txt.stream.iter_vrt_mmap`) are
+    split into the same lines. The "\\r"s are kept for measuring the lines
+    (see `_measure_lines`)."""
+    newline, carriage_return = ("\n", "\r") if isinstance(text, str) else (b"\n", b"\r")
+    lines = text.split(newline)
+    if not lines[-1]:
+        lines.pop()
+    if not keep_cr and carriage_return in text:
+        lines = [
+            line[:-1] if line.endswith(carriage_return) else line for line in lines
+        ]
+    return lines
+
+
+def _measure_lines(lines: Iterable[Any], encoding: str) -> Iterator[tuple[Any, int]]:
+    """Yields each line (str or bytes) without the "\\r" of a "\\r\\n" line end
+    (kept by `_split_lines` with `keep_cr`), and its size in the input: the
+    number of bytes including the line end. The str lines are measured in
+    `encoding`."""
+    for line in lines:
+        if isinstance(line, str):
+            # Most lines of most corpora are ASCII, whose size is the length.
+            size = (
+                len(line) if line.isascii() else len(line.encode(encoding, "replace"))
+            )
+            if line.endswith("\r"):
+                line = line[:-1]
+        else:
+            size = len(line)
+            if line.endswith(b"\r"):
+                line = line[:-1]
+        yield line, size + 1
+
+
+def get_contents_from_line(
+    line: str, html_entities=False, columns: Columns | None = None
+) -> tuple[str, str]:
+    if columns is None:
+        return _get_default_token_reader(html_entities)(line)
+    return _make_token_reader(columns, html_entities)(line)
+
+
+def _make_token_reader(
+    columns: Columns, html_entities=False, cache: TokenCache | None = None
+) -> TokenReader:
+    """Creates a function which reads the word and its type from a token line
+    with the given layout of columns. With a `cache`, the words are decoded
+    through the cache."""
+    word_index = columns.word
+    upos_index = columns.upos
+    # The columns after the last used one are left unsplit.
+    maxsplit = max(word_index, upos_index) + 1
+    # Change &amp; to & and other entities to their original form
+    # This is required as explained at: https://www.kielipankki.fi/support/vrt-format/
+    unescape = _get_unescape(html_entities)
+    non_word_content_types = NON_WORD_CONTENT_TYPES
+
+    def get_contents(line: str) -> tuple[str, str]:
+        fields = line.split("\t", maxsplit)
+        if len(fields) < maxsplit:
+            raise ValueError(f'Could not parse line "{line}"')
+        content = fields[word_index]
+        content_type = fields[upos_index]
+        if content_type not in non_word_content_types:
             content_type = WORD
-        # Change &amp; to & and other HTML entities to their original form
-        # This is required as explained at: https://www.kielipankki.fi/support/vrt-format/
-        content = html.unescape(content)
-    except ValueError as err:
-        raise ValueError(f'Could not parse line "{line}"') from err
-    return content, content_type
+        if "&" in content:
+            content = unescape(content)
+        return content, content_type
+
+    if cache is None:
+        return get_contents
 
+    decode = cache.get_decoder(html_entities)
 
-def parse_vrt_sentence(vrt_string: str):
+    def get_cached_contents(line: str) -> tuple[str, str]:
+        fields = line.split("\t", maxsplit)
+        if len(fields) < maxsplit:
+            raise ValueError(f'Could not parse line "{line}"')
+        content_type = fields[upos_index]
+        if content_type not in non_word_content_types:
+            content_type = WORD
+        return decode(fields[word_index]), content_type
+
+    return get_cached_contents
+
+
+def _make_bytes_token_reader(
+    columns: Columns,
+    html_entities=False,
+    cache: TokenCache | None = None,
+    encoding="utf-8",
+) -> Callable[[bytes], tuple[str, str]]:
+    """Like `_make_token_reader`, but for token lines as bytes. Only the word
+    field is decoded."""
+    word_index = columns.word
+    upos_index = columns.upos
+    maxsplit = max(word_index, upos_index) + 1
+    content_types = {
+        PUNCT.encode(encoding): PUNCT,
+        NUM.encode(encoding): NUM,
+    }
+    if cache is None:
+        unescape = _get_unescape(html_entities)
+
+        def decode(word: bytes) -> str:
+            content = word.decode(encoding)
+            if "&" in content:
+                content = unescape(content)
+            return content
+
+    else:
+        decode = cache.get_decoder(html_entities, encoding)
+
+    def get_contents(line: bytes) -> tuple[str, str]:
+        fields = line.split(b"\t", maxsplit)
+        if len(fields) < maxsplit:
+            raise ValueError(f'Could not parse line "{line.decode(encoding)}"')
+        return decode(fields[word_index]), content_types.get(fields[upos_index], WORD)
+
+    return get_contents
+
+
+def _make_counted_token_reader(
+    make_token_reader: Callable[..., Callable],
+    stats: ConversionStats,
+    columns: Columns,
+    html_entities=False,
+    cache: TokenCache | None = None,
+) -> Callable:
+    """Creates a token reader with `make_token_reader`, counted and timed into
+    `stats`."""
+    get_contents = make_token_reader(columns, html_entities, cache)
+    return stats._wrap_token_reader(get_contents, columns.word)
+
+
+def _check_ascii_compatible(encoding: str):
+    # The structure of the lines is found by scanning the bytes for "<", tabs
+    # and newlines, which must be single bytes as in ASCII.
+    if "<\t\n".encode(encoding) != b"<\t\n":
+        raise ValueError(f"Encoding {encoding} is not ASCII compatible")
+
+
+def _get_unescape(html_entities=False) -> Callable[[str], str]:
+    """Returns the function which decodes the entities of the words: all HTML
+    entities with `html_entities`, or only the entities of VRT (see
+    `unescape_vrt`). The html module, with its table of over 2000 entities,
+    is imported only when it is needed."""
+    if not html_entities:
+        return unescape_vrt
+    import html
+
+    return html.unescape
+
+
+@functools.lru_cache(maxsize=None)
+def _get_default_token_reader(html_entities: bool) -> TokenReader:
+    return _make_token_reader(DEFAULT_COLUMNS, html_entities)
+
+
+def parse_vrt_sentence(
+    vrt_string: str,
+    html_entities=False,
+    columns: Columns | None = None,
+    cache: TokenCache | None = None,
+):
     """Parses the sentence from a VRT input.
 
     Parameters
     ----------
     vrt_string : str
         The VRT input.
+    html_entities : bool, optional
+        If True, all HTML entities are decoded. See `iter_vrt_xml`.
+    columns : Columns | None, optional
+        The positions of the word and part-of-speech columns. By default, the
+        word is in the 2nd and the part of speech in the 4th column.
+    cache : TokenCache | None, optional
+        Memoizes the decoded words and their spacing classes. See
+        `iter_vrt_xml`.
 
     Returns
     -------
@@ -105,114 +798,175 @@ def parse_vrt_sentence(vrt_string: str):
     )
     'Helppoa!'
     """
+    get_contents = _make_token_reader(columns or DEFAULT_COLUMNS, html_entities, cache)
+    get_part_class = _PART_CLASSES.get if cache is None else cache.get_part_class
     sentence_parts = []
     sentence_part_types = []
 
-    for line in vrt_string.splitlines():
+    for line in _split_lines(vrt_string):
         if not line.strip():
             continue
-        content, content_type = get_contents_from_line(line)
+        content, content_type = get_contents(line)
         sentence_parts.append(content)
         sentence_part_types.append(content_type)
 
-    return _form_sentence(sentence_parts, sentence_part_types)
-
+    return _form_sentence(sentence_parts, sentence_part_types, get_part_class)
+
+
+# Spacing classes of the sentence parts. The quote bits are also used for the
+# quote state of a sentence (inside which quotes we are).
+DOUBLE_QUOTE = 1  # part contains "
+CURLY_DOUBLE_QUOTE = 2  # part contains ”
+SINGLE_QUOTE = 4  # part contains '
+QUOTES = DOUBLE_QUOTE | CURLY_DOUBLE_QUOTE | SINGLE_QUOTE
+BARE_QUOTE = 8  # part is only the quotation mark
+NO_SPACE_AFTER = 16  # "(" and "/"
+OPENING_PUNCT = 32  # has space before it even if it is PUNCT
+
+# Codes of the part types. 0 means "no part".
+_PART_TYPE_CODES = {PUNCT: 1, NUM: 2, WORD: 3}
+_PUNCT_CODE = _PART_TYPE_CODES[PUNCT]
+_NUM_CODE = _PART_TYPE_CODES[NUM]
+
+
+def _get_part_class(part: str) -> int:
+    """Returns the spacing class of a sentence part, which tells how the part
+    affects the spaces around it. See `_form_sentence`."""
+    # Note: sometimes quotation marks may be part of a WORD (and not as a
+    # separate PUNCT). Therefore using syntax <<if '"' in part>>.
+    if '"' in part:
+        part_class = DOUBLE_QUOTE
+    elif "”" in part:
+        part_class = CURLY_DOUBLE_QUOTE
+    elif "'" in part:
+        part_class = SINGLE_QUOTE
+    else:
+        part_class = 0
+    if part in {'"', "”", "'"}:
+        part_class |= BARE_QUOTE
+    if part in {"(", "/"}:
+        part_class |= NO_SPACE_AFTER
+    if part in "(":
+        part_class |= OPENING_PUNCT
+    return part_class
 
-def _form_sentence(
-    sentence_parts: Sequence[str], sentence_part_types: Sequence[str]
-) -> str:
 
-    return "".join(_iter_sentence_parts(sentence_parts, sentence_part_types))
+# Precomputed classes of the most common punctuation, and all the parts which
+# affect the spacing by more than the quotation marks they contain.
+_PART_CLASSES = {
+    part: _get_part_class(part)
+    for part in ["", ".", ",", "!", "?", ":", ";", "-", "(", ")", "/", '"', "”", "'"]
+}
 
 
-def _iter_sentence_parts(
-    sentence_parts: Sequence[str], sentence_part_types: Sequence[str]
-) -> Iterable[str]:
+def _form_sentence(
+    sentence_parts: Sequence[str],
+    sentence_part_types: Sequence[str],
+    get_part_class: Callable[[str], int | None] = _PART_CLASSES.get,
+    starts: list[int] | None = None,
+) -> str:
+    """Joins the sentence parts with spaces where needed. `get_part_class`
+    returns the spacing class of a part (see `_get_part_class`), or None if
+    the class is to be resolved here. If `starts` is given, the offset of
+    each part in the sentence is appended to it."""
     # Notes:
-    # This would be probably easier to understand if rewritten as a class.
     # This does not handle all special cases. There are numerous different
     # quotation marks in the world which are not handled correctly. Urls are
     # not handled correctly either.
+    output: list[str] = []
+    append = output.append
+    part_type_codes = _PART_TYPE_CODES
+    # Local copies of the constants (faster to look up in the loop)
+    punct, num = _PUNCT_CODE, _NUM_CODE
+    double_quote, curly_double_quote, single_quote = (
+        DOUBLE_QUOTE,
+        CURLY_DOUBLE_QUOTE,
+        SINGLE_QUOTE,
+    )
+    no_space_after, bare_quote, quotes, opening_punct = (
+        NO_SPACE_AFTER,
+        BARE_QUOTE,
+        QUOTES,
+        OPENING_PUNCT,
+    )
+
     previous_part = None
-    previous_part_type = None
-    before_previous_part_type = None
+    previous_part_class = 0
+    previous_part_type = 0
+    before_previous_part_type = 0
 
     space_before_part = False
-
-    inside_double_quotes = False
-    inside_single_quotes = False
-    inside_curly_double_quotes = False
-
-    for part, part_type in zip(
-        sentence_parts,
-        sentence_part_types,
-    ):
-        if part_type not in PART_TYPES:
+    # The QUOTES bits of the quotes which are currently open
+    inside_quotes = 0
+    # The length of the output (only tracked for the starts)
+    length = 0
+
+    for part, part_type in zip(sentence_parts, sentence_part_types):
+        part_type_code = part_type_codes.get(part_type)
+        if part_type_code is None:
             raise ValueError(f"Invalid part type: {part_type}")
+        part_class = get_part_class(part)
+        if part_class is None:
+            # Not a bare quote, "(" or "/" (those are in the table). Note:
+            # sometimes quotation marks may be part of a WORD (and not as a
+            # separate PUNCT). Therefore using syntax <<if '"' in part>>.
+            if '"' in part:
+                part_class = double_quote
+            elif "”" in part:
+                part_class = curly_double_quote
+            elif "'" in part:
+                part_class = single_quote
+            else:
+                part_class = 0
 
         if previous_part:
             # By detault, assume that each part is separated with a space.
             space_before_part = True
 
-        if previous_part in {"(", "/"}:
-            # After opening parenthesis there is no space
-            # After slash there is no space
-            # Example: "km/h"
-            space_before_part = False
-        elif previous_part == '"' and inside_double_quotes:
-            # Inside double quotes, no space
-            # Example: 'Foo "bar" baz' (at 'b')
-            space_before_part = False
-        elif previous_part == "”" and inside_curly_double_quotes:
-            # Inside double curly quotes, no space
-            # Example: "Foo ”bar” baz" (at 'b')
-            space_before_part = False
-        elif previous_part == "'" and inside_single_quotes:
-            # Inside single quotes, no space
-            # Example: "Foo 'bar' baz" (at 'b')
-            space_before_part = False
-
-        # Note: sometimes quotation marks may be part of a WORD (and not as a
-        # separate PUNCT). Therefore using syntax <<if '"' in part>>.
-        if '"' in part:
-            if inside_double_quotes:
-                # When closing double quotes, there is no space
-                # Example: 'foo "bar" baz' (at 'r')
-                space_before_part = False
-            inside_double_quotes = not inside_double_quotes
-        elif "”" in part:
-            if inside_curly_double_quotes:
-                # When closing curly double quotes, there is no space
-                # Example: 'foo ”bar” baz' (at 'r')
+        if previous_part_class:
+            if previous_part_class & no_space_after:
+                # After opening parenthesis there is no space
+                # After slash there is no space
+                # Example: "km/h"
                 space_before_part = False
-            inside_curly_double_quotes = not inside_curly_double_quotes
-        elif "'" in part:
-            if inside_single_quotes:
-                # When closing single quotes, there is no space
-                # Example: "foo 'bar' baz" (at 'r')
-                space_before_part = False
-            inside_single_quotes = not inside_single_quotes
-        elif part_type == PUNCT:
-            if part in "(":
-                # Before opening parenthesis there is a space
-                # Example: "Foo (bar) baz"
-                space_before_part = True
-            else:
-                # Otherwise before punctionation, no space
-                # Example: "Foo!" (at '!')
+            elif previous_part_class & bare_quote and (
+                previous_part_class & inside_quotes
+            ):
+                # Inside quotes, no space
+                # Example: 'Foo "bar" baz' (at 'b')
                 space_before_part = False
 
-        if part_type == NUM:
-            if previous_part_type == PUNCT and before_previous_part_type == NUM:
-                # Example: "6,3"
+        if part_class & quotes:
+            if inside_quotes & part_class:
+                # When closing quotes, there is no space
+                # Example: 'foo "bar" baz' (at 'r')
                 space_before_part = False
+            inside_quotes ^= part_class & quotes
+        elif part_type_code == punct:
+            # Before opening parenthesis there is a space. Otherwise before
+            # punctionation, no space.
+            # Example: "Foo (bar) baz" and "Foo!"
+            space_before_part = part_class & opening_punct != 0
+
+        if (
+            part_type_code == num
+            and previous_part_type == punct
+            and before_previous_part_type == num
+        ):
+            # Example: "6,3"
+            space_before_part = False
 
         if space_before_part:
-            yield " "
-
-        yield part
+            append(" ")
+        append(part)
+        if starts is not None:
+            start = length + space_before_part
+            starts.append(start)
+            length = start + len(part)
 
         before_previous_part_type = previous_part_type
-
         previous_part = part
-        previous_part_type = part_type
+        previous_part_class = part_class
+        previous_part_type = part_type_code
+
+    return "".join(output)
@@ -0,0 +1,105 @@
+import pytest
+
+
+@pytest.fixture
+def vrt_two_files_two_sentences():
+    return """
+    <file id="123" year="1999" genre="Comedy,Romance" original="English" country="USA" duration= "NaN">
+    <sentence>
+    1	tarvitsen	tarvita	VERB	_	Mood=Ind|Number=Sing|Person=1|Tense=Pres|VerbForm=Fin|Voice=Act	0	root	_	_
+    2	apua	apu	NOUN	_	Case=Par|Number=Sing	1	dobj	_	_
+    3	.	.	PUNCT	_	_	1	punct	_	_
+    </sentence>
+    <sentence>
+    1	mario	mario	NOUN	_	Case=Nom|Number=Sing	0	root	_	_
+    2	,	,	PUNCT	_	_	1	punct	_	_
+    3	iaske	iaske	NOUN	_	Case=Nom|Number=Sing	1	conj	_	_
+    4	hänet	hän	PRON	_	Case=Acc|Number=Sing|Person=3|PronType=Prs	5	nmod:poss	_	_
+    5	aias	aias	NOUN	_	Case=Nom|Number=Sing	3	nmod	_	_
+    6	.	.	PUNCT	_	_	1	punct	_	_
+    </sentence>
+    </file>###C:<file id="20018" year="2001" genre="Comedy" original="English" country="USA, Canada" duration= "NaN">
+    <sentence>
+    1	Kiitos	kiitos	NOUN	_	Case=Nom|Number=Sing	0	root	_	_
+    2	.	.	PUNCT	_	_	1	punct	_	_
+    </sentence>
+    <sentence>
+    1	Mitä	mikä	PRON	_	Case=Par|Number=Sing|PronType=Int	3	dobj	_	_
+    2	haluat	haluta	VERB	_	Mood=Ind|Number=Sing|Person=2|Tense=Pres|VerbForm=Fin|Voice=Act	0	root	_	_
+    3	tietää	tietää	VERB	_	InfForm=1|Number=Sing|VerbForm=Inf|Voice=Act	2	xcomp	_	_
+    4	?	?	PUNCT	_	_	2	punct	_	_
+    </sentence>
+    """
+
+
+@pytest.fixture
+def vrt_paragraph(paragraph1):
+    return f"""
+    <doc id="123" url="https://fi.wikipedia.org/wiki?curid=123" title="Foo">
+    {paragraph1}
+    </doc>
+    """
+
+
+@pytest.fixture
+def vrt_two_paragraphs(paragraph1):
+    return f"""
+    <doc id="123" url="https://fi.wikipedia.org/wiki?curid=123" title="Foo">
+    {paragraph1}
+    <paragraph>
+    <sentence>
+    1	Minä	minä	PRON	_	Case=Nom|Number=Sing|Person=1|PronType=Prs	2	nsubj	_	_
+    2	keksin	keksiä	VERB	_	Mood=Ind|Number=Sing|Person=1|Tense=Past|VerbForm=Fin|Voice=Act	0	root	_	_
+    3	.	.	PUNCT	_	_	2	punct	_	_
+    </sentence>
+    </paragraph>
+    </doc>
+    """
+
+
+@pytest.fixture
+def paragraph1():
+    return """
+    <paragraph>
+    <sentence>
+    1	Mondego	Mondego	NOUN	_	Case=Nom|Number=Sing	8	nsubj:cop	_	_
+    2	on	olla	VERB	_	Mood=Ind|Number=Sing|Person=3|Tense=Pres|VerbForm=Fin|Voice=Act	8	cop	_	_
+    3	pisin	pitkä	ADJ	_	Case=Nom|Degree=Sup|Number=Sing	8	amod	_	_
+    4	kokonaisuudessaan	kokonaisuus	NOUN	_	Case=Ine|Number=Sing|Person[psor]=3	7	nmod	_	_
+    5	Portugalin	Portugali	PROPN	_	Case=Gen|Number=Sing	6	nmod:poss	_	_
+    6	alueella	alue	NOUN	_	Case=Ade|Number=Sing	7	nmod	_	_
+    7	sijaitseva	sijaita	VERB	_	Case=Nom|Degree=Pos|Number=Sing|PartForm=Pres|VerbForm=Part|Voice=Act	8	acl	_	_
+    8	joki	joki	NOUN	_	Case=Nom|Number=Sing	0	root	_	_
+    9	.	.	PUNCT	_	_	8	punct	_	_
+    </sentence>
+    <sentence>
+    1	Sen	se	PRON	_	Case=Gen|Number=Sing|PronType=Dem	2	nmod:poss	_	_
+    2	pituus	pituus	NOUN	_	Case=Nom|Number=Sing	5	nsubj:cop	_	_
+    3	on	olla	VERB	_	Mood=Ind|Number=Sing|Person=3|Tense=Pres|VerbForm=Fin|Voice=Act	5	cop	_	_
+    4	234	234	NUM	_	NumType=Card	5	nummod	_	_
+    5	kilometriä	kilo#metri	NOUN	_	Case=Par|Number=Sing	0	root	_	_
+    6	.	.	PUNCT	_	_	5	punct	_	_
+    </sentence>
+    </paragraph>
+    """
+
+
+@pytest.fixture
+def raw_folder(tmp_path, vrt_paragraph: str, vrt_two_paragraphs: str):
+    folder = tmp_path / "raw"
+    folder.mkdir()
+    (folder / "a.VRT").write_text(vrt_paragraph, encoding="utf-8")
+    (folder / "b.VRT").write_text(vrt_two_paragraphs, encoding="utf-8")
+    return folder
+
+
+@pytest.fixture
+def write_vrt(tmp_path):
+    """Writes VRT contents into a file in tmp_path, and returns its path."""
+
+    def write(contents: str, name="corpus.VRT"):
+        file = tmp_path / name
+        file.write_text(contents, encoding="utf-8")
+        return file
+
+    return write
@@ -0,0 +1,198 @@
+import asyncio
+import gzip
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from src.vrt2txt.aio import convert_async, iter_vrt_async
+from src.vrt2txt.documents import AttributeFilter
+from src.vrt2txt.errors import RejectLog
+from src.vrt2txt.stats import ConversionStats
+from src.vrt2txt.vrt2txt import iter_vrt_xml
+
+
+@pytest.fixture
+def contents(vrt_two_files_two_sentences: str, vrt_two_paragraphs: str) -> str:
+    return vrt_two_files_two_sentences + vrt_two_paragraphs
+
+
+class TestIterVrtAsync:
+
+    @pytest.mark.parametrize("batch_size", [1, 200, 1024 * 1024])
+    @pytest.mark.parametrize("read_size", [1, 7, 4096])
+    @pytest.mark.parametrize("paragraphs", [False, True])
+    def test_same_as_iter_vrt_xml(self, contents, batch_size, read_size, paragraphs):
+        expected = "".join(iter_vrt_xml(contents, paragraphs=paragraphs))
+
+        text = _collect(
+            _as_reader(contents),
+            paragraphs=paragraphs,
+            batch_size=batch_size,
+            read_size=read_size,
+        )
+
+        assert text == expected
+
+    def test_async_iterable_of_text(self, contents):
+        async def chunks():
+            for start in range(0, len(contents), 10):
+                yield contents[start : start + 10]
+
+        text = _collect(chunks(), paragraphs=True, batch_size=100)
+
+        assert text == "".join(iter_vrt_xml(contents, paragraphs=True))
+
+    def test_path(self, tmp_path, contents):
+        file = tmp_path / "corpus.VRT.gz"
+        file.write_bytes(gzip.compress(contents.encode("utf-8")))
+
+        text = _collect(file, batch_size=100)
+
+        assert text == "".join(iter_vrt_xml(contents))
+
+    def test_process_pool(self, contents):
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            text = _collect(_as_reader(contents), batch_size=100, executor=executor)
+
+        assert text == "".join(iter_vrt_xml(contents))
+
+    def test_columns_from_header(self, vrt_two_paragraphs: str):
+        header = "<!-- #vrt positional-attributes: word lemma upos -->\n"
+        word_first = "\n".join(
+            "\t".join(line.split("\t")[1:]) if "\t" in line else line
+            for line in vrt_two_paragraphs.splitlines()
+        )
+
+        text = _collect(_as_reader(header + word_first), batch_size=1)
+
+        assert text == "".join(iter_vrt_xml(vrt_two_paragraphs))
+
+    @pytest.mark.parametrize("errors", ["skip-sentence", "skip-document"])
+    def test_errors(self, contents, errors):
+        malformed = contents.replace("</sentence>", "rikki\n</sentence>", 2)
+        expected_log = RejectLog()
+        expected = "".join(
+            iter_vrt_xml(
+                malformed, paragraphs=True, errors=errors, reject_log=expected_log
+            )
+        )
+        reject_log = RejectLog()
+
+        text = _collect(
+            _as_reader(malformed),
+            paragraphs=True,
+            batch_size=1,
+            errors=errors,
+            reject_log=reject_log,
+        )
+
+        assert text == expected
+        assert reject_log.errors == expected_log.errors
+        for record in reject_log.records:
+            assert malformed.encode()[record["offset"] :].startswith(b"rikki\n")
+
+    def test_document_filter(self, vrt_two_files_two_sentences: str):
+        document_filter = AttributeFilter("id=123")
+        expected = "".join(
+            iter_vrt_xml(vrt_two_files_two_sentences, document_filter=document_filter)
+        )
+
+        text = _collect(
+            _as_reader(vrt_two_files_two_sentences),
+            batch_size=1,
+            document_filter=document_filter,
+        )
+
+        assert text == expected
+
+    def test_stats(self, contents):
+        expected = ConversionStats()
+        list(iter_vrt_xml(contents, paragraphs=True, stats=expected))
+        stats = ConversionStats()
+
+        _collect(_as_reader(contents), paragraphs=True, batch_size=1, stats=stats)
+
+        assert stats.sentences == expected.sentences
+        assert stats.tokens == expected.tokens
+
+    def test_no_sentences(self):
+        with pytest.raises(ValueError, match="Found no sentences"):
+            _collect(_as_reader("<file>\n</file>\n"))
+
+    def test_backpressure(self, contents):
+        """The source is read only as far as the consumed text needs."""
+        reader = _as_reader(contents * 50)
+
+        async def main():
+            texts = iter_vrt_async(
+                reader, paragraphs=True, batch_size=1, read_size=64, max_pending=2
+            )
+            await texts.__anext__()
+            await asyncio.sleep(0.01)
+            consumed = reader.position
+            await asyncio.sleep(0.01)
+            assert reader.position == consumed
+            await texts.aclose()
+            return consumed
+
+        consumed = asyncio.run(main())
+
+        assert consumed < len(contents) * 5
+
+
+class TestConvertAsync:
+
+    def test_path(self, tmp_path, contents):
+        out = tmp_path / "out.txt"
+
+        asyncio.run(convert_async(_as_reader(contents), out, paragraphs=True))
+
+        expected = "".join(iter_vrt_xml(contents, paragraphs=True))
+        assert out.read_text(encoding="utf-8") == expected
+
+    def test_stream_writer(self, contents):
+        writer = _Writer()
+
+        asyncio.run(convert_async(_as_reader(contents), writer, batch_size=100))
+
+        assert writer.data.decode("utf-8") == "".join(iter_vrt_xml(contents))
+        assert writer.drained
+
+
+def _collect(source, **kwargs) -> str:
+    async def collect():
+        return "".join([text async for text in iter_vrt_async(source, **kwargs)])
+
+    return asyncio.run(collect())
+
+
+def _as_reader(contents: str) -> "_Reader":
+    return _Reader(contents.encode("utf-8"))
+
+
+class _Reader:
+    """A minimal asynchronous reader, like `asyncio.StreamReader`."""
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.position = 0
+
+    async def read(self, n: int) -> bytes:
+        await asyncio.sleep(0)
+        chunk = self.data[self.position : self.position + n]
+        self.position += len(chunk)
+        return chunk
+
+
+class _Writer:
+    """A minimal asynchronous writer, like `asyncio.StreamWriter`."""
+
+    def __init__(self):
+        self.data = b""
+        self.drained = False
+
+    def write(self, data: bytes):
+        self.data += data
+
+    async def drain(self):
+        self.drained = True
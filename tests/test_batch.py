@@ -0,0 +1,160 @@
+import random
+
+import pytest
+
+from src.vrt2txt.batch import form_sentences, get_spaces
+from src.vrt2txt.cache import TokenCache
+from src.vrt2txt.vrt2txt import NO_SPACE_AFTER, NUM, PUNCT, WORD, _form_sentence
+
+# The parts which affect the spacing, and some which do not.
+PARTS = [
+    ("Foo", WORD), ("bar", WORD), ("x", WORD), ('"le', WORD), ("l'eau", WORD),
+    ("”x", WORD), ("a\"b'c", WORD), ("6", NUM), ("3", NUM), (".", PUNCT),
+    (",", PUNCT), ("!", PUNCT), ("-", PUNCT), ("(", PUNCT), (")", PUNCT),
+    ("/", PUNCT), ('"', PUNCT), ("”", PUNCT), ("'", PUNCT), ("''", PUNCT),
+    ("", WORD), ("", PUNCT), ('"', WORD), ("(", WORD), ("/", NUM),
+]  # fmt: skip
+
+SENTENCES = [
+    (["Foo", "(", "bar", ")", "!"], [WORD, PUNCT, WORD, PUNCT, PUNCT], "Foo (bar)!"),
+    (["6", ",", "3", "foo"], [NUM, PUNCT, NUM, WORD], "6,3 foo"),
+    (["6", ".", "Foo", "!"], [NUM, PUNCT, WORD, PUNCT], "6. Foo!"),
+    (
+        ["Yukon", "(", '"', "Yukon", "Territory", '"', ")", "."],
+        [WORD, PUNCT, PUNCT, WORD, WORD, PUNCT, PUNCT, PUNCT],
+        'Yukon ("Yukon Territory").',
+    ),
+    (["Larry", "”", "Ler", "”", "LaLonde"], [WORD] * 5, "Larry ”Ler” LaLonde"),
+    (["on", '"le', "retraité", '"'], [WORD, WORD, WORD, PUNCT], 'on "le retraité"'),
+    (["40", "km", "/", "h"], [NUM, WORD, PUNCT, WORD], "40 km/h"),
+    ([], [], ""),
+    (["A", "", "B"], [WORD, PUNCT, WORD], "A  B"),
+]
+
+
+@pytest.fixture(params=["python", "numpy"])
+def backend(request):
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    return request.param
+
+
+def _make_batch(sentences):
+    parts = [part for sentence in sentences for part in sentence[0]]
+    part_types = [part_type for sentence in sentences for part_type in sentence[1]]
+    offsets = [0]
+    for sentence in sentences:
+        offsets.append(offsets[-1] + len(sentence[0]))
+    return parts, part_types, offsets
+
+
+class TestFormSentences:
+
+    def test_sentences(self, backend):
+        parts, part_types, offsets = _make_batch(SENTENCES)
+
+        sentences = form_sentences(parts, part_types, offsets, backend=backend)
+
+        assert sentences == [expected for _, _, expected in SENTENCES]
+
+    @pytest.mark.parametrize("seed", range(5))
+    def test_same_as_form_sentence(self, backend, seed):
+        rng = random.Random(seed)
+        for _ in range(50):
+            sentences = [
+                list(zip(*[rng.choice(PARTS) for _ in range(rng.randint(0, 15))]))
+                or [(), ()]
+                for _ in range(rng.randint(0, 40))
+            ]
+            parts, part_types, offsets = _make_batch(sentences)
+            expected = [_form_sentence(*sentence) for sentence in sentences]
+
+            assert form_sentences(parts, part_types, offsets, backend=backend) == (
+                expected
+            )
+
+    def test_get_part_class(self, backend):
+        cache = TokenCache()
+        parts, part_types, offsets = _make_batch(SENTENCES)
+
+        sentences = form_sentences(
+            parts, part_types, offsets, cache.get_part_class, backend=backend
+        )
+
+        assert sentences == [expected for _, _, expected in SENTENCES]
+
+    def test_custom_part_class(self, backend):
+        # No space after a hyphen. The parts for which it returns None only
+        # get their quote bits, so "'" is not a bare quote here.
+        def get_part_class(part):
+            return NO_SPACE_AFTER if part == "-" else None
+
+        sentences = form_sentences(
+            ["vrt", "-", "text", "'", "x", "'"],
+            [WORD, PUNCT, WORD, PUNCT, WORD, PUNCT],
+            [0, 3, 6],
+            get_part_class,
+            backend=backend,
+        )
+
+        assert sentences == ["vrt-text", "' x'"]
+
+    def test_empty(self, backend):
+        assert form_sentences([], [], [0], backend=backend) == []
+        assert form_sentences([], [], [0, 0, 0], backend=backend) == ["", ""]
+
+    def test_invalid_part_type(self, backend):
+        with pytest.raises(ValueError, match="Invalid part type: FOO"):
+            form_sentences(["A", "B"], [WORD, "FOO"], [0, 1, 2], backend=backend)
+
+    @pytest.mark.parametrize("offsets", [[], [1, 2], [0, 1], [0, 2, 1, 2]])
+    def test_invalid_offsets(self, backend, offsets):
+        with pytest.raises(ValueError):
+            form_sentences(["A", "B"], [WORD, WORD], offsets, backend=backend)
+
+    def test_unknown_backend(self):
+        with pytest.raises(ValueError):
+            form_sentences(["A"], [WORD], [0, 1], backend="fortran")
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_backends_agree(seed):
+    # Random parts made of the characters which affect the spacing, checked
+    # against each other and against the sentence-by-sentence parser.
+    pytest.importorskip("numpy")
+    rng = random.Random(seed)
+    cache = TokenCache()
+    for _ in range(50):
+        sentences = []
+        for _ in range(rng.randint(0, 40)):
+            length = rng.randint(0, 15)
+            parts = [
+                "".join(rng.choices("aZ6.,!-()/\"”'", k=rng.randint(0, 3)))
+                for _ in range(length)
+            ]
+            part_types = rng.choices([WORD, NUM, PUNCT], k=length)
+            sentences.append((parts, part_types))
+        parts, part_types, offsets = _make_batch(sentences)
+        expected = [_form_sentence(*sentence) for sentence in sentences]
+
+        results = [
+            form_sentences(parts, part_types, offsets, backend=backend)
+            for backend in ["python", "numpy"]
+        ] + [
+            form_sentences(parts, part_types, offsets, cache.get_part_class, backend)
+            for backend in ["python", "numpy"]
+        ]
+
+        assert results == [expected] * 4
+
+
+def test_get_spaces(backend):
+    parts, part_types, offsets = _make_batch(SENTENCES[:2])
+
+    spaces = get_spaces(parts, part_types, offsets, backend=backend)
+
+    # "Foo (bar)!" and "6,3 foo"
+    assert [bool(space) for space in spaces] == [
+        *[False, True, False, False, False],
+        *[False, False, False, True],
+    ]
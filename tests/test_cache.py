@@ -0,0 +1,97 @@
+import pickle
+
+import pytest
+
+from src.vrt2txt.cache import TokenCache
+from src.vrt2txt.stream import iter_vrt_file
+from src.vrt2txt.vrt2txt import (
+    _get_part_class,
+    iter_vrt_blocks,
+    iter_vrt_xml,
+    parse_vrt_sentence,
+)
+
+
+class TestTokenCache:
+
+    def test_same_output(self, vrt_two_paragraphs: str):
+        cache = TokenCache()
+        expected = list(iter_vrt_xml(vrt_two_paragraphs, paragraphs=True))
+
+        result = list(iter_vrt_xml(vrt_two_paragraphs, paragraphs=True, cache=cache))
+
+        assert result == expected
+        assert cache.misses > 0
+
+    def test_hits_when_words_repeat(self, vrt_paragraph: str):
+        cache = TokenCache()
+        list(iter_vrt_blocks(vrt_paragraph, cache=cache))
+        misses = cache.misses
+
+        list(iter_vrt_blocks(vrt_paragraph, cache=cache))
+
+        assert cache.misses == misses
+        assert cache.hits >= misses
+
+    @pytest.mark.parametrize("html_entities", [False, True])
+    def test_decoder(self, html_entities):
+        decode = TokenCache().get_decoder(html_entities)
+
+        assert decode("&amp;lt;") == "&lt;"
+        assert decode("&eacute;") == ("é" if html_entities else "&eacute;")
+
+    def test_interned_words(self):
+        decode = TokenCache().get_decoder()
+        # Build equal strings which are different objects.
+        first, second = "".join(["wo", "rd"]), "".join(["w", "ord"])
+
+        assert decode(first) is decode(second)
+
+    def test_part_class(self):
+        cache = TokenCache()
+        for part in ["(", '"', "”sana", "'", "sana"]:
+            assert cache.get_part_class(part) == _get_part_class(part)
+
+    def test_maxsize_evicts(self):
+        cache = TokenCache(maxsize=2)
+        decode = cache.get_decoder()
+        for word in ["a", "b", "c", "a"]:
+            decode(word)
+
+        # "a" was evicted by "c", so it was decoded again.
+        assert cache.misses == 4
+        assert cache.size == 2
+
+    def test_clear(self, vrt_paragraph: str):
+        cache = TokenCache()
+        list(iter_vrt_xml(vrt_paragraph, cache=cache))
+
+        cache.clear()
+
+        assert (cache.hits, cache.misses, cache.size) == (0, 0, 0)
+
+    def test_invalid_maxsize(self):
+        with pytest.raises(ValueError):
+            TokenCache(maxsize=0)
+
+    def test_pickle(self):
+        cache = TokenCache(maxsize=10)
+        cache.get_decoder()("word")
+
+        copy = pickle.loads(pickle.dumps(cache))
+
+        assert copy.maxsize == 10
+        assert copy is pickle.loads(pickle.dumps(cache))
+
+    def test_parse_vrt_sentence(self):
+        vrt = "1\tHelppoa\thelppo\tADJ\t_\n2\t!\t!\tPUNCT\t_"
+
+        assert parse_vrt_sentence(vrt, cache=TokenCache()) == "Helppoa!"
+
+    def test_file(self, vrt_two_paragraphs: str, tmp_path):
+        file = tmp_path / "corpus.VRT"
+        file.write_text(vrt_two_paragraphs, encoding="utf-8")
+
+        result = "".join(iter_vrt_file(file, paragraphs=True, cache=TokenCache()))
+
+        assert result == "".join(iter_vrt_xml(vrt_two_paragraphs, paragraphs=True))
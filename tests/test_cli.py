@@ -0,0 +1,225 @@
+import gzip
+import io
+import json
+import sys
+import zipfile
+
+import pytest
+
+from src.vrt2txt.cli import main
+from src.vrt2txt.vrt2txt import iter_vrt_xml
+
+
+@pytest.fixture
+def archive_and_text(tmp_path, vrt_two_paragraphs: str):
+    archive = tmp_path / "corpus.zip"
+    with zipfile.ZipFile(archive, "w", compression=zipfile.ZIP_DEFLATED) as f:
+        f.writestr("vrt/b.VRT", vrt_two_paragraphs)
+    return archive, "".join(iter_vrt_xml(vrt_two_paragraphs))
+
+
+class TestMain:
+
+    def test_folder(self, raw_folder, tmp_path, vrt_two_paragraphs: str, capsys):
+        out = tmp_path / "out"
+
+        assert main([str(raw_folder), "-o", str(out), "--paragraphs"]) == 0
+
+        assert sorted(file.name for file in out.iterdir()) == ["a.txt", "b.txt"]
+        assert (out / "b.txt").read_text(encoding="utf-8") == "".join(
+            iter_vrt_xml(vrt_two_paragraphs, paragraphs=True)
+        )
+        report = capsys.readouterr().err
+        assert "MB/s" in report
+        assert "total: " in report
+
+    def test_glob_and_workers(self, raw_folder, tmp_path, vrt_paragraph: str):
+        out = tmp_path / "out"
+
+        main([str(raw_folder / "a.*"), "-o", str(out), "-j", "2", "-q"])
+
+        assert [file.name for file in out.iterdir()] == ["a.txt"]
+        assert (out / "a.txt").read_text(encoding="utf-8") == "".join(
+            iter_vrt_xml(vrt_paragraph)
+        )
+
+    @pytest.mark.parametrize("stdin", [False, True])
+    def test_workers_require_plain_files(self, raw_folder, stdin, capsys):
+        argv = ["-"] if stdin else [str(raw_folder), "--threaded"]
+
+        with pytest.raises(SystemExit):
+            main([*argv, "-j", "2"])
+
+        assert "--workers cannot be used" in capsys.readouterr().err
+
+    def test_workers_compressed(self, tmp_path, vrt_paragraph: str, capsys):
+        file = tmp_path / "a.VRT.gz"
+        file.write_bytes(gzip.compress(vrt_paragraph.encode()))
+
+        with pytest.raises(SystemExit):
+            main([str(file), "-o", str(tmp_path / "out"), "-j", "2"])
+
+        assert "--workers cannot be used" in capsys.readouterr().err
+
+    def test_same_output_name(self, raw_folder, tmp_path, vrt_paragraph: str, capsys):
+        other = tmp_path / "other"
+        other.mkdir()
+        (other / "a.VRT").write_text(vrt_paragraph, encoding="utf-8")
+        out = tmp_path / "out"
+
+        with pytest.raises(SystemExit):
+            main([str(raw_folder), str(other), "-o", str(out)])
+
+        assert "would both be written to 'a'" in capsys.readouterr().err
+        assert not out.exists()
+
+    def test_stdin_to_stdout(self, monkeypatch, vrt_two_files_two_sentences: str):
+        stdin = io.TextIOWrapper(io.BytesIO(vrt_two_files_two_sentences.encode()))
+        stdout = io.TextIOWrapper(io.BytesIO())
+        monkeypatch.setattr(sys, "stdin", stdin)
+        monkeypatch.setattr(sys, "stdout", stdout)
+
+        main(["-", "-q"])
+
+        assert stdout.buffer.getvalue().decode() == "".join(
+            iter_vrt_xml(vrt_two_files_two_sentences)
+        )
+
+    def test_no_inputs_found(self, tmp_path):
+        with pytest.raises(SystemExit):
+            main([str(tmp_path / "*.VRT")])
+
+    def test_cache(self, raw_folder, tmp_path, vrt_two_paragraphs: str, capsys):
+        out = tmp_path / "out"
+
+        main([str(raw_folder), "-o", str(out), "--paragraphs", "--cache-size", "100"])
+
+        assert (out / "b.txt").read_text(encoding="utf-8") == "".join(
+            iter_vrt_xml(vrt_two_paragraphs, paragraphs=True)
+        )
+        assert "cache: " in capsys.readouterr().err
+
+    def test_errors(self, tmp_path, vrt_two_paragraphs: str, capsys):
+        file = tmp_path / "a.VRT"
+        malformed = vrt_two_paragraphs.replace("</sentence>", "rikki\n</sentence>", 1)
+        file.write_text(malformed, encoding="utf-8")
+        out = tmp_path / "out"
+        reject_log = tmp_path / "rejects.jsonl"
+
+        main(
+            [str(file), "-o", str(out), "--paragraphs", "--errors", "skip-sentence"]
+            + ["--reject-log", str(reject_log)]
+        )
+
+        assert "skipped: 1 sentences" in capsys.readouterr().err
+        text = (out / "a.txt").read_text(encoding="utf-8")
+        assert text == "Sen pituus on 234 kilometriä.\nMinä keksin.\n"
+        lines = reject_log.read_text(encoding="utf-8").splitlines()
+        (record,) = map(json.loads, lines)
+        assert record["source"] == str(file)
+        assert record["skipped"] == "sentence"
+
+    def test_errors_strict_by_default(self, tmp_path, vrt_two_paragraphs: str, capsys):
+        file = tmp_path / "a.VRT"
+        file.write_text(vrt_two_paragraphs.replace("<sentence>", "<sentence>\nrikki"))
+
+        with pytest.raises(SystemExit):
+            main([str(file), "-o", str(tmp_path / "out"), "-q"])
+
+        assert 'Could not parse line "rikki"' in capsys.readouterr().err
+
+    @pytest.mark.parametrize("split", [False, True])
+    def test_error_leaves_no_output(self, raw_folder, tmp_path, split):
+        data = (raw_folder / "b.VRT").read_bytes()
+        # Invalid UTF-8 after the first document.
+        (raw_folder / "b.VRT").write_bytes(data + b"\xff" + data)
+        out = tmp_path / "out"
+
+        with pytest.raises(SystemExit):
+            main([str(raw_folder), "-o", str(out), "-q"] + ["--split"] * split)
+
+        expected = ["a"] if split else ["a.txt"]
+        assert [file.name for file in out.iterdir()] == expected
+
+    def test_stats(self, raw_folder, tmp_path, capsys):
+        out = tmp_path / "out"
+
+        main([str(raw_folder), "-o", str(out), "--paragraphs", "--stats", "-q"])
+
+        err = capsys.readouterr().err
+        assert " sentences, " in err
+        assert "time: read " in err
+        assert "total: " in err
+
+    def test_stats_with_workers(self, tmp_path, vrt_two_paragraphs: str, capsys):
+        file = tmp_path / "a.VRT"
+        file.write_text(vrt_two_paragraphs, encoding="utf-8")
+
+        main([str(file), "-o", str(tmp_path), "--paragraphs", "--stats", "-j", "2"])
+
+        # The sentences are counted by the workers.
+        assert ", 3 sentences, " in capsys.readouterr().err.splitlines()[0]
+
+    def test_mmap(self, raw_folder, tmp_path, vrt_two_paragraphs: str):
+        out = tmp_path / "out"
+
+        main([str(raw_folder), "-o", str(out), "--paragraphs", "--mmap", "-q"])
+
+        assert (out / "b.txt").read_text(encoding="utf-8") == "".join(
+            iter_vrt_xml(vrt_two_paragraphs, paragraphs=True)
+        )
+
+    @pytest.mark.parametrize("args", [["-j", "2"], ["--threaded"], ["--resume"]])
+    def test_mmap_requires_plain_files(self, raw_folder, tmp_path, args, capsys):
+        with pytest.raises(SystemExit):
+            main([str(raw_folder), "-o", str(tmp_path / "out"), "--mmap", *args])
+
+        assert "--mmap cannot be used" in capsys.readouterr().err
+
+    @pytest.mark.parametrize("stdin", [False, True])
+    def test_mmap_streams(self, tmp_path, vrt_paragraph: str, stdin, capsys):
+        file = tmp_path / "a.VRT.gz"
+        file.write_bytes(gzip.compress(vrt_paragraph.encode()))
+
+        with pytest.raises(SystemExit):
+            main(["-" if stdin else str(file), "--mmap"])
+
+        assert "--mmap cannot be used" in capsys.readouterr().err
+
+    def test_filter_and_split(self, raw_folder, tmp_path, vrt_two_paragraphs: str):
+        out = tmp_path / "out"
+
+        main([str(raw_folder), "-o", str(out), "--split", "--filter", "id=123", "-q"])
+
+        assert sorted(file.name for file in (out / "b").iterdir()) == [
+            "000001.txt",
+            "documents.jsonl",
+        ]
+        assert (out / "b" / "000001.txt").read_text(encoding="utf-8") == "".join(
+            iter_vrt_xml(vrt_two_paragraphs)
+        )
+        assert '"title": "Foo"' in (out / "b" / "documents.jsonl").read_text()
+
+    def test_split_requires_output(self, raw_folder):
+        with pytest.raises(SystemExit):
+            main([str(raw_folder), "--split"])
+
+    def test_zip_and_compressed_output(self, archive_and_text, tmp_path):
+        archive, expected = archive_and_text
+        out = tmp_path / "out"
+
+        main([str(archive), "-o", str(out), "--compress", "gz", "--threaded", "-q"])
+
+        assert [file.name for file in out.iterdir()] == ["b.txt.gz"]
+        assert gzip.decompress((out / "b.txt.gz").read_bytes()).decode() == expected
+
+    def test_resume(self, raw_folder, tmp_path, vrt_two_paragraphs: str, capsys):
+        out = tmp_path / "out"
+
+        main([str(raw_folder), "-o", str(out), "--resume"])
+        main([str(raw_folder), "-o", str(out), "--resume"])
+
+        assert (out / "b.txt").read_text(encoding="utf-8") == "".join(
+            iter_vrt_xml(vrt_two_paragraphs)
+        )
+        assert capsys.readouterr().err.count("up to date") == 2
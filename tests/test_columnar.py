@@ -0,0 +1,172 @@
+import pytest
+
+from src.vrt2txt.columnar import StringColumn, iter_vrt_token_batches
+from src.vrt2txt.errors import RejectLog
+from src.vrt2txt.stats import ConversionStats
+from src.vrt2txt.vrt2txt import iter_vrt_xml
+
+VRT = """<!-- #vrt positional-attributes: word lemma upos -->
+<doc id="1">
+<paragraph>
+<sentence>
+Tom	Tom	PROPN
+&amp;	&amp;	SYM
+Jerry	Jerry	PROPN
+lähti	lähteä	VERB
+(	(	PUNCT
+taas	taas	ADV
+)	)	PUNCT
+.	.	PUNCT
+</sentence>
+<sentence>
+&quot;Hei&quot;	&quot;hei&quot;	INTJ
+</sentence>
+</paragraph>
+</doc>
+<doc id="2">
+<paragraph>
+<sentence>
+Loppu	loppu	NOUN
+</sentence>
+</paragraph>
+</doc>
+"""
+
+
+class TestIterVrtTokenBatches:
+
+    @pytest.mark.parametrize("use_mmap", [False, True])
+    def test_columns(self, write_vrt, use_mmap):
+        file = write_vrt(VRT)
+
+        (batch,) = iter_vrt_token_batches(file, paragraphs=True, use_mmap=use_mmap)
+
+        assert len(batch) == 3
+        assert batch.num_tokens == 10
+        assert batch.sentence(0) == "Tom & Jerry lähti (taas)."
+        assert batch.sentence(1) == '"Hei"'
+        assert batch.tokens(0) == ["Tom", "&", "Jerry", "lähti", "(", "taas", ")", "."]
+        assert batch.tokens(1, "lemma") == ['"hei"']
+        assert batch.tokens(2, "upos") == ["NOUN"]
+        assert list(batch.columns) == ["word", "upos", "lemma"]
+        assert list(batch.token_offsets) == [0, 8, 9, 10]
+
+    def test_token_offsets(self, write_vrt):
+        file = write_vrt(VRT)
+
+        (batch,) = iter_vrt_token_batches(file, paragraphs=True)
+
+        words = batch.columns["word"]
+        for i in range(batch.num_tokens):
+            assert batch.text[batch.token_starts[i] : batch.token_ends[i]] == words[i]
+        assert batch.token_starts[8] == len("Tom & Jerry lähti (taas).")
+
+    @pytest.mark.parametrize("paragraphs", [False, True])
+    def test_same_sentences_as_iter_vrt_xml(
+        self, write_vrt, vrt_two_paragraphs: str, paragraphs
+    ):
+        file = write_vrt(vrt_two_paragraphs)
+        fragments = iter_vrt_xml(vrt_two_paragraphs, paragraphs=paragraphs)
+        expected = [fragment for fragment in fragments if fragment not in " \n"]
+
+        batches = list(
+            iter_vrt_token_batches(file, paragraphs=paragraphs, batch_tokens=1)
+        )
+
+        assert len(batches) == len(expected)
+        assert [batch.sentence(0) for batch in batches] == expected
+
+    def test_default_layout(self, write_vrt, vrt_two_paragraphs: str):
+        file = write_vrt(vrt_two_paragraphs)
+
+        (batch,) = iter_vrt_token_batches(
+            file, fields=["lemma", "feats"], paragraphs=True
+        )
+
+        assert list(batch.columns) == ["lemma", "feats"]
+        assert batch.tokens(1, "lemma")[-2] == "kilo#metri"
+        assert batch.tokens(1, "feats")[-2] == "Case=Par|Number=Sing"
+
+    def test_missing_column(self, write_vrt):
+        file = write_vrt(VRT)
+
+        with pytest.raises(ValueError, match="feats"):
+            list(iter_vrt_token_batches(file, fields=["feats"]))
+
+    def test_short_line(self, write_vrt):
+        file = write_vrt("<sentence>\n1\tA\ta\tX\t_\n2\tB\tb\tY\n</sentence>\n")
+
+        with pytest.raises(ValueError, match="Could not parse"):
+            list(iter_vrt_token_batches(file, fields=["word", "xpos"]))
+        (batch,) = iter_vrt_token_batches(
+            file, fields=["word", "xpos"], errors="skip-line"
+        )
+        assert batch.tokens(0) == ["A"]
+
+    @pytest.mark.parametrize("use_mmap", [False, True])
+    def test_skipped_sentences_and_documents(self, write_vrt, use_mmap):
+        contents = VRT.replace("Jerry\tJerry\tPROPN", "rikki").replace(
+            "Loppu\tloppu\tNOUN", "Loppu\tloppu\tNOUN\nLoppu2\tloppu2"
+        )
+        file = write_vrt(contents)
+
+        def collect(errors):
+            batches = iter_vrt_token_batches(
+                file, paragraphs=True, errors=errors, use_mmap=use_mmap
+            )
+            return [
+                batch.tokens(i, "lemma") for batch in batches for i in range(len(batch))
+            ]
+
+        assert collect("skip-sentence") == [['"hei"']]
+        assert collect("skip-document") == []
+
+    def test_batches(self, write_vrt):
+        file = write_vrt(VRT * 3)
+
+        batches = list(iter_vrt_token_batches(file, paragraphs=True, batch_tokens=5))
+
+        assert [batch.num_tokens for batch in batches] == [8, 10, 10, 2]
+        assert all(batch.sentence_offsets[0] == 0 for batch in batches)
+        assert "".join(batch.text for batch in batches) == 3 * (
+            'Tom & Jerry lähti (taas)."Hei"Loppu'
+        )
+
+    def test_stats_and_reject_log(self, write_vrt):
+        file = write_vrt(VRT.replace("taas\ttaas\tADV", "rikki"))
+        stats = ConversionStats()
+        reject_log = RejectLog()
+
+        list(
+            iter_vrt_token_batches(
+                file,
+                paragraphs=True,
+                stats=stats,
+                errors="skip-line",
+                reject_log=reject_log,
+            )
+        )
+
+        assert stats.sentences == 3
+        assert reject_log.lines == 1
+
+
+class TestStringColumn:
+
+    def test_strings(self):
+        column = StringColumn.from_strings(["kissa", "", "äiti"])
+
+        assert len(column) == 3
+        assert column[2] == column[-1] == "äiti"
+        assert list(column) == column.to_list() == ["kissa", "", "äiti"]
+        assert column.data == "kissaäiti".encode("utf-8")
+        assert list(column.offsets) == [0, 5, 5, 10]
+        with pytest.raises(IndexError):
+            column[3]
+
+    def test_buffers(self):
+        column = StringColumn.from_strings(["a", "bc"])
+
+        offsets = memoryview(column.offsets)
+
+        assert (offsets.format, offsets.itemsize) == ("i", 4)
@@ -0,0 +1,47 @@
+import pytest
+
+from src.vrt2txt.columns import Columns, read_columns
+
+
+class TestColumns:
+
+    def test_from_names(self):
+        columns = Columns.from_names(["word", "ref", "lemma", "lex/", "pos", "upos"])
+        assert columns == Columns(word=0, upos=5)
+
+    def test_from_names_pos_fallback(self):
+        assert Columns.from_names(["ref", "word", "pos"]) == Columns(word=1, upos=2)
+
+    def test_from_names_missing(self):
+        with pytest.raises(ValueError):
+            Columns.from_names(["ref", "lemma"])
+
+    def test_from_header(self):
+        header = "<!-- #vrt positional-attributes: ref word lemma upos -->"
+        assert Columns.from_header(header) == Columns(word=1, upos=3)
+
+    def test_position(self):
+        columns = Columns.from_names(["word", "lemma", "pos", "msd"])
+
+        assert columns.position("word") == 0
+        assert columns.position("upos") == 2
+        assert columns.position("msd") == 3
+        assert Columns().position("lemma") == 2
+        with pytest.raises(ValueError):
+            columns.position("feats")
+
+
+class TestReadColumns:
+
+    def test_header(self, tmp_path):
+        file = tmp_path / "corpus.VRT"
+        file.write_text(
+            "<!-- #vrt positional-attributes: word upos -->\n<text>\n"
+            "<sentence>\nMoi\tINTJ\n</sentence>\n</text>\n"
+        )
+        assert read_columns(file) == Columns(word=0, upos=1)
+
+    def test_no_header(self, tmp_path):
+        file = tmp_path / "corpus.VRT"
+        file.write_text("<sentence>\n1\tMoi\tmoi\tINTJ\t_\n</sentence>\n")
+        assert read_columns(file) is None
@@ -0,0 +1,159 @@
+import bz2
+import gzip
+import io
+import lzma
+import zipfile
+
+import pytest
+
+from src.vrt2txt.compression import (
+    ThreadedReader,
+    ZipMember,
+    get_compression,
+    get_text_name,
+    iter_zip_members,
+    open_binary,
+    open_vrt,
+)
+from src.vrt2txt.parallel import convert_folder, iter_vrt_file_parallel
+from src.vrt2txt.stream import convert, iter_vrt_file, iter_vrt_mmap
+from src.vrt2txt.vrt2txt import iter_vrt_xml
+
+DECOMPRESS = {"gz": gzip.decompress, "bz2": bz2.decompress, "xz": lzma.decompress}
+
+
+@pytest.fixture
+def archive(tmp_path, vrt_paragraph: str, vrt_two_paragraphs: str):
+    path = tmp_path / "corpus.zip"
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as f:
+        f.writestr("vrt/b.VRT", vrt_two_paragraphs)
+        f.writestr("vrt/a.VRT", vrt_paragraph)
+        f.writestr("readme.txt", "Not a VRT file")
+    return path
+
+
+class TestNames:
+
+    @pytest.mark.parametrize(
+        "name, compression",
+        [("a.VRT.gz", "gz"), ("a.vrt.BZ2", "bz2"), ("a.xz", "xz"), ("a.VRT", None)],
+    )
+    def test_get_compression(self, name, compression):
+        assert get_compression(name) == compression
+
+    @pytest.mark.parametrize(
+        "name, compression, expected",
+        [
+            ("raw/a.VRT", None, "a.txt"),
+            ("vrt/a.VRT.gz", None, "a.txt"),
+            ("a.VRT", "xz", "a.txt.xz"),
+        ],
+    )
+    def test_get_text_name(self, name, compression, expected):
+        assert get_text_name(name, compression) == expected
+
+
+class TestOpenBinary:
+
+    @pytest.mark.parametrize("compression", ["gz", "bz2", "xz"])
+    def test_round_trip(self, tmp_path, compression):
+        path = tmp_path / f"file.{compression}"
+
+        with open_binary(path, "wb") as f:
+            f.write(b"data")
+
+        assert DECOMPRESS[compression](path.read_bytes()) == b"data"
+        with open_binary(path) as f:
+            assert f.read() == b"data"
+
+    def test_unknown_compression(self, tmp_path):
+        with pytest.raises(ValueError):
+            open_binary(tmp_path / "file", "wb", compression="zst")
+
+
+class TestCompressedFiles:
+
+    @pytest.mark.parametrize("compression", ["gz", "bz2", "xz"])
+    def test_iter_vrt_file(self, tmp_path, vrt_two_paragraphs: str, compression):
+        path = tmp_path / f"corpus.VRT.{compression}"
+        with open_binary(path, "wb") as f:
+            f.write(vrt_two_paragraphs.encode())
+
+        result = list(iter_vrt_file(path, paragraphs=True))
+
+        assert result == list(iter_vrt_xml(vrt_two_paragraphs, paragraphs=True))
+
+    def test_convert_to_compressed(self, tmp_path, vrt_two_paragraphs: str):
+        src = tmp_path / "corpus.VRT"
+        src.write_text(vrt_two_paragraphs, encoding="utf-8")
+
+        convert(src, tmp_path / "corpus.txt.xz", paragraphs=True)
+
+        text = lzma.decompress((tmp_path / "corpus.txt.xz").read_bytes()).decode()
+        assert text == "".join(iter_vrt_xml(vrt_two_paragraphs, paragraphs=True))
+
+    def test_cannot_mmap_or_split(self, tmp_path, vrt_paragraph: str):
+        path = tmp_path / "corpus.VRT.gz"
+        path.write_bytes(gzip.compress(vrt_paragraph.encode()))
+
+        with pytest.raises(ValueError):
+            list(iter_vrt_mmap(path))
+        with pytest.raises(ValueError):
+            list(iter_vrt_file_parallel(path, workers=1))
+
+
+class TestZipArchives:
+
+    def test_iter_zip_members(self, archive):
+        assert iter_zip_members(archive) == [
+            ZipMember(archive, "vrt/a.VRT"),
+            ZipMember(archive, "vrt/b.VRT"),
+        ]
+
+    @pytest.mark.parametrize("threaded", [False, True])
+    def test_open_member(self, archive, vrt_two_paragraphs: str, threaded):
+        with open_vrt(ZipMember(archive, "vrt/b.VRT"), threaded=threaded) as f:
+            result = list(iter_vrt_file(f, paragraphs=True, chunk_size=7))
+
+        assert result == list(iter_vrt_xml(vrt_two_paragraphs, paragraphs=True))
+
+    def test_convert_folder(self, archive, tmp_path, vrt_paragraph: str):
+        files = convert_folder(archive, tmp_path / "out", workers=1, compression="gz")
+
+        assert [file.name for file in files] == ["a.txt.gz", "b.txt.gz"]
+        assert gzip.decompress(files[0].read_bytes()).decode() == "".join(
+            iter_vrt_xml(vrt_paragraph)
+        )
+
+
+class TestThreadedReader:
+
+    @pytest.mark.parametrize("size", [1, 3, 100, -1])
+    def test_read(self, size):
+        data = bytes(range(256)) * 10
+        reader = ThreadedReader(io.BytesIO(data), chunk_size=64, queue_size=2)
+
+        chunks = []
+        while chunk := reader.read(size):
+            chunks.append(chunk)
+        reader.close()
+
+        assert b"".join(chunks) == data
+
+    def test_error_is_raised_in_reader(self):
+        class Broken(io.BytesIO):
+            def read(self, size=-1):
+                raise OSError("broken")
+
+        with ThreadedReader(Broken()) as reader:
+            with pytest.raises(OSError, match="broken"):
+                reader.read(10)
+
+    def test_close_before_end(self):
+        raw = io.BytesIO(b"x" * 10000)
+        reader = ThreadedReader(raw, chunk_size=10, queue_size=1)
+
+        reader.read(5)
+        reader.close()
+
+        assert raw.closed
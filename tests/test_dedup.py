@@ -0,0 +1,267 @@
+import pytest
+
+from src.vrt2txt.cli import main
+from src.vrt2txt.dedup import (
+    BloomFilter,
+    Deduplicator,
+    DiskHashSet,
+    HashSet,
+    get_fingerprint,
+)
+from src.vrt2txt.errors import RejectLog
+from src.vrt2txt.parallel import convert_folder
+from src.vrt2txt.stream import convert, iter_vrt_file_blocks
+from src.vrt2txt.vrt2txt import iter_vrt_blocks, iter_vrt_xml
+
+SUBTITLES = """<!-- #vrt positional-attributes: word lemma upos -->
+<file id="1">
+<paragraph>
+<sentence>
+Kiitos	kiitos	NOUN
+.	.	PUNCT
+</sentence>
+<sentence>
+Mitä	mikä	PRON
+?	?	PUNCT
+</sentence>
+</paragraph>
+<paragraph>
+<sentence>
+Mitä	mikä	PRON
+?	?	PUNCT
+</sentence>
+</paragraph>
+<paragraph>
+<sentence>
+Kiitos	kiitos	NOUN
+.	.	PUNCT
+</sentence>
+<sentence>
+Hei	hei	INTJ
+</sentence>
+</paragraph>
+<paragraph>
+<sentence>
+Kiitos	kiitos	NOUN
+.	.	PUNCT
+</sentence>
+<sentence>
+Mitä	mikä	PRON
+?	?	PUNCT
+</sentence>
+</paragraph>
+</file>
+"""
+
+
+class TestDeduplicator:
+
+    def test_sentences(self):
+        dedup = Deduplicator()
+
+        fragments = list(iter_vrt_xml(SUBTITLES, paragraphs=True, dedup=dedup))
+
+        assert fragments == ["Kiitos.", " ", "Mitä?", "\n", "Hei", "\n"]
+        assert (dedup.items, dedup.dropped) == (7, 4)
+
+    def test_sentences_without_paragraphs(self):
+        dedup = Deduplicator()
+
+        text = "".join(iter_vrt_xml(SUBTITLES, dedup=dedup))
+
+        assert text == "Kiitos. Mitä? Hei\n"
+
+    def test_paragraphs(self):
+        dedup = Deduplicator("paragraph")
+
+        fragments = list(iter_vrt_xml(SUBTITLES, paragraphs=True, dedup=dedup))
+
+        assert "".join(fragments) == "Kiitos. Mitä?\nMitä?\nKiitos. Hei\n"
+        assert fragments[:4] == ["Kiitos.", " ", "Mitä?", "\n"]
+        assert (dedup.items, dedup.dropped) == (4, 1)
+
+    @pytest.mark.parametrize("block_size", [0, 1, 10, 1024])
+    @pytest.mark.parametrize("unit", ["sentence", "paragraph"])
+    def test_blocks(self, block_size, unit):
+        expected = "".join(
+            iter_vrt_xml(SUBTITLES, paragraphs=True, dedup=Deduplicator(unit))
+        )
+
+        blocks = list(
+            iter_vrt_blocks(
+                SUBTITLES,
+                paragraphs=True,
+                block_size=block_size,
+                dedup=Deduplicator(unit),
+            )
+        )
+
+        assert "".join(blocks) == expected
+        if block_size == 0:
+            assert all(block.endswith("\n") for block in blocks)
+
+    def test_paragraphs_require_paragraphs(self):
+        with pytest.raises(ValueError, match="paragraphs=True"):
+            list(iter_vrt_xml(SUBTITLES, dedup=Deduplicator("paragraph")))
+
+    def test_unknown_unit(self):
+        with pytest.raises(ValueError, match="Unknown unit"):
+            Deduplicator("word")
+
+    def test_across_files(self):
+        dedup = Deduplicator()
+        list(iter_vrt_xml(SUBTITLES, paragraphs=True, dedup=dedup))
+
+        # A duplicated file: all the paragraphs are left out, without an error
+        # about paragraphs without sentences.
+        assert list(iter_vrt_xml(SUBTITLES, paragraphs=True, dedup=dedup)) == []
+        assert list(iter_vrt_xml(SUBTITLES, dedup=dedup)) == []
+
+    def test_rejected_documents_are_not_seen(self):
+        malformed = SUBTITLES.replace("Hei\thei\tINTJ", "rikki")
+        dedup = Deduplicator()
+
+        first = "".join(
+            iter_vrt_xml(
+                malformed, paragraphs=True, errors="skip-document", dedup=dedup
+            )
+        )
+        second = "".join(
+            iter_vrt_xml(
+                SUBTITLES, paragraphs=True, errors="skip-document", dedup=dedup
+            )
+        )
+
+        assert first == ""
+        assert second == "Kiitos. Mitä?\nHei\n"
+
+    def test_stream(self, tmp_path):
+        file = tmp_path / "a.VRT"
+        file.write_text(SUBTITLES, encoding="utf-8")
+        expected = "".join(
+            iter_vrt_xml(SUBTITLES, paragraphs=True, dedup=Deduplicator())
+        )
+
+        for use_mmap in [False, True]:
+            convert(
+                file,
+                tmp_path / "a.txt",
+                paragraphs=True,
+                use_mmap=use_mmap,
+                dedup=Deduplicator(),
+            )
+            assert (tmp_path / "a.txt").read_text(encoding="utf-8") == expected
+        blocks = iter_vrt_file_blocks(file, paragraphs=True, dedup=Deduplicator())
+        assert "".join(blocks) == expected
+
+    def test_convert_folder(self, tmp_path):
+        folder = tmp_path / "raw"
+        folder.mkdir()
+        (folder / "a.VRT").write_text(SUBTITLES, encoding="utf-8")
+        (folder / "b.VRT").write_text(SUBTITLES, encoding="utf-8")
+        dedup = Deduplicator()
+
+        written = convert_folder(folder, tmp_path / "out", paragraphs=True, dedup=dedup)
+
+        assert written[0].read_text(encoding="utf-8") == "Kiitos. Mitä?\nHei\n"
+        assert written[1].read_text(encoding="utf-8") == ""
+        assert dedup.dropped == 4 + 7
+
+
+class TestIndexes:
+
+    def test_hash_set(self, tmp_path):
+        hash_set = HashSet(capacity=4)
+
+        assert all(hash_set.add(key) for key in range(1, 1001))
+        assert not any(hash_set.add(key) for key in range(1, 1001))
+        assert len(hash_set) == 1000
+        assert 1000 in hash_set and 1001 not in hash_set
+
+        hash_set.save(tmp_path / "seen.bin.gz")
+        loaded = HashSet.load(tmp_path / "seen.bin.gz")
+        assert len(loaded) == 1000 and 2**64 - 1 not in loaded
+
+    def test_disk_hash_set(self, tmp_path):
+        path = tmp_path / "seen.sqlite"
+        hash_set = DiskHashSet(path)
+        assert hash_set.add(2**64 - 1)
+        assert not hash_set.add(2**64 - 1)
+        hash_set.close()
+
+        # The fingerprints are kept across runs.
+        with Deduplicator(index=DiskHashSet(path)) as dedup:
+            assert 2**64 - 1 in dedup.index
+            list(iter_vrt_xml(SUBTITLES, dedup=dedup))
+        with Deduplicator(index=DiskHashSet(path)) as dedup:
+            assert list(iter_vrt_xml(SUBTITLES, dedup=dedup)) == []
+
+    @pytest.mark.parametrize("file_backed", [False, True])
+    def test_bloom_filter(self, tmp_path, file_backed):
+        path = tmp_path / "seen.bloom" if file_backed else None
+        bloom = BloomFilter(1000, error_rate=0.01, path=path)
+
+        keys = [get_fingerprint(str(i)) for i in range(11000)]
+
+        assert sum(bloom.add(key) for key in keys[:1000]) > 980
+        assert all(key in bloom for key in keys[:1000])
+        assert sum(key in bloom for key in keys[1000:]) < 300
+        bloom.close()
+
+        if file_backed:
+            # The size is read from the file.
+            reopened = BloomFilter(10, path=path)
+            assert reopened.num_bits == bloom.num_bits
+            assert keys[999] in reopened
+            reopened.close()
+
+
+class TestCommandLine:
+
+    def test_dedup(self, tmp_path, capsys):
+        folder = tmp_path / "raw"
+        folder.mkdir()
+        (folder / "a.VRT").write_text(SUBTITLES, encoding="utf-8")
+        (folder / "b.VRT").write_text(SUBTITLES, encoding="utf-8")
+        out = tmp_path / "out"
+
+        main([str(folder), "-o", str(out), "--paragraphs", "--dedup", "sentence"])
+
+        assert (out / "a.txt").read_text(encoding="utf-8") == "Kiitos. Mitä?\nHei\n"
+        assert (out / "b.txt").read_text(encoding="utf-8") == ""
+        assert "duplicates: 11 of 14 sentences dropped" in capsys.readouterr().err
+
+    @pytest.mark.parametrize("bloom", [False, True])
+    def test_index_across_runs(self, tmp_path, bloom):
+        file = tmp_path / "a.VRT"
+        file.write_text(SUBTITLES, encoding="utf-8")
+        args = [str(file), "-o", str(tmp_path / "out"), "-q", "--paragraphs"]
+        args += ["--dedup", "paragraph", "--dedup-index", str(tmp_path / "seen")]
+        if bloom:
+            args += ["--dedup-bloom", "1000"]
+
+        main(args)
+        main(args)
+
+        assert (tmp_path / "out" / "a.txt").read_text(encoding="utf-8") == ""
+
+    def test_dedup_with_workers(self, tmp_path):
+        with pytest.raises(SystemExit):
+            main(["-", "--dedup", "sentence", "-j", "2"])
+
+
+def test_reject_log_unchanged():
+    # The deduplicated sentences are not rejections.
+    reject_log = RejectLog()
+
+    list(
+        iter_vrt_xml(
+            SUBTITLES,
+            paragraphs=True,
+            errors="skip-sentence",
+            reject_log=reject_log,
+            dedup=Deduplicator(),
+        )
+    )
+
+    assert reject_log.errors == 0
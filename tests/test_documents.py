@@ -0,0 +1,207 @@
+import io
+
+import pytest
+
+from src.vrt2txt.documents import AttributeFilter, Document, parse_attributes
+from src.vrt2txt.parallel import convert_folder
+from src.vrt2txt.stream import convert, iter_vrt_documents, iter_vrt_mmap
+from src.vrt2txt.vrt2txt import iter_vrt_blocks, iter_vrt_xml
+
+
+@pytest.fixture
+def vrt_two_files():
+    return """
+    <!-- #vrt positional-attributes: ref word lemma upos -->
+    <file id="1" year="1999" genre="Comedy,Romance" title="A &amp; B">
+    <sentence>
+    1	Hei	hei	INTJ
+    2	!	!	PUNCT
+    </sentence>
+    <sentence>
+    1	Mitä	mikä	PRON
+    2	?	?	PUNCT
+    </sentence>
+    </file>
+    <file id="2" year="2012" genre="Comedy">
+    <sentence>
+    1	Kiitos	kiitos	NOUN
+    2	.	.	PUNCT
+    </sentence>
+    </file>
+    """
+
+
+class TestParseAttributes:
+
+    def test_attributes(self):
+        tag = '<file id="123" genre="Comedy,Romance" duration= "NaN">'
+
+        assert parse_attributes(tag) == {
+            "id": "123",
+            "genre": "Comedy,Romance",
+            "duration": "NaN",
+        }
+
+    def test_entities(self):
+        assert parse_attributes('<doc title="A &amp; B &quot;C&quot;">') == {
+            "title": 'A & B "C"'
+        }
+
+    def test_document_from_tag(self):
+        document = Document.from_tag('  <doc id="1" url="https://x">\n')
+
+        assert document.tag == "doc"
+        assert document.get("url") == "https://x"
+        assert document.get("title") is None
+
+
+class TestAttributeFilter:
+
+    @pytest.mark.parametrize(
+        "expression, expected",
+        [
+            ("year=1999", True),
+            ("year!=1999", False),
+            ("genre~Romance", True),
+            ("genre!~Romance", False),
+            ("year>1998", True),
+            ("year>=2000", False),
+            ("year<2000.5", True),
+            ("year<=1998", False),
+            ("country=USA", False),  # missing attribute
+            ("duration>0", False),  # not a number
+        ],
+    )
+    def test_conditions(self, expression, expected):
+        document = Document(
+            "file", {"year": "1999", "genre": "Comedy,Romance", "duration": "NaN"}
+        )
+
+        assert AttributeFilter(expression)(document) is expected
+
+    def test_all_conditions_must_match(self):
+        document = Document("file", {"year": "2012", "genre": "Comedy"})
+
+        assert AttributeFilter("year>2010", genre="Comedy")(document)
+        assert not AttributeFilter("year>2010", genre="Drama")(document)
+
+    @pytest.mark.parametrize("expression", ["year", "year>new", "=1999"])
+    def test_invalid(self, expression):
+        with pytest.raises(ValueError):
+            AttributeFilter(expression)
+
+
+class TestDocumentFilter:
+
+    def test_skips_documents(self, vrt_two_files: str):
+        result = "".join(
+            iter_vrt_xml(vrt_two_files, document_filter=AttributeFilter("year>2000"))
+        )
+
+        assert result == "Kiitos.\n"
+
+    def test_same_as_without_filter(self, vrt_two_files: str):
+        accept_all = AttributeFilter()
+
+        result = list(iter_vrt_xml(vrt_two_files, document_filter=accept_all))
+
+        assert result == list(iter_vrt_xml(vrt_two_files))
+
+    def test_rejected_documents_are_not_parsed(self):
+        # The token line of the rejected document could not be parsed.
+        contents = (
+            '<doc id="1">\n<sentence>\nbroken line\n</sentence>\n</doc>\n'
+            '<doc id="2">\n<sentence>\n1\tOk\tok\tINTJ\n</sentence>\n</doc>\n'
+        )
+
+        blocks = iter_vrt_blocks(contents, document_filter=AttributeFilter(id="2"))
+
+        assert "".join(blocks) == "Ok\n"
+
+    def test_mmap(self, vrt_two_files: str, tmp_path):
+        file = tmp_path / "corpus.VRT"
+        file.write_text(vrt_two_files, encoding="utf-8")
+        document_filter = AttributeFilter("genre~Romance")
+
+        result = "".join(iter_vrt_mmap(file, document_filter=document_filter))
+
+        assert result == "Hei! Mitä?\n"
+
+    def test_convert_folder(self, vrt_two_files: str, tmp_path):
+        (tmp_path / "raw").mkdir()
+        (tmp_path / "raw" / "a.VRT").write_text(vrt_two_files, encoding="utf-8")
+
+        (file,) = convert_folder(
+            tmp_path / "raw",
+            tmp_path / "out",
+            document_filter=AttributeFilter(id="2"),
+            workers=1,
+        )
+
+        assert file.read_text(encoding="utf-8") == "Kiitos.\n"
+
+
+class TestIterVrtDocuments:
+
+    @pytest.mark.parametrize("use_mmap", [False, True])
+    def test_documents(self, vrt_two_files: str, tmp_path, use_mmap):
+        file = tmp_path / "corpus.VRT"
+        file.write_text(vrt_two_files, encoding="utf-8")
+
+        documents = list(iter_vrt_documents(file, use_mmap=use_mmap))
+
+        assert [document.text for document in documents] == [
+            "Hei! Mitä?\n",
+            "Kiitos.\n",
+        ]
+        assert documents[0].tag == "file"
+        assert documents[0].attributes["title"] == "A & B"
+
+    def test_filter(self, vrt_two_files: str):
+        documents = iter_vrt_documents(
+            io.StringIO(vrt_two_files), document_filter=AttributeFilter("year<2000")
+        )
+
+        assert [document.get("id") for document in documents] == ["1"]
+
+    def test_paragraphs(self, vrt_two_paragraphs: str):
+        (document,) = iter_vrt_documents(
+            io.StringIO(vrt_two_paragraphs), paragraphs=True
+        )
+
+        assert document.get("title") == "Foo"
+        assert document.text == "".join(
+            iter_vrt_xml(vrt_two_paragraphs, paragraphs=True)
+        )
+
+    def test_unclosed_document(self, vrt_two_files_two_sentences: str):
+        # The closing </file> tag is not on its own line, so the first document
+        # continues until the end.
+        documents = list(iter_vrt_documents(io.StringIO(vrt_two_files_two_sentences)))
+
+        assert [document.get("id") for document in documents] == ["123"]
+        assert documents[0].text == "".join(iter_vrt_xml(vrt_two_files_two_sentences))
+
+    def test_text_outside_documents(self, vrt_two_files: str):
+        contents = "<sentence>\n1\tHei\thei\tINTJ\n</sentence>\n" + vrt_two_files
+
+        documents = list(iter_vrt_documents(io.StringIO(contents)))
+
+        assert [document.tag for document in documents] == ["", "file", "file"]
+        assert documents[0].text == "Hei\n"
+
+    def test_empty_document(self):
+        contents = '<doc id="1">\n</doc>\n'
+
+        (document,) = iter_vrt_documents(io.StringIO(contents))
+
+        assert document.text == ""
+
+    def test_convert(self, vrt_two_files: str):
+        dst = io.StringIO()
+
+        convert(
+            io.StringIO(vrt_two_files), dst, document_filter=AttributeFilter(id="1")
+        )
+
+        assert dst.getvalue() == "Hei! Mitä?\n"
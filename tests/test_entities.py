@@ -0,0 +1,26 @@
+import html
+
+import pytest
+
+from src.vrt2txt.entities import VRT_ENTITIES, unescape_vrt
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("AT&amp;T", "AT&T"),
+        ("&lt;3 &quot;x&quot; &apos;y&apos; &gt;", "<3 \"x\" 'y' >"),
+        # Decoded once, like html.unescape.
+        ("&amp;lt;", "&lt;"),
+        ("&amp;amp;", "&amp;"),
+        # Other HTML entities are left as they are.
+        ("&auml;", "&auml;"),
+    ],
+)
+def test_unescape_vrt(text, expected):
+    assert unescape_vrt(text) == expected
+
+
+def test_same_as_html():
+    for entity, character in VRT_ENTITIES.items():
+        assert html.unescape(entity) == character
@@ -0,0 +1,251 @@
+import io
+import json
+
+import pytest
+
+from src.vrt2txt.errors import RejectLog
+from src.vrt2txt.parallel import convert_folder, iter_vrt_file_parallel
+from src.vrt2txt.stream import iter_vrt_file, iter_vrt_mmap
+from src.vrt2txt.vrt2txt import iter_vrt_blocks, iter_vrt_xml
+
+VRT = """<file id="1">
+<paragraph>
+<sentence>
+1	Hyvä	hyvä	ADJ
+2	.	.	PUNCT
+</sentence>
+</paragraph>
+</file>
+<file id="2">
+<paragraph>
+<sentence>
+1	Huono	huono	ADJ
+rikki
+2	.	.	PUNCT
+</sentence>
+<sentence>
+1	Toinen	toinen	ADJ
+</sentence>
+</paragraph>
+<paragraph>
+</paragraph>
+</file>
+<file id="3">
+<paragraph>
+<sentence>
+1	Loppu	loppu	NOUN
+</sentence>
+</paragraph>
+</file>
+"""
+
+
+class TestErrorPolicies:
+
+    def test_strict(self):
+        with pytest.raises(ValueError, match="rikki"):
+            list(iter_vrt_xml(VRT, paragraphs=True))
+
+    @pytest.mark.parametrize(
+        "errors, expected",
+        [
+            ("skip-line", "Hyvä.\nHuono. Toinen\nLoppu\n"),
+            ("skip-sentence", "Hyvä.\nToinen\nLoppu\n"),
+            ("skip-document", "Hyvä.\nLoppu\n"),
+        ],
+    )
+    def test_paragraphs(self, errors, expected):
+        text = "".join(iter_vrt_xml(VRT, paragraphs=True, errors=errors))
+
+        assert text == expected
+
+    @pytest.mark.parametrize(
+        "errors, expected",
+        [
+            ("skip-line", "Hyvä. Huono. Toinen Loppu\n"),
+            ("skip-sentence", "Hyvä. Toinen Loppu\n"),
+            ("skip-document", "Hyvä. Loppu\n"),
+        ],
+    )
+    def test_sentences(self, errors, expected):
+        text = "".join(iter_vrt_xml(VRT, errors=errors))
+
+        assert text == expected
+
+    @pytest.mark.parametrize("block_size", [0, 1, 1000])
+    @pytest.mark.parametrize("paragraphs", [False, True])
+    def test_blocks_same_as_fragments(self, block_size, paragraphs):
+        expected = "".join(
+            iter_vrt_xml(VRT, paragraphs=paragraphs, errors="skip-document")
+        )
+
+        blocks = iter_vrt_blocks(
+            VRT, paragraphs=paragraphs, block_size=block_size, errors="skip-document"
+        )
+
+        assert "".join(blocks) == expected
+
+    def test_skip_document_outside_of_documents(self):
+        contents = (
+            "<sentence>\n1\tA\ta\tX\n</sentence>\n<sentence>\nrikki\n</sentence>\n"
+        )
+
+        text = "".join(iter_vrt_xml(contents, errors="skip-document"))
+
+        assert text == "A\n"
+
+    def test_all_sentences_skipped(self):
+        reject_log = RejectLog()
+
+        text = "".join(
+            iter_vrt_xml(
+                "<sentence>\nrikki\n</sentence>\n",
+                errors="skip-sentence",
+                reject_log=reject_log,
+            )
+        )
+
+        assert text == ""
+        assert reject_log.sentences == 1
+
+    def test_unknown_policy(self):
+        with pytest.raises(ValueError, match="Unknown error policy"):
+            iter_vrt_xml(VRT, errors="ignore")
+
+
+class TestRejectLog:
+
+    def test_records(self):
+        file = io.StringIO()
+        reject_log = RejectLog(file, source="corpus.VRT")
+
+        list(
+            iter_vrt_xml(
+                VRT, paragraphs=True, errors="skip-line", reject_log=reject_log
+            )
+        )
+
+        assert (reject_log.lines, reject_log.paragraphs) == (1, 1)
+        assert reject_log.errors == 2
+        first, second = reject_log.records
+        assert first["source"] == "corpus.VRT"
+        assert first["line"] == 13
+        assert VRT.encode()[first["offset"] :].startswith(b"rikki\n")
+        assert first["skipped"] == "line"
+        assert second["line"] == 21
+        assert second["skipped"] == "paragraph"
+        assert [json.loads(line) for line in file.getvalue().splitlines()] == [
+            first,
+            second,
+        ]
+
+    def test_max_records(self):
+        reject_log = RejectLog(max_records=1)
+
+        list(
+            iter_vrt_xml(
+                VRT, paragraphs=True, errors="skip-line", reject_log=reject_log
+            )
+        )
+
+        assert reject_log.errors == 2
+        assert len(reject_log.records) == 1
+
+    def test_mmap_offsets_are_bytes(self, tmp_path):
+        file = tmp_path / "corpus.VRT"
+        file.write_text(VRT, encoding="utf-8")
+        reject_log = RejectLog()
+
+        list(
+            iter_vrt_mmap(
+                file, paragraphs=True, errors="skip-document", reject_log=reject_log
+            )
+        )
+
+        (record,) = reject_log.records
+        assert record["skipped"] == "document"
+        assert file.read_bytes()[record["offset"] :].startswith(b"rikki\n")
+
+    @pytest.mark.parametrize("encoding", ["utf-8", "latin-1"])
+    @pytest.mark.parametrize("newline", ["\n", "\r\n"])
+    @pytest.mark.parametrize("iterate", [iter_vrt_file, iter_vrt_mmap])
+    def test_offsets_in_file(self, tmp_path, encoding, newline, iterate):
+        # The offsets are bytes of the file, after the non-ASCII words and
+        # with the whole line ends.
+        contents = VRT.replace("\n", newline).encode(encoding)
+        file = tmp_path / "corpus.VRT"
+        file.write_bytes(contents)
+        reject_log = RejectLog()
+
+        list(
+            iterate(
+                file,
+                paragraphs=True,
+                errors="skip-line",
+                reject_log=reject_log,
+                encoding=encoding,
+            )
+        )
+
+        first, second = reject_log.records
+        assert first["line"] == 13
+        assert contents[first["offset"] :].startswith(b"rikki" + newline.encode())
+        assert second["line"] == 21
+        assert contents[: second["offset"]].count(newline.encode()) == 20
+
+
+class TestParallelErrors:
+
+    @pytest.mark.parametrize("errors", ["skip-line", "skip-sentence", "skip-document"])
+    @pytest.mark.parametrize("paragraphs", [False, True])
+    def test_same_as_iter_vrt_xml(self, tmp_path, errors, paragraphs):
+        file = tmp_path / "corpus.VRT"
+        file.write_text(VRT * 3, encoding="utf-8")
+        expected_log = RejectLog()
+        expected = "".join(
+            iter_vrt_xml(
+                VRT * 3, paragraphs=paragraphs, errors=errors, reject_log=expected_log
+            )
+        )
+        reject_log = RejectLog()
+
+        text = "".join(
+            iter_vrt_file_parallel(
+                file,
+                paragraphs=paragraphs,
+                workers=2,
+                chunk_size=50,
+                errors=errors,
+                reject_log=reject_log,
+            )
+        )
+
+        assert text == expected
+        assert reject_log.errors == expected_log.errors
+        contents = file.read_bytes()
+        for record in reject_log.records:
+            assert record["line"] is None
+            if record["error"].startswith("Could not parse"):
+                assert contents[record["offset"] :].startswith(b"rikki\n")
+
+    def test_convert_folder(self, tmp_path):
+        folder = tmp_path / "raw"
+        folder.mkdir()
+        (folder / "a.VRT").write_text(VRT, encoding="utf-8")
+        reject_log = RejectLog()
+
+        convert_folder(
+            folder,
+            tmp_path / "out",
+            paragraphs=True,
+            workers=1,
+            errors="skip-document",
+            reject_log=reject_log,
+        )
+
+        assert (tmp_path / "out" / "a.txt").read_text(encoding="utf-8") == (
+            "Hyvä.\nLoppu\n"
+        )
+        assert reject_log.documents == 1
+        assert reject_log.records[0]["source"] == str(folder / "a.VRT")
+        assert reject_log.records[0]["line"] == 13
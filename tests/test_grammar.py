@@ -0,0 +1,195 @@
+import pickle
+
+import pytest
+
+from src.vrt2txt.grammar import StructureGrammar, get_grammar
+from src.vrt2txt.index import build_index
+from src.vrt2txt.parallel import iter_vrt_file_parallel
+from src.vrt2txt.stream import iter_vrt_documents, iter_vrt_mmap
+from src.vrt2txt.vrt2txt import iter_vrt_blocks, iter_vrt_xml
+
+# A Kielipankki style corpus: the structures have attributes, and the second
+# text has no paragraphs.
+CORPUS = """<!-- #vrt positional-attributes: word lemma upos -->
+<text id="1">
+<paragraph id="1" type="heading">
+<sentence id="1">
+Otsikko	otsikko	NOUN
+</sentence>
+</paragraph>
+<paragraph id="2">
+<sentence id="2">
+Hei	hei	INTJ
+!	!	PUNCT
+</sentence>
+<sentence id="3">
+Mitä	mikä	PRON
+kuuluu	kuulua	VERB
+?	?	PUNCT
+</sentence>
+</paragraph>
+</text>
+<text id="2">
+<sentence id="4">
+Ei	ei	VERB
+mitään	mikään	PRON
+.	.	PUNCT
+</sentence>
+<sentence id="5">
+Kiitos	kiitos	NOUN
+</sentence>
+</text>
+"""
+
+
+class TestStructureGrammar:
+
+    def test_tags_with_attributes(self):
+        text = "".join(iter_vrt_xml(CORPUS, paragraphs=True))
+
+        # The sentences outside of paragraphs are left out by default.
+        assert text == "Otsikko\nHei! Mitä kuuluu?\n"
+        text = "".join(iter_vrt_xml(CORPUS))
+        assert text == "Otsikko Hei! Mitä kuuluu? Ei mitään. Kiitos\n"
+
+    def test_optional_paragraphs(self):
+        grammar = StructureGrammar(optional_paragraphs=True)
+
+        fragments = list(iter_vrt_xml(CORPUS, paragraphs=True, grammar=grammar))
+
+        assert "".join(fragments) == "Otsikko\nHei! Mitä kuuluu?\nEi mitään. Kiitos\n"
+        assert fragments[-4:] == ["Ei mitään.", " ", "Kiitos", "\n"]
+
+    def test_implicit_paragraphs_end_at_paragraphs(self):
+        contents = (
+            "<text>\n"
+            "<sentence>\n1\tEi\tei\tVERB\n</sentence>\n"
+            "<paragraph>\n<sentence>\n1\tKyllä\tkyllä\tADV\n</sentence>\n"
+            "</paragraph>\n"
+            "<sentence>\n1\tEhkä\tehkä\tADV\n</sentence>\n"
+            "</text>\n"
+        )
+        grammar = StructureGrammar(optional_paragraphs=True)
+
+        text = "".join(iter_vrt_xml(contents, paragraphs=True, grammar=grammar))
+
+        assert text == "Ei\nKyllä\nEhkä\n"
+
+    @pytest.mark.parametrize("block_size", [0, 10, 1024])
+    def test_blocks(self, block_size):
+        grammar = StructureGrammar(optional_paragraphs=True)
+        expected = "".join(iter_vrt_xml(CORPUS, paragraphs=True, grammar=grammar))
+
+        blocks = iter_vrt_blocks(
+            CORPUS, paragraphs=True, block_size=block_size, grammar=grammar
+        )
+
+        assert "".join(blocks) == expected
+
+    def test_tag_names(self):
+        contents = (
+            CORPUS.replace("sentence", "s")
+            .replace("paragraph", "p")
+            # Both names of the sentences in the same file
+            .replace('<s id="5">', '<sentence id="5">', 1)
+            .replace("Kiitos\tkiitos\tNOUN\n</s>", "Kiitos\tkiitos\tNOUN\n</sentence>")
+        )
+        grammar = StructureGrammar(("s", "sentence"), "p", optional_paragraphs=True)
+        expected = "".join(
+            iter_vrt_xml(
+                CORPUS,
+                paragraphs=True,
+                grammar=StructureGrammar(optional_paragraphs=True),
+            )
+        )
+
+        text = "".join(iter_vrt_xml(contents, paragraphs=True, grammar=grammar))
+        assert text == expected
+        assert (
+            "".join(iter_vrt_xml(contents, "s", "p"))
+            == "Otsikko Hei! Mitä kuuluu? Ei mitään.\n"
+        )
+
+    def test_skip_document(self):
+        malformed = CORPUS.replace("Kiitos\tkiitos\tNOUN", "rikki")
+        grammar = StructureGrammar(optional_paragraphs=True)
+
+        text = "".join(
+            iter_vrt_xml(
+                malformed, paragraphs=True, errors="skip-document", grammar=grammar
+            )
+        )
+
+        assert text == "Otsikko\nHei! Mitä kuuluu?\n"
+
+    def test_pickle(self):
+        grammar = StructureGrammar(("s", "sentence"), optional_paragraphs=True)
+        grammar.get_tags("utf-8")
+
+        unpickled = pickle.loads(pickle.dumps(grammar))
+
+        assert unpickled == grammar
+        assert unpickled.get_tags("utf-8") == grammar.get_tags("utf-8")
+        assert "optional_paragraphs=True" in repr(unpickled)
+
+    def test_get_grammar_is_cached(self):
+        assert get_grammar("s", "p") is get_grammar("s", "p")
+        assert get_grammar() == StructureGrammar()
+        assert get_grammar("s", "p") != StructureGrammar("s", "p", ())
+
+    def test_no_tags(self):
+        with pytest.raises(ValueError):
+            StructureGrammar(())
+
+
+class TestFiles:
+
+    @pytest.fixture
+    def vrt_file(self, tmp_path):
+        file = tmp_path / "corpus.VRT"
+        file.write_text(CORPUS * 3, encoding="utf-8")
+        return file
+
+    @pytest.fixture
+    def grammar(self):
+        return StructureGrammar(optional_paragraphs=True)
+
+    def test_mmap(self, vrt_file, grammar):
+        expected = "".join(iter_vrt_xml(CORPUS * 3, paragraphs=True, grammar=grammar))
+
+        text = "".join(iter_vrt_mmap(vrt_file, paragraphs=True, grammar=grammar))
+
+        assert text == expected
+
+    @pytest.mark.parametrize("chunk_size", [1, 300, 1024 * 1024])
+    @pytest.mark.parametrize("paragraphs", [False, True])
+    def test_parallel(self, vrt_file, grammar, chunk_size, paragraphs):
+        expected = "".join(
+            iter_vrt_xml(CORPUS * 3, paragraphs=paragraphs, grammar=grammar)
+        )
+
+        text = "".join(
+            iter_vrt_file_parallel(
+                vrt_file,
+                paragraphs=paragraphs,
+                workers=2,
+                chunk_size=chunk_size,
+                grammar=grammar,
+            )
+        )
+
+        assert text == expected
+
+    def test_documents(self, vrt_file, grammar):
+        documents = list(iter_vrt_documents(vrt_file, paragraphs=True, grammar=grammar))
+
+        assert [document.get("id") for document in documents] == ["1", "2"] * 3
+        assert documents[1].text == "Ei mitään. Kiitos\n"
+
+    def test_index(self, vrt_file):
+        with build_index(vrt_file) as index:
+            assert index.num_documents == 6
+            assert index.num_paragraphs == 6
+            assert index.num_sentences == 15
+            assert index.sentence(3) == "Ei mitään."
+            assert index.paragraph(1) == "Hei! Mitä kuuluu?"
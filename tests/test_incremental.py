@@ -0,0 +1,145 @@
+import os
+
+import pytest
+
+from src.vrt2txt import incremental, parallel
+from src.vrt2txt.incremental import (
+    CHECKPOINT_SUFFIX,
+    MANIFEST_NAME,
+    Manifest,
+    convert_folder_incremental,
+    convert_incremental,
+)
+from src.vrt2txt.vrt2txt import iter_vrt_xml
+
+
+class Crash(Exception):
+    pass
+
+
+class TestConvertFolderIncremental:
+
+    def test_skips_unchanged_files(self, raw_folder, tmp_path):
+        out = tmp_path / "out"
+
+        first = convert_folder_incremental(raw_folder, out, workers=1)
+        second = convert_folder_incremental(raw_folder, out, workers=1)
+
+        assert [file.name for file in first] == ["a.txt", "b.txt"]
+        assert second == []
+        assert (out / MANIFEST_NAME).exists()
+
+    def test_converts_changed_files(self, raw_folder, tmp_path, vrt_paragraph: str):
+        out = tmp_path / "out"
+        convert_folder_incremental(raw_folder, out, workers=1)
+
+        (raw_folder / "b.VRT").write_text(vrt_paragraph, encoding="utf-8")
+        converted = convert_folder_incremental(raw_folder, out, workers=1)
+
+        assert [file.name for file in converted] == ["b.txt"]
+        assert (out / "b.txt").read_text(encoding="utf-8") == "".join(
+            iter_vrt_xml(vrt_paragraph)
+        )
+
+    def test_touched_file_is_hashed(self, raw_folder, tmp_path):
+        out = tmp_path / "out"
+        convert_folder_incremental(raw_folder, out, workers=1)
+
+        stat = os.stat(raw_folder / "a.VRT")
+        os.utime(raw_folder / "a.VRT", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        assert convert_folder_incremental(raw_folder, out, workers=1) == []
+
+    def test_options_change(self, raw_folder, tmp_path):
+        out = tmp_path / "out"
+        convert_folder_incremental(raw_folder, out, workers=1)
+
+        converted = convert_folder_incremental(
+            raw_folder, out, paragraphs=True, workers=1
+        )
+
+        assert len(converted) == 2
+
+    def test_damaged_output(self, raw_folder, tmp_path):
+        out = tmp_path / "out"
+        convert_folder_incremental(raw_folder, out, workers=1)
+
+        (out / "a.txt").write_text("x", encoding="utf-8")
+        # Same size, different contents: found only when verifying.
+        text = (out / "b.txt").read_text(encoding="utf-8")
+        (out / "b.txt").write_text(text.upper(), encoding="utf-8")
+
+        assert [
+            f.name for f in convert_folder_incremental(raw_folder, out, workers=1)
+        ] == ["a.txt"]
+        assert [
+            f.name
+            for f in convert_folder_incremental(raw_folder, out, workers=1, verify=True)
+        ] == ["b.txt"]
+
+
+class TestResume:
+
+    @pytest.fixture
+    def big_vrt(self, tmp_path, paragraph1: str):
+        file = tmp_path / "big.VRT"
+        file.write_text(f"<doc>\n{paragraph1 * 20}\n</doc>\n", encoding="utf-8")
+        return file
+
+    @pytest.mark.parametrize("paragraphs", [False, True])
+    def test_resume_after_crash(self, big_vrt, tmp_path, monkeypatch, paragraphs):
+        out = tmp_path / "out"
+        out.mkdir()
+        file_out = out / "big.txt"
+        convert_piece = parallel._convert_piece
+        calls = []
+
+        def crashing_convert_piece(args):
+            calls.append(args[1])
+            if len(calls) == 5 and crash:
+                raise Crash
+            return convert_piece(args)
+
+        crash = True
+        monkeypatch.setattr(incremental, "_convert_piece", crashing_convert_piece)
+        with pytest.raises(Crash):
+            convert_incremental(
+                big_vrt,
+                file_out,
+                Manifest.load(out),
+                paragraphs=paragraphs,
+                checkpoint_size=100,
+            )
+        assert (out / ("big.txt" + CHECKPOINT_SUFFIX)).exists()
+
+        calls.clear()
+        crash = False
+        converted = convert_incremental(
+            big_vrt,
+            file_out,
+            Manifest.load(out),
+            paragraphs=paragraphs,
+            checkpoint_size=100,
+        )
+
+        assert converted
+        # The four pieces before the crash were not converted again.
+        assert calls[0] > 0
+        assert file_out.read_text(encoding="utf-8") == "".join(
+            iter_vrt_xml(big_vrt.read_text(encoding="utf-8"), paragraphs=paragraphs)
+        )
+        assert not (out / ("big.txt" + CHECKPOINT_SUFFIX)).exists()
+
+    def test_changed_input_restarts(self, big_vrt, tmp_path, vrt_paragraph: str):
+        out = tmp_path / "out"
+        out.mkdir()
+        file_out = out / "big.txt"
+        (out / ("big.txt" + CHECKPOINT_SUFFIX)).write_text(
+            '{"input": {}, "options": "", "offset": 10, "output_size": 0}'
+        )
+
+        convert_incremental(big_vrt, file_out, Manifest.load(out))
+
+        assert file_out.read_text(encoding="utf-8") == "".join(
+            iter_vrt_xml(big_vrt.read_text(encoding="utf-8"))
+        )
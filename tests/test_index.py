@@ -0,0 +1,162 @@
+import os
+
+import pytest
+
+from src.vrt2txt.cli import main
+from src.vrt2txt.index import VrtIndex, build_index, get_index_path, open_index
+from src.vrt2txt.stream import iter_vrt_documents
+from src.vrt2txt.vrt2txt import iter_vrt_xml
+
+
+@pytest.fixture
+def contents(vrt_two_files_two_sentences: str, vrt_two_paragraphs: str) -> str:
+    # Sentences outside of paragraphs, and documents with paragraphs.
+    files = vrt_two_files_two_sentences.replace("###C:", "\n") + "</file>\n"
+    return files + vrt_two_paragraphs * 3
+
+
+@pytest.fixture
+def vrt_file(tmp_path, contents: str):
+    file = tmp_path / "corpus.VRT"
+    file.write_text(contents, encoding="utf-8")
+    return file
+
+
+class TestVrtIndex:
+
+    def test_counts(self, vrt_file):
+        with build_index(vrt_file) as index:
+            assert index.num_documents == 5
+            assert index.num_paragraphs == 6
+            assert index.num_sentences == 13
+
+    def test_sentences(self, vrt_file, contents: str):
+        # The sentences of the files are not in paragraphs.
+        files, docs = contents.split("<doc", 1)
+        fragments = [
+            *iter_vrt_xml(files),
+            *iter_vrt_xml("<doc" + docs, paragraphs=True),
+        ]
+        expected = [fragment for fragment in fragments if fragment not in " \n"]
+
+        with build_index(vrt_file) as index:
+            sentences = [index.sentence(i) for i in range(index.num_sentences)]
+
+        assert sentences == expected
+        assert sentences[2] == "Kiitos."
+
+    def test_paragraphs(self, vrt_file, vrt_two_paragraphs: str):
+        with build_index(vrt_file) as index:
+            assert index.paragraph(-1) == "Minä keksin."
+            assert index.paragraph(0) == index.paragraph(2)
+
+    def test_documents(self, vrt_file):
+        expected = list(iter_vrt_documents(vrt_file, paragraphs=True))
+
+        with build_index(vrt_file) as index:
+            documents = [
+                index.document(i, paragraphs=True) for i in range(index.num_documents)
+            ]
+
+        assert [document.attributes for document in documents] == [
+            document.attributes for document in expected
+        ]
+        assert [document.text for document in documents] == [
+            document.text for document in expected
+        ]
+
+    def test_offsets(self, vrt_file):
+        data = vrt_file.read_bytes()
+
+        with build_index(vrt_file) as index:
+            for level in ["document", "paragraph", "sentence"]:
+                for start, end in zip(index.starts[level], index.ends[level]):
+                    lines = data[start:end].splitlines()
+                    assert lines[0].strip().startswith(b"<")
+                    assert lines[-1].strip().startswith(b"</")
+
+    def test_sample(self, vrt_file):
+        with build_index(vrt_file) as index:
+            sample = index.sample(5, seed=1)
+            all_sentences = [index.sentence(i) for i in range(index.num_sentences)]
+
+            assert sample == index.sample(5, seed=1)
+            assert len(sample) == 5
+            assert all(sentence in all_sentences for sentence in sample)
+            assert len(index.sample(6, level="paragraph")) == 6
+            with pytest.raises(ValueError):
+                index.sample(index.num_sentences + 1)
+
+    @pytest.mark.parametrize("n", [1, 2, 3, 100])
+    def test_shards(self, tmp_path, vrt_two_paragraphs: str, n):
+        contents = vrt_two_paragraphs * 5
+        file = tmp_path / "corpus.VRT"
+        file.write_text(contents, encoding="utf-8")
+
+        with build_index(file) as index:
+            shards = index.shards(n)
+            texts = [
+                index.convert_range(start, end, paragraphs=True)
+                for start, end in shards
+            ]
+
+        assert 1 <= len(shards) <= n
+        assert shards[0][0] == 0 and shards[-1][1] == len(contents.encode())
+        assert all(a[1] == b[0] for a, b in zip(shards, shards[1:]))
+        assert "".join(texts) == "".join(iter_vrt_xml(contents, paragraphs=True))
+
+    def test_columns_from_header(self, tmp_path):
+        file = tmp_path / "corpus.VRT"
+        file.write_text(
+            "<!-- #vrt positional-attributes: word lemma upos -->\n"
+            "<text>\n<sentence>\nHei\thei\tINTJ\n!\t!\tPUNCT\n</sentence>\n</text>\n",
+            encoding="utf-8",
+        )
+
+        with build_index(file) as index:
+            assert index.sentence(0) == "Hei!"
+            assert index.document(0).text == "Hei!\n"
+
+    def test_save_and_load(self, vrt_file):
+        build_index(vrt_file).save()
+
+        index = VrtIndex.load(vrt_file)
+
+        assert get_index_path(vrt_file).name == "corpus.VRT.idx"
+        assert index.is_current()
+        assert index.num_sentences == 13
+        assert index.ends == build_index(vrt_file).ends
+
+    def test_open_index_rebuilds_stale_index(self, vrt_file, contents: str):
+        assert open_index(vrt_file).num_documents == 5
+        vrt_file.write_text(contents * 2, encoding="utf-8")
+        stat = vrt_file.stat()
+        os.utime(vrt_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        assert open_index(vrt_file).num_documents == 10
+        assert VrtIndex.load(vrt_file).num_documents == 10
+
+    def test_open_index_rebuilds_for_other_encoding(self, vrt_file):
+        assert open_index(vrt_file).encoding == "utf-8"
+
+        assert open_index(vrt_file, encoding="latin-1").encoding == "latin-1"
+        assert VrtIndex.load(vrt_file).encoding == "latin-1"
+
+    def test_empty_file(self, tmp_path):
+        file = tmp_path / "empty.VRT"
+        file.write_bytes(b"")
+
+        with build_index(file) as index:
+            assert index.num_sentences == 0
+            assert index.shards(4) == [(0, 0)]
+
+    def test_compressed_file(self, tmp_path):
+        with pytest.raises(ValueError, match="Compressed"):
+            build_index(tmp_path / "corpus.VRT.gz")
+
+
+def test_cli(vrt_file, capsys):
+    main([str(vrt_file), "--build-index"])
+
+    assert "5 documents, 6 paragraphs, 13 sentences" in capsys.readouterr().err
+    assert VrtIndex.load(vrt_file).num_paragraphs == 6
@@ -0,0 +1,161 @@
+import collections
+import random
+
+import pytest
+
+from src.vrt2txt.cli import main
+from src.vrt2txt.ngrams import NgramCounter
+from src.vrt2txt.parallel import convert_folder, iter_vrt_file_parallel
+from src.vrt2txt.stream import convert
+from src.vrt2txt.vrt2txt import iter_vrt_xml
+
+
+class TestNgramCounter:
+
+    @pytest.mark.parametrize(
+        "text",
+        [
+            "",
+            "a",
+            "ab",
+            " ",
+            "Kissa istui puussa. Koira haukkui kissaa, ja kissa hyppäsi alas.\n" * 3,
+            "  kaksi  välilyöntiä  ja  lopussa  välilyönti " * 2,
+            "x" * 100,
+        ],
+    )
+    def test_same_as_naive(self, text):
+        ngrams = NgramCounter()
+
+        ngrams.update(text)
+
+        assert ngrams == _count_naive(text)
+
+    @pytest.mark.parametrize("seed", range(5))
+    def test_pieces(self, seed):
+        generator = random.Random(seed)
+        text = "".join(generator.choice("ab c\n") for _ in range(500))
+        cuts = sorted(generator.sample(range(len(text)), 20))
+        ngrams = NgramCounter()
+
+        for start, end in zip([0] + cuts, cuts + [len(text)]):
+            ngrams.update(text[start:end])
+
+        assert ngrams == _count_naive(text)
+
+    def test_merge(self):
+        ngrams = NgramCounter()
+        ngrams.update("kissa")
+        other = NgramCounter()
+        other.update("koira")
+
+        ngrams.merge(other)
+
+        assert ngrams.unigrams["a"] == 2
+        assert ngrams.bigrams["ak"] == 0
+        assert ngrams.trigrams.total() == 6
+
+    def test_counted(self):
+        ngrams = NgramCounter()
+
+        texts = list(ngrams.counted(["ki", "ssa"]))
+
+        assert texts == ["ki", "ssa"]
+        assert ngrams == _count_naive("kissa")
+
+    @pytest.mark.parametrize("name", ["ngrams.json", "ngrams.json.gz"])
+    def test_save_and_load(self, tmp_path, name):
+        ngrams = NgramCounter()
+        ngrams.update("Äiti ja isä.\n")
+        file = tmp_path / name
+
+        ngrams.save(file)
+
+        assert NgramCounter.load(file) == ngrams
+
+    def test_load_other_file(self, tmp_path):
+        file = tmp_path / "other.json"
+        file.write_text('{"unigrams": {}}', encoding="utf-8")
+
+        with pytest.raises(ValueError, match="Not an n-gram file"):
+            NgramCounter.load(file)
+
+
+class TestConversion:
+
+    @pytest.mark.parametrize("block_size", [1, 1024 * 1024])
+    def test_convert(self, tmp_path, write_vrt, vrt_two_paragraphs: str, block_size):
+        ngrams = NgramCounter()
+
+        convert(
+            write_vrt(vrt_two_paragraphs),
+            tmp_path / "out.txt",
+            paragraphs=True,
+            block_size=block_size,
+            ngrams=ngrams,
+        )
+
+        text = (tmp_path / "out.txt").read_text(encoding="utf-8")
+        assert ngrams == _count_naive(text)
+
+    @pytest.mark.parametrize("chunk_size", [1, 200])
+    @pytest.mark.parametrize("paragraphs", [False, True])
+    def test_parallel(
+        self,
+        write_vrt,
+        vrt_two_files_two_sentences: str,
+        vrt_two_paragraphs: str,
+        chunk_size,
+        paragraphs,
+    ):
+        file = write_vrt(vrt_two_files_two_sentences + vrt_two_paragraphs)
+        ngrams = NgramCounter()
+
+        text = "".join(
+            iter_vrt_file_parallel(
+                file,
+                paragraphs=paragraphs,
+                workers=2,
+                chunk_size=chunk_size,
+                ngrams=ngrams,
+            )
+        )
+
+        assert ngrams == _count_naive(text)
+
+    def test_convert_folder(
+        self, tmp_path, write_vrt, vrt_paragraph: str, vrt_two_paragraphs
+    ):
+        folder = tmp_path / "raw"
+        folder.mkdir()
+        write_vrt(vrt_paragraph, "raw/a.VRT")
+        write_vrt(vrt_two_paragraphs, "raw/b.VRT")
+        ngrams = NgramCounter()
+
+        written = convert_folder(folder, tmp_path / "out", workers=2, ngrams=ngrams)
+
+        expected = NgramCounter()
+        for file in written:
+            expected.merge(_count_naive(file.read_text(encoding="utf-8")))
+        assert ngrams == expected
+
+    @pytest.mark.parametrize("workers", ["1", "2"])
+    def test_cli(self, tmp_path, write_vrt, vrt_two_paragraphs: str, workers):
+        file = write_vrt(vrt_two_paragraphs)
+        ngrams = tmp_path / "ngrams.json.gz"
+
+        main(
+            [str(file), "-o", str(tmp_path / "out"), "-q", "--paragraphs"]
+            + ["-j", workers, "--chunk-size", "200", "--ngrams", str(ngrams)]
+        )
+
+        expected = "".join(iter_vrt_xml(vrt_two_paragraphs, paragraphs=True))
+        assert NgramCounter.load(ngrams) == _count_naive(expected)
+
+
+def _count_naive(text: str) -> NgramCounter:
+    ngrams = NgramCounter()
+    ngrams.unigrams = collections.Counter(text)
+    ngrams.bigrams = collections.Counter(text[i : i + 2] for i in range(len(text) - 1))
+    ngrams.trigrams = collections.Counter(text[i : i + 3] for i in range(len(text) - 2))
+    return ngrams
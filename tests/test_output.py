@@ -0,0 +1,190 @@
+import io
+import multiprocessing
+import os
+import subprocess
+import sys
+import threading
+from multiprocessing.connection import Listener
+from pathlib import Path
+
+import pytest
+
+from src.vrt2txt.output import (
+    BlockWriter,
+    SharedMemoryWriter,
+    iter_shared_memory_blocks,
+)
+from src.vrt2txt.stats import ConversionStats
+from src.vrt2txt.stream import convert
+from src.vrt2txt.vrt2txt import iter_vrt_xml
+
+FRAGMENTS = ["Hyvää päivää!", " ", "Mitä kuuluu?", "\n", "€ – “lainaus”", "\n"] * 50
+
+
+class _SlowRawWriter(io.RawIOBase):
+    """A raw handle which writes at most 3 bytes at a time."""
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.data += bytes(data[:3])
+        return min(3, len(data))
+
+
+def _read_all(fd: int, chunks: list[bytes]):
+    with os.fdopen(fd, "rb") as f:
+        chunks.append(f.read())
+
+
+class TestBlockWriter:
+
+    @pytest.mark.parametrize("buffer_size", [1, 3, 7, 100, 1024 * 1024])
+    def test_writelines(self, buffer_size):
+        out = io.BytesIO()
+
+        with BlockWriter(out, buffer_size) as writer:
+            writer.writelines(FRAGMENTS[:10])
+            writer.write(FRAGMENTS[10])
+            writer.writelines(FRAGMENTS[11:])
+
+        assert out.getvalue() == "".join(FRAGMENTS).encode("utf-8")
+        assert writer.bytes_written == len(out.getvalue())
+
+    def test_buffer_is_written_when_full(self):
+        out = io.BytesIO()
+        writer = BlockWriter(out, buffer_size=100)
+
+        writer.writelines(FRAGMENTS)
+        written = out.getvalue()
+
+        assert len(written) % 100 == 0 and written
+        assert writer.writes == len(written) // 100
+        writer.close()
+        assert out.getvalue() == "".join(FRAGMENTS).encode("utf-8")
+
+    def test_partial_writes(self):
+        out = _SlowRawWriter()
+
+        with BlockWriter(out, buffer_size=10, encoding="utf-16-le") as writer:
+            writer.writelines(FRAGMENTS)
+
+        assert bytes(out.data) == "".join(FRAGMENTS).encode("utf-16-le")
+
+    def test_pipe(self):
+        read_fd, write_fd = os.pipe()
+        chunks: list[bytes] = []
+        reader = threading.Thread(target=_read_all, args=(read_fd, chunks))
+        reader.start()
+        # More than the capacity of the pipe.
+        text = "".join(FRAGMENTS) * 200
+
+        with BlockWriter(write_fd, buffer_size=4096) as writer:
+            writer.write(text)
+        os.close(write_fd)
+        reader.join()
+
+        assert chunks == [text.encode("utf-8")]
+
+    def test_buffer_size(self):
+        with pytest.raises(ValueError):
+            BlockWriter(io.BytesIO(), buffer_size=0)
+
+
+class TestConvert:
+
+    def test_file_descriptor(self, vrt_two_paragraphs: str, tmp_path):
+        src = tmp_path / "a.VRT"
+        src.write_text(vrt_two_paragraphs, encoding="utf-8")
+        fd = os.open(tmp_path / "a.txt", os.O_WRONLY | os.O_CREAT)
+        try:
+            convert(src, fd, paragraphs=True)
+        finally:
+            os.close(fd)
+
+        expected = "".join(iter_vrt_xml(vrt_two_paragraphs, paragraphs=True))
+        assert (tmp_path / "a.txt").read_text(encoding="utf-8") == expected
+
+    def test_writer(self, vrt_two_paragraphs: str):
+        out = io.BytesIO()
+        writer = BlockWriter(out, buffer_size=16)
+        stats = ConversionStats()
+
+        convert(io.StringIO(vrt_two_paragraphs), writer, block_size=10, stats=stats)
+        convert(io.StringIO(vrt_two_paragraphs), writer, block_size=10)
+
+        # Flushed, but not closed.
+        assert not writer.closed
+        expected = "".join(iter_vrt_xml(vrt_two_paragraphs)) * 2
+        assert out.getvalue().decode("utf-8") == expected
+        assert stats.as_dict()["write_seconds"] > 0
+
+
+class TestSharedMemory:
+
+    @staticmethod
+    def _consume(connection, blocks: list[bytes]):
+        for block in iter_shared_memory_blocks(connection):
+            blocks.append(bytes(block))
+
+    @pytest.mark.parametrize("fragments", [FRAGMENTS, []])
+    def test_blocks(self, fragments):
+        reader, writer = multiprocessing.Pipe()
+        blocks: list[bytes] = []
+        consumer = threading.Thread(target=self._consume, args=(reader, blocks))
+        consumer.start()
+
+        with SharedMemoryWriter(writer, buffer_size=256) as out:
+            out.writelines(fragments)
+            name = out.shared_memory.name
+        consumer.join()
+
+        assert b"".join(blocks) == "".join(fragments).encode("utf-8")
+        assert all(len(block) <= 256 for block in blocks)
+        assert len(blocks) == out.writes
+        # The segment is removed.
+        assert not os.path.exists(f"/dev/shm/{name.lstrip('/')}")
+
+    def test_convert(self, vrt_two_paragraphs: str):
+        reader, writer = multiprocessing.Pipe()
+        blocks: list[bytes] = []
+        consumer = threading.Thread(target=self._consume, args=(reader, blocks))
+        consumer.start()
+
+        with SharedMemoryWriter(writer, buffer_size=64) as out:
+            convert(io.StringIO(vrt_two_paragraphs), out, paragraphs=True)
+        consumer.join()
+
+        expected = "".join(iter_vrt_xml(vrt_two_paragraphs, paragraphs=True))
+        assert b"".join(blocks).decode("utf-8") == expected
+
+    def test_independent_consumer(self):
+        # A process which is not a child of the writer, with a resource tracker
+        # of its own.
+        code = (
+            "import sys\n"
+            "from multiprocessing.connection import Client\n"
+            "from src.vrt2txt.output import iter_shared_memory_blocks\n"
+            "connection = Client(sys.argv[1], authkey=b'test')\n"
+            "size = sum(map(len, iter_shared_memory_blocks(connection)))\n"
+            "print(size)\n"
+        )
+        with Listener(authkey=b"test") as listener:
+            consumer = subprocess.Popen(
+                [sys.executable, "-c", code, listener.address],
+                cwd=Path(__file__).parent.parent,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+            )
+            with listener.accept() as connection:
+                with SharedMemoryWriter(connection, buffer_size=256) as out:
+                    out.writelines(FRAGMENTS)
+            stdout, stderr = consumer.communicate(timeout=60)
+
+        assert int(stdout) == out.bytes_written
+        # The consumer neither removes the segment nor warns about it.
+        assert stderr == ""
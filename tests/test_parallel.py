@@ -0,0 +1,85 @@
+import pytest
+
+from src.vrt2txt.parallel import (
+    _iter_piece_offsets,
+    convert_folder,
+    iter_vrt_file_parallel,
+)
+from src.vrt2txt.vrt2txt import iter_vrt_xml
+
+
+@pytest.fixture
+def vrt_file(tmp_path, vrt_two_files_two_sentences: str, vrt_two_paragraphs: str):
+    file = tmp_path / "corpus.VRT"
+    file.write_text(vrt_two_files_two_sentences + vrt_two_paragraphs, encoding="utf-8")
+    return file
+
+
+class TestIterVrtFileParallel:
+
+    @pytest.mark.parametrize("chunk_size", [1, 200, 1024 * 1024])
+    @pytest.mark.parametrize("paragraphs", [False, True])
+    def test_same_as_iter_vrt_xml(self, vrt_file, chunk_size, paragraphs):
+        contents = vrt_file.read_text(encoding="utf-8")
+        expected = "".join(iter_vrt_xml(contents, paragraphs=paragraphs))
+
+        text = "".join(
+            iter_vrt_file_parallel(
+                vrt_file, paragraphs=paragraphs, workers=2, chunk_size=chunk_size
+            )
+        )
+        assert text == expected
+
+    def test_columns_from_header(self, tmp_path, vrt_two_paragraphs: str):
+        # The header is only in the first piece
+        file = tmp_path / "corpus.VRT"
+        header = "<!-- #vrt positional-attributes: word lemma upos -->\n"
+        word_first = "\n".join(
+            "\t".join(line.split("\t")[1:]) if "\t" in line else line
+            for line in vrt_two_paragraphs.splitlines()
+        )
+        file.write_text(header + word_first, encoding="utf-8")
+
+        text = "".join(iter_vrt_file_parallel(file, workers=2, chunk_size=1))
+        assert text == "".join(iter_vrt_xml(vrt_two_paragraphs))
+
+    def test_no_sentences(self, tmp_path):
+        file = tmp_path / "empty.VRT"
+        file.write_text("<file>\n</file>\n")
+
+        with pytest.raises(ValueError):
+            list(iter_vrt_file_parallel(file, workers=1))
+
+    def test_latin1_tags(self, tmp_path, vrt_two_paragraphs: str):
+        file = tmp_path / "corpus.VRT"
+        contents = vrt_two_paragraphs.replace("sentence>", "lausé>")
+        file.write_bytes(contents.encode("latin-1"))
+
+        offsets = list(_iter_piece_offsets(file, 1, "lausé", encoding="latin-1"))
+        text = "".join(
+            iter_vrt_file_parallel(
+                file, "lausé", workers=1, chunk_size=1, encoding="latin-1"
+            )
+        )
+
+        # A piece for each sentence, and the lines after the last one.
+        assert len(offsets) == contents.count("</lausé>") + 1
+        assert text == "".join(iter_vrt_xml(vrt_two_paragraphs))
+
+
+class TestConvertFolder:
+
+    def test_convert_folder(
+        self, tmp_path, vrt_paragraph: str, vrt_two_paragraphs: str
+    ):
+        folder = tmp_path / "raw"
+        folder.mkdir()
+        (folder / "a.VRT").write_text(vrt_paragraph, encoding="utf-8")
+        (folder / "b.VRT").write_text(vrt_two_paragraphs, encoding="utf-8")
+
+        written = convert_folder(folder, tmp_path / "out", paragraphs=True, workers=2)
+
+        assert [file.name for file in written] == ["a.txt", "b.txt"]
+        assert written[1].read_text(encoding="utf-8") == "".join(
+            iter_vrt_xml(vrt_two_paragraphs, paragraphs=True)
+        )
@@ -0,0 +1,157 @@
+import io
+import json
+import socket
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+from src.vrt2txt.cache import TokenCache
+from src.vrt2txt.cli import main
+from src.vrt2txt.server import ConversionServer
+from src.vrt2txt.vrt2txt import iter_vrt_xml
+
+
+class TestConversionServer:
+
+    def test_serve(self, raw_folder, tmp_path, vrt_paragraph: str):
+        server = ConversionServer(paragraphs=True, cache=TokenCache())
+        requests = [
+            f"{raw_folder / 'a.VRT'}\n",
+            "\n",
+            f"{raw_folder / 'b.VRT'}\t{tmp_path / 'b.txt'}\n",
+            f"{raw_folder / 'missing.VRT'}\n",
+        ]
+        responses = io.StringIO()
+
+        assert server.serve(requests, responses) == 3
+
+        records = [json.loads(line) for line in responses.getvalue().splitlines()]
+        assert [record["output"] for record in records] == [
+            str(raw_folder / "a.txt"),
+            str(tmp_path / "b.txt"),
+            str(raw_folder / "missing.txt"),
+        ]
+        assert records[0]["error"] is None and records[0]["seconds"] >= 0
+        assert "missing.VRT" in records[2]["error"]
+        assert (server.requests, server.failed) == (3, 1)
+        assert (raw_folder / "a.txt").read_text(encoding="utf-8") == "".join(
+            iter_vrt_xml(vrt_paragraph, paragraphs=True)
+        )
+        assert (tmp_path / "b.txt").exists()
+
+    def test_failed_request_leaves_no_output(self, raw_folder, tmp_path):
+        server = ConversionServer()
+        # Invalid UTF-8 after the first paragraph has been written.
+        data = (raw_folder / "b.VRT").read_bytes()
+        (raw_folder / "bad.VRT").write_bytes(data + b"\xff" + data)
+        (tmp_path / "old.txt").write_text("old", encoding="utf-8")
+
+        responses = [
+            server.handle(f"{raw_folder / 'missing.VRT'}\n"),
+            server.handle(f"{raw_folder / 'bad.VRT'}\n"),
+            server.handle(f"{raw_folder / 'bad.VRT'}\t{tmp_path / 'old.txt'}\n"),
+        ]
+
+        assert all(response["error"] for response in responses)
+        assert not (raw_folder / "missing.txt").exists()
+        assert not (raw_folder / "bad.txt").exists()
+        assert (tmp_path / "old.txt").read_text(encoding="utf-8") == "old"
+        assert sorted(path.name for path in raw_folder.iterdir()) == [
+            "a.VRT",
+            "b.VRT",
+            "bad.VRT",
+        ]
+        assert sorted(path.name for path in tmp_path.iterdir()) == ["old.txt", "raw"]
+
+    def test_output_folder(self, raw_folder, tmp_path):
+        server = ConversionServer(tmp_path / "out", "gz")
+        (tmp_path / "out").mkdir()
+
+        response = server.handle(f"{raw_folder / 'a.VRT'}\n")
+
+        assert response["output"] == str(tmp_path / "out" / "a.txt.gz")
+        assert (tmp_path / "out" / "a.txt.gz").exists()
+
+    @pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="Unix sockets only")
+    def test_socket(self, raw_folder, tmp_path):
+        path = tmp_path / "vrt2txt.sock"
+        socket_server = ConversionServer().make_socket_server(path)
+        thread = threading.Thread(target=socket_server.serve_forever)
+        thread.start()
+        try:
+            for name in ["a", "b"]:
+                # One connection per request, and the server stays up.
+                with socket.socket(socket.AF_UNIX) as client:
+                    client.connect(str(path))
+                    client.sendall(f"{raw_folder / name}.VRT\n".encode())
+                    client.shutdown(socket.SHUT_WR)
+                    response = json.loads(client.makefile().readline())
+                assert response["error"] is None
+        finally:
+            socket_server.shutdown()
+            socket_server.server_close()
+            thread.join()
+
+        assert (raw_folder / "a.txt").exists() and (raw_folder / "b.txt").exists()
+
+
+class TestCommandLine:
+
+    def test_serve(self, raw_folder, tmp_path, monkeypatch, capsys):
+        stdin = io.StringIO(f"{raw_folder / 'a.VRT'}\n{raw_folder / 'b.VRT'}\n")
+        monkeypatch.setattr(sys, "stdin", stdin)
+
+        main(["--serve", "-o", str(tmp_path / "out"), "--paragraphs", "--mmap"])
+
+        captured = capsys.readouterr()
+        assert len(captured.out.splitlines()) == 2
+        assert "served 2 requests, 0 failed" in captured.err
+        assert (tmp_path / "out" / "b.txt").exists()
+
+    @pytest.mark.parametrize(
+        "args",
+        [
+            ["a.VRT", "--serve"],
+            ["--serve", "-j", "2"],
+            ["--serve", "--threaded"],
+            ["--serve", "--chunk-size", "1000"],
+            ["--socket", "s"],
+        ],
+    )
+    def test_invalid_options(self, args):
+        with pytest.raises(SystemExit):
+            main(args)
+
+
+def test_lazy_imports():
+    # The command line interface does not import the modules of the optional
+    # features, nor the slow standard modules used only by them.
+    code = (
+        "import sys, src.vrt2txt, src.vrt2txt.cli; "
+        "print(' '.join(sorted(sys.modules)))"
+    )
+    root = Path(__file__).parent.parent
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=root,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    modules = set(output.split())
+
+    assert "src.vrt2txt.cli" in modules
+    for name in [
+        "html",
+        "multiprocessing",
+        "sqlite3",
+        "zipfile",
+        "lzma",
+        "src.vrt2txt.parallel",
+        "src.vrt2txt.index",
+        "src.vrt2txt.server",
+    ]:
+        assert name not in modules
@@ -0,0 +1,143 @@
+import pickle
+
+import pytest
+
+from src.vrt2txt.parallel import convert_folder, iter_vrt_file_parallel
+from src.vrt2txt.stats import STAGES, ConversionStats
+from src.vrt2txt.stream import convert, iter_vrt_file, iter_vrt_mmap
+from src.vrt2txt.vrt2txt import iter_vrt_blocks, iter_vrt_xml
+
+VRT = """<doc id="1">
+<paragraph>
+<sentence>
+1	Tom	Tom	PROPN
+2	&amp;	&amp;	SYM
+3	Jerry	Jerry	PROPN
+4	.	.	PUNCT
+</sentence>
+<sentence>
+1	&quot;Hei&quot;	hei	INTJ
+</sentence>
+</paragraph>
+</doc>
+"""
+
+
+class TestConversionStats:
+
+    def test_counters(self):
+        stats = ConversionStats()
+
+        text = "".join(iter_vrt_xml(VRT, paragraphs=True, stats=stats))
+
+        assert text == 'Tom & Jerry. "Hei"\n'
+        assert stats.lines == VRT.count("\n")
+        assert stats.bytes_scanned == len(VRT)
+        assert stats.sentences == 2
+        assert stats.paragraphs == 1
+        assert stats.tokens == 5
+        assert stats.entities == 3
+        assert stats.malformed_lines == 0
+
+    def test_same_output(self, vrt_two_paragraphs: str):
+        expected = list(iter_vrt_blocks(vrt_two_paragraphs, paragraphs=True))
+
+        result = list(
+            iter_vrt_blocks(
+                vrt_two_paragraphs, paragraphs=True, stats=ConversionStats()
+            )
+        )
+
+        assert result == expected
+
+    def test_times(self, tmp_path, write_vrt, vrt_two_paragraphs: str):
+        stats = ConversionStats()
+        file = write_vrt(vrt_two_paragraphs)
+
+        convert(file, tmp_path / "out.txt", paragraphs=True, stats=stats)
+
+        times = stats.times
+        assert list(times) == list(STAGES)
+        assert all(seconds >= 0 for seconds in times.values())
+        assert times["write"] > 0
+        assert stats.total_time == pytest.approx(sum(times.values()))
+
+    def test_malformed_line(self):
+        stats = ConversionStats()
+
+        with pytest.raises(ValueError):
+            list(iter_vrt_xml("<sentence>\nfoo\n</sentence>\n", stats=stats))
+
+        assert stats.malformed_lines == 1
+
+    @pytest.mark.parametrize("newline", ["\n", "\r\n"])
+    @pytest.mark.parametrize("iterate", [iter_vrt_file, iter_vrt_mmap])
+    def test_counts_bytes(self, tmp_path, newline, iterate):
+        file = tmp_path / "corpus.VRT"
+        file.write_bytes(VRT.replace("Jerry", "Jäärä").replace("\n", newline).encode())
+        stats = ConversionStats()
+
+        list(iterate(file, paragraphs=True, stats=stats))
+
+        assert stats.bytes_scanned == file.stat().st_size
+        assert stats.tokens == 5
+        assert stats.entities == 3
+
+    def test_merge_and_as_dict(self):
+        stats = ConversionStats()
+        list(iter_vrt_xml(VRT, paragraphs=True, stats=stats))
+        merged = ConversionStats()
+
+        merged.merge(stats)
+        merged.merge(pickle.loads(pickle.dumps(stats)))
+
+        result = merged.as_dict()
+        assert result["sentences"] == 4
+        assert result["tokens"] == 10
+        assert result["total_seconds"] == pytest.approx(2 * stats.total_time)
+        assert set(f"{stage}_seconds" for stage in STAGES) <= set(result)
+
+    def test_add_time(self):
+        stats = ConversionStats()
+
+        stats.add_time("write", 1.5)
+
+        assert stats.times["write"] == 1.5
+        with pytest.raises(ValueError):
+            stats.add_time("scan", 1.0)
+
+
+class TestParallelStats:
+
+    @pytest.mark.parametrize("paragraphs", [False, True])
+    def test_same_counts_as_sequential(self, write_vrt, paragraphs):
+        contents = VRT * 20
+        file = write_vrt(contents)
+        expected = ConversionStats()
+        list(iter_vrt_xml(contents, paragraphs=paragraphs, stats=expected))
+
+        stats = ConversionStats()
+        list(
+            iter_vrt_file_parallel(
+                file, paragraphs=paragraphs, workers=2, chunk_size=100, stats=stats
+            )
+        )
+
+        assert stats.sentences == expected.sentences
+        assert stats.tokens == expected.tokens
+        assert stats.entities == expected.entities
+        assert stats.paragraphs == expected.paragraphs
+
+    def test_convert_folder(self, tmp_path, write_vrt):
+        folder = tmp_path / "raw"
+        folder.mkdir()
+        write_vrt(VRT, "raw/a.VRT")
+        write_vrt(VRT, "raw/b.VRT")
+        stats = ConversionStats()
+
+        convert_folder(
+            folder, tmp_path / "out", paragraphs=True, workers=2, stats=stats
+        )
+
+        assert stats.sentences == 4
+        assert stats.paragraphs == 2
@@ -0,0 +1,190 @@
+import gzip
+import io
+
+import pytest
+
+from src.vrt2txt.cache import TokenCache
+from src.vrt2txt.stream import (
+    _iter_mapped_lines,
+    convert,
+    iter_vrt_file,
+    iter_vrt_mmap,
+    iter_vrt_mmap_blocks,
+)
+from src.vrt2txt.vrt2txt import iter_vrt_xml
+
+
+class TestIterVrtFile:
+
+    @pytest.mark.parametrize("chunk_size", [1, 7, 64, 1024 * 1024])
+    def test_same_as_iter_vrt_xml(self, vrt_two_files_two_sentences: str, chunk_size):
+        expected = list(iter_vrt_xml(vrt_two_files_two_sentences))
+        handle = io.StringIO(vrt_two_files_two_sentences)
+
+        assert list(iter_vrt_file(handle, chunk_size=chunk_size)) == expected
+
+    @pytest.mark.parametrize("chunk_size", [1, 5, 100])
+    def test_paragraphs(self, vrt_two_paragraphs: str, chunk_size):
+        expected = list(iter_vrt_xml(vrt_two_paragraphs, paragraphs=True))
+        handle = io.StringIO(vrt_two_paragraphs)
+
+        result = list(iter_vrt_file(handle, paragraphs=True, chunk_size=chunk_size))
+        assert result == expected
+
+    @pytest.mark.parametrize("chunk_size", [1, 3, 1000])
+    def test_binary_handle(self, vrt_two_paragraphs: str, chunk_size):
+        # Multi-byte characters (ä) are split between chunks with small sizes
+        expected = list(iter_vrt_xml(vrt_two_paragraphs, paragraphs=False))
+        handle = io.BytesIO(vrt_two_paragraphs.encode("utf-8"))
+
+        assert list(iter_vrt_file(handle, chunk_size=chunk_size)) == expected
+
+    def test_path(self, vrt_two_paragraphs: str, tmp_path):
+        file = tmp_path / "corpus.VRT"
+        file.write_text(vrt_two_paragraphs, encoding="utf-8")
+        expected = list(iter_vrt_xml(vrt_two_paragraphs, paragraphs=True))
+
+        assert list(iter_vrt_file(file, paragraphs=True)) == expected
+
+    def test_bare_carriage_return(self, tmp_path):
+        # A "\r" without "\n" does not end a line in any of the inputs.
+        contents = "<sentence>\n1\tx\tx\tNOUN\r2\ty\ty\tNOUN\n</sentence>\n"
+        file = tmp_path / "corpus.VRT"
+        file.write_bytes(contents.encode())
+        compressed = tmp_path / "corpus.VRT.gz"
+        compressed.write_bytes(gzip.compress(contents.encode()))
+        expected = list(iter_vrt_xml(contents))
+
+        assert expected == ["x", "\n"]
+        assert list(iter_vrt_file(file)) == expected
+        assert list(iter_vrt_file(compressed)) == expected
+        assert list(iter_vrt_mmap(file)) == expected
+
+
+class TestIterVrtMmap:
+
+    @pytest.fixture
+    def write_vrt(self, tmp_path):
+        def write(contents: str, encoding="utf-8"):
+            file = tmp_path / "corpus.VRT"
+            file.write_bytes(contents.encode(encoding))
+            return file
+
+        return write
+
+    @pytest.mark.parametrize("paragraphs", [False, True])
+    def test_same_as_iter_vrt_xml(self, write_vrt, vrt_two_paragraphs: str, paragraphs):
+        file = write_vrt(vrt_two_paragraphs)
+        expected = list(iter_vrt_xml(vrt_two_paragraphs, paragraphs=paragraphs))
+
+        assert list(iter_vrt_mmap(file, paragraphs=paragraphs)) == expected
+
+    def test_blocks(self, write_vrt, vrt_two_paragraphs: str):
+        file = write_vrt(vrt_two_paragraphs)
+
+        blocks = list(iter_vrt_mmap_blocks(file, paragraphs=True, block_size=0))
+
+        assert len(blocks) == 2
+        assert all(block.endswith("\n") for block in blocks)
+        assert "".join(blocks) == "".join(
+            iter_vrt_xml(vrt_two_paragraphs, paragraphs=True)
+        )
+
+    def test_entities_and_columns(self, write_vrt):
+        contents = (
+            "<!-- #vrt positional-attributes: word lemma upos -->\n"
+            "<sentence>\n"
+            "R&amp;D\tr&amp;d\tNOUN\n"
+            "&eacute;\t_\tNOUN\n"
+            ".\t.\tPUNCT\n"
+            "</sentence>\n"
+        )
+        file = write_vrt(contents)
+
+        for html_entities in [False, True]:
+            expected = list(iter_vrt_xml(contents, html_entities=html_entities))
+            result = list(iter_vrt_mmap(file, html_entities=html_entities))
+            assert result == expected
+
+    def test_cache(self, write_vrt, vrt_two_paragraphs: str):
+        file = write_vrt(vrt_two_paragraphs)
+        cache = TokenCache()
+
+        result = list(iter_vrt_mmap(file, paragraphs=True, cache=cache))
+
+        assert result == list(iter_vrt_xml(vrt_two_paragraphs, paragraphs=True))
+        assert cache.hits > 0
+
+    def test_latin1(self, write_vrt, vrt_paragraph: str):
+        file = write_vrt(vrt_paragraph, encoding="latin-1")
+
+        result = list(iter_vrt_mmap(file, encoding="latin-1"))
+
+        assert result == list(iter_vrt_xml(vrt_paragraph))
+
+    def test_not_ascii_compatible(self, write_vrt, vrt_paragraph: str):
+        file = write_vrt(vrt_paragraph, encoding="utf-16")
+
+        with pytest.raises(ValueError):
+            list(iter_vrt_mmap(file, encoding="utf-16"))
+
+    def test_empty_file(self, write_vrt):
+        with pytest.raises(ValueError, match="Found no sentences"):
+            list(iter_vrt_mmap(write_vrt("")))
+
+    @pytest.mark.parametrize("window_size", [1, 10, 1000])
+    def test_mapped_lines(self, write_vrt, vrt_two_paragraphs: str, window_size):
+        file = write_vrt(vrt_two_paragraphs)
+
+        lines = list(_iter_mapped_lines(file, window_size))
+
+        assert lines == vrt_two_paragraphs.encode().splitlines()
+
+    @pytest.mark.parametrize("separator", ["\x85", "\u2028", "\x0c", "\x1e"])
+    def test_unicode_line_boundaries(self, write_vrt, separator):
+        # Only "\n" ends a line; the other line boundaries of Unicode are a
+        # part of the word in both the text and the bytes.
+        contents = (
+            "<sentence>\r\n"
+            f"1\ta{separator}b\tab\tNOUN\n"
+            "2\tc\tc\tNOUN\n"
+            "</sentence>\n"
+        )
+        file = write_vrt(contents)
+        expected = [f"a{separator}b c", "\n"]
+
+        assert list(iter_vrt_xml(contents)) == expected
+        assert list(iter_vrt_file(file)) == expected
+        assert list(iter_vrt_mmap(file)) == expected
+
+
+class TestConvert:
+
+    def test_paths(self, vrt_two_paragraphs: str, tmp_path):
+        src = tmp_path / "corpus.VRT"
+        src.write_text(vrt_two_paragraphs, encoding="utf-8")
+
+        convert(src, tmp_path / "corpus.txt", paragraphs=True, block_size=10)
+
+        assert (tmp_path / "corpus.txt").read_text(encoding="utf-8") == "".join(
+            iter_vrt_xml(vrt_two_paragraphs, paragraphs=True)
+        )
+
+    @pytest.mark.parametrize("dst", [io.StringIO(), io.BytesIO()])
+    def test_handles(self, vrt_two_files_two_sentences: str, dst):
+        convert(io.StringIO(vrt_two_files_two_sentences), dst)
+
+        text = dst.getvalue()
+        if isinstance(text, bytes):
+            text = text.decode("utf-8")
+        assert text == "".join(iter_vrt_xml(vrt_two_files_two_sentences))
+
+    def test_use_mmap(self, vrt_two_paragraphs: str, tmp_path):
+        src = tmp_path / "corpus.VRT"
+        src.write_text(vrt_two_paragraphs, encoding="utf-8")
+
+        convert(src, tmp_path / "corpus.txt", paragraphs=True, use_mmap=True)
+
+        assert (tmp_path / "corpus.txt").read_text(encoding="utf-8") == "".join(
+            iter_vrt_xml(vrt_two_paragraphs, paragraphs=True)
+        )
@@ -2,90 +2,15 @@ from itertools import zip_longest
 
 import pytest
 
-from src.vrt2txt.vrt2txt import _form_sentence, iter_vrt_xml, parse_vrt_sentence
-
-
-@pytest.fixture
-def vrt_two_files_two_sentences():
-    return """
-    <file id="123" year="1999" genre="Comedy,Romance" original="English" country="USA" duration= "NaN">
-    <sentence>
-    1	tarvitsen	tarvita	VERB	_	Mood=Ind|Number=Sing|Person=1|Tense=Pres|VerbForm=Fin|Voice=Act	0	root	_	_
-    2	apua	apu	NOUN	_	Case=Par|Number=Sing	1	dobj	_	_
-    3	.	.	PUNCT	_	_	1	punct	_	_
-    </sentence>
-    <sentence>
-    1	mario	mario	NOUN	_	Case=Nom|Number=Sing	0	root	_	_
-    2	,	,	PUNCT	_	_	1	punct	_	_
-    3	iaske	iaske	NOUN	_	Case=Nom|Number=Sing	1	conj	_	_
-    4	hänet	hän	PRON	_	Case=Acc|Number=Sing|Person=3|PronType=Prs	5	nmod:poss	_	_
-    5	aias	aias	NOUN	_	Case=Nom|Number=Sing	3	nmod	_	_
-    6	.	.	PUNCT	_	_	1	punct	_	_
-    </sentence>
-    </file>###C:<file id="20018" year="2001" genre="Comedy" original="English" country="USA, Canada" duration= "NaN">
-    <sentence>
-    1	Kiitos	kiitos	NOUN	_	Case=Nom|Number=Sing	0	root	_	_
-    2	.	.	PUNCT	_	_	1	punct	_	_
-    </sentence>
-    <sentence>
-    1	Mitä	mikä	PRON	_	Case=Par|Number=Sing|PronType=Int	3	dobj	_	_
-    2	haluat	haluta	VERB	_	Mood=Ind|Number=Sing|Person=2|Tense=Pres|VerbForm=Fin|Voice=Act	0	root	_	_
-    3	tietää	tietää	VERB	_	InfForm=1|Number=Sing|VerbForm=Inf|Voice=Act	2	xcomp	_	_
-    4	?	?	PUNCT	_	_	2	punct	_	_
-    </sentence>
-    """
-
-
-@pytest.fixture
-def vrt_paragraph(paragraph1):
-    return f"""
-    <doc id="123" url="https://fi.wikipedia.org/wiki?curid=123" title="Foo">
-    {paragraph1}
-    </doc>
-    """
-
-
-@pytest.fixture
-def vrt_two_paragraphs(paragraph1):
-    return f"""
-    <doc id="123" url="https://fi.wikipedia.org/wiki?curid=123" title="Foo">
-    {paragraph1}
-    <paragraph>
-    <sentence>
-    1	Minä	minä	PRON	_	Case=Nom|Number=Sing|Person=1|PronType=Prs	2	nsubj	_	_
-    2	keksin	keksiä	VERB	_	Mood=Ind|Number=Sing|Person=1|Tense=Past|VerbForm=Fin|Voice=Act	0	root	_	_
-    3	.	.	PUNCT	_	_	2	punct	_	_
-    </sentence>
-    </paragraph>
-    </doc>
-    """
-
-
-@pytest.fixture
-def paragraph1():
-    return """
-    <paragraph>
-    <sentence>
-    1	Mondego	Mondego	NOUN	_	Case=Nom|Number=Sing	8	nsubj:cop	_	_
-    2	on	olla	VERB	_	Mood=Ind|Number=Sing|Person=3|Tense=Pres|VerbForm=Fin|Voice=Act	8	cop	_	_
-    3	pisin	pitkä	ADJ	_	Case=Nom|Degree=Sup|Number=Sing	8	amod	_	_
-    4	kokonaisuudessaan	kokonaisuus	NOUN	_	Case=Ine|Number=Sing|Person[psor]=3	7	nmod	_	_
-    5	Portugalin	Portugali	PROPN	_	Case=Gen|Number=Sing	6	nmod:poss	_	_
-    6	alueella	alue	NOUN	_	Case=Ade|Number=Sing	7	nmod	_	_
-    7	sijaitseva	sijaita	VERB	_	Case=Nom|Degree=Pos|Number=Sing|PartForm=Pres|VerbForm=Part|Voice=Act	8	acl	_	_
-    8	joki	joki	NOUN	_	Case=Nom|Number=Sing	0	root	_	_
-    9	.	.	PUNCT	_	_	8	punct	_	_
-    </sentence>
-    <sentence>
-    1	Sen	se	PRON	_	Case=Gen|Number=Sing|PronType=Dem	2	nmod:poss	_	_
-    2	pituus	pituus	NOUN	_	Case=Nom|Number=Sing	5	nsubj:cop	_	_
-    3	on	olla	VERB	_	Mood=Ind|Number=Sing|Person=3|Tense=Pres|VerbForm=Fin|Voice=Act	5	cop	_	_
-    4	234	234	NUM	_	NumType=Card	5	nummod	_	_
-    5	kilometriä	kilo#metri	NOUN	_	Case=Par|Number=Sing	0	root	_	_
-    6	.	.	PUNCT	_	_	5	punct	_	_
-    </sentence>
-    </paragraph>
-    """
+from src.vrt2txt.columns import Columns
+from src.vrt2txt.vrt2txt import (
+    _form_sentence,
+    _iter_lines,
+    get_contents_from_line,
+    iter_vrt_blocks,
+    iter_vrt_xml,
+    parse_vrt_sentence,
+)
 
 
 class TestIterVrtXml:
@@ -147,6 +72,92 @@ class TestIterVrtXml:
         ):
             assert sentence == sentence_expected
 
+    def test_paragraph_without_sentences(self):
+        contents = "<paragraph>\n</paragraph>\n"
+        with pytest.raises(ValueError):
+            list(iter_vrt_xml(contents, paragraphs=True))
+
+    def test_sentences_outside_paragraphs_are_skipped(self, vrt_paragraph: str):
+        contents = (
+            "<sentence>\n1\tOhitettu\tohittaa\tVERB\t_\n</sentence>\n" + vrt_paragraph
+        )
+        assert list(iter_vrt_xml(contents, paragraphs=True)) == list(
+            iter_vrt_xml(vrt_paragraph, paragraphs=True)
+        )
+
+
+class TestColumns:
+
+    def test_columns_from_header(self, vrt_paragraph: str):
+        # word-first layout, as in many Kielipankki corpora
+        contents = (
+            "<!-- #vrt positional-attributes: word lemma upos msd -->\n"
+            + "\n".join(
+                "\t".join(line.split("\t")[1:]) if "\t" in line else line
+                for line in vrt_paragraph.splitlines()
+            )
+        )
+
+        assert list(iter_vrt_xml(contents)) == list(iter_vrt_xml(vrt_paragraph))
+
+    def test_explicit_columns(self):
+        contents = "<sentence>\nHelppoa\tADJ\n!\tPUNCT\n</sentence>\n"
+
+        result = "".join(iter_vrt_xml(contents, columns=Columns(word=0, upos=1)))
+        assert result == "Helppoa!\n"
+
+
+class TestIterVrtBlocks:
+
+    def test_one_block_per_paragraph(self, vrt_two_paragraphs: str):
+        blocks = list(
+            iter_vrt_blocks(vrt_two_paragraphs, paragraphs=True, block_size=0)
+        )
+
+        assert blocks == [
+            "Mondego on pisin kokonaisuudessaan Portugalin alueella sijaitseva joki. "
+            "Sen pituus on 234 kilometriä.\n",
+            "Minä keksin.\n",
+        ]
+
+    @pytest.mark.parametrize("paragraphs", [False, True])
+    @pytest.mark.parametrize("block_size", [1, 40, 64 * 1024])
+    def test_same_text_as_iter_vrt_xml(
+        self, vrt_two_paragraphs: str, paragraphs, block_size
+    ):
+        blocks = list(
+            iter_vrt_blocks(
+                vrt_two_paragraphs, paragraphs=paragraphs, block_size=block_size
+            )
+        )
+
+        assert "".join(blocks) == "".join(
+            iter_vrt_xml(vrt_two_paragraphs, paragraphs=paragraphs)
+        )
+        if block_size == 1:
+            # Every sentence fills a block, and the last newline is left alone
+            assert len(blocks) == 4
+
+
+class TestIterLines:
+
+    @pytest.mark.parametrize("block_size", [1, 4, 1000])
+    def test_chunks_split_mid_line(self, block_size):
+        chunks = ["ab\nc", "d\n", "\ne", "f", "\r\ng"]
+
+        assert list(_iter_lines(chunks, block_size)) == ["ab", "cd", "", "ef", "g"]
+
+    def test_same_as_splitlines(self, vrt_two_paragraphs: str):
+        lines = list(_iter_lines((vrt_two_paragraphs,), block_size=10))
+
+        assert lines == vrt_two_paragraphs.splitlines()
+
+    @pytest.mark.parametrize("block_size", range(1, 8))
+    def test_blank_lines_at_block_ends(self, block_size):
+        text = "a\n\nb\n\n\nc\n\n"
+
+        assert list(_iter_lines([text], block_size)) == text.splitlines()
+
 
 @pytest.fixture
 def vrt_single_word():
@@ -449,3 +460,42 @@ class TestFormSentence:
     def test_unknown_part_type(self):
         with pytest.raises(ValueError):
             _form_sentence(["A"], ["FOO-IM-NOT-A-VALID-TYPE"])
+
+
+class TestGetContentsFromLine:
+
+    def test_word(self):
+        line = "2\tapua\tapu\tNOUN\t_\tCase=Par|Number=Sing\t1\tdobj\t_\t_"
+        assert get_contents_from_line(line) == ("apua", "WORD")
+
+    def test_punct(self):
+        assert get_contents_from_line("3\t.\t.\tPUNCT\t_") == (".", "PUNCT")
+
+    @pytest.mark.parametrize(
+        "word, expected",
+        [
+            ("&lt;3", "<3"),
+            ("&quot;&apos;&gt;", "\"'>"),
+            ("&amp;lt;", "&lt;"),
+            ("&eacute;", "&eacute;"),
+        ],
+    )
+    def test_vrt_entities(self, word, expected):
+        content, _ = get_contents_from_line(f"1\t{word}\t{word}\tSYM\t_")
+        assert content == expected
+
+    def test_html_entities(self):
+        line = "1\t&eacute;&amp;\t_\tNOUN\t_"
+        assert get_contents_from_line(line, html_entities=True) == ("é&", "WORD")
+
+    def test_too_few_columns(self):
+        with pytest.raises(ValueError):
+            get_contents_from_line("1\tapua\tapu")
+
+    def test_no_columns_after_upos(self):
+        assert get_contents_from_line("1\tapua\tapu\tNOUN") == ("apua", "WORD")
+
+    def test_columns(self):
+        line = "apu\tapua\tNOUN"
+        columns = Columns(word=1, upos=2)
+        assert get_contents_from_line(line, columns=columns) == ("apua", "WORD")